@@ -0,0 +1,520 @@
+"""
+Backends de Análise de Imóveis
+==============================
+
+- responses: uma única chamada à Responses API com o edital como arquivo de
+  entrada e saída estruturada (JSON Schema strict de prompts.py). Retorna
+  assim que a geração termina. Backend padrão.
+- assistants: thread + mensagem + run consumido como stream de eventos até
+  o fim do run (o uso de tokens só vem no evento final). O texto parcial
+  pode ser repassado a quem chamou e o tempo até o primeiro token (TTFT) e
+  o tempo total são medidos. Com "edital_vector_store_id" no config.json
+  (criado por setup_openai.py) o edital já está indexado no vector store
+  do assistente; sem ele, o edital vai anexado à mensagem e a plataforma
+  indexa o arquivo de novo a cada thread antes de iniciar o run.
+- chat: uma chamada à Chat Completions com a mesma saída estruturada; é
+  também a chamada do backend local (modelo em CPU num servidor compatível).
+
+O edital de cada imóvel sai do registro de editais (editais.py) quando há
+uma regra para a UF/modalidade do anúncio; senão vale o edital global. Com
+"edital_modo": "clausulas" o edital não vai como arquivo nem via
+file_search: as cláusulas relevantes para cada critério, buscadas num
+índice BM25 local (clausulas.py), vão no texto da mensagem.
+
+Com "saida_modo": "compacta" o modelo responde no formato enxuto de
+compacto.py (menos tokens de saída, geração mais curta) e extrair_json
+devolve a estrutura completa de sempre.
+
+A interface comum dos backends, a escolha por execução ("analysis_backend"
+do config.json ou `python query.py --backend assistants`) e o backend local
+ficam em backends.py. Com hedging (hedge.py) as chamadas recebem um
+`cancelado` (threading.Event): responses e chat passam a usar streaming e
+fecham o stream quando a outra tentativa vence; no assistants o run é
+cancelado. Com `on_partial` (validação da saída durante o stream,
+validacao.py) responses e chat também usam streaming e repassam o texto
+acumulado; a mesma interrupção aborta uma resposta inválida. O modo batch
+do automation.py (batch.py) envia as mesmas chamadas do backend responses
+pela Batch API.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from openai import AssistantEventHandler
+
+import clausulas
+import compacto
+import matricula_summary
+import scoring
+import usage
+import validacao
+from ocr import extrair_texto_pdf, DEFAULT_DPI_RAPIDO, DEFAULT_DPI_ALTO, DEFAULT_CONF_MIN
+from prompts import ANALYSIS_SCHEMA, CRITERIOS, INSTRUCTIONS, MODEL, VERSAO_PROMPT
+
+
+def caminhos_imovel(estado: str, cidade: str, imovel_id: str) -> Dict[str, str]:
+    """Caminhos do HTML de detalhe e do PDF da matrícula baixados pelo scraping"""
+    base = f"data/detail/{cidade.lower()}_{estado.lower()}/{imovel_id}"
+    return {"html": f"{base}.html", "pdf": f"{base}.pdf"}
+
+
+def ler_matricula(pdf_path: str, config: Dict) -> str:
+    """Extrai o texto da matrícula (se existir o PDF)"""
+    if not os.path.exists(pdf_path):
+        print(f"[AVISO] PDF nao encontrado: {pdf_path}")
+        print("Continuando analise apenas com informacoes do HTML...")
+        return "Matricula nao disponivel (PDF nao encontrado)."
+
+    print(f"[OK] PDF encontrado: {pdf_path}")
+    try:
+        # Motor de OCR e pipeline configuráveis (ver ocr.py). Primeira passada
+        # em baixa resolução; páginas de baixa confiança são relidas em alta
+        ocr_stats = {}
+        matricula_imovel = extrair_texto_pdf(
+            pdf_path,
+            engine=config.get("ocr_engine"),
+            lang=config.get("ocr_lang", "eng"),
+            workers=config.get("ocr_workers", 1),
+            pipeline=config.get("ocr_pipeline"),
+            dpi=config.get("ocr_dpi", DEFAULT_DPI_RAPIDO),
+            dpi_alto=config.get("ocr_dpi_alto", DEFAULT_DPI_ALTO),
+            conf_min=config.get("ocr_conf_min", DEFAULT_CONF_MIN),
+            stats=ocr_stats
+        )
+
+        print(f"Matricula extraida: {len(matricula_imovel)} caracteres")
+        print(f"OCR: {ocr_stats['paginas_alta_resolucao']}/{ocr_stats['paginas']} paginas relidas em alta resolucao "
+              f"(confianca media: {ocr_stats['confianca_media']})")
+        return matricula_imovel
+    except Exception as e:
+        print(f"[AVISO] Erro ao processar PDF: {e}")
+        return "PDF nao pode ser processado."
+
+
+def preparar_matricula(client, matricula_imovel: str, config: Dict) -> str:
+    """Matrícula longa vira resumo estruturado (map-reduce) em vez de ser truncada"""
+    limite = config.get("matricula_limite_texto", matricula_summary.DEFAULT_LIMITE_TEXTO)
+    if config.get("matricula_modo", "resumo") == "truncar":
+        return matricula_imovel[:limite]
+
+    return matricula_summary.preparar_matricula(
+        client,
+        matricula_imovel,
+        model=config.get("matricula_modelo", matricula_summary.DEFAULT_MODEL),
+        workers=config.get("matricula_workers", matricula_summary.DEFAULT_WORKERS),
+        tamanho_bloco=config.get("matricula_bloco", matricula_summary.DEFAULT_BLOCO),
+        limite_texto=limite
+    )
+
+
+def montar_conteudo(detail: str, matricula: str) -> str:
+    """Mensagem do usuário com os dados do imóvel"""
+    return f"Esta é a descrição resumida do imóvel: {detail}\n\nMatrícula do imóvel: {matricula}"
+
+
+def preparar_conteudo(client, config: Dict, estado: str, cidade: str, imovel_id: str) -> str:
+    """Lê detalhe e matrícula do imóvel e monta a mensagem da análise
+
+    Ordem pensada para o cache de prompt da API (prefixo idêntico entre
+    requisições): o que é igual para todos os imóveis do edital vem antes
+    (trechos do edital no modo clausulas), depois os dados do imóvel e, por
+    último, as notas locais, que variam por anúncio.
+    """
+    caminhos = caminhos_imovel(estado, cidade, imovel_id)
+    matricula_imovel = preparar_matricula(client, ler_matricula(caminhos["pdf"], config), config)
+
+    with open(caminhos["html"], "r", encoding="utf-8") as f:
+        detail = f.read()
+
+    conteudo = montar_conteudo(detail, matricula_imovel)
+    if clausulas.modo(config) == "clausulas":
+        # Trechos de todos os critérios (não só dos que o modelo avalia neste
+        # imóvel): o bloco depende só do edital e forma um prefixo estável
+        conteudo = clausulas.trechos_edital(config, [nome for nome, _ in CRITERIOS]) + "\n\n" + conteudo
+    # Critérios quantitativos calculados localmente (scoring.py) saem do escopo do modelo
+    locais = scoring.criterios_locais(detail, config)
+    if locais and scoring.modo(config) == "prompt":
+        conteudo += scoring.instrucao_prompt(locais)
+    return conteudo
+
+
+def finalizar_analise(analise: Dict, config: Dict, estado: str, cidade: str, imovel_id: str) -> Dict:
+    """Aplica as notas locais (scoring.py) ao JSON do modelo e recalcula a nota final"""
+    html_path = caminhos_imovel(estado, cidade, imovel_id)["html"]
+    if not os.path.exists(html_path):
+        return analise
+    with open(html_path, "r", encoding="utf-8") as f:
+        return scoring.aplicar(analise, scoring.criterios_locais(f.read(), config))
+
+
+# Tokens fixos por análise além da mensagem: edital anexado e resposta JSON
+DEFAULT_EDITAL_TOKENS = 15000
+DEFAULT_OUTPUT_TOKENS = 2000
+
+
+def tokens_saida(config: Dict) -> int:
+    """Tokens de saída previstos para a resposta no formato configurado"""
+    return compacto.DEFAULT_OUTPUT_TOKENS if compacto.modo(config) == "compacta" else DEFAULT_OUTPUT_TOKENS
+
+
+def estimar_tokens(conteudo: str, config: Dict) -> int:
+    """Estimativa grosseira (4 caracteres por token) do custo de uma análise em tokens"""
+    # No modo clausulas os trechos do edital já estão no conteúdo
+    edital = 0 if clausulas.modo(config) == "clausulas" else config.get("edital_tokens", DEFAULT_EDITAL_TOKENS)
+    instrucoes = formato_saida(config)["instructions"]
+    return (len(instrucoes) + len(conteudo)) // 4 + edital + tokens_saida(config)
+
+
+def extrair_json(texto: str) -> Optional[Dict]:
+    """Extrai o JSON da análise (último objeto que começa com "imovel") do texto
+
+    Respostas no formato compacto (começam com "i") só são expandidas se
+    seguirem compacto.SCHEMA. JSON com defeitos triviais (cercas de
+    markdown, vírgulas sobrando, resposta truncada) passa por
+    validacao.reparar e só é aceito se seguir o esquema.
+    """
+    matches = list(re.finditer(r'\{\s*"(?:imovel|i)"\s*:', texto))
+    if not matches:
+        return None
+
+    # Pega o último match (mais provável de ser o correto)
+    json_start = matches[-1].start()
+    try:
+        dados = json.JSONDecoder(strict=False).raw_decode(texto, json_start)[0]
+        reparado = False
+    except ValueError:
+        dados = validacao.reparar(texto[json_start:])
+        reparado = True
+    if not isinstance(dados, dict):
+        return None
+    # A resposta compacta sempre passa pelo esquema antes de ser expandida
+    if reparado or "i" in dados:
+        try:
+            validacao.validar(dados, compacto.SCHEMA if "i" in dados else ANALYSIS_SCHEMA, extras=True)
+        except validacao.SaidaInvalida:
+            return None
+    return compacto.expandir(dados)
+
+
+def formato_saida(config: Dict) -> Dict:
+    """Instruções e esquema da resposta: completos (prompts.py) ou compactos (compacto.py)"""
+    if compacto.modo(config) == "compacta":
+        return {"instructions": compacto.instrucoes(compacto.max_justificativa(config)),
+                "nome": "analise_compacta", "schema": compacto.SCHEMA}
+    return {"instructions": INSTRUCTIONS, "nome": "analise_imovel", "schema": ANALYSIS_SCHEMA}
+
+
+def chave_prefixo(config: Dict, file_id: Optional[str], variante: Optional[str] = None) -> str:
+    """prompt_cache_key: análises com o mesmo prefixo estático (instruções,
+    esquema, modelo e edital) vão para o mesmo cache de prompt da API
+
+    `variante` separa formatos de resposta com outras instruções (pacotes, pacote.py).
+    """
+    edital = file_id or config.get("edital_pdf", clausulas.DEFAULT_EDITAL_PDF)
+    base = f"{VERSAO_PROMPT}:{config.get('analysis_model', MODEL)}:{edital}:{compacto.modo(config)}"
+    if variante:
+        base += f":{variante}"
+    return "analise-" + hashlib.sha256(base.encode("utf-8")).hexdigest()[:16]
+
+
+def corpo_responses(file_id: Optional[str], conteudo: str, model: str = MODEL,
+                    cache_key: Optional[str] = None, saida: Optional[Dict] = None) -> Dict:
+    """Parâmetros da chamada à Responses API (também usados nas linhas do modo batch)
+
+    Sem `file_id` (modo clausulas) o edital vai só como texto dentro do conteúdo.
+    A ordem é a do cache de prompt: instruções, esquema e edital (iguais em
+    todas as análises) antes do conteúdo do imóvel. `saida` vem de
+    formato_saida (default: JSON completo).
+    """
+    saida = saida or formato_saida({})
+    arquivo = [{"type": "input_file", "file_id": file_id}] if file_id else []
+    corpo = {
+        "model": model,
+        "instructions": saida["instructions"],
+        "input": [
+            {
+                "role": "user",
+                "content": arquivo + [{"type": "input_text", "text": conteudo}],
+            }
+        ],
+        "text": {
+            "format": {
+                "type": "json_schema",
+                "name": saida["nome"],
+                "schema": saida["schema"],
+                "strict": True,
+            }
+        },
+    }
+    if cache_key:
+        corpo["prompt_cache_key"] = cache_key
+    return corpo
+
+
+def texto_resposta(body: Dict) -> str:
+    """Equivalente a `response.output_text` para uma resposta em JSON (modo batch)"""
+    return "".join(
+        content.get("text", "")
+        for item in body.get("output", [])
+        if item.get("type") == "message"
+        for content in item.get("content", [])
+        if content.get("type") == "output_text"
+    )
+
+
+class AnaliseCancelada(Exception):
+    """Chamada abandonada: outra tentativa da mesma análise respondeu antes (hedge.py) ou a saída
+    já chegou inválida (validacao.py)"""
+
+
+def _checar(cancelado: Optional[threading.Event], stream=None):
+    """Fecha o stream e interrompe a chamada se a tentativa foi cancelada"""
+    if cancelado is not None and cancelado.is_set():
+        if stream is not None:
+            stream.close()
+        raise AnaliseCancelada()
+
+
+def analisar_responses(client, file_id: Optional[str], conteudo: str, model: str = MODEL,
+                       metricas: Optional[Dict] = None, cache_key: Optional[str] = None,
+                       saida: Optional[Dict] = None, cancelado: Optional[threading.Event] = None,
+                       on_partial: Optional[Callable[[str], None]] = None) -> List[str]:
+    """Análise em uma chamada com saída estruturada
+
+    Com `cancelado` ou `on_partial` a resposta vem em streaming, para poder
+    ser abandonada no meio (hedge.py) ou validada enquanto chega
+    (validacao.py); sem eles, uma chamada simples.
+    """
+    corpo = corpo_responses(file_id, conteudo, model, cache_key, saida)
+    # prompt_cache_key via extra_body: aceito também pelos SDKs anteriores ao parâmetro
+    extra = {"prompt_cache_key": corpo.pop("prompt_cache_key")} if "prompt_cache_key" in corpo else None
+    inicio = time.perf_counter()
+    if cancelado is None and on_partial is None:
+        response = client.responses.create(**corpo, extra_body=extra)
+    else:
+        response = None
+        primeiro_token = None
+        texto = ""
+        stream = client.responses.create(**corpo, extra_body=extra, stream=True)
+        for evento in stream:
+            _checar(cancelado, stream)
+            if evento.type == "response.output_text.delta":
+                if primeiro_token is None:
+                    primeiro_token = time.perf_counter()
+                if on_partial:
+                    texto += evento.delta
+                    on_partial(texto)
+                    _checar(cancelado, stream)
+            elif evento.type in ("response.completed", "response.incomplete", "response.failed"):
+                response = evento.response
+        stream.close()
+        if response is None:
+            raise RuntimeError("Stream da Responses API encerrado sem a resposta final")
+        if metricas is not None and primeiro_token is not None:
+            metricas["ttft_s"] = round(primeiro_token - inicio, 3)
+    if metricas is not None:
+        metricas["total_s"] = round(time.perf_counter() - inicio, 3)
+        metricas["modelo"] = response.model or model
+        metricas.update(usage.uso_tokens(response.usage))
+    return [response.output_text]
+
+
+class _RunStreamHandler(AssistantEventHandler):
+    """Coleta o texto do run em streaming e mede TTFT e tempo de geração"""
+
+    def __init__(self, on_partial: Optional[Callable[[str], None]] = None):
+        super().__init__()
+        self.on_partial = on_partial
+        self.inicio = time.perf_counter()
+        self.primeiro_token = None
+        self.fim = None
+        self.textos = []
+        self.usage = None
+
+    def on_event(self, event):
+        # O uso de tokens só chega no evento final do run
+        if event.event == "thread.run.completed":
+            self.usage = event.data.usage
+
+    def on_text_delta(self, delta, snapshot):
+        if self.primeiro_token is None:
+            self.primeiro_token = time.perf_counter()
+        if self.on_partial:
+            self.on_partial(snapshot.value)
+
+    def on_message_done(self, message):
+        for content in message.content:
+            if content.type == "text":
+                self.textos.append(content.text.value)
+            else:
+                print("Outro tipo de conteúdo:", content, file=sys.stderr)
+        self.fim = time.perf_counter()
+
+    def metricas(self) -> Dict:
+        fim = self.fim or time.perf_counter()
+        return {
+            "ttft_s": round(self.primeiro_token - self.inicio, 3) if self.primeiro_token else None,
+            "geracao_s": round(fim - self.primeiro_token, 3) if self.primeiro_token else None,
+            "total_s": round(fim - self.inicio, 3),
+        }
+
+
+def analisar_assistants(client, assistant_id: str, file_id: Optional[str], conteudo: str,
+                        metricas: Optional[Dict] = None,
+                        on_partial: Optional[Callable[[str], None]] = None,
+                        vector_store_id: Optional[str] = None, file_search: bool = True,
+                        instructions: Optional[str] = None,
+                        cancelado: Optional[threading.Event] = None) -> List[str]:
+    """Análise via Assistants API (thread, mensagem e run em streaming)
+
+    Com `file_id` o edital é anexado à mensagem (vector store temporário da
+    thread); com None o assistente usa o vector store persistente do edital.
+    `vector_store_id` liga à thread o vector store de outro edital já
+    indexado (registro de editais, editais.py). Com `file_search=False` o run
+    sai sem ferramentas (cláusulas do edital já na mensagem). `instructions`
+    substitui as instruções do assistente só neste run (saída compacta).
+    Com `cancelado` sinalizado o stream é fechado e o run cancelado (hedge.py).
+    """
+    inicio = time.perf_counter()
+    if vector_store_id:
+        thread = client.beta.threads.create(tool_resources={"file_search": {"vector_store_ids": [vector_store_id]}})
+    else:
+        thread = client.beta.threads.create()
+    thread_id = thread.id
+    print("thread", thread_id, file=sys.stderr)  # Log para stderr para não poluir stdout
+
+    mensagem = {"thread_id": thread_id, "role": "user", "content": conteudo}
+    if file_id:
+        mensagem["attachments"] = [
+            {
+                "file_id": file_id,
+                "tools": [{"type": "file_search"}]
+            }
+        ]
+    client.beta.threads.messages.create(**mensagem)
+
+    handler = _RunStreamHandler(on_partial)
+    opcoes = {} if file_search else {"tools": []}
+    if instructions:
+        opcoes["instructions"] = instructions
+    with client.beta.threads.runs.stream(
+        thread_id=thread_id,
+        assistant_id=assistant_id,
+        event_handler=handler,
+        **opcoes
+    ) as stream:
+        # Consome até o fim do run: o uso de tokens só vem em thread.run.completed
+        for _ in stream:
+            if cancelado is not None and cancelado.is_set():
+                break
+
+    if cancelado is not None and cancelado.is_set():
+        if handler.current_run is not None:
+            try:
+                client.beta.threads.runs.cancel(handler.current_run.id, thread_id=thread_id)
+            except Exception as e:
+                print(f"Falha ao cancelar o run {handler.current_run.id}: {e}", file=sys.stderr)
+        raise AnaliseCancelada()
+
+    if metricas is not None:
+        metricas.update(handler.metricas())
+        if not file_search:
+            metricas["edital"] = "clausulas"
+        else:
+            metricas["edital"] = "anexo" if file_id else "vector_store_thread" if vector_store_id else "vector_store"
+        metricas["total_s"] = round((handler.fim or time.perf_counter()) - inicio, 3)
+        if handler.current_run is not None:
+            metricas["modelo"] = handler.current_run.model
+        if handler.usage is not None:
+            metricas.update(usage.uso_tokens(handler.usage))
+    return handler.textos
+
+
+def corpo_chat(file_id: Optional[str], conteudo: str, model: str = MODEL,
+               cache_key: Optional[str] = None, saida: Optional[Dict] = None) -> Dict:
+    """Parâmetros da chamada à Chat Completions (backends chat e local, backends.py)
+
+    Mesma ordem do corpo_responses: instruções (mensagem de sistema),
+    edital em PDF (se houver `file_id`) e o conteúdo do imóvel por último.
+    """
+    saida = saida or formato_saida({})
+    mensagem = conteudo
+    if file_id:
+        mensagem = [{"type": "file", "file": {"file_id": file_id}}, {"type": "text", "text": conteudo}]
+    corpo = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": saida["instructions"]},
+            {"role": "user", "content": mensagem},
+        ],
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {"name": saida["nome"], "schema": saida["schema"], "strict": True},
+        },
+    }
+    if cache_key:
+        corpo["prompt_cache_key"] = cache_key
+    return corpo
+
+
+def analisar_chat(client, corpo: Dict, metricas: Optional[Dict] = None,
+                  cancelado: Optional[threading.Event] = None,
+                  on_partial: Optional[Callable[[str], None]] = None) -> List[str]:
+    """Análise numa chamada à Chat Completions (OpenAI ou servidor local compatível)
+
+    Com `cancelado` ou `on_partial` a resposta vem em streaming (uso no
+    último pedaço) e pode ser abandonada no meio (hedge.py, validacao.py).
+    """
+    corpo = dict(corpo)
+    extra = {"prompt_cache_key": corpo.pop("prompt_cache_key")} if "prompt_cache_key" in corpo else None
+    inicio = time.perf_counter()
+    if cancelado is None and on_partial is None:
+        response = client.chat.completions.create(**corpo, extra_body=extra)
+        modelo, uso, texto = response.model, response.usage, response.choices[0].message.content
+    else:
+        modelo, uso, partes, primeiro_token = None, None, [], None
+        stream = client.chat.completions.create(**corpo, extra_body=extra, stream=True,
+                                                stream_options={"include_usage": True})
+        for pedaco in stream:
+            _checar(cancelado, stream)
+            modelo = pedaco.model or modelo
+            uso = pedaco.usage or uso
+            if pedaco.choices and pedaco.choices[0].delta.content:
+                if primeiro_token is None:
+                    primeiro_token = time.perf_counter()
+                partes.append(pedaco.choices[0].delta.content)
+                if on_partial:
+                    on_partial("".join(partes))
+                    _checar(cancelado, stream)
+        stream.close()
+        texto = "".join(partes)
+        if metricas is not None and primeiro_token is not None:
+            metricas["ttft_s"] = round(primeiro_token - inicio, 3)
+    if metricas is not None:
+        metricas["total_s"] = round(time.perf_counter() - inicio, 3)
+        metricas["modelo"] = modelo or corpo["model"]
+        if uso is not None:
+            metricas.update(usage.uso_tokens(uso))
+    return [texto or ""]
+
+
+def salvar_metricas(imovel_id: str, backend: str, metricas: Dict, analysis_dir: str = "data/analysis") -> Path:
+    """Grava as métricas da análise em data/analysis/<imovel>_metrics.json"""
+    path = Path(analysis_dir) / f"{imovel_id}_metrics.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "imovel": imovel_id,
+            "backend": backend,
+            "timestamp": datetime.now().isoformat(),
+            **metricas
+        }, f, indent=2, ensure_ascii=False)
+    return path
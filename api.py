@@ -9,6 +9,8 @@ Endpoints:
     GET /status/{task_id} - Verifica status de análise
     GET /result/{task_id} - Obtém resultado de análise
     GET /ranking - Lista imóveis analisados com filtros
+    GET /cache - Estatísticas do cache de análises
+    GET /uso - Tokens, custo e tempos das análises (GET /uso/{imovel_id} por imóvel)
     GET /health - Healthcheck
 
 Uso com n8n:
@@ -31,6 +33,9 @@ import uuid
 import subprocess
 import sys
 
+from cache import AnalysisCache
+import usage
+
 app = FastAPI(
     title="IA Leilão Imóveis API",
     description="API para análise automatizada de imóveis de leilão",
@@ -155,6 +160,8 @@ async def root():
             "GET /status/{task_id}": "Verifica status",
             "GET /result/{task_id}": "Obtém resultado",
             "GET /ranking": "Lista imóveis analisados",
+            "GET /cache": "Estatísticas do cache de análises",
+            "GET /uso": "Tokens, custo e tempos das análises",
             "GET /health": "Healthcheck"
         }
     }
@@ -346,6 +353,45 @@ async def get_ranking(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao buscar ranking: {str(e)}")
 
+@app.get("/cache", tags=["Consulta"])
+async def get_cache_stats():
+    """
+    Estatísticas do cache de análises (cache.py)
+    
+    Compartilhado com automation.py, query.py e Streamlit: acertos, faltas,
+    taxa de acerto e número de análises armazenadas
+    """
+    return AnalysisCache().estatisticas()
+
+@app.get("/uso", tags=["Consulta"])
+async def get_usage(
+    backend: Optional[str] = Query(default=None, description="Filtrar por backend (responses, assistants, chat, local, batch)"),
+    desde: Optional[str] = Query(default=None, description="Só análises a partir desta data (ISO, ex.: 2025-01-31)")
+):
+    """
+    Uso agregado das análises salvas (usage.py)
+    
+    Tokens de entrada/cache/saída, custo em USD, tempos de fila, preparo e
+    chamada (média, p50, p95) e repetições por 429
+    """
+    registros = [
+        r for r in usage.carregar()
+        if (not backend or r.get("backend") == backend) and (not desde or r.get("timestamp", "") >= desde)
+    ]
+    return {
+        "filtros": {"backend": backend, "desde": desde},
+        **usage.agregar(registros)
+    }
+
+@app.get("/uso/{imovel_id}", tags=["Consulta"])
+async def get_usage_imovel(imovel_id: str):
+    """Uso registrado na última análise do imóvel (data/analysis/<id>_metrics.json)"""
+    path = Path("data/analysis") / f"{imovel_id}_metrics.json"
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Métricas não encontradas para o imóvel")
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
 @app.delete("/task/{task_id}", tags=["Análise"])
 async def delete_task(task_id: str):
     """Remove tarefa do sistema"""
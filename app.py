@@ -9,6 +9,9 @@ import subprocess
 import time
 from datetime import datetime
 
+from analysis import extrair_json
+from cache import AnalysisCache
+
 # Configuração da página
 st.set_page_config(
     page_title="IA Leilão Imóveis",
@@ -531,13 +534,10 @@ elif page == "🤖 Analisar Imóvel":
                     
                     # Procurar pelo JSON na saída
                     try:
-                        # Encontrar o início e fim do JSON
-                        start_idx = output.find("{")
-                        end_idx = output.rfind("}") + 1
+                        # JSON da análise (com reparo de defeitos triviais, validacao.py)
+                        analysis_data = extrair_json(output)
                         
-                        if start_idx != -1 and end_idx != 0:
-                            json_str = output[start_idx:end_idx]
-                            analysis_data = json.loads(json_str)
+                        if analysis_data is not None:
                             
                             # Salvar resultado
                             output_dir = Path("data/analysis")
@@ -548,6 +548,8 @@ elif page == "🤖 Analisar Imóvel":
                                 json.dump(analysis_data, f, indent=4, ensure_ascii=False)
                             
                             st.success(f"✅ Análise concluída! Resultado salvo em: {output_file}")
+                            if "[CACHE]" in result.stderr:
+                                st.info("♻️ Entradas inalteradas (HTML, matrícula, edital, prompt e modelo): análise reutilizada do cache, sem nova chamada à API")
                             
                             # Exibir resultados
                             st.markdown("---")
@@ -582,6 +584,12 @@ elif page == "🤖 Analisar Imóvel":
     st.markdown("---")
     st.markdown("### 📂 Análises Anteriores")
     
+    cache_stats = AnalysisCache().estatisticas()
+    if cache_stats["acertos"] or cache_stats["faltas"]:
+        st.caption(f"♻️ Cache de análises: {cache_stats['entradas']} entradas | "
+                   f"{cache_stats['acertos']} acertos, {cache_stats['faltas']} faltas "
+                   f"(taxa de acerto {cache_stats['taxa_acerto']:.0%})")
+    
     analysis_dir = Path("data/analysis")
     if analysis_dir.exists():
         analysis_files = list(analysis_dir.glob("*_analysis.json"))
@@ -19,7 +19,6 @@ import json
 import os
 import sys
 import io
-import re
 
 # Configurar encoding UTF-8 para Windows (resolve problema com emojis/caracteres especiais)
 if sys.platform == 'win32':
@@ -30,19 +29,65 @@ import argparse
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Optional
-import time
+
+from analysis import (preparar_conteudo, finalizar_analise, montar_conteudo, caminhos_imovel,
+                      estimar_tokens, extrair_json, salvar_metricas, tokens_saida)
+from backends import analisar, preparar_config, BACKENDS, BACKENDS_SAIDA, DEFAULT_BACKEND
+from scheduler import AnalysisScheduler, DEFAULT_CONCORRENCIA, DEFAULT_RPM, DEFAULT_TPM
+from batch import BatchRunner, DEFAULT_INTERVALO
+from cache import AnalysisCache, chave_analise, entradas_analise
+from editais import RegistroEditais, config_imovel
+from hedge import Hedge
+from listing import extrair_dados
+from resilience import Resiliencia, cliente_resiliente
+import compacto
+import pacote
+import reanalise
+import screening
+import usage
 
 class AutomationPipeline:
     """Pipeline completo de automação de análise de imóveis"""
     
-    def __init__(self, estado: str, cidade: str, min_nota: float = 0.0, max_imoveis: Optional[int] = None):
+    def __init__(self, estado: str, cidade: str, min_nota: float = 0.0, max_imoveis: Optional[int] = None,
+                 concorrencia: int = DEFAULT_CONCORRENCIA, rpm: int = DEFAULT_RPM, tpm: int = DEFAULT_TPM,
+                 backend: str = DEFAULT_BACKEND, batch: bool = False, intervalo_batch: float = DEFAULT_INTERVALO,
+                 triagem: Optional[Dict] = None, hedge_percentil: Optional[float] = None,
+                 concorrencia_max: Optional[int] = None, pacote_tamanho: Optional[int] = None):
         self.estado = estado.upper()
         self.cidade = cidade.upper()
         self.min_nota = min_nota
         self.max_imoveis = max_imoveis
+        self.backend = backend
+        self.batch = batch
+        self.intervalo_batch = intervalo_batch
+        # Política da triagem (screening.py): modo, top, nota_min, modelo
+        self.triagem = triagem or {}
         self.config_path = Path("config.json")
+        # Repetições, backoff e circuit breaker compartilhados por todas as chamadas à API
+        self.resiliencia = Resiliencia.de_config(self.load_config(), log=lambda msg: self.log(msg, "WARNING"))
+        # Análises em paralelo: começa em `concorrencia` e se ajusta até `concorrencia_max` (concorrencia.py)
+        self.scheduler = AnalysisScheduler(rpm=rpm, tpm=tpm, concorrencia=concorrencia,
+                                           concorrencia_max=concorrencia_max,
+                                           log=lambda msg: self.log(msg, "WARNING"), resiliencia=self.resiliencia,
+                                           config=self.load_config())
+        self._client = None
+        # Uso (tokens, custo, tempos) das análises executadas nesta execução, por imóvel
+        self.uso: Dict[str, Dict] = {}
         self.data_dir = Path("data")
         self.analysis_dir = self.data_dir / "analysis"
+        self.cache = AnalysisCache(str(self.data_dir / "cache"))
+        # Editais por UF/modalidade/leilão (editais.py) e o config resolvido de cada imóvel
+        self.editais = RegistroEditais.de_config(self.load_config(), log=self.log)
+        self.editais_imovel: Dict[str, Dict] = {}
+        # Cópia das análises que passam do percentil de latência (hedge.py); --hedge-percentil tem prioridade
+        config_hedge = self.load_config()
+        if hedge_percentil is not None:
+            config_hedge["hedge_percentil"] = hedge_percentil
+        self.hedge = Hedge.de_config(config_hedge, backend, str(self.analysis_dir),
+                                     log=lambda msg: self.log(msg, "WARNING"))
+        # Imóveis pequenos do mesmo edital por requisição (pacote.py); --pacote tem prioridade
+        self.pacote_tamanho = pacote_tamanho or pacote.tamanho(self.load_config())
         
         # Detecta o Python correto (venv se disponível, senão sys.executable)
         venv_python = Path(__file__).parent / "venv" / "Scripts" / "python.exe"
@@ -188,6 +233,7 @@ class AutomationPipeline:
                 timeout=3600  # 1 hora
             )
             
+            self.read_scraping_metrics()
             if result.returncode == 0:
                 self.log("✓ Scraping de detalhes concluído")
                 return True
@@ -214,83 +260,210 @@ class AutomationPipeline:
             })
             return False
     
+    def read_scraping_metrics(self):
+        """Concorrência adaptativa e tempos do scraping de detalhes (gravados pelo scrape_detail.py)"""
+        path = self.data_dir / "detail" / f"scraping_{self.cidade.lower()}_{self.estado.lower()}.json"
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                self.results["scraping"] = json.load(f)
+            self.log(f"Scraping: {self.results['scraping'].get('baixados')} imóveis, concorrência "
+                     f"{self.results['scraping'].get('concorrencia', {}).get('limite_medio')} em média")
+    
+    def load_config(self) -> Dict:
+        """Lê config.json (edital, assistant e opções) para as análises em processo"""
+        config = {}
+        if self.config_path.exists():
+            with open(self.config_path, 'r') as f:
+                config = json.load(f)
+        config["estado"] = self.estado
+        config["cidade"] = self.cidade
+        return config
+    
+    def get_client(self):
+        """Cliente OpenAI sem retries automáticos: as análises são repetidas pelo agendador"""
+        if self._client is None:
+            from dotenv import load_dotenv
+            from openai import OpenAI
+            load_dotenv()
+            self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0, timeout=300)
+        return self._client
+    
+    def get_resilient_client(self):
+        """Cliente para as demais chamadas (matrícula, triagem, batch): repetições e circuito de resilience.py"""
+        return cliente_resiliente(self.get_client(), self.resiliencia)
+    
+    @property
+    def backend_efetivo(self) -> str:
+        """O modo batch equivale ao backend responses"""
+        return "responses" if self.batch else self.backend
+    
+    def edital_config(self, imovel_id: str, config: Dict) -> Dict:
+        """Config com o edital do imóvel (registro de editais, editais.py), ajustado ao backend (backends.py)"""
+        if imovel_id not in self.editais_imovel:
+            resolvido = config_imovel(config, self.estado, self.cidade, imovel_id, self.editais)
+            self.editais_imovel[imovel_id] = preparar_config(self.backend_efetivo, resolvido)
+        return self.editais_imovel[imovel_id]
+    
+    def cache_key(self, imovel_id: str, config: Dict) -> str:
+        """Chave de conteúdo da análise (cache.py)"""
+        return chave_analise(self.edital_config(imovel_id, config), self.estado, self.cidade, imovel_id,
+                             self.backend_efetivo)
+    
+    def cache_inputs(self, imovel_id: str, config: Dict) -> Dict:
+        """Entradas da análise (cache.entradas_analise), guardadas com ela para a reanálise parcial"""
+        return entradas_analise(self.edital_config(imovel_id, config), self.estado, self.cidade, imovel_id,
+                                self.backend_efetivo)
+    
+    def partial_plan(self, imovel_id: str, config: Dict) -> Optional[Dict]:
+        """Plano de reanálise parcial (reanalise.py) se só parte das entradas mudou desde a última análise"""
+        return reanalise.planejar(self.cache.anterior(imovel_id), self.cache_inputs(imovel_id, config),
+                                  self.edital_config(imovel_id, config), self.backend_efetivo)
+    
+    def write_analysis_file(self, imovel_id: str, analysis_json: Dict):
+        """data/analysis/<id>_analysis.json: análise atual do imóvel (ranking, API, Streamlit)"""
+        self.analysis_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.analysis_dir / f"{imovel_id}_analysis.json", 'w', encoding='utf-8') as f:
+            json.dump(analysis_json, f, indent=2, ensure_ascii=False)
+    
+    def load_cached_analysis(self, imovel_id: str, config: Dict) -> Optional[Dict]:
+        """Análise do cache para as entradas atuais do imóvel (ou None se alguma mudou)"""
+        cached = self.cache.obter(self.cache_key(imovel_id, config))
+        if cached:
+            self.write_analysis_file(imovel_id, cached)
+        return cached
+    
+    def saved_analysis(self, imovel_id: str, config: Dict) -> Optional[Dict]:
+        """Análise já gravada para as entradas atuais, sem contar acerto/falta no cache"""
+        anterior = self.cache.anterior(imovel_id)
+        if anterior and anterior.get("chave") == self.cache_key(imovel_id, config):
+            return anterior.get("analise")
+        return None
+    
+    def prepare_analysis(self, imovel_id: str, config: Dict):
+        """OCR da matrícula + mensagem do usuário; retorna (conteúdo, tokens estimados)"""
+        # Chamadas auxiliares (resumo da matrícula) com a camada de resiliência
+        client = self.get_resilient_client()
+        config = self.edital_config(imovel_id, config)
+        conteudo = preparar_conteudo(client, config, self.estado, self.cidade, imovel_id)
+        return conteudo, estimar_tokens(conteudo, config)
+    
+    def save_analysis(self, imovel_id: str, texto: str, backend: str, metricas: Dict, config: Dict) -> Dict:
+        """Extrai o JSON da resposta e salva análise (cache + data/analysis) e métricas"""
+        analysis_json = extrair_json(texto)
+        if analysis_json is None:
+            raise ValueError(f"JSON não encontrado na resposta: {texto[:500]}")
+        analysis_json = finalizar_analise(analysis_json, config, self.estado, self.cidade, imovel_id)
+        
+        self.cache.gravar(self.cache_key(imovel_id, config), imovel_id, analysis_json,
+                          self.cache_inputs(imovel_id, config))
+        self.write_analysis_file(imovel_id, analysis_json)
+        salvar_metricas(imovel_id, backend, metricas, str(self.analysis_dir))
+        self.uso[imovel_id] = {"backend": backend, **metricas}
+        
+        self.log(f"  ✓ {imovel_id}: análise concluída - Nota: {analysis_json['nota_final']['valor']:.1f} "
+                 f"| {usage.linha_cache(metricas)}")
+        return analysis_json
+    
+    def execute_analysis(self, imovel_id: str, conteudo: str, config: Dict) -> Dict:
+        """Chamada ao modelo: só as partes afetadas se a reanálise parcial couber (reanalise.py)"""
+        hedge = self.hedge if self.hedge.ativo else None
+        plano = self.partial_plan(imovel_id, config)
+        if plano:
+            metricas = {}
+            analise = reanalise.analisar(self.get_client(), self.backend, conteudo, self.edital_config(imovel_id, config),
+                                         plano, metricas=metricas, hedge=hedge)
+            if analise is not None:
+                self.log(f"  → {imovel_id}: {', '.join(plano['mudancas'])} mudou; reavaliados "
+                         f"{len(plano['reavaliados'])} critérios, {len(plano['reaproveitados'])} reaproveitados")
+                return self.save_analysis(imovel_id, json.dumps(analise, ensure_ascii=False), self.backend,
+                                          metricas, config)
+            self.log(f"  → {imovel_id}: reanálise parcial sem as partes pedidas, refazendo a análise completa",
+                     "WARNING")
+        
+        metricas = {}
+        textos = analisar(self.get_client(), self.backend, conteudo, self.edital_config(imovel_id, config),
+                          metricas=metricas, hedge=hedge)
+        return self.save_analysis(imovel_id, "\n".join(textos), self.backend, metricas, config)
+    
+    def valor_minimo(self, imovel_id: str) -> Optional[float]:
+        """Valor mínimo de venda do anúncio (HTML de detalhe), None se não houver"""
+        html_path = Path(caminhos_imovel(self.estado, self.cidade, imovel_id)["html"])
+        if not html_path.exists():
+            return None
+        return extrair_dados(html_path.read_text(encoding="utf-8")).get("valor_minimo")
+    
+    def prepare_pack(self, ids: List[str], config: Dict):
+        """Prepara os imóveis do pacote; retorna ({"conteudos", "feitas"}, tokens estimados)"""
+        conteudos = {}
+        for imovel_id in ids:
+            try:
+                conteudos[imovel_id] = self.prepare_analysis(imovel_id, config)[0]
+            except Exception as e:
+                self.log(f"  ✗ {imovel_id}: falha ao preparar análise: {e}", "ERROR")
+        if not conteudos:
+            raise ValueError("nenhum imóvel do pacote preparado")
+        tokens = pacote.estimar_tokens(conteudos, self.edital_config(next(iter(conteudos)), config))
+        return {"conteudos": conteudos, "feitas": {}}, tokens
+    
+    def execute_pack(self, payload: Dict, config: Dict) -> Dict[str, Dict]:
+        """Uma chamada ao modelo para os imóveis do pacote (pacote.py); retorna {id: análise}
+        
+        Imóveis fora dos limites do pacote, ausentes ou inválidos na resposta
+        são analisados sozinhos. As análises já salvas ficam em payload["feitas"]:
+        uma repetição do agendador não refaz o que já foi gravado.
+        """
+        feitas = payload["feitas"]
+        pendentes = {i: c for i, c in payload["conteudos"].items() if i not in feitas}
+        verificar_valor = config.get("pacote_valor_max") is not None
+        # Quem cabe numa reanálise parcial (reanalise.py) segue sozinho
+        elegiveis = {i: c for i, c in pendentes.items()
+                     if pacote.elegivel(c, config, self.valor_minimo(i) if verificar_valor else None)
+                     and not self.partial_plan(i, config)}
+        
+        if len(elegiveis) > 1:
+            id_pacote = "+".join(elegiveis)
+            metricas = {}
+            analises = pacote.analisar(self.get_client(), self.backend, elegiveis,
+                                       self.edital_config(next(iter(elegiveis)), config), metricas)
+            # O custo do pacote fica com as análises que voltaram válidas
+            por_imovel = pacote.ratear(metricas, {i: elegiveis[i] for i in analises}, analises, id_pacote, config)
+            for imovel_id, analise in analises.items():
+                feitas[imovel_id] = self.save_analysis(imovel_id, json.dumps(analise, ensure_ascii=False),
+                                                       self.backend, por_imovel[imovel_id], config)
+            faltando = [i for i in elegiveis if i not in analises]
+            if faltando:
+                self.log(f"  → Pacote {id_pacote}: sem análise válida para {', '.join(faltando)}, "
+                         f"analisando sozinhos", "WARNING")
+        
+        for imovel_id, conteudo in pendentes.items():
+            if imovel_id not in feitas:
+                feitas[imovel_id] = self.execute_analysis(imovel_id, conteudo, config)
+        return feitas
+    
+    def record_scheduling(self, job: Dict):
+        """Acrescenta ao uso da análise a espera na fila, o preparo e as tentativas do agendador"""
+        registro = self.uso.get(job["id"])
+        if not registro:
+            return
+        registro.update(fila_s=job["fila_s"], preparo_s=job["preparo_s"], tentativas=job["tentativas"])
+        salvar_metricas(job["id"], registro["backend"], {k: v for k, v in registro.items() if k != "backend"},
+                        str(self.analysis_dir))
+    
     def analyze_imovel(self, imovel_id: str) -> Optional[Dict]:
         """Analisa um imóvel específico com IA"""
         self.log(f"Analisando imóvel {imovel_id}...")
         
         try:
-            # Verifica se já existe análise
-            analysis_file = self.analysis_dir / f"{imovel_id}_analysis.json"
-            if analysis_file.exists():
+            # Verifica se já existe análise para as mesmas entradas
+            config = self.load_config()
+            cached = self.load_cached_analysis(imovel_id, config)
+            if cached:
                 self.log(f"  → Análise já existe, carregando do cache...")
-                with open(analysis_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            
-            # Atualiza config com imóvel atual
-            if not self.update_config(imovel_id):
-                return None
+                return cached
             
-            # Executa análise
+            conteudo, _ = self.prepare_analysis(imovel_id, config)
             self.log(f"  → Executando análise com IA (pode demorar 1-3 min)...")
-            result = subprocess.run(
-                [self.python_executable, "query.py"],
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minutos
-            )
-            
-            if result.returncode != 0:
-                self.log(f"  ✗ Erro na análise: {result.stderr}", "ERROR")
-                return None
-            
-            # Extrai JSON da saída
-            output = result.stdout
-            
-            # Tenta encontrar o JSON mais completo (começa com "imovel")
-            # Procura de trás para frente para pegar o último JSON válido
-            json_start = -1
-            json_end = -1
-            
-            # Procura padrão: {"imovel" para garantir que é o JSON correto
-            matches = list(re.finditer(r'\{\s*"imovel"\s*:', output))
-            
-            if matches:
-                # Pega o último match (mais provável de ser o correto)
-                json_start = matches[-1].start()
-                # Agora procura o final do JSON a partir deste ponto
-                brace_count = 0
-                for i in range(json_start, len(output)):
-                    if output[i] == '{':
-                        brace_count += 1
-                    elif output[i] == '}':
-                        brace_count -= 1
-                        if brace_count == 0:
-                            json_end = i + 1
-                            break
-            
-            if json_start == -1 or json_end == -1:
-                self.log(f"  ✗ JSON não encontrado na saída", "ERROR")
-                self.log(f"  DEBUG: Output primeiras 500 chars: {output[:500]}", "ERROR")
-                return None
-            
-            try:
-                analysis_json = json.loads(output[json_start:json_end])
-            except json.JSONDecodeError as e:
-                self.log(f"  ✗ Erro ao decodificar JSON: {e}", "ERROR")
-                self.log(f"  DEBUG: JSON extraído: {output[json_start:json_end][:200]}", "ERROR")
-                return None
-            
-            # Salva análise
-            self.analysis_dir.mkdir(parents=True, exist_ok=True)
-            with open(analysis_file, 'w', encoding='utf-8') as f:
-                json.dump(analysis_json, f, indent=2, ensure_ascii=False)
-            
-            self.log(f"  ✓ Análise concluída - Nota: {analysis_json['nota_final']['valor']:.1f}")
-            return analysis_json
-            
-        except subprocess.TimeoutExpired:
-            self.log(f"  ✗ Timeout na análise", "ERROR")
-            return None
+            return self.execute_analysis(imovel_id, conteudo, config)
         except json.JSONDecodeError as e:
             self.log(f"  ✗ Erro ao decodificar JSON: {e}", "ERROR")
             return None
@@ -298,57 +471,228 @@ class AutomationPipeline:
             self.log(f"  ✗ Exceção na análise: {e}", "ERROR")
             return None
     
+    def add_analysis_result(self, imovel_id: str, analysis: Optional[Dict]):
+        """Contabiliza a análise no relatório (aprovados, top imóveis e erros)"""
+        if analysis:
+            self.results["imoveis_analisados"] += 1
+            nota = analysis["nota_final"]["valor"]
+            
+            # Verifica se passa no filtro de nota mínima
+            if nota >= self.min_nota:
+                self.results["imoveis_aprovados"] += 1
+                
+                # Adiciona aos top imóveis
+                imovel_summary = {
+                    "id": imovel_id,
+                    "nota_final": nota,
+                    "comarca": analysis["imovel"].get("comarca", "N/A"),
+                    "condominio": analysis["imovel"].get("condominio", "N/A"),
+                    "apartamento": analysis["imovel"].get("apartamento", "N/A"),
+                    "quartos": analysis["imovel"].get("quartos", "N/A"),
+                    "area_privativa_m2": analysis["imovel"].get("area_privativa_m2", "N/A"),
+                    "valor_minimo": analysis["imovel"].get("valor_minimo", "N/A"),
+                    "desconto_percent": analysis["imovel"].get("desconto_percent", "N/A"),
+                    "criterios": [
+                        {
+                            "nome": c["nome"],
+                            "nota": c["nota"]
+                        } for c in analysis["criterios"]
+                    ],
+                    "riscos": [r["descricao"] for r in analysis.get("riscos", [])],
+                    "proximos_passos": analysis.get("proximos_passos", [])
+                }
+                
+                self.results["top_imoveis"].append(imovel_summary)
+            else:
+                self.log(f"  → Imóvel {imovel_id} filtrado (nota {nota:.1f} < {self.min_nota})")
+        else:
+            self.results["erros"].append({
+                "etapa": "analysis",
+                "imovel": imovel_id,
+                "erro": "Falha na análise"
+            })
+    
+    def analyze_batch(self, pendentes: List[str], config: Dict) -> Dict[str, Optional[Dict]]:
+        """Análises pendentes num único job da Batch API (batch.py), retomável"""
+        if self.backend != "responses":
+            self.log(f"Modo batch usa as chamadas do backend responses (ignorando '{self.backend}')", "WARNING")
+        
+        def preparar(ids: List[str]) -> Dict[str, str]:
+            conteudos = {}
+            for imovel_id in ids:
+                try:
+                    conteudos[imovel_id] = self.prepare_analysis(imovel_id, config)[0]
+                except Exception as e:
+                    self.log(f"  ✗ {imovel_id}: falha ao preparar análise: {e}", "ERROR")
+            return conteudos
+        
+        state_path = self.data_dir / "batch" / f"{self.cidade.lower()}_{self.estado.lower()}.json"
+        runner = BatchRunner(self.get_resilient_client(), state_path, intervalo=self.intervalo_batch, log=self.log,
+                             edital=lambda imovel_id: self.edital_config(imovel_id, config)["edital_file_id"])
+        
+        analyses = {}
+        for imovel_id, resultado in runner.executar(pendentes, preparar, config).items():
+            if "erro" in resultado:
+                self.log(f"  ✗ {imovel_id}: erro no batch: {resultado['erro']}", "ERROR")
+                continue
+            metricas = {"batch_id": resultado["batch_id"], "batch_s": resultado.get("batch_s"),
+                        "modelo": resultado.get("modelo"), "saida": compacto.modo(config),
+                        **usage.uso_tokens(resultado.get("usage"))}
+            metricas["custo_usd"] = usage.custo_usd(metricas, metricas["modelo"], config, batch=True)
+            metricas["economia_cache_usd"] = usage.economia_cache_usd(metricas, metricas["modelo"], config, batch=True)
+            try:
+                analyses[imovel_id] = self.save_analysis(imovel_id, resultado["texto"], "batch", metricas, config)
+            except Exception as e:
+                self.log(f"  ✗ {imovel_id}: {e}", "ERROR")
+        return analyses
+    
+    def screen_imoveis(self, pendentes: List[str], config: Dict) -> List[str]:
+        """Triagem barata dos pendentes; retorna só os promovidos à análise completa"""
+        modo = self.triagem.get("modo", screening.DEFAULT_MODO)
+        top = self.triagem.get("top")
+        nota_min = self.triagem.get("nota_min")
+        
+        htmls = {}
+        for imovel_id in pendentes:
+            html_path = Path(caminhos_imovel(self.estado, self.cidade, imovel_id)["html"])
+            htmls[imovel_id] = html_path.read_text(encoding="utf-8") if html_path.exists() else ""
+        
+        client = self.get_resilient_client() if modo == "modelo" else None
+        triagem = screening.triar(
+            htmls,
+            modo=modo,
+            client=client,
+            model=self.triagem.get("modelo", screening.DEFAULT_MODELO),
+            preco_ideal=config.get("triagem_preco_ideal", screening.DEFAULT_PRECO_IDEAL)
+        )
+        promovidos = screening.promover(triagem, top=top, nota_min=nota_min)
+        descartados = [i for i in triagem if i["id"] not in promovidos]
+        
+        self.log(f"  → Triagem ({modo}): {len(promovidos)}/{len(triagem)} imóveis promovidos à análise completa")
+        self.results["triagem"] = {
+            "modo": modo,
+            "politica": {"top": top, "nota_min": nota_min},
+            "triados": len(triagem),
+            "promovidos": len(promovidos),
+            "notas": [
+                {"id": i["id"], "nota_triagem": i["nota_triagem"], "promovido": i["id"] in promovidos,
+                 "motivo": i["motivo"]}
+                for i in triagem
+            ],
+        }
+        # Estimativa conservadora: só anúncio + edital + saída (sem a matrícula)
+        self._triagem_descartados = [
+            estimar_tokens(montar_conteudo(htmls[i["id"]], ""), config) for i in descartados
+        ]
+        self._triagem_itens = triagem
+        return [i for i in pendentes if i in promovidos]
+    
+    def report_screening_savings(self, config: Dict, latencia_analise: Optional[float]):
+        """Tokens, custo e tempo evitados pela triagem nesta execução"""
+        if "triagem" not in self.results:
+            return
+        self.results["triagem"]["economia"] = screening.economia(
+            self._triagem_descartados,
+            tokens_saida(config),
+            latencia_analise,
+            concorrencia=1 if self.batch else self.scheduler.concorrencia,
+            triagem=self._triagem_itens,
+            preco_entrada_1m=config.get("preco_entrada_1m", screening.DEFAULT_PRECO_ENTRADA_1M),
+            preco_saida_1m=config.get("preco_saida_1m", screening.DEFAULT_PRECO_SAIDA_1M)
+        )
+        self.log(f"Triagem: {self.results['triagem']['economia']}")
+    
     def analyze_all_imoveis(self, imoveis: List[str]):
-        """Analisa todos os imóveis da lista"""
+        """Analisa todos os imóveis da lista, várias análises em paralelo
+        
+        As análises pendentes passam pelo AnalysisScheduler (scheduler.py), que
+        limita requisições e tokens por minuto e respeita o Retry-After dos 429.
+        """
         self.log(f"Iniciando análise de {len(imoveis)} imóveis...")
         
-        for idx, imovel_id in enumerate(imoveis, 1):
-            self.log(f"\n[{idx}/{len(imoveis)}] Processando imóvel {imovel_id}")
+        config = self.load_config()
+        analyses = {}
+        pendentes = []
+        for imovel_id in imoveis:
+            cached = self.load_cached_analysis(imovel_id, config)
+            if cached:
+                analyses[imovel_id] = cached
+            else:
+                pendentes.append(imovel_id)
+        
+        self.results["cache"] = {
+            "acertos": len(analyses),
+            "faltas": len(pendentes),
+            "acumulado": self.cache.estatisticas()
+        }
+        self.log(f"  → Cache: {len(analyses)} acertos, {len(pendentes)} análises a executar")
+        
+        if pendentes and (self.triagem.get("top") is not None or self.triagem.get("nota_min") is not None):
+            pendentes = self.screen_imoveis(pendentes, config)
+        
+        latencia_analise = None
+        if pendentes and self.batch:
+            self.log(f"  → {len(pendentes)} análises pela Batch API")
+            analyses.update(self.analyze_batch(pendentes, config))
+        elif pendentes:
+            self.log(f"  → {len(pendentes)} análises com IA ({self.scheduler.controle.limite} em paralelo, "
+                     f"até {self.scheduler.controle.maximo}; limites {self.scheduler.rpm} rpm / {self.scheduler.tpm} tpm)")
             
-            analysis = self.analyze_imovel(imovel_id)
+            grupos = [[imovel_id] for imovel_id in pendentes]
+            if self.pacote_tamanho > 1 and self.backend in BACKENDS_SAIDA:
+                grupos = pacote.agrupar(
+                    pendentes,
+                    lambda imovel_id: pacote.edital(self.edital_config(imovel_id, config)),
+                    self.pacote_tamanho
+                )
+                self.log(f"  → Pacotes de até {self.pacote_tamanho} imóveis: {len(grupos)} requisições")
+            elif self.pacote_tamanho > 1:
+                self.log(f"Pacotes não disponíveis no backend {self.backend}; análises individuais", "WARNING")
             
-            if analysis:
-                self.results["imoveis_analisados"] += 1
-                nota = analysis["nota_final"]["valor"]
-                
-                # Verifica se passa no filtro de nota mínima
-                if nota >= self.min_nota:
-                    self.results["imoveis_aprovados"] += 1
-                    
-                    # Adiciona aos top imóveis
-                    imovel_summary = {
-                        "id": imovel_id,
-                        "nota_final": nota,
-                        "comarca": analysis["imovel"].get("comarca", "N/A"),
-                        "condominio": analysis["imovel"].get("condominio", "N/A"),
-                        "apartamento": analysis["imovel"].get("apartamento", "N/A"),
-                        "quartos": analysis["imovel"].get("quartos", "N/A"),
-                        "area_privativa_m2": analysis["imovel"].get("area_privativa_m2", "N/A"),
-                        "valor_minimo": analysis["imovel"].get("valor_minimo", "N/A"),
-                        "desconto_percent": analysis["imovel"].get("desconto_percent", "N/A"),
-                        "criterios": [
-                            {
-                                "nome": c["nome"],
-                                "nota": c["nota"]
-                            } for c in analysis["criterios"]
-                        ],
-                        "riscos": [r["descricao"] for r in analysis.get("riscos", [])],
-                        "proximos_passos": analysis.get("proximos_passos", [])
-                    }
-                    
-                    self.results["top_imoveis"].append(imovel_summary)
-                else:
-                    self.log(f"  → Imóvel filtrado (nota {nota:.1f} < {self.min_nota})")
-            else:
-                self.results["erros"].append({
-                    "etapa": "analysis",
-                    "imovel": imovel_id,
-                    "erro": "Falha na análise"
-                })
+            jobs = [
+                (
+                    grupo[0],
+                    lambda imovel_id=grupo[0]: self.prepare_analysis(imovel_id, config),
+                    lambda conteudo, imovel_id=grupo[0]: self.execute_analysis(imovel_id, conteudo, config),
+                ) if len(grupo) == 1 else (
+                    "+".join(grupo),
+                    lambda grupo=grupo: self.prepare_pack(grupo, config),
+                    lambda payload: self.execute_pack(payload, config),
+                )
+                for grupo in grupos
+            ]
+            for grupo, job in zip(grupos, self.scheduler.executar_todos(jobs)):
+                if len(grupo) == 1:
+                    analyses[job["id"]] = job.get("resultado")
+                    if job["ok"]:
+                        self.record_scheduling(job)
+                    continue
+                for imovel_id in grupo:
+                    # Pacote com erro: o que chegou a ser gravado antes da falha está no cache
+                    resultado = (job.get("resultado") or {}).get(imovel_id)
+                    analyses[imovel_id] = resultado or self.saved_analysis(imovel_id, config)
+                    if resultado:
+                        self.record_scheduling({**job, "id": imovel_id})
             
-            # Pequeno delay para não sobrecarregar a API
-            if idx < len(imoveis):
-                time.sleep(2)
+            self.results["vazao"] = self.scheduler.relatorio()
+            self.log(f"Vazão: {self.results['vazao']}")
+            latencia_analise = self.results["vazao"]["latencia_media_s"]
+        
+        self.report_screening_savings(config, latencia_analise)
+        
+        self.results["uso"] = usage.agregar(self.uso.values())
+        self.log(f"Uso: {self.results['uso']}")
+        self.results["resiliencia"] = self.resiliencia.relatorio()
+        if self.hedge.ativo:
+            self.results["hedge"] = self.hedge.relatorio()
+            self.log(f"Hedge: {self.results['hedge']}")
+        
+        descartados = {n["id"] for n in self.results.get("triagem", {}).get("notas", []) if not n["promovido"]}
+        for imovel_id in imoveis:
+            # Descartados na triagem não são falhas: ficam só na seção "triagem"
+            if imovel_id in descartados:
+                continue
+            self.add_analysis_result(imovel_id, analyses.get(imovel_id))
         
         # Ordena top imóveis por nota (descendente)
         self.results["top_imoveis"].sort(key=lambda x: x["nota_final"], reverse=True)
@@ -362,6 +706,23 @@ class AutomationPipeline:
         self.log(f"Imóveis encontrados: {self.results['imoveis_encontrados']}")
         self.log(f"Imóveis analisados: {self.results['imoveis_analisados']}")
         self.log(f"Imóveis aprovados (nota ≥ {self.min_nota}): {self.results['imoveis_aprovados']}")
+        if "triagem" in self.results:
+            triagem = self.results["triagem"]
+            economia = triagem.get("economia", {})
+            self.log(f"Triagem: {triagem['promovidos']}/{triagem['triados']} promovidos | "
+                     f"~US$ {economia.get('economia_liquida_usd_estimada', 0):.2f} e "
+                     f"~{economia.get('tempo_execucao_evitado_s_estimado', 0):.0f}s evitados")
+        if self.results.get("uso", {}).get("analises"):
+            uso = self.results["uso"]
+            self.log(f"Uso: {uso['analises']} análises | {uso['tokens_entrada']} tokens de entrada "
+                     f"({uso['tokens_cache']} em cache, {uso['analises_com_cache']} análises com acerto), "
+                     f"{uso['tokens_saida']} de saída | US$ {uso['custo_usd']:.2f} "
+                     f"(US$ {uso['custo_medio_usd']:.3f}/análise, US$ {uso['economia_cache_usd']:.2f} poupados pelo cache)")
+        if "resiliencia" in self.results:
+            resiliencia = self.results["resiliencia"]
+            self.log(f"Resiliência: {resiliencia['repeticoes']} repetições, "
+                     f"{resiliencia['aberturas_circuito']} aberturas do circuito "
+                     f"({resiliencia['pausado_s']:.0f}s pausado), erros {resiliencia['erros_por_status']}")
         self.log(f"Erros: {len(self.results['erros'])}")
         
         if self.results["top_imoveis"]:
@@ -425,6 +786,24 @@ Exemplos:
   
   # Análise sem filtro de nota
   python automation.py --estado SP --cidade "SAO PAULO"
+  
+  # Triagem barata: só os 30% melhores ou com nota provisória ≥ 6 vão para a análise completa
+  python automation.py --estado MG --cidade UBERLANDIA --triagem-top 0.3 --triagem-nota 6
+  
+  # Execução semanal pela Batch API (retoma o batch se o processo for interrompido)
+  python automation.py --estado MG --cidade UBERLANDIA --batch
+  
+  # 8 análises em paralelo dentro dos limites da conta
+  python automation.py --estado MG --cidade UBERLANDIA --concorrencia 8 --rpm 500 --tpm 200000
+  
+  # Começa com 4 análises em paralelo e sobe até 16 enquanto a API responder bem
+  python automation.py --estado MG --cidade UBERLANDIA --concorrencia 4 --concorrencia-max 16
+  
+  # Cópia das análises que passarem do p95 da latência (corta a cauda, custa ~5% a mais)
+  python automation.py --estado MG --cidade UBERLANDIA --hedge-percentil 95
+  
+  # Até 4 imóveis pequenos do mesmo edital por requisição (metade do custo, cada chamada mais lenta)
+  python automation.py --estado MG --cidade UBERLANDIA --pacote 4
         """
     )
     
@@ -453,6 +832,97 @@ Exemplos:
         help="Número máximo de imóveis para analisar (útil para testes)"
     )
     
+    # Limites da conta na API (config.json: rate_limit_rpm / rate_limit_tpm)
+    config = {}
+    if Path("config.json").exists():
+        with open("config.json", 'r') as f:
+            config = json.load(f)
+    
+    parser.add_argument(
+        "--concorrencia",
+        type=int,
+        default=config.get("analysis_concorrencia", DEFAULT_CONCORRENCIA),
+        help=f"Análises com IA em paralelo no início (ajustadas por AIMD). Default: {DEFAULT_CONCORRENCIA}"
+    )
+    
+    parser.add_argument(
+        "--concorrencia-max",
+        type=int,
+        default=config.get("analysis_concorrencia_max"),
+        help="Teto da concorrência adaptativa das análises. Default: o valor de --concorrencia"
+    )
+    
+    parser.add_argument(
+        "--rpm",
+        type=int,
+        default=config.get("rate_limit_rpm", DEFAULT_RPM),
+        help=f"Limite de requisições por minuto na API. Default: {DEFAULT_RPM}"
+    )
+    
+    parser.add_argument(
+        "--tpm",
+        type=int,
+        default=config.get("rate_limit_tpm", DEFAULT_TPM),
+        help=f"Limite de tokens por minuto na API. Default: {DEFAULT_TPM}"
+    )
+    
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=config.get("analysis_backend", DEFAULT_BACKEND),
+        help=f"Backend de análise. Default: {DEFAULT_BACKEND}"
+    )
+    
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Envia as análises pendentes pela Batch API (mais barato, conclui em até 24h; retoma se interrompido)"
+    )
+    
+    parser.add_argument(
+        "--intervalo",
+        type=float,
+        default=DEFAULT_INTERVALO,
+        help=f"Segundos entre consultas ao status do batch. Default: {DEFAULT_INTERVALO}"
+    )
+    
+    parser.add_argument(
+        "--hedge-percentil",
+        type=float,
+        default=None,
+        help="Envia uma cópia da análise que passar deste percentil de latência (ex.: 95). "
+             "Default: 'hedge_percentil' do config.json (desligado)"
+    )
+    
+    parser.add_argument(
+        "--pacote",
+        type=int,
+        default=None,
+        help="Analisa até N imóveis pequenos do mesmo edital por requisição (backends responses, chat e local). "
+             "Default: 'pacote_tamanho' do config.json (1, um imóvel por requisição)"
+    )
+    
+    parser.add_argument(
+        "--triagem-top",
+        type=float,
+        default=config.get("triagem_top"),
+        help="Triagem: promove à análise completa esta fração dos melhores (ex.: 0.3)"
+    )
+    
+    parser.add_argument(
+        "--triagem-nota",
+        type=float,
+        default=config.get("triagem_nota_min"),
+        help="Triagem: promove à análise completa quem tiver nota provisória ≥ este valor"
+    )
+    
+    parser.add_argument(
+        "--triagem-modo",
+        choices=screening.MODOS,
+        default=config.get("triagem_modo", screening.DEFAULT_MODO),
+        help=f"Triagem por regras sobre o anúncio ou por modelo barato. Default: {screening.DEFAULT_MODO}"
+    )
+    
     parser.add_argument(
         "--output",
         default="automation_result.json",
@@ -466,7 +936,22 @@ Exemplos:
         estado=args.estado,
         cidade=args.cidade,
         min_nota=args.min_nota,
-        max_imoveis=args.max_imoveis
+        max_imoveis=args.max_imoveis,
+        concorrencia=args.concorrencia,
+        concorrencia_max=args.concorrencia_max,
+        rpm=args.rpm,
+        tpm=args.tpm,
+        backend=args.backend,
+        batch=args.batch,
+        intervalo_batch=args.intervalo,
+        hedge_percentil=args.hedge_percentil,
+        pacote_tamanho=args.pacote,
+        triagem={
+            "modo": args.triagem_modo,
+            "top": args.triagem_top,
+            "nota_min": args.triagem_nota,
+            "modelo": config.get("triagem_modelo", screening.DEFAULT_MODELO)
+        }
     )
     
     results = pipeline.run()
@@ -0,0 +1,306 @@
+"""
+Interface dos Backends de Análise
+=================================
+
+Todo backend recebe a mesma mensagem (analysis.preparar_conteudo) e devolve
+os textos da resposta, de onde sai o JSON da análise (analysis.extrair_json).
+query.py, automation.py e benchmark.py escolhem o backend por execução
+("analysis_backend" do config.json ou --backend) e comparam latência e
+vazão com as mesmas entradas.
+
+- responses: Responses API com saída estruturada (padrão)
+- assistants: thread + run em streaming (Assistants API)
+- chat: Chat Completions com saída estruturada; edital em PDF na mensagem
+  ou, no modo clausulas, como trechos no texto
+- local: modelo local em CPU atrás de um servidor compatível com a API de
+  chat (llama.cpp `llama-server`, Ollama, vLLM...) em "local_base_url",
+  modelo "local_model". Sem arquivos: o edital vai sempre como cláusulas
+  (edital_modo "clausulas", clausulas.py) e o custo por token é zero. Para
+  análises baratas ou em volume; com CPU lenta, prefira "saida_modo":
+  "compacta" e pouca concorrência
+
+Novo backend: subclasse de Backend com `nome` e `chamar`, registrada em
+BACKENDS_CLASSES. `chamar` recebe `cancelado` (threading.Event) quando a
+análise tem hedging (hedge.py) ou a saída é validada durante o stream
+(validacao.py) e deve desistir ao vê-lo sinalizado; `on_partial` recebe o
+texto acumulado da resposta.
+
+Uso:
+    python query.py --backend local
+    python automation.py --estado MG --cidade UBERLANDIA --backend local --concorrencia 2
+    python benchmark.py carga --backend local --local-url http://127.0.0.1:8080/v1
+"""
+
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import clausulas
+import compacto
+import usage
+import validacao
+from analysis import (AnaliseCancelada, analisar_assistants, analisar_chat, analisar_responses, chave_prefixo, corpo_chat,
+                      estimar_tokens, extrair_json, formato_saida, tokens_saida)
+from prompts import MODEL
+
+DEFAULT_BACKEND = "responses"
+DEFAULT_LOCAL_URL = "http://127.0.0.1:8080/v1"
+DEFAULT_LOCAL_MODEL = "qwen2.5-7b-instruct"
+# Modelos em CPU geram poucos tokens por segundo
+DEFAULT_LOCAL_TIMEOUT = 900
+
+
+class _Cancelamento:
+    """Sinalizado quando qualquer um dos eventos estiver (hedge e validação da saída)"""
+
+    def __init__(self, *eventos: Optional[threading.Event]):
+        self.eventos = [e for e in eventos if e is not None]
+
+    def is_set(self) -> bool:
+        return any(e.is_set() for e in self.eventos)
+
+
+class Backend:
+    """Análise de um imóvel: mensagem -> textos da resposta (e métricas)"""
+
+    nome = ""
+    # Sem arquivos nem file_search: o edital só pode ir como texto (cláusulas)
+    so_texto = False
+    # Resposta presa ao esquema pela API; sem isso a validação tolera chaves a mais
+    saida_estruturada = True
+
+    def __init__(self, client, config: Dict, saida: Optional[Dict] = None):
+        self.client = client
+        self.config = config
+        # Formato da resposta (analysis.formato_saida); outro formato, ex. pacotes (pacote.py), em `saida`
+        self.saida = saida or formato_saida(config)
+        self.variante = saida["nome"] if saida else None
+
+    @classmethod
+    def preparar_config(cls, config: Dict) -> Dict:
+        """Config ajustado às limitações do backend (antes de montar a mensagem e a chave do cache)"""
+        if cls.so_texto and clausulas.modo(config) != "clausulas":
+            return {**config, "edital_modo": "clausulas"}
+        return config
+
+    @property
+    def por_clausulas(self) -> bool:
+        return clausulas.modo(self.config) == "clausulas"
+
+    def chave_cache(self, file_id: Optional[str]) -> str:
+        return chave_prefixo(self.config, file_id, self.variante)
+
+    def chamar(self, conteudo: str, metricas: Optional[Dict], on_partial: Optional[Callable[[str], None]],
+               cancelado: Optional[threading.Event] = None) -> List[str]:
+        raise NotImplementedError
+
+    def custo(self, metricas: Dict) -> Dict:
+        modelo = metricas.get("modelo")
+        return {
+            "custo_usd": usage.custo_usd(metricas, modelo, self.config),
+            "economia_cache_usd": usage.economia_cache_usd(metricas, modelo, self.config),
+        }
+
+    def analisar(self, conteudo: str, metricas: Optional[Dict] = None,
+                 on_partial: Optional[Callable[[str], None]] = None,
+                 cancelado: Optional[threading.Event] = None) -> List[str]:
+        """Executa a análise e retorna os textos da resposta
+
+        Se `metricas` for informado, recebe os tempos medidos (total_s e, no
+        backend assistants, ttft_s e geracao_s), o modelo, os tokens (com os
+        servidos pelo cache de prompt), o custo e a economia do cache (usage.py).
+        """
+        if not validacao.ativa(self.config):
+            textos = self.chamar(conteudo, metricas, on_partial, cancelado)
+        else:
+            textos = self.chamar_validado(conteudo, metricas, on_partial, cancelado)
+        if metricas is not None:
+            metricas["saida"] = compacto.modo(self.config)
+            if self.por_clausulas:
+                metricas["edital"] = "clausulas"
+            if "tokens_entrada" not in metricas:
+                # Run encerrado antes do evento com o uso: estimativa pelo tamanho
+                metricas.update(
+                    tokens_entrada=estimar_tokens(conteudo, self.config) - tokens_saida(self.config),
+                    tokens_cache=0,
+                    tokens_saida=len("".join(textos)) // 4,
+                    tokens_estimados=True,
+                )
+            metricas.update(self.custo(metricas))
+        return textos
+
+    def chamar_validado(self, conteudo: str, metricas: Optional[Dict],
+                        on_partial: Optional[Callable[[str], None]],
+                        cancelado: Optional[threading.Event] = None) -> List[str]:
+        """`chamar` com a resposta validada contra o esquema enquanto chega (validacao.py)
+
+        No primeiro erro de estrutura sem conserto a chamada é abandonada e
+        refeita, até "saida_tentativas" vezes; a última vai até o fim (o
+        reparo de extrair_json ainda pode aproveitá-la). O cancelamento pelo hedge
+        continua valendo e interrompe tudo.
+        """
+        tentativas = validacao.tentativas(self.config)
+        abortadas, erros, tempo_abortado = 0, [], 0.0
+        for tentativa in range(1, tentativas + 1):
+            validador = validacao.ValidadorJSON(self.saida["schema"], extras=not self.saida_estruturada)
+            invalida = threading.Event()
+            ultima = tentativa == tentativas
+
+            def acompanhar(texto: str, validador=validador, invalida=invalida, ultima=ultima):
+                if on_partial:
+                    on_partial(texto)
+                if validador.erro is not None:
+                    return
+                try:
+                    validador.acompanhar(texto)
+                except validacao.SaidaInvalida as e:
+                    erros.append(str(e))
+                    if not ultima and not validacao.reparavel(texto, self.saida["schema"],
+                                                              extras=not self.saida_estruturada):
+                        invalida.set()
+
+            inicio = time.perf_counter()
+            try:
+                textos = self.chamar(conteudo, metricas, acompanhar, _Cancelamento(cancelado, invalida))
+            except AnaliseCancelada:
+                if not invalida.is_set():
+                    raise
+                abortadas += 1
+                tempo_abortado += time.perf_counter() - inicio
+                print(f"[SAIDA] Resposta inválida abortada após {validador.posicao} caracteres "
+                      f"(tentativa {tentativa}/{tentativas}): {erros[-1]}", file=sys.stderr)
+                continue
+            break
+
+        if metricas is not None:
+            metricas["saida_valida"] = validador.concluido and validador.erro is None
+            if abortadas:
+                metricas["saida_abortadas"] = abortadas
+                metricas["saida_abortadas_s"] = round(tempo_abortado, 3)
+            if erros:
+                metricas["saida_erros"] = erros
+        return textos
+
+    def analisar_json(self, conteudo: str, metricas: Optional[Dict] = None) -> Optional[Dict]:
+        """JSON da análise (estrutura completa de prompts.py) ou None se a resposta não tiver um"""
+        return extrair_json("\n".join(self.analisar(conteudo, metricas)))
+
+
+class ResponsesBackend(Backend):
+    nome = "responses"
+
+    def chamar(self, conteudo, metricas, on_partial, cancelado=None):
+        file_id = None if self.por_clausulas else self.config["edital_file_id"]
+        return analisar_responses(self.client, file_id, conteudo, model=self.config.get("analysis_model", MODEL),
+                                  metricas=metricas, cache_key=self.chave_cache(file_id),
+                                  saida=self.saida, cancelado=cancelado, on_partial=on_partial)
+
+
+class AssistantsBackend(Backend):
+    nome = "assistants"
+    saida_estruturada = False
+
+    def chamar(self, conteudo, metricas, on_partial, cancelado=None):
+        config = self.config
+        anexo = None if config.get("edital_vector_store_id") or self.por_clausulas else config["edital_file_id"]
+        na_thread = (config["edital_vector_store_id"]
+                     if config.get("edital_na_thread") and not self.por_clausulas else None)
+        compacta = compacto.modo(config) == "compacta"
+        return analisar_assistants(self.client, config["assistant_id"], anexo, conteudo,
+                                   metricas=metricas, on_partial=on_partial, vector_store_id=na_thread,
+                                   file_search=not self.por_clausulas,
+                                   instructions=formato_saida(config)["instructions"] if compacta else None,
+                                   cancelado=cancelado)
+
+
+class ChatBackend(Backend):
+    nome = "chat"
+
+    def modelo(self) -> str:
+        return self.config.get("analysis_model", MODEL)
+
+    def corpo(self, conteudo: str) -> Dict:
+        file_id = None if self.por_clausulas else self.config["edital_file_id"]
+        return corpo_chat(file_id, conteudo, self.modelo(), self.chave_cache(file_id), self.saida)
+
+    def chamar(self, conteudo, metricas, on_partial, cancelado=None):
+        return analisar_chat(self.client, self.corpo(conteudo), metricas, cancelado, on_partial)
+
+
+_clientes_locais = {}
+_lock_clientes = threading.Lock()
+
+
+def cliente_local(config: Dict):
+    """Cliente OpenAI apontado para o servidor local (um por URL, reaproveitado entre análises)"""
+    from openai import OpenAI
+
+    url = config.get("local_base_url", DEFAULT_LOCAL_URL)
+    with _lock_clientes:
+        if url not in _clientes_locais:
+            _clientes_locais[url] = OpenAI(base_url=url, api_key=config.get("local_api_key", "local"),
+                                           max_retries=0, timeout=config.get("local_timeout", DEFAULT_LOCAL_TIMEOUT))
+        return _clientes_locais[url]
+
+
+class LocalBackend(ChatBackend):
+    """Modelo em CPU num servidor local compatível com a Chat Completions"""
+
+    nome = "local"
+    so_texto = True
+
+    def __init__(self, client, config: Dict, saida: Optional[Dict] = None):
+        # O cliente da OpenAI recebido não serve: as chamadas vão para o servidor local
+        super().__init__(cliente_local(config), config, saida)
+
+    def modelo(self) -> str:
+        return self.config.get("local_model", DEFAULT_LOCAL_MODEL)
+
+    def corpo(self, conteudo: str) -> Dict:
+        # Sem prompt_cache_key: parâmetro da OpenAI, desconhecido dos servidores locais
+        return corpo_chat(None, conteudo, self.modelo(), saida=self.saida)
+
+    def custo(self, metricas: Dict) -> Dict:
+        return {"custo_usd": 0.0, "economia_cache_usd": 0.0}
+
+
+BACKENDS_CLASSES = {b.nome: b for b in (ResponsesBackend, AssistantsBackend, ChatBackend, LocalBackend)}
+BACKENDS = tuple(BACKENDS_CLASSES)
+# Backends que aceitam outro formato de resposta em `saida` (pacotes, pacote.py, e
+# reanálises parciais, reanalise.py)
+BACKENDS_SAIDA = ("responses", "chat", "local")
+
+
+def classe(nome: str) -> type:
+    if nome not in BACKENDS_CLASSES:
+        raise ValueError(f"Backend de análise desconhecido: {nome} (opções: {', '.join(BACKENDS)})")
+    return BACKENDS_CLASSES[nome]
+
+
+def preparar_config(nome: str, config: Dict) -> Dict:
+    """Config ajustado ao backend (ex.: local força o edital em cláusulas)"""
+    return classe(nome).preparar_config(config)
+
+
+def criar(nome: str, client, config: Dict, saida: Optional[Dict] = None) -> Backend:
+    return classe(nome)(client, classe(nome).preparar_config(config), saida)
+
+
+def analisar(client, backend: str, conteudo: str, config: Dict, metricas: Optional[Dict] = None,
+             on_partial: Optional[Callable[[str], None]] = None, hedge=None,
+             saida: Optional[Dict] = None) -> List[str]:
+    """Executa a análise no backend escolhido e retorna os textos da resposta
+
+    Com `hedge` (hedge.Hedge) uma cópia da chamada sai se a primeira passar
+    do percentil de latência; o texto parcial só é mostrado na primeira.
+    `saida` troca o formato da resposta (ex.: reanálise parcial, reanalise.py).
+    """
+    instancia = criar(backend, client, config, saida)
+    if hedge is None:
+        return instancia.analisar(conteudo, metricas, on_partial)
+    return hedge.executar(
+        lambda parcial, cancelado, copia: instancia.analisar(conteudo, parcial, None if copia else on_partial,
+                                                             cancelado),
+        metricas
+    )
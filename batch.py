@@ -0,0 +1,183 @@
+"""
+Modo Batch (OpenAI Batch API)
+=============================
+
+Para execuções que não têm pressa (ex.: o workflow semanal do n8n), as
+análises pendentes são enviadas de uma vez como um job da Batch API, com
+custo menor que as chamadas síncronas:
+
+1. monta um JSONL com uma chamada à Responses API por imóvel
+   (custom_id = id do imóvel, corpo = analysis.corpo_responses)
+2. envia o arquivo e cria o batch
+3. consulta o status até o batch terminar
+4. baixa o arquivo de saída e entrega o texto de cada análise
+
+O id do batch fica gravado em data/batch/<cidade>_<estado>.json assim que é
+criado. Se o processo for interrompido, a próxima execução retoma o mesmo
+batch em vez de enviar outro; o estado é apagado depois da ingestão.
+
+Para testar sem a API real, suba o servidor local de fake_openai.py e
+aponte o cliente para ele (OPENAI_BASE_URL=http://127.0.0.1:8089/v1).
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import clausulas
+from analysis import chave_prefixo, corpo_responses, formato_saida, texto_resposta
+from prompts import MODEL
+
+BATCH_ENDPOINT = "/v1/responses"
+COMPLETION_WINDOW = "24h"
+DEFAULT_INTERVALO = 60
+STATUS_FINAIS = ("completed", "failed", "expired", "cancelled")
+
+
+def montar_linhas(conteudos: Dict[str, str], config: Dict,
+                  edital: Optional[Callable[[str], str]] = None) -> List[Dict]:
+    """Uma requisição do JSONL por imóvel; `edital(id)` dá o file_id do edital de cada um"""
+    model = config.get("analysis_model", MODEL)
+    if clausulas.modo(config) == "clausulas":
+        # Cláusulas do edital já estão no conteúdo
+        edital = lambda imovel_id: None
+    linhas = []
+    for imovel_id, conteudo in conteudos.items():
+        file_id = edital(imovel_id) if edital else config["edital_file_id"]
+        linhas.append({
+            "custom_id": imovel_id,
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": corpo_responses(file_id, conteudo, model, chave_prefixo(config, file_id), formato_saida(config)),
+        })
+    return linhas
+
+
+def ler_jsonl(texto: str) -> List[Dict]:
+    return [json.loads(linha) for linha in texto.splitlines() if linha.strip()]
+
+
+class BatchRunner:
+    """Envia, acompanha e ingere um batch de análises, retomando após reinício"""
+
+    def __init__(self, client, state_path: Path, intervalo: float = DEFAULT_INTERVALO,
+                 log: Callable[[str], None] = print, edital: Optional[Callable[[str], str]] = None):
+        self.client = client
+        self.state_path = Path(state_path)
+        self.intervalo = intervalo
+        self.log = log
+        # file_id do edital por imóvel (registro de editais); None = edital global
+        self.edital = edital
+
+    def carregar_estado(self) -> Optional[Dict]:
+        if not self.state_path.exists():
+            return None
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def salvar_estado(self, estado: Dict):
+        # Grava num temporário e renomeia: um estado pela metade faria perder o batch
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.state_path)
+
+    def submeter(self, conteudos: Dict[str, str], config: Dict) -> Dict:
+        """Envia o JSONL e cria o batch; retorna o estado gravado"""
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        jsonl_path = self.state_path.with_suffix(".jsonl")
+        with open(jsonl_path, 'w', encoding='utf-8') as f:
+            for linha in montar_linhas(conteudos, config, self.edital):
+                f.write(json.dumps(linha, ensure_ascii=False) + "\n")
+
+        with open(jsonl_path, 'rb') as f:
+            arquivo = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=arquivo.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=COMPLETION_WINDOW,
+            metadata={"origem": "automation.py"},
+        )
+
+        estado = {
+            "batch_id": batch.id,
+            "input_file_id": arquivo.id,
+            "imoveis": list(conteudos),
+            "criado_em": time.time(),
+        }
+        self.salvar_estado(estado)
+        self.log(f"Batch {batch.id} criado com {len(conteudos)} análises")
+        return estado
+
+    def aguardar(self, batch_id: str):
+        """Consulta o batch até um status final"""
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status in STATUS_FINAIS:
+                return batch
+            contagem = batch.request_counts
+            progresso = f" ({contagem.completed + contagem.failed}/{contagem.total})" if contagem else ""
+            self.log(f"Batch {batch_id}: {batch.status}{progresso}")
+            time.sleep(self.intervalo)
+
+    def ingerir(self, batch) -> Dict[str, Dict]:
+        """Resultados por imóvel: {"texto": ..., "usage": ..., "modelo": ...} ou {"erro": ...}"""
+        resultados = {}
+        if batch.output_file_id:
+            for linha in ler_jsonl(self.client.files.content(batch.output_file_id).text):
+                response = linha.get("response") or {}
+                if response.get("status_code") == 200:
+                    body = response.get("body") or {}
+                    resultados[linha["custom_id"]] = {
+                        "texto": texto_resposta(body), "usage": body.get("usage"), "modelo": body.get("model")
+                    }
+                else:
+                    resultados[linha["custom_id"]] = {"erro": linha.get("error") or response.get("body")}
+        if batch.error_file_id:
+            for linha in ler_jsonl(self.client.files.content(batch.error_file_id).text):
+                resultados.setdefault(linha["custom_id"], {"erro": linha.get("error") or linha.get("response")})
+        return resultados
+
+    def executar(self, pendentes: List[str], preparar: Callable[[List[str]], Dict[str, str]],
+                 config: Dict) -> Dict[str, Dict]:
+        """Processa os imóveis pendentes pela Batch API
+
+        Se houver um batch em andamento (execução anterior interrompida), ele é
+        concluído primeiro; os pendentes que não estavam nele vão num batch novo.
+        `preparar(ids)` retorna {id: conteúdo} só para os imóveis a enviar.
+        """
+        resultados = {}
+        preparados = set()
+        estado = self.carregar_estado()
+        if estado:
+            self.log(f"Retomando batch {estado['batch_id']} ({len(estado['imoveis'])} análises)")
+        else:
+            preparados.update(pendentes)
+            conteudos = preparar(pendentes)
+            if not conteudos:
+                return resultados
+            estado = self.submeter(conteudos, config)
+
+        while estado:
+            batch = self.aguardar(estado["batch_id"])
+            self.log(f"Batch {batch.id} terminou: {batch.status}")
+            # Tempo do job na plataforma (da criação ao fim), igual para todas as análises dele
+            duracao = batch.completed_at - batch.created_at if batch.completed_at else None
+            for imovel_id, resultado in self.ingerir(batch).items():
+                resultado.update(batch_id=batch.id, batch_s=duracao)
+                resultados[imovel_id] = resultado
+            for imovel_id in estado["imoveis"]:
+                resultados.setdefault(imovel_id, {"erro": f"batch {batch.status}", "batch_id": batch.id})
+            self.state_path.unlink(missing_ok=True)
+            self.state_path.with_suffix(".jsonl").unlink(missing_ok=True)
+
+            # Pendentes que não estavam no batch retomado (os que já falharam na preparação não voltam)
+            restantes = [i for i in pendentes if i not in resultados and i not in preparados]
+            preparados.update(restantes)
+            conteudos = preparar(restantes) if restantes else {}
+            estado = self.submeter(conteudos, config) if conteudos else None
+
+        return resultados
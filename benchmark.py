@@ -0,0 +1,439 @@
+"""
+Benchmarks do Pipeline de Análise
+=================================
+
+Mede o desempenho das etapas do pipeline para comparar implementações.
+
+Uso:
+    # Compara os motores de OCR na mesma matrícula
+    python benchmark.py ocr data/detail/uberlandia_mg/8787705248848.pdf --repeat 3
+
+    # Pico de memória dos pipelines batch e stream numa matrícula de 40 páginas
+    python benchmark.py ocr-memoria data/detail/uberlandia_mg/8787705248848.pdf --paginas 40
+
+    # Latência dos runs do assistente: edital anexado por mensagem x vector store persistente
+    python benchmark.py assistants-latencia --repeat 3
+
+    # Carga do pipeline completo contra o servidor local (fake_openai.py), sem custo
+    python benchmark.py carga --imoveis 50 --concorrencia 8 --ttft 1.0 --tokens-por-s 80 --taxa-429 0.05
+
+    # Mesmas entradas em outro backend (por_backend), ex.: modelo local em CPU via llama.cpp
+    python benchmark.py carga --imoveis 20 --concorrencia 2 --backend local --local-url http://127.0.0.1:8080/v1
+
+    # Saída compacta x completa: tokens de saída e latência (seção uso.por_saida)
+    python benchmark.py carga --imoveis 20 --tokens-por-s 60 --saida compacta
+
+    # Edital trocado depois da carga: reanálise só dos critérios afetados (seção reanalise)
+    python benchmark.py carga --imoveis 20 --reanalise edital
+
+    # Respostas com JSON defeituoso: validação durante o stream x só no fim (seção uso.validacao_saida)
+    python benchmark.py carga --imoveis 20 --taxa-json-invalido 0.2
+    python benchmark.py carga --imoveis 20 --taxa-json-invalido 0.2 --sem-validacao
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import ocr
+
+
+def bench_ocr(args) -> dict:
+    """Compara os motores de OCR (renderização feita uma vez, fora da medição)"""
+    pages = ocr.render_pages(args.pdf, dpi=args.dpi)
+    print(f"PDF: {args.pdf} ({len(pages)} páginas, {args.dpi} dpi)", file=sys.stderr)
+
+    results = {}
+    for name in args.engines:
+        try:
+            start = time.perf_counter()
+            engine = ocr.get_engine(name, lang=args.lang, workers=args.workers)
+            init_s = time.perf_counter() - start
+        except Exception as e:
+            print(f"[AVISO] Motor {name} indisponível: {e}", file=sys.stderr)
+            continue
+
+        tempos = []
+        chars = 0
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            chars = sum(len(t) for t in ocr.ocr_pages(pages, engine))
+            tempos.append(time.perf_counter() - start)
+
+        mediana = statistics.median(tempos)
+        results[name] = {
+            "init_s": round(init_s, 3),
+            "mediana_s": round(mediana, 3),
+            "min_s": round(min(tempos), 3),
+            "paginas_por_s": round(len(pages) / mediana, 2) if mediana else None,
+            "caracteres": chars,
+        }
+        print(f"{name:12s} init={init_s:.2f}s mediana={mediana:.2f}s "
+              f"({results[name]['paginas_por_s']} pág/s, {chars} caracteres)", file=sys.stderr)
+
+    ocr.close_engines()
+    return results
+
+
+def _replicar_paginas(pdf_path: str, paginas: int, tmpdir: str) -> str:
+    """Monta um PDF com `paginas` páginas repetindo as do original (pdfseparate + pdfunite)"""
+    subprocess.run([ocr._poppler_bin("pdfseparate"), pdf_path, os.path.join(tmpdir, "p%d.pdf")], check=True)
+    originais = len(ocr.page_sizes(pdf_path))
+    partes = [os.path.join(tmpdir, f"p{i % originais + 1}.pdf") for i in range(paginas)]
+    destino = os.path.join(tmpdir, f"matricula_{paginas}p.pdf")
+    subprocess.run([ocr._poppler_bin("pdfunite"), *partes, destino], check=True)
+    return destino
+
+
+def _ocr_memoria_isolado(args) -> dict:
+    """Executa um único pipeline neste processo e mede o pico de memória"""
+    pipeline = args.pipelines[0]
+    start = time.perf_counter()
+    texto = ocr.extrair_texto_pdf(args.pdf, engine=args.engine, lang=args.lang,
+                                  workers=args.workers, dpi=args.dpi, pipeline=pipeline)
+    tempo = time.perf_counter() - start
+    # Encerra os workers para que entrem na contagem de RUSAGE_CHILDREN
+    ocr.close_engines()
+    pico = ocr.peak_rss_mb()
+    return {
+        "pipeline": pipeline,
+        "paginas": len(ocr.page_sizes(args.pdf)),
+        "tempo_s": round(tempo, 2),
+        "pico_rss_mb": round(pico["processo"], 1) if pico["processo"] else None,
+        "pico_rss_filhos_mb": round(pico["filhos"], 1) if pico["filhos"] else None,
+        "caracteres": len(texto),
+    }
+
+
+def bench_ocr_memory(args) -> dict:
+    """Compara o pico de memória dos pipelines de OCR, cada um num processo novo"""
+    if args.isolado:
+        return _ocr_memoria_isolado(args)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        pdf = _replicar_paginas(args.pdf, args.paginas, tmpdir) if args.paginas else args.pdf
+
+        for pipeline in args.pipelines:
+            cmd = [sys.executable, os.path.abspath(__file__), "ocr-memoria", pdf,
+                   "--pipelines", pipeline, "--isolado",
+                   "--engine", args.engine, "--workers", str(args.workers),
+                   "--dpi", str(args.dpi), "--lang", args.lang]
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f"[AVISO] Pipeline {pipeline} falhou: {proc.stderr}", file=sys.stderr)
+                continue
+
+            results[pipeline] = json.loads(proc.stdout)
+            r = results[pipeline]
+            print(f"{pipeline:8s} {r['paginas']} páginas em {r['tempo_s']}s | "
+                  f"pico RSS {r['pico_rss_mb']} MB (filhos: {r['pico_rss_filhos_mb']} MB)", file=sys.stderr)
+
+    return results
+
+
+def bench_assistants_latency(args) -> dict:
+    """Latência por run do backend assistants com o edital anexado e com o vector store
+
+    Usa o imóvel do config.json. O modo "anexo" é o caminho antigo (o edital
+    é indexado num vector store da thread a cada mensagem); o modo
+    "vector_store" depende do setup_openai.py ter indexado o edital.
+    """
+    from dotenv import load_dotenv
+    from openai import OpenAI
+    from analysis import analisar_assistants, preparar_conteudo
+
+    with open("config.json", "r") as f:
+        config = json.load(f)
+    load_dotenv()
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    conteudo = preparar_conteudo(client, config, config["estado"], config["cidade"], config["imovel"])
+
+    modos = {"anexo": config["edital_file_id"]}
+    if config.get("edital_vector_store_id"):
+        modos["vector_store"] = None
+    else:
+        print("[AVISO] Sem edital_vector_store_id: rode python setup_openai.py", file=sys.stderr)
+
+    results = {}
+    for modo, file_id in modos.items():
+        medidas = []
+        for _ in range(args.repeat):
+            metricas = {}
+            analisar_assistants(client, config["assistant_id"], file_id, conteudo, metricas=metricas)
+            medidas.append(metricas)
+
+        def mediana(chave):
+            valores = [m[chave] for m in medidas if m.get(chave) is not None]
+            return round(statistics.median(valores), 2) if valores else None
+
+        results[modo] = {
+            "runs": len(medidas),
+            "ttft_mediana_s": mediana("ttft_s"),
+            "total_mediana_s": mediana("total_s"),
+        }
+        print(f"{modo:12s} TTFT {results[modo]['ttft_mediana_s']}s | "
+              f"total {results[modo]['total_mediana_s']}s (mediana de {len(medidas)})", file=sys.stderr)
+
+    return results
+
+
+ANUNCIO_SINTETICO = """<html><body>
+<h5>APARTAMENTO {n} - CENTRO</h5>
+<p>Valor de avaliação: R$ {avaliacao:,.2f}</p>
+<p>Valor mínimo de venda: R$ {minimo:,.2f} - desconto de {desconto:.2f}%</p>
+<p>Tipo de imóvel: {tipo} Quartos: {quartos} Garagem: {vagas}</p>
+<p>Área privativa = {area:.2f}m2</p>
+<p>{pagamento}</p><p>Imóvel {ocupacao}.</p>
+</body></html>"""
+
+
+# Cláusulas do edital sintético (modo clausulas e backend local)
+EDITAL_SINTETICO = """1. DO OBJETO
+1.1. Venda de imóveis de propriedade da CAIXA, no estado de ocupação em que se encontram.
+2. DO PAGAMENTO
+2.1. O pagamento poderá ser à vista, com recursos próprios, ou mediante financiamento habitacional.
+2.2. O prazo para pagamento do saldo é de até 30 dias da homologação.
+3. DAS DESPESAS
+3.1. Débitos de IPTU e condomínio até a data da venda são de responsabilidade da CAIXA, até o limite de 10% do valor de avaliação.
+3.2. Tributos e despesas de registro correm por conta do adquirente.
+4. DA CONTRATAÇÃO E DO REGISTRO
+4.1. A escritura ou o contrato deve ser registrado no Cartório de Registro de Imóveis em até 30 dias da assinatura.
+4.2. A desocupação do imóvel é de responsabilidade do adquirente.
+"""
+
+
+def _workspace_carga(tmpdir: str, client, args) -> dict:
+    """Anúncios sintéticos, edital e assistente no servidor local; retorna o config.json"""
+    import random
+    rng = random.Random(42)
+    detalhes = os.path.join(tmpdir, "data", "detail", f"{args.cidade.lower()}_{args.estado.lower()}")
+    os.makedirs(detalhes)
+    for n in range(args.imoveis):
+        avaliacao = rng.uniform(120000, 600000)
+        desconto = rng.uniform(5, 55)
+        html = ANUNCIO_SINTETICO.format(
+            n=n, avaliacao=avaliacao, minimo=avaliacao * (1 - desconto / 100), desconto=desconto,
+            tipo=rng.choice(["Apartamento", "Casa", "Terreno"]), quartos=rng.randint(1, 4),
+            vagas=rng.randint(0, 2), area=rng.uniform(35, 140),
+            pagamento="Permite financiamento habitacional" if rng.random() < 0.6 else "Recursos próprios",
+            ocupacao=rng.choice(["ocupado", "desocupado"]),
+        ).replace(",", "X").replace(".", ",").replace("X", ".")
+        with open(os.path.join(detalhes, f"{9000000000000 + n}.html"), "w", encoding="utf-8") as f:
+            f.write(html)
+
+    import clausulas
+    from editais import hash_pdf
+    from prompts import INSTRUCTIONS, MODEL
+    pdf = b"%PDF-1.4 edital sintetico"
+    with open(os.path.join(tmpdir, clausulas.DEFAULT_EDITAL_PDF), "wb") as f:
+        f.write(pdf)
+    # Índice de cláusulas já pronto (o PDF sintético não tem texto extraível)
+    indice = os.path.join(tmpdir, clausulas.DEFAULT_DIR, f"{hash_pdf(os.path.join(tmpdir, clausulas.DEFAULT_EDITAL_PDF))}.json")
+    os.makedirs(os.path.dirname(indice))
+    with open(indice, "w", encoding="utf-8") as f:
+        json.dump({"versao": clausulas.VERSAO, "pdf": clausulas.DEFAULT_EDITAL_PDF,
+                   "clausulas": clausulas.segmentar(EDITAL_SINTETICO)}, f, ensure_ascii=False)
+    edital = client.files.create(file=("edital.pdf", pdf), purpose="assistants")
+    vector_store = client.vector_stores.create(name="Edital (carga)", file_ids=[edital.id])
+    assistant = client.beta.assistants.create(
+        model=MODEL, instructions=INSTRUCTIONS, tools=[{"type": "file_search"}],
+        tool_resources={"file_search": {"vector_store_ids": [vector_store.id]}},
+    )
+    config = {
+        "estado": args.estado, "cidade": args.cidade, "imovel": "",
+        "edital_file_id": edital.id, "edital_vector_store_id": vector_store.id, "assistant_id": assistant.id,
+        "saida_modo": args.saida,
+        "edital_modo": args.edital_modo,
+        "saida_validacao": not args.sem_validacao,
+        # Backend local: servidor próprio (llama.cpp, Ollama...) ou o mesmo servidor da carga
+        "local_base_url": args.local_url or os.environ["OPENAI_BASE_URL"],
+    }
+    if args.local_model:
+        config["local_model"] = args.local_model
+    if args.hedge_percentil:
+        # Sem histórico no workspace novo: o percentil começa a valer após poucas análises
+        config.update(hedge_percentil=args.hedge_percentil, hedge_minimo_s=args.hedge_minimo,
+                      hedge_min_amostras=args.hedge_min_amostras)
+    with open(os.path.join(tmpdir, "config.json"), "w") as f:
+        json.dump(config, f, indent=2)
+    return config
+
+
+def _reanalisar(client, args, imoveis, anterior) -> dict:
+    """Troca o edital e analisa de novo os mesmos imóveis (reanálise parcial, reanalise.py)"""
+    from automation import AutomationPipeline
+    with open("config.json", "r") as f:
+        config = json.load(f)
+    config["edital_file_id"] = client.files.create(file=("edital-v2.pdf", b"%PDF-1.4 edital v2"),
+                                                   purpose="assistants").id
+    with open("config.json", "w") as f:
+        json.dump(config, f, indent=2)
+
+    pipeline = AutomationPipeline(args.estado, args.cidade, concorrencia=args.concorrencia,
+                                  concorrencia_max=args.concorrencia_max, rpm=args.rpm, tpm=args.tpm,
+                                  backend=args.backend, pacote_tamanho=args.pacote)
+    start = time.perf_counter()
+    pipeline.analyze_all_imoveis(imoveis)
+    return {
+        "mudanca": args.reanalise,
+        "duracao_s": round(time.perf_counter() - start, 1),
+        "custo_usd": {"primeira": anterior.results["uso"].get("custo_usd"),
+                      "reanalise": pipeline.results["uso"].get("custo_usd")},
+        "uso": pipeline.results.get("uso"),
+    }
+
+
+def bench_load(args) -> dict:
+    """Executa o pipeline de análise do automation.py contra o servidor local
+
+    Mede a vazão do agendador (ou do batch) com o perfil de latência, tokens e
+    erros escolhido, num diretório temporário com anúncios sintéticos. Com
+    --base-url usa um servidor já em execução (python fake_openai.py).
+    """
+    import fake_openai
+    from openai import OpenAI
+
+    servidor = None
+    base_url = args.base_url
+    if not base_url:
+        servidor = fake_openai.iniciar(
+            0, latencia_api=args.latencia_api, ttft=args.ttft, sigma=args.sigma, tokens_por_s=args.tokens_por_s,
+            indexacao=args.indexacao, busca=args.busca, taxa_429=args.taxa_429, taxa_500=args.taxa_500, retry_after=args.retry_after,
+            rpm=args.rpm_servidor, duracao=args.duracao_batch,
+            taxa_lenta=args.taxa_lenta, fator_lento=args.fator_lento, capacidade=args.capacidade,
+            taxa_json_invalido=args.taxa_json_invalido,
+        )
+        base_url = f"http://127.0.0.1:{servidor.server_port}/v1"
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "sk-local")
+    client = OpenAI()
+
+    origem = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        try:
+            os.chdir(tmpdir)
+            _workspace_carga(tmpdir, client, args)
+            client.post("/_stats/reset", cast_to=object)
+
+            from automation import AutomationPipeline
+            pipeline = AutomationPipeline(args.estado, args.cidade, concorrencia=args.concorrencia,
+                                          concorrencia_max=args.concorrencia_max, rpm=args.rpm, tpm=args.tpm, backend=args.backend,
+                                          batch=args.batch, intervalo_batch=1, pacote_tamanho=args.pacote)
+            imoveis = sorted(p.stem for p in (pipeline.data_dir / "detail").glob("*/*.html"))
+            start = time.perf_counter()
+            pipeline.analyze_all_imoveis(imoveis)
+            duracao = time.perf_counter() - start
+            if args.reanalise:
+                reanalise = _reanalisar(client, args, imoveis, pipeline)
+        finally:
+            os.chdir(origem)
+
+    results = {
+        "imoveis": args.imoveis,
+        "analisados": pipeline.results["imoveis_analisados"],
+        "falhas": len(pipeline.results["erros"]),
+        "duracao_s": round(duracao, 1),
+        "vazao": pipeline.results.get("vazao"),
+        "uso": pipeline.results.get("uso"),
+        "resiliencia": pipeline.results.get("resiliencia"),
+        "hedge": pipeline.results.get("hedge"),
+        "reanalise": reanalise if args.reanalise else None,
+        "servidor": client.get("/_stats", cast_to=object),
+    }
+    if servidor:
+        servidor.shutdown()
+    print(f"{results['analisados']}/{args.imoveis} análises em {results['duracao_s']}s "
+          f"({results['falhas']} falhas, {results['servidor']['total']['erros_429']} respostas 429)", file=sys.stderr)
+    return results
+
+
+def main():
+    """Função principal para linha de comando"""
+    from backends import BACKENDS, DEFAULT_BACKEND
+
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline de análise")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_ocr = sub.add_parser("ocr", help="Compara motores de OCR")
+    p_ocr.add_argument("pdf", help="Caminho do PDF da matrícula")
+    p_ocr.add_argument("--engines", nargs="+", default=list(ocr.ENGINES), help="Motores a comparar")
+    p_ocr.add_argument("--repeat", type=int, default=3, help="Repetições por motor. Default: 3")
+    p_ocr.add_argument("--workers", type=int, default=1, help="Páginas em paralelo. Default: 1")
+    p_ocr.add_argument("--dpi", type=int, default=ocr.DEFAULT_DPI, help="Resolução de renderização")
+    p_ocr.add_argument("--lang", default=ocr.DEFAULT_LANG, help="Idioma do Tesseract")
+    p_ocr.set_defaults(func=bench_ocr)
+
+    p_mem = sub.add_parser("ocr-memoria", help="Pico de memória dos pipelines de OCR")
+    p_mem.add_argument("pdf", help="Caminho do PDF da matrícula")
+    p_mem.add_argument("--paginas", type=int, help="Replica as páginas até este total (ex.: 40)")
+    p_mem.add_argument("--pipelines", nargs="+", default=["batch", "stream"], help="Pipelines a comparar")
+    p_mem.add_argument("--engine", default=ocr.DEFAULT_ENGINE, help="Motor de OCR")
+    p_mem.add_argument("--workers", type=int, default=2, help="Processos de OCR. Default: 2")
+    p_mem.add_argument("--dpi", type=int, default=ocr.DEFAULT_DPI, help="Resolução de renderização")
+    p_mem.add_argument("--lang", default=ocr.DEFAULT_LANG, help="Idioma do Tesseract")
+    p_mem.add_argument("--isolado", action="store_true", help=argparse.SUPPRESS)
+    p_mem.set_defaults(func=bench_ocr_memory)
+
+    p_ast = sub.add_parser("assistants-latencia", help="Latência dos runs: edital anexado x vector store")
+    p_ast.add_argument("--repeat", type=int, default=3, help="Runs por modo. Default: 3")
+    p_ast.set_defaults(func=bench_assistants_latency)
+
+    p_carga = sub.add_parser("carga", help="Pipeline completo contra o servidor local (fake_openai.py)")
+    p_carga.add_argument("--imoveis", type=int, default=20, help="Anúncios sintéticos. Default: 20")
+    p_carga.add_argument("--estado", default="MG", help="Default: MG")
+    p_carga.add_argument("--cidade", default="CARGA", help="Default: CARGA")
+    p_carga.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND)
+    p_carga.add_argument("--local-url", help="Servidor do modelo local (backend local). Default: o servidor da carga")
+    p_carga.add_argument("--local-model", help="Modelo do servidor local (backend local)")
+    p_carga.add_argument("--batch", action="store_true", help="Usa a Batch API")
+    p_carga.add_argument("--concorrencia", type=int, default=4, help="Análises em paralelo. Default: 4")
+    p_carga.add_argument("--concorrencia-max", type=int,
+                         help="Teto da concorrência adaptativa (AIMD). Default: o valor de --concorrencia")
+    p_carga.add_argument("--rpm", type=int, default=10000, help="Limite do agendador. Default: 10000")
+    p_carga.add_argument("--tpm", type=int, default=2000000, help="Limite do agendador. Default: 2000000")
+    p_carga.add_argument("--base-url", help="Servidor já em execução (ex.: http://127.0.0.1:8089/v1)")
+    p_carga.add_argument("--latencia-api", type=float, default=0.02, help="Mediana (s) dos endpoints leves")
+    p_carga.add_argument("--ttft", type=float, default=0.5, help="Mediana (s) até o primeiro token")
+    p_carga.add_argument("--sigma", type=float, default=0.3, help="Dispersão lognormal das latências")
+    p_carga.add_argument("--tokens-por-s", type=float, default=200.0, help="Velocidade de geração")
+    p_carga.add_argument("--indexacao", type=float, default=0.0, help="Atraso (s) com edital anexado")
+    p_carga.add_argument("--busca", type=float, default=0.0, help="Atraso (s) do file_search nos runs")
+    p_carga.add_argument("--taxa-429", type=float, default=0.0, help="Fração de 429 injetados")
+    p_carga.add_argument("--taxa-500", type=float, default=0.0, help="Fração de 500 injetados")
+    p_carga.add_argument("--retry-after", type=float, default=1.0, help="Retry-After (s) dos 429")
+    p_carga.add_argument("--rpm-servidor", type=int, help="Limite de rpm do servidor")
+    p_carga.add_argument("--capacidade", type=int, help="Gerações simultâneas do servidor antes dos 429")
+    p_carga.add_argument("--taxa-lenta", type=float, default=0.0, help="Fração das chamadas ao modelo mais lentas")
+    p_carga.add_argument("--fator-lento", type=float, default=5.0, help="Quantas vezes mais lentas. Default: 5")
+    p_carga.add_argument("--taxa-json-invalido", type=float, default=0.0,
+                         help="Fração das análises com JSON defeituoso (fake_openai.py)")
+    p_carga.add_argument("--sem-validacao", action="store_true",
+                         help="Desliga a validação da saída durante o stream (validacao.py)")
+    p_carga.add_argument("--hedge-percentil", type=float, help="Liga o hedging das análises (hedge.py), ex.: 90")
+    p_carga.add_argument("--hedge-minimo", type=float, default=0.5, help="Limiar mínimo (s) do hedge. Default: 0.5")
+    p_carga.add_argument("--hedge-min-amostras", type=int, default=5,
+                         help="Latências antes do primeiro hedge. Default: 5")
+    p_carga.add_argument("--pacote", type=int, default=1,
+                         help="Imóveis do mesmo edital por requisição (pacote.py). Default: 1")
+    p_carga.add_argument("--reanalise", choices=["edital"],
+                         help="Depois da carga, troca o edital e reanalisa os mesmos imóveis (reanalise.py)")
+    p_carga.add_argument("--duracao-batch", type=float, default=3.0, help="Segundos até um batch concluir")
+    p_carga.add_argument("--edital-modo", choices=["arquivo", "clausulas"], default="arquivo",
+                         help="Edital como arquivo ou como cláusulas no texto (clausulas.py). Default: arquivo")
+    p_carga.add_argument("--saida", choices=["completa", "compacta"], default="completa",
+                         help="Formato da resposta do modelo (compacto.py). Default: completa")
+    p_carga.set_defaults(func=bench_load)
+
+    args = parser.parse_args()
+    results = args.func(args)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
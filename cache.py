@@ -0,0 +1,157 @@
+"""
+Cache de Análises Endereçado por Conteúdo
+=========================================
+
+A chave de uma análise é o SHA-256 das entradas que determinam o resultado:
+
+- HTML de detalhe do imóvel
+- PDF da matrícula (bytes) + opções de OCR/resumo que mudam o texto enviado
+- edital do imóvel (edital_file_id, já resolvido pelo registro de editais)
+  e, no backend assistants, o assistant_id e o vector store do edital; no
+  modo clausulas, o PDF local do edital e a versão do índice (clausulas.py)
+- instruções e esquema de saída (prompts.py), versão das notas locais
+  (scoring.py) e modelo
+
+Se qualquer entrada mudar a chave muda, então uma análise antiga nunca é
+servida no lugar de uma nova; se nada mudou, a análise não é paga de novo.
+O PDF é usado no lugar do texto do OCR para que a consulta ao cache não
+exija OCR.
+
+Entradas em data/cache/<chave>.json, com as entradas de origem; a última
+de cada imóvel fica apontada em data/cache/imoveis/<id>.json, base da
+reanálise parcial quando só parte das entradas muda (reanalise.py). Contadores de acertos/faltas em
+data/cache/stats.json, compartilhados pelo automation.py (CLI/API), pelo
+query.py e, através dele, pelo Streamlit.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+import clausulas
+import scoring
+from analysis import caminhos_imovel
+from editais import hash_pdf
+from prompts import MODEL, VERSAO_PROMPT
+
+DEFAULT_CACHE_DIR = "data/cache"
+
+# Opções que alteram o texto da matrícula enviado ao modelo (workers e
+# pipeline só mudam o desempenho)
+CONFIG_CHAVE = (
+    "ocr_engine", "ocr_lang", "ocr_dpi", "ocr_dpi_alto", "ocr_conf_min",
+    "matricula_modo", "matricula_limite_texto", "matricula_modelo", "matricula_bloco",
+    "scoring_modo", "criterios_locais", "triagem_preco_ideal",
+    "edital_modo", "edital_trechos", "edital_max_caracteres",
+    "saida_modo", "saida_max_justificativa",
+)
+
+
+def _hash_arquivo(path: str) -> Optional[str]:
+    return hash_pdf(path) if os.path.exists(path) else None
+
+
+def entradas_analise(config: Dict, estado: str, cidade: str, imovel_id: str, backend: str) -> Dict:
+    """Hashes e versões das entradas da análise do imóvel, por entrada (reanalise.py compara uma a uma)"""
+    caminhos = caminhos_imovel(estado, cidade, imovel_id)
+    entradas = {
+        "detalhe": _hash_arquivo(caminhos["html"]),
+        "matricula": _hash_arquivo(caminhos["pdf"]),
+        "opcoes": {k: config.get(k) for k in CONFIG_CHAVE},
+        "edital": config.get("edital_file_id"),
+        "prompt": VERSAO_PROMPT,
+        "scoring": scoring.VERSAO,
+    }
+    if clausulas.modo(config) == "clausulas":
+        # Trechos do edital local no prompt: o conteúdo do PDF e a versão da segmentação
+        entradas["edital"] = {"pdf": _hash_arquivo(config.get("edital_pdf", clausulas.DEFAULT_EDITAL_PDF)),
+                              "clausulas": clausulas.VERSAO}
+    # O modo batch envia as mesmas chamadas do backend responses
+    if backend == "assistants":
+        entradas["modelo"] = {"assistant_id": config.get("assistant_id"),
+                              "vector_store": config.get("edital_vector_store_id")}
+    else:
+        entradas["modelo"] = {"model": config.get("analysis_model", MODEL)}
+    return entradas
+
+
+def chave_analise(config: Dict, estado: str, cidade: str, imovel_id: str, backend: str) -> str:
+    """SHA-256 das entradas da análise do imóvel"""
+    entradas = entradas_analise(config, estado, cidade, imovel_id, backend)
+    return hashlib.sha256(json.dumps(entradas, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """Análises por chave de conteúdo, com estatísticas de acerto"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.stats_path = self.cache_dir / "stats.json"
+        self._lock = threading.Lock()
+
+    def _gravar_json(self, path: Path, dados: Dict):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(dados, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _contar(self, campo: str):
+        with self._lock:
+            stats = self.estatisticas()
+            stats[campo] += 1
+            stats["atualizado_em"] = datetime.now().isoformat()
+            self._gravar_json(self.stats_path, {k: stats[k] for k in ("acertos", "faltas", "atualizado_em")})
+
+    def obter(self, chave: str) -> Optional[Dict]:
+        """Análise armazenada para a chave (ou None); conta acerto/falta"""
+        path = self.cache_dir / f"{chave}.json"
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                analise = json.load(f)["analise"]
+        except (OSError, ValueError, KeyError):
+            self._contar("faltas")
+            return None
+        self._contar("acertos")
+        return analise
+
+    def gravar(self, chave: str, imovel_id: str, analise: Dict, entradas: Optional[Dict] = None):
+        """Grava a análise; com `entradas` (entradas_analise) ela vira a anterior do imóvel (reanalise.py)"""
+        self._gravar_json(self.cache_dir / f"{chave}.json", {
+            "chave": chave,
+            "imovel": imovel_id,
+            "criado_em": datetime.now().isoformat(),
+            "entradas": entradas,
+            "analise": analise,
+        })
+        if entradas is not None:
+            (self.cache_dir / "imoveis").mkdir(parents=True, exist_ok=True)
+            self._gravar_json(self.cache_dir / "imoveis" / f"{imovel_id}.json", {"chave": chave})
+
+    def anterior(self, imovel_id: str) -> Optional[Dict]:
+        """Última entrada gravada do imóvel (chave, entradas e análise), sem contar acerto/falta"""
+        try:
+            with open(self.cache_dir / "imoveis" / f"{imovel_id}.json", "r", encoding="utf-8") as f:
+                chave = json.load(f)["chave"]
+            with open(self.cache_dir / f"{chave}.json", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def estatisticas(self) -> Dict:
+        """Acertos, faltas, taxa de acerto e número de entradas"""
+        stats = {"acertos": 0, "faltas": 0}
+        try:
+            with open(self.stats_path, "r", encoding="utf-8") as f:
+                stats.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        consultas = stats["acertos"] + stats["faltas"]
+        stats["taxa_acerto"] = round(stats["acertos"] / consultas, 3) if consultas else None
+        stats["entradas"] = sum(1 for p in self.cache_dir.glob("*.json") if p != self.stats_path) \
+            if self.cache_dir.exists() else 0
+        return stats
@@ -0,0 +1,298 @@
+"""
+Índice Local de Cláusulas do Edital (BM25)
+==========================================
+
+Com "edital_modo": "clausulas" no config.json, o edital deixa de ir como
+arquivo (Responses API) ou via file_search (assistants): ele é lido uma
+única vez, dividido em cláusulas numeradas (1., 6.2., 13.2.1. ...) e
+indexado localmente com BM25. Para cada critério, as cláusulas mais
+relevantes (regras de IPTU e condomínio, prazos de pagamento, contratação
+e registro...) vão direto na mensagem, antes dos dados do imóvel.
+
+- sem ida e volta do file_search nem indexação na plataforma
+- contexto determinístico: o mesmo edital e o mesmo anúncio levam sempre
+  aos mesmos trechos (e a chave do cache depende deles)
+- entrada bem menor que o edital inteiro
+
+Texto do PDF pelo `pdftotext` do Poppler (o mesmo do OCR); editais
+escaneados, sem camada de texto, passam pelo OCR de ocr.py. As cláusulas
+ficam em data/editais/<sha256 do PDF>.json e o índice é montado em memória
+(milissegundos). Cabeçalhos e rodapés repetidos nas páginas são removidos.
+
+Tokens: minúsculas sem acento, sem stopwords e truncados em 6 letras
+(radical grosseiro: "condomínio" e "condominiais" viram "condom").
+
+Uso:
+    python clausulas.py edital.pdf "prazo para registro da escritura"
+    python clausulas.py edital.pdf --criterios     # trechos que iriam no prompt
+"""
+
+import argparse
+import collections
+import json
+import math
+import os
+import re
+import sys
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from editais import hash_pdf
+from prompts import CRITERIOS
+
+# Muda sempre que a segmentação ou as consultas mudarem (faz parte da chave do cache)
+VERSAO = 1
+
+MODOS = ("arquivo", "clausulas")
+DEFAULT_MODO = "arquivo"
+DEFAULT_EDITAL_PDF = "edital.pdf"
+DEFAULT_DIR = "data/editais"
+DEFAULT_TRECHOS = 3
+DEFAULT_MAX_CARACTERES = 8000
+
+# Tamanho dos blocos do resumo inicial (texto antes da primeira cláusula numerada)
+BLOCO_PREAMBULO = 600
+# Cláusulas maiores (anexos, listas de imóveis) viram partes deste tamanho
+MAX_CLAUSULA = 1500
+
+K1 = 1.5
+B = 0.75
+RADICAL = 6
+
+STOPWORDS = {
+    "a", "ao", "aos", "as", "com", "como", "da", "das", "de", "do", "dos", "e", "em", "entre", "na", "nas",
+    "no", "nos", "o", "os", "ou", "para", "pela", "pelas", "pelo", "pelos", "por", "que", "se", "sem", "sua",
+    "suas", "seu", "seus", "um", "uma", "ser", "sao", "ate", "apos", "este", "esta", "deste", "desta", "caso",
+}
+
+# Consulta de cada critério ao índice
+CONSULTAS = {
+    "Liquidez & Preço de Entrada": "forma de pagamento à vista financiamento FGTS valor mínimo lance proposta comissão leiloeiro",
+    "Situação Registral & Risco Jurídico": "ação judicial ônus gravames matrícula registro evicção desocupação ocupado posse",
+    "Despesas Propter Rem": "débitos IPTU condomínio tributos taxas despesas responsabilidade arrematante limite quitação",
+    "Prazos de Contratação & Registro": "prazo dias pagamento contratação assinatura escritura contrato registro cartório homologação",
+    "Velocidade de Liquidez": "imóvel ocupado desocupação imissão na posse entrega das chaves",
+}
+
+# "6.2. texto", "13. DO PAGAMENTO" (número seguido de ponto e espaço)
+_ITEM = re.compile(r"^(\d{1,2}(?:\.\d{1,2}){0,3})\.(?:\s+\S|$)")
+
+
+def modo(config: Dict) -> str:
+    return config.get("edital_modo", DEFAULT_MODO)
+
+
+def tokens(texto: str) -> List[str]:
+    texto = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii").lower()
+    return [p[:RADICAL] for p in re.findall(r"[a-z0-9]+", texto) if len(p) > 1 and p not in STOPWORDS]
+
+
+def extrair_texto(pdf_path: str, config: Optional[Dict] = None) -> str:
+    """Texto do edital, páginas separadas por \\f (camada de texto; OCR se o PDF for escaneado)"""
+    from ocr import extrair_camada_texto, extrair_texto_pdf
+
+    texto = extrair_camada_texto(pdf_path)
+    if len(texto.strip()) > 200:
+        return texto
+    print(f"[AVISO] {pdf_path} sem camada de texto, usando OCR no edital", file=sys.stderr)
+    config = config or {}
+    return extrair_texto_pdf(pdf_path, engine=config.get("ocr_engine"), lang=config.get("ocr_lang", "eng"),
+                             workers=config.get("ocr_workers", 1), pipeline=config.get("ocr_pipeline"))
+
+
+def _linhas_repetidas(paginas: List[List[str]]) -> set:
+    """Cabeçalhos/rodapés: linhas curtas presentes em boa parte das páginas"""
+    if len(paginas) < 3:
+        return set()
+    contagem = collections.Counter(l for linhas in paginas for l in set(linhas) if len(l) < 100)
+    return {l for l, n in contagem.items() if n >= max(3, len(paginas) // 3)}
+
+
+def segmentar(texto: str) -> List[Dict]:
+    """Cláusulas numeradas do edital: {"id", "secao", "pagina", "texto"}"""
+    paginas = [[" ".join(l.split()) for l in p.splitlines()] for p in texto.split("\f")]
+    paginas = [[l for l in linhas if l] for linhas in paginas]
+    repetidas = _linhas_repetidas(paginas)
+
+    clausulas, preambulo = [], []
+    atual, secao = None, None
+    for pagina, linhas in enumerate(paginas, 1):
+        for linha in linhas:
+            if linha in repetidas or linha.isdigit():
+                continue
+            item = _ITEM.match(linha)
+            if item:
+                if "." not in item.group(1):
+                    secao = linha
+                atual = {"id": item.group(1), "secao": secao, "pagina": pagina, "linhas": [linha]}
+                clausulas.append(atual)
+            elif atual:
+                atual["linhas"].append(linha)
+            else:
+                preambulo.append((pagina, linha))
+
+    # Resumo inicial (datas, prazos, forma de pagamento) em blocos pesquisáveis
+    blocos = []
+    for pagina, linha in preambulo:
+        if not blocos or len(blocos[-1]["texto"]) >= BLOCO_PREAMBULO:
+            blocos.append({"id": f"resumo-{len(blocos) + 1}", "secao": "Resumo", "pagina": pagina, "texto": ""})
+        blocos[-1]["texto"] = f"{blocos[-1]['texto']} {linha}".strip()
+
+    resultado = blocos
+    for c in clausulas:
+        texto_clausula = " ".join(c.pop("linhas"))
+        # Título de seção sem corpo ("6. DO PAGAMENTO"): já vai no campo secao dos itens
+        if c["secao"] == texto_clausula and "." not in c["id"]:
+            continue
+        partes = _partes(texto_clausula)
+        for n, parte in enumerate(partes, 1):
+            resultado.append({**c, "id": c["id"] if len(partes) == 1 else f"{c['id']} (parte {n})", "texto": parte})
+    return resultado
+
+
+def _partes(texto: str) -> List[str]:
+    """Divide um texto longo em partes de até MAX_CLAUSULA caracteres, entre palavras"""
+    partes = []
+    while len(texto) > MAX_CLAUSULA:
+        corte = texto.rfind(" ", 0, MAX_CLAUSULA)
+        corte = corte if corte > 0 else MAX_CLAUSULA
+        partes.append(texto[:corte])
+        texto = texto[corte:].lstrip()
+    return partes + [texto] if texto else partes
+
+
+class IndiceBM25:
+    """Okapi BM25 sobre as cláusulas (título da seção + texto)"""
+
+    def __init__(self, clausulas: List[Dict]):
+        self.clausulas = clausulas
+        self.docs = [collections.Counter(tokens(f"{c.get('secao') or ''} {c['texto']}")) for c in clausulas]
+        self.tamanhos = [sum(d.values()) for d in self.docs]
+        self.media = (sum(self.tamanhos) / len(self.docs)) if self.docs else 0.0
+        self.df = collections.Counter(t for d in self.docs for t in d)
+
+    def idf(self, termo: str) -> float:
+        n = len(self.docs)
+        return math.log(1 + (n - self.df[termo] + 0.5) / (self.df[termo] + 0.5))
+
+    def buscar(self, consulta: str, k: int = DEFAULT_TRECHOS) -> List[Tuple[float, Dict]]:
+        """As k cláusulas de maior pontuação (score > 0)"""
+        termos = set(tokens(consulta))
+        pontos = []
+        for i, doc in enumerate(self.docs):
+            score = 0.0
+            for t in termos:
+                f = doc.get(t)
+                if f:
+                    score += self.idf(t) * f * (K1 + 1) / (f + K1 * (1 - B + B * self.tamanhos[i] / self.media))
+            if score > 0:
+                pontos.append((score, i))
+        pontos.sort(key=lambda p: (-p[0], p[1]))
+        return [(round(s, 3), self.clausulas[i]) for s, i in pontos[:k]]
+
+
+# Índices já montados neste processo, por (caminho, mtime, tamanho)
+_indices: Dict[Tuple, IndiceBM25] = {}
+
+
+def carregar_indice(pdf_path: str, config: Optional[Dict] = None, cache_dir: str = DEFAULT_DIR) -> IndiceBM25:
+    """Índice do edital; as cláusulas são extraídas uma única vez por conteúdo do PDF"""
+    st = os.stat(pdf_path)
+    chave = (os.path.abspath(pdf_path), st.st_mtime, st.st_size)
+    if chave in _indices:
+        return _indices[chave]
+
+    path = Path(cache_dir) / f"{hash_pdf(pdf_path)}.json"
+    clausulas = None
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            dados = json.load(f)
+        if dados.get("versao") == VERSAO:
+            clausulas = dados["clausulas"]
+    if clausulas is None:
+        clausulas = segmentar(extrair_texto(pdf_path, config))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"versao": VERSAO, "pdf": os.path.basename(pdf_path), "clausulas": clausulas},
+                      f, indent=2, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    _indices[chave] = IndiceBM25(clausulas)
+    return _indices[chave]
+
+
+def trechos_relevantes(indice: IndiceBM25, criterios: List[str], k: int = DEFAULT_TRECHOS,
+                       max_caracteres: int = DEFAULT_MAX_CARACTERES) -> List[Dict]:
+    """União das k melhores cláusulas de cada critério, na ordem do edital, até o limite de tamanho"""
+    escolhidas = {}
+    # Rodadas: a melhor de cada critério primeiro, para o limite não cortar um critério inteiro
+    por_criterio = [indice.buscar(CONSULTAS[c], k) for c in criterios if c in CONSULTAS]
+    total = 0
+    for rodada in range(k):
+        for resultados in por_criterio:
+            if rodada >= len(resultados):
+                continue
+            clausula = resultados[rodada][1]
+            chave = id(clausula)
+            if chave in escolhidas or total + len(clausula["texto"]) > max_caracteres:
+                continue
+            escolhidas[chave] = clausula
+            total += len(clausula["texto"])
+    ordem = {id(c): i for i, c in enumerate(indice.clausulas)}
+    return sorted(escolhidas.values(), key=lambda c: ordem[id(c)])
+
+
+def bloco_prompt(trechos: List[Dict]) -> str:
+    """Complemento da mensagem com as cláusulas do edital"""
+    linhas = "\n".join(
+        f"[Edital pág. {c['pagina']}, item {c['id']}] {c['texto']}" for c in trechos
+    )
+    return (
+        "Trechos do edital relevantes para os critérios (o edital não vai anexado; "
+        "cite como \"Edital pág. X, item Y\"):\n"
+        f"{linhas}"
+    )
+
+
+def trechos_edital(config: Dict, criterios: List[str]) -> str:
+    """Bloco com as cláusulas do edital do imóvel para os critérios dados
+
+    Para os mesmos critérios o bloco só depende do edital, então pode abrir a
+    mensagem como prefixo comum a todos os imóveis (cache de prompt).
+    """
+    pdf_path = config.get("edital_pdf", DEFAULT_EDITAL_PDF)
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(f"edital_modo 'clausulas' precisa do PDF local do edital: {pdf_path}")
+    indice = carregar_indice(pdf_path, config)
+    trechos = trechos_relevantes(
+        indice, criterios,
+        k=config.get("edital_trechos", DEFAULT_TRECHOS),
+        max_caracteres=config.get("edital_max_caracteres", DEFAULT_MAX_CARACTERES),
+    )
+    print(f"[EDITAL] {len(trechos)} cláusulas de {len(indice.clausulas)} ({os.path.basename(pdf_path)})", file=sys.stderr)
+    return bloco_prompt(trechos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Busca BM25 nas cláusulas do edital")
+    parser.add_argument("pdf", help="PDF do edital")
+    parser.add_argument("consulta", nargs="?", help="Texto da busca")
+    parser.add_argument("-k", type=int, default=DEFAULT_TRECHOS, help="Cláusulas por busca")
+    parser.add_argument("--criterios", action="store_true", help="Mostra o bloco que iria no prompt")
+    args = parser.parse_args()
+
+    indice = carregar_indice(args.pdf)
+    print(f"{len(indice.clausulas)} cláusulas", file=sys.stderr)
+    if args.criterios:
+        print(bloco_prompt(trechos_relevantes(indice, [nome for nome, _ in CRITERIOS], k=args.k)))
+    elif args.consulta:
+        for score, clausula in indice.buscar(args.consulta, args.k):
+            print(f"{score:7.3f}  pág. {clausula['pagina']} item {clausula['id']}: {clausula['texto'][:300]}")
+    else:
+        parser.error("informe a consulta ou --criterios")
+
+
+if __name__ == "__main__":
+    main()
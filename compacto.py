@@ -0,0 +1,257 @@
+"""
+Saída Compacta da Análise
+=========================
+
+Na análise, o tempo de geração cresce com os tokens de saída, e o JSON
+completo (prompts.py) repete em toda resposta os ~30 campos de "imovel"
+(a maioria "Não informado"), o nome e o peso dos cinco critérios e
+justificativas longas. No modo compacto ("saida_modo": "compacta" no
+config.json) o modelo responde num formato enxuto:
+
+    {"i": ["cond=Residencial Ipê (Fonte: Matrícula R-1)", "qt=2 (Fonte: Anúncio/HTML)"],
+     "c": [{"n": 1, "s": 8, "j": "Deságio de 40%...", "f": ["Anúncio/HTML"]}],
+     "r": [{"d": "Passivo condominial", "f": "Edital pág. 4"}],
+     "p": ["Solicitar certidões", "Confirmar quitação"]}
+
+- "i": só os dados que constam nos documentos, com chaves curtas (CHAVES)
+- "c": critérios pelo número (1 a 5, ordem de prompts.CRITERIOS), sem nome
+  nem peso, justificativa limitada a "saida_max_justificativa" caracteres
+- sem "nota_final": a média ponderada é calculada localmente
+  (scoring.nota_final, que marca a nota incompleta se faltar critério)
+
+`expandir` devolve a estrutura completa ("Não informado" nos campos
+omitidos, nomes, pesos e nota final) que app.py, api.py e automation.py
+consomem; analysis.extrair_json expande as respostas compactas.
+
+Medição da economia em análises já salvas (tokens de saída e tempo de
+geração estimados nos dois formatos):
+    python compacto.py medir data/analysis/*.json --tokens-por-s 60
+"""
+
+import argparse
+import glob
+import json
+import sys
+from typing import Dict, List
+
+import scoring
+from prompts import CRITERIOS, IMOVEL_CAMPOS, INSTRUCTIONS, _objeto
+
+MODOS = ("completa", "compacta")
+DEFAULT_MODO = "completa"
+DEFAULT_MAX_JUSTIFICATIVA = 240
+# Estimativa da resposta compacta para o agendador (a completa usa analysis.DEFAULT_OUTPUT_TOKENS)
+DEFAULT_OUTPUT_TOKENS = 700
+
+NAO_INFORMADO = "Não informado"
+
+# Campo de "imovel" -> chave curta da saída compacta
+CHAVES = {
+    "empreendimento": "emp",
+    "condominio": "cond",
+    "habite_se": "hab",
+    "apartamento": "ap",
+    "bloco": "bl",
+    "area_privativa_m2": "apriv",
+    "area_total_m2": "atot",
+    "quartos": "qt",
+    "vaga_garagem": "vaga",
+    "itens_lazer": "lazer",
+    "matricula": "mat",
+    "oficio": "of",
+    "comarca": "com",
+    "inscricao_imobiliaria": "insc",
+    "forma_titulo": "tit",
+    "laudemio": "laud",
+    "noticia_execucao_extrajudicial": "exec",
+    "decurso_prazo_purga_mora": "purga",
+    "documentos_instrucao": "docs",
+    "codigo_cnib": "cnib",
+    "doi": "doi",
+    "registro": "reg",
+    "sequencial": "seq",
+    "pendencias_judiciais": "pend",
+    "processo_judicial": "proc",
+    "restricoes_disponibilidade": "restr",
+    "quitacao_divida": "quit",
+    "averbacao_leilao_negativo": "lneg",
+    "avaliacao": "aval",
+    "valor_minimo": "vmin",
+    "desconto_percent": "desc",
+    "fonte_principal": "fonte",
+}
+CAMPOS = {curta: campo for campo, curta in CHAVES.items()}
+
+
+def modo(config: Dict) -> str:
+    return config.get("saida_modo", DEFAULT_MODO)
+
+
+def max_justificativa(config: Dict) -> int:
+    return int(config.get("saida_max_justificativa", DEFAULT_MAX_JUSTIFICATIVA))
+
+
+def instrucoes(limite: int = DEFAULT_MAX_JUSTIFICATIVA) -> str:
+    """Instruções de prompts.py com a seção de saída trocada pelo formato compacto"""
+    tarefa = INSTRUCTIONS.split(" Saída obrigatória")[0]
+    chaves = ", ".join(f"{curta} ({campo})" for campo, curta in CHAVES.items())
+    criterios = "; ".join(f"{n} = {nome}" for n, (nome, _) in enumerate(CRITERIOS, 1))
+    return tarefa + f"""Saída obrigatória (formato compacto):
+A resposta final deve ser apenas um JSON compacto, sem espaços nem quebras de linha, nesta estrutura:
+{{"i":["chave=valor (Fonte: …)"],"c":[{{"n":1,"s":0,"j":"","f":[]}}],"r":[{{"d":"","f":""}}],"p":[""]}}
+
+- "i": um item "chave=valor (Fonte: …)" por dado do imóvel que consta nos documentos. Chaves: {chaves}.
+  Omita os dados que não constam (não escreva "Não informado").
+- "c": um item por critério avaliado, pelo número (n): {criterios}. Nota em "s", justificativa em "j"
+  com no máximo {limite} caracteres (frases curtas, sem repetir dados de "i") e fontes abreviadas em "f".
+  Não repita nome nem peso; a nota final é calculada localmente.
+- "r": 2 riscos (descrição "d", fonte "f"). "p": 2 próximos passos.
+
+Regras finais:
+- Português claro e técnico, frases curtas.
+- Sem inferências: o que não constar nos documentos fica fora de "i".
+- Sem links externos.
+- Resposta final deve ser SOMENTE o JSON.
+"""
+
+
+# JSON Schema (modo strict) da saída compacta; o limite da justificativa fica
+# nas instruções (maxLength não é aceito no modo strict)
+SCHEMA = _objeto({
+    "i": {"type": "array", "items": {"type": "string"}},
+    "c": {
+        "type": "array",
+        "items": _objeto({
+            "n": {"type": "integer", "enum": list(range(1, len(CRITERIOS) + 1))},
+            "s": {"type": "number"},
+            "j": {"type": "string"},
+            "f": {"type": "array", "items": {"type": "string"}},
+        }),
+    },
+    "r": {"type": "array", "items": _objeto({"d": {"type": "string"}, "f": {"type": "string"}})},
+    "p": {"type": "array", "items": {"type": "string"}},
+})
+
+
+def e_compacta(analise: Dict) -> bool:
+    return isinstance(analise, dict) and "imovel" not in analise and "c" in analise
+
+
+def expandir(compacta: Dict) -> Dict:
+    """Estrutura completa (prompts.ANALYSIS_SCHEMA) a partir da saída compacta
+
+    Análises que já estão no formato completo voltam sem alteração.
+    """
+    if not e_compacta(compacta):
+        return compacta
+
+    imovel = {campo: NAO_INFORMADO for campo in IMOVEL_CAMPOS}
+    for item in compacta.get("i") or []:
+        chave, _, valor = str(item).partition("=")
+        campo = CAMPOS.get(chave.strip())
+        if campo and valor.strip():
+            imovel[campo] = valor.strip()
+
+    criterios = []
+    for item in compacta.get("c") or []:
+        try:
+            nome, peso = CRITERIOS[int(item["n"]) - 1]
+        except (KeyError, ValueError, TypeError, IndexError):
+            continue
+        criterios.append({"nome": nome, "peso": peso, "nota": item.get("s"),
+                          "justificativa": item.get("j", ""), "fontes": list(item.get("f") or [])})
+    criterios.sort(key=lambda c: [nome for nome, _ in CRITERIOS].index(c["nome"]))
+
+    return {
+        "imovel": imovel,
+        "criterios": criterios,
+        "nota_final": scoring.nota_final(criterios),
+        "riscos": [{"descricao": r.get("d", ""), "fonte": r.get("f", "")} for r in compacta.get("r") or []],
+        "proximos_passos": list(compacta.get("p") or []),
+    }
+
+
+def _curta(texto: str, limite: int) -> str:
+    if len(texto) <= limite:
+        return texto
+    return texto[:limite - 1].rsplit(" ", 1)[0].rstrip(",;:") + "…"
+
+
+def compactar(analise: Dict, limite: int = DEFAULT_MAX_JUSTIFICATIVA) -> Dict:
+    """Saída compacta equivalente a uma análise completa (medição e servidor local)"""
+    numeros = {nome: n for n, (nome, _) in enumerate(CRITERIOS, 1)}
+    locais = set(analise.get("criterios_locais") or [])
+    return {
+        "i": [f"{CHAVES[campo]}={valor}" for campo, valor in (analise.get("imovel") or {}).items()
+              if campo in CHAVES and valor and valor.strip() != NAO_INFORMADO],
+        "c": [{"n": numeros[c["nome"]], "s": c["nota"], "j": _curta(c.get("justificativa", ""), limite),
+               "f": c.get("fontes", [])}
+              for c in analise.get("criterios") or [] if c.get("nome") in numeros and c["nome"] not in locais],
+        "r": [{"d": r.get("descricao", ""), "f": r.get("fonte", "")} for r in analise.get("riscos") or []],
+        "p": list(analise.get("proximos_passos") or []),
+    }
+
+
+def _tokens_saida(analise: Dict) -> int:
+    """Tokens (4 caracteres por token) do JSON como o modelo gera: sem espaços"""
+    return len(json.dumps(analise, ensure_ascii=False, separators=(",", ":"))) // 4
+
+
+def _gerada(analise: Dict) -> Dict:
+    """Parte da análise completa gerada pelo modelo (sem os critérios locais, scoring.py)"""
+    locais = set(analise.get("criterios_locais") or [])
+    gerada = {k: v for k, v in analise.items() if k != "criterios_locais"}
+    gerada["criterios"] = [c for c in analise.get("criterios") or [] if c.get("nome") not in locais]
+    return gerada
+
+
+def medir(analises: List[Dict], limite: int = DEFAULT_MAX_JUSTIFICATIVA, tokens_por_s: float = 60.0) -> Dict:
+    """Tokens de saída (4 caracteres por token) e tempo de geração nos dois formatos"""
+    if not analises:
+        return {"analises": 0}
+    completa = [_tokens_saida(_gerada(a)) for a in analises]
+    compacta = [_tokens_saida(compactar(a, limite)) for a in analises]
+    media_completa = sum(completa) / len(completa)
+    media_compacta = sum(compacta) / len(compacta)
+    return {
+        "analises": len(analises),
+        "tokens_saida_completa": round(media_completa),
+        "tokens_saida_compacta": round(media_compacta),
+        "reducao_percent": round(100 * (1 - media_compacta / media_completa), 1) if media_completa else None,
+        "geracao_completa_s": round(media_completa / tokens_por_s, 2),
+        "geracao_compacta_s": round(media_compacta / tokens_por_s, 2),
+        "geracao_evitada_s": round((media_completa - media_compacta) / tokens_por_s, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Saída compacta da análise")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_medir = sub.add_parser("medir", help="Economia de tokens de saída em análises já salvas")
+    p_medir.add_argument("analises", nargs="+", help="JSONs de análise (ex.: data/analysis/*.json)")
+    p_medir.add_argument("--max-justificativa", type=int, default=DEFAULT_MAX_JUSTIFICATIVA,
+                         help=f"Caracteres por justificativa. Default: {DEFAULT_MAX_JUSTIFICATIVA}")
+    p_medir.add_argument("--tokens-por-s", type=float, default=60.0,
+                         help="Velocidade de geração do modelo. Default: 60")
+
+    sub.add_parser("expandir", help="Converte uma resposta compacta (stdin) para a estrutura completa")
+    args = parser.parse_args()
+
+    if args.comando == "medir":
+        analises = []
+        for padrao in args.analises:
+            for path in sorted(glob.glob(padrao)):
+                if path.endswith("_metrics.json"):
+                    continue
+                with open(path, "r", encoding="utf-8") as f:
+                    analise = json.load(f)
+                if isinstance(analise, dict) and "imovel" in analise:
+                    analises.append(analise)
+        print(json.dumps(medir(analises, args.max_justificativa, args.tokens_por_s), indent=2, ensure_ascii=False))
+    else:
+        print(json.dumps(expandir(json.load(sys.stdin)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Concorrência Adaptativa (AIMD)
+==============================
+
+Concorrência fixa não serve ao mesmo tempo para o site da Caixa lento de
+manhã e rápido à noite, nem para limites da OpenAI que mudam ao longo do
+dia. O controle AIMD ajusta o número de tarefas em andamento pelo que
+observa:
+
+- aumento aditivo: cada conclusão saudável (sem erro e com latência até
+  "aimd_tolerancia_latencia" vezes a latência de base) soma 1/limite, ou
+  seja, +1 no limite a cada "rodada" completa de tarefas
+- corte multiplicativo: um 429, timeout ou erro de conexão/5xx multiplica o
+  limite por "aimd_fator_corte" (default 0,5). Só corta de novo quem foi
+  iniciado uma rodada (latência de base) depois do último corte: uma rajada
+  de erros do mesmo lote, ou das repetições enquanto o lote antigo ainda
+  ocupa o servidor, conta uma vez só
+- latência acima da tolerância segura o limite (não aumenta nem corta)
+
+A latência de base é o p10 das latências saudáveis recentes. Cada etapa tem
+o seu controle, independente: scraping de detalhes (scrape_detail.py,
+"scraping_concorrencia" a "scraping_concorrencia_max") e análises
+(scheduler.py, "analysis_concorrencia" a "analysis_concorrencia_max"). O
+limite atual, os aumentos, os cortes e a evolução do limite saem em
+`relatorio()`, no resultado do automation.py.
+"""
+
+import collections
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+DEFAULT_FATOR_CORTE = 0.5
+DEFAULT_TOLERANCIA_LATENCIA = 2.0
+# Latências consideradas na base e amostras mínimas antes de usá-la
+JANELA_LATENCIA = 100
+MIN_AMOSTRAS_LATENCIA = 5
+# Mudanças do limite guardadas para o relatório
+MAX_HISTORICO = 200
+
+
+class ControleAIMD:
+    """Limite de tarefas em andamento: aumento aditivo, corte multiplicativo"""
+
+    def __init__(self, inicial: int = 1, minimo: int = 1, maximo: int = 4,
+                 fator_corte: float = DEFAULT_FATOR_CORTE,
+                 tolerancia_latencia: float = DEFAULT_TOLERANCIA_LATENCIA,
+                 nome: str = "", log: Callable[[str], None] = print):
+        self.minimo = max(1, minimo)
+        self.maximo = max(self.minimo, maximo)
+        self.fator_corte = fator_corte
+        self.tolerancia_latencia = tolerancia_latencia
+        self.nome = nome
+        self.log = log
+        self._limite = float(min(self.maximo, max(self.minimo, inicial)))
+        self.ultimo_corte = float("-inf")
+        self.latencias = collections.deque(maxlen=JANELA_LATENCIA)
+        self.lock = threading.Lock()
+        self.inicio = time.monotonic()
+        self.stats = {"sucessos": 0, "congestionamentos": 0, "lentas": 0, "aumentos": 0, "cortes": 0,
+                      "pico": self.limite}
+        self.historico = [(0.0, self.limite)]
+
+    @classmethod
+    def de_config(cls, config: Dict, prefixo: str, inicial: int, maximo: Optional[int] = None,
+                  **kwargs) -> "ControleAIMD":
+        """Controle de uma etapa: "<prefixo>_concorrencia_max" e os parâmetros "aimd_*" do config.json"""
+        return cls(
+            inicial=inicial,
+            minimo=int(config.get(f"{prefixo}_concorrencia_min", 1)),
+            maximo=int(maximo or config.get(f"{prefixo}_concorrencia_max", inicial)),
+            fator_corte=float(config.get("aimd_fator_corte", DEFAULT_FATOR_CORTE)),
+            tolerancia_latencia=float(config.get("aimd_tolerancia_latencia", DEFAULT_TOLERANCIA_LATENCIA)),
+            nome=prefixo,
+            **kwargs
+        )
+
+    @property
+    def limite(self) -> int:
+        """Tarefas em andamento permitidas agora"""
+        return int(self._limite)
+
+    def latencia_base(self) -> Optional[float]:
+        if len(self.latencias) < MIN_AMOSTRAS_LATENCIA:
+            return None
+        ordenadas = sorted(self.latencias)
+        return ordenadas[len(ordenadas) // 10]
+
+    def _mudou(self, anterior: int):
+        if self.limite != anterior:
+            self.historico.append((round(time.monotonic() - self.inicio, 1), self.limite))
+            del self.historico[:-MAX_HISTORICO]
+            self.stats["pico"] = max(self.stats["pico"], self.limite)
+
+    def registrar(self, inicio: float, latencia: Optional[float] = None, congestionado: bool = False):
+        """Resultado de uma tarefa iniciada em `inicio` (time.monotonic())
+
+        `congestionado`: 429, timeout ou erro de conexão/5xx. Erros que não
+        indicam sobrecarga (400, 404, página sem o imóvel) não devem ser
+        registrados.
+        """
+        with self.lock:
+            anterior = self.limite
+            if congestionado:
+                self.stats["congestionamentos"] += 1
+                if inicio > self.ultimo_corte + (self.latencia_base() or 0.0):
+                    self._limite = max(float(self.minimo), self._limite * self.fator_corte)
+                    self.ultimo_corte = time.monotonic()
+                    self.stats["cortes"] += 1
+                    self._mudou(anterior)
+                    self.log(f"Concorrência {self.nome}: congestionamento, limite {anterior} -> {self.limite}")
+                return
+
+            self.stats["sucessos"] += 1
+            base = self.latencia_base()
+            if latencia is not None and base is not None and latencia > base * self.tolerancia_latencia:
+                self.stats["lentas"] += 1
+                return
+            if latencia is not None:
+                self.latencias.append(latencia)
+            self._limite = min(float(self.maximo), self._limite + 1.0 / self._limite)
+            if self.limite > anterior:
+                self.stats["aumentos"] += 1
+            self._mudou(anterior)
+
+    def relatorio(self) -> Dict:
+        with self.lock:
+            base = self.latencia_base()
+            duracao = time.monotonic() - self.inicio
+            # Limite médio ponderado pelo tempo em cada valor
+            pontos = self.historico + [(round(duracao, 1), self.limite)]
+            medio = (sum((t2 - t1) * limite for (t1, limite), (t2, _) in zip(pontos, pontos[1:])) / duracao
+                     if duracao > 0 else self.limite)
+            return {
+                "limite_atual": self.limite,
+                "minimo": self.minimo,
+                "maximo": self.maximo,
+                "limite_medio": round(medio, 2),
+                **self.stats,
+                "latencia_base_s": round(base, 3) if base is not None else None,
+                "historico": [list(p) for p in self.historico],
+            }
+
+
+class Vagas:
+    """Semáforo (threads) cujo tamanho acompanha o limite do ControleAIMD"""
+
+    def __init__(self, controle: ControleAIMD):
+        self.controle = controle
+        self.em_uso = 0
+        self.cond = threading.Condition()
+
+    def __enter__(self):
+        with self.cond:
+            self.cond.wait_for(lambda: self.em_uso < self.controle.limite)
+            self.em_uso += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self.cond:
+            self.em_uso -= 1
+            self.cond.notify_all()
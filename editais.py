@@ -0,0 +1,273 @@
+"""
+Registro de Editais
+===================
+
+Cada leilão/modalidade da Caixa tem o seu edital. Em vez de um único
+edital.pdf global, o registro (editais.json, ou a chave "editais_registro"
+do config.json) associa editais a regras por UF, modalidade e número do
+leilão:
+
+    {
+      "arquivos": {"<sha256 do PDF>": {"nome", "caminho", "bytes", "file_id", "vector_store_id", "enviado_em"}},
+      "regras":   [{"uf": "MG", "modalidade": "Leilão SFI", "leilao": null, "sha256": "..."}]
+    }
+
+- cada PDF é enviado uma única vez, identificado pelo SHA-256 do conteúdo:
+  o mesmo arquivo em outra regra (ou registrado de novo) reaproveita o
+  file_id e o vector store já criados, desde que ainda existam na conta
+- a análise de cada imóvel usa o edital da regra mais específica que casa
+  com a UF e com a modalidade/leilão lidos do anúncio (listing.py); sem
+  regra compatível vale o edital global do config.json (edital_file_id).
+  A modalidade casa por igualdade (sem acentos/maiúsculas) ou com um
+  qualificador depois de " - " ("Leilão SFI - Edital Único")
+- no backend assistants o vector store do edital escolhido vai na thread
+  quando não é o do assistente (o do assistente continua disponível na
+  busca; para isolar os editais, crie o assistente sem vector store)
+
+Uso:
+    python editais.py adicionar editais/sfi_mg.pdf --uf MG --modalidade "Leilão SFI"
+    python editais.py adicionar editais/licitacao.pdf --modalidade "Licitação Aberta"
+    python editais.py listar
+    python editais.py resolver 8787705248848     # edital que a análise usaria
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_REGISTRO = "editais.json"
+CAMPOS_REGRA = ("uf", "modalidade", "leilao")
+
+
+def hash_pdf(path: str) -> str:
+    """SHA-256 do conteúdo do arquivo"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _normalizar(texto: Optional[str]) -> Optional[str]:
+    """Maiúsculas, sem acentos nem espaços repetidos ('Leilão  SFI' == 'LEILAO SFI')"""
+    if texto is None:
+        return None
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii")
+    return " ".join(texto.upper().split()) or None
+
+
+def _modalidade_casa(regra: str, imovel: Optional[str]) -> bool:
+    """Modalidade igual à da regra, ou a da regra com um qualificador depois de " - "
+
+    "Leilão SFI" casa com "Leilão SFI - Edital Único"; "Venda Direta" não
+    casa com "Venda Direta Online" (outra modalidade, listing.MODALIDADES).
+    """
+    return imovel is not None and (imovel == regra or imovel.startswith(regra + " - "))
+
+
+class RegistroEditais:
+    """Editais enviados (por hash) e regras UF/modalidade/leilão -> edital"""
+
+    def __init__(self, path: str = DEFAULT_REGISTRO, log: Callable[[str], None] = print):
+        self.path = Path(path)
+        self.log = log
+        self.dados = {"arquivos": {}, "regras": []}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.dados.update(json.load(f))
+
+    @classmethod
+    def de_config(cls, config: Dict, **kwargs) -> "RegistroEditais":
+        return cls(config.get("editais_registro", DEFAULT_REGISTRO), **kwargs)
+
+    def salvar(self):
+        tmp = self.path.with_name(f"{self.path.name}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.dados, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    @property
+    def arquivos(self) -> Dict[str, Dict]:
+        return self.dados["arquivos"]
+
+    @property
+    def regras(self) -> List[Dict]:
+        return self.dados["regras"]
+
+    def enviar(self, client, pdf_path: str) -> str:
+        """Envia o PDF se o conteúdo ainda não estiver na conta; retorna o sha256"""
+        sha = hash_pdf(pdf_path)
+        arquivo = self.arquivos.get(sha)
+        if arquivo and arquivo.get("file_id"):
+            try:
+                client.files.retrieve(arquivo["file_id"])
+                self.log(f"Edital {Path(pdf_path).name} já enviado: {arquivo['file_id']}")
+                if arquivo.get("caminho") != str(pdf_path):
+                    arquivo["caminho"] = str(pdf_path)
+                    self.salvar()
+                return sha
+            except Exception:
+                self.log(f"File {arquivo['file_id']} não existe mais, reenviando {Path(pdf_path).name}")
+                arquivo.pop("vector_store_id", None)
+
+        with open(pdf_path, "rb") as f:
+            enviado = client.files.create(file=f, purpose="assistants")
+        self.arquivos[sha] = {
+            "nome": Path(pdf_path).name,
+            # PDF local, lido pelo índice de cláusulas (clausulas.py)
+            "caminho": str(pdf_path),
+            "bytes": os.path.getsize(pdf_path),
+            "file_id": enviado.id,
+            "enviado_em": datetime.now().isoformat(),
+        }
+        self.salvar()
+        self.log(f"Edital {Path(pdf_path).name} enviado: {enviado.id}")
+        return sha
+
+    def indexar(self, client, sha: str) -> str:
+        """Vector store próprio do edital (criado e indexado uma única vez)"""
+        arquivo = self.arquivos[sha]
+        if arquivo.get("vector_store_id"):
+            try:
+                client.vector_stores.retrieve(arquivo["vector_store_id"])
+                return arquivo["vector_store_id"]
+            except Exception:
+                self.log(f"Vector store {arquivo['vector_store_id']} não encontrado, criando outro")
+
+        vector_store = client.vector_stores.create(name=f"Leilão Bot - {arquivo['nome']}")
+        indexado = client.vector_stores.files.create_and_poll(
+            vector_store_id=vector_store.id, file_id=arquivo["file_id"]
+        )
+        if indexado.status != "completed":
+            raise RuntimeError(f"Falha ao indexar {arquivo['nome']}: {indexado.status} {indexado.last_error}")
+        arquivo["vector_store_id"] = vector_store.id
+        self.salvar()
+        self.log(f"Edital {arquivo['nome']} indexado: {vector_store.id}")
+        return vector_store.id
+
+    def adicionar(self, client, pdf_path: str, uf: Optional[str] = None, modalidade: Optional[str] = None,
+                  leilao: Optional[str] = None, indexar: bool = True) -> Dict:
+        """Registra o edital para a regra (substitui o edital de uma regra idêntica)"""
+        sha = self.enviar(client, pdf_path)
+        if indexar:
+            self.indexar(client, sha)
+
+        regra = {"uf": uf.upper() if uf else None, "modalidade": modalidade, "leilao": leilao, "sha256": sha}
+        chave = [_normalizar(regra[c]) for c in CAMPOS_REGRA]
+        self.dados["regras"] = [r for r in self.regras if [_normalizar(r.get(c)) for c in CAMPOS_REGRA] != chave]
+        self.regras.append(regra)
+        self.salvar()
+        return regra
+
+    def resolver(self, uf: Optional[str], modalidade: Optional[str] = None,
+                 leilao: Optional[str] = None) -> Optional[Dict]:
+        """Arquivo da regra mais específica que casa com o imóvel (ou None)"""
+        imovel = {"uf": _normalizar(uf), "modalidade": _normalizar(modalidade), "leilao": _normalizar(leilao)}
+        melhor, pontos = None, -1
+        for regra in self.regras:
+            campos = [c for c in CAMPOS_REGRA if regra.get(c)]
+            if any(not _modalidade_casa(_normalizar(regra[c]), imovel[c]) if c == "modalidade"
+                   else _normalizar(regra[c]) != imovel[c] for c in campos):
+                continue
+            # Empate: a regra registrada por último vence
+            if len(campos) >= pontos and regra["sha256"] in self.arquivos:
+                melhor, pontos = regra, len(campos)
+        return {**self.arquivos[melhor["sha256"]], "sha256": melhor["sha256"]} if melhor else None
+
+
+def dados_edital(estado: str, cidade: str, imovel_id: str) -> Dict:
+    """UF, modalidade e leilão do imóvel, lidos do HTML de detalhe"""
+    from analysis import caminhos_imovel
+    from listing import extrair_dados
+
+    dados = {"uf": estado, "modalidade": None, "leilao": None}
+    html_path = caminhos_imovel(estado, cidade, imovel_id)["html"]
+    if os.path.exists(html_path):
+        with open(html_path, "r", encoding="utf-8") as f:
+            anuncio = extrair_dados(f.read())
+        dados.update(modalidade=anuncio.get("modalidade"), leilao=anuncio.get("leilao"))
+    return dados
+
+
+def config_imovel(config: Dict, estado: str, cidade: str, imovel_id: str,
+                  registro: Optional[RegistroEditais] = None) -> Dict:
+    """config.json com o edital (file_id e vector store) que vale para o imóvel
+
+    Sem registro ou sem regra compatível, retorna o próprio config (edital
+    global). A chave do cache (cache.py) usa o edital resolvido.
+    """
+    if registro is None:
+        if not Path(config.get("editais_registro", DEFAULT_REGISTRO)).exists():
+            return config
+        registro = RegistroEditais.de_config(config)
+    edital = registro.resolver(**dados_edital(estado, cidade, imovel_id))
+    if edital is None or edital["file_id"] == config.get("edital_file_id"):
+        return config
+
+    resolvido = {**config, "edital_file_id": edital["file_id"], "edital_nome": edital["nome"]}
+    if edital.get("caminho"):
+        resolvido["edital_pdf"] = edital["caminho"]
+    if edital.get("vector_store_id"):
+        resolvido["edital_vector_store_id"] = edital["vector_store_id"]
+        # O assistente foi criado com o vector store do edital global
+        resolvido["edital_na_thread"] = edital["vector_store_id"] != config.get("edital_vector_store_id")
+    else:
+        resolvido.pop("edital_vector_store_id", None)
+    return resolvido
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registro de editais por UF, modalidade e leilão")
+    parser.add_argument("--registro", default=None, help=f"Arquivo do registro (default: {DEFAULT_REGISTRO})")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_add = sub.add_parser("adicionar", help="Envia (se preciso) e associa um edital a uma regra")
+    p_add.add_argument("pdf")
+    p_add.add_argument("--uf", help="UF do imóvel (ex.: MG)")
+    p_add.add_argument("--modalidade", help='Modalidade de venda (ex.: "Leilão SFI", "Licitação Aberta")')
+    p_add.add_argument("--leilao", help="Número do edital/leilão (ex.: 0001/2025)")
+    p_add.add_argument("--sem-indice", action="store_true",
+                       help="Não cria vector store (só o backend responses usará o edital)")
+
+    sub.add_parser("listar", help="Mostra editais enviados e regras")
+
+    p_res = sub.add_parser("resolver", help="Edital usado na análise de um imóvel (estado/cidade do config.json)")
+    p_res.add_argument("imovel")
+    args = parser.parse_args()
+
+    config = {}
+    if Path("config.json").exists():
+        with open("config.json", "r") as f:
+            config = json.load(f)
+    if args.registro:
+        config["editais_registro"] = args.registro
+    registro = RegistroEditais.de_config(config, log=lambda msg: print(msg, file=sys.stderr))
+
+    if args.comando == "adicionar":
+        from dotenv import load_dotenv
+        from openai import OpenAI
+        from resilience import Resiliencia, cliente_resiliente
+        load_dotenv()
+        client = cliente_resiliente(OpenAI(api_key=os.getenv("OPENAI_API_KEY")), Resiliencia.de_config(config))
+        regra = registro.adicionar(client, args.pdf, uf=args.uf, modalidade=args.modalidade,
+                                   leilao=args.leilao, indexar=not args.sem_indice)
+        print(json.dumps({"regra": regra, "arquivo": registro.arquivos[regra["sha256"]]},
+                         indent=2, ensure_ascii=False))
+    elif args.comando == "listar":
+        print(json.dumps(registro.dados, indent=2, ensure_ascii=False))
+    else:
+        dados = dados_edital(config["estado"], config["cidade"], args.imovel)
+        edital = registro.resolver(**dados)
+        print(json.dumps({"imovel": args.imovel, **dados,
+                          "edital": edital or {"file_id": config.get("edital_file_id"), "nome": "global"}},
+                         indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
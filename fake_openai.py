@@ -0,0 +1,996 @@
+"""
+Servidor Local Compatível com a API da OpenAI (testes e benchmarks)
+===================================================================
+
+Implementa localmente o subconjunto da API usado pelo projeto, para rodar
+query.py, automation.py, setup_openai.py e create_assistent.py sem custo e
+sem chave de API (OPENAI_BASE_URL=http://127.0.0.1:8089/v1):
+
+- GET  /v1/models
+- POST /v1/files, GET /v1/files/{id}, GET /v1/files/{id}/content
+- POST /v1/vector_stores, GET /v1/vector_stores/{id},
+  GET|POST /v1/vector_stores/{id}/files, GET|DELETE /v1/vector_stores/{id}/files/{file_id}
+- POST /v1/assistants, GET|POST /v1/assistants/{id}
+- POST /v1/threads, GET|POST /v1/threads/{id}/messages
+- POST /v1/threads/{id}/runs (com ou sem stream), GET /v1/threads/{id}/runs/{run_id},
+  POST /v1/threads/{id}/runs/{run_id}/cancel
+- POST /v1/chat/completions, POST /v1/responses (com ou sem stream)
+- POST /v1/batches, GET /v1/batches/{id}, POST /v1/batches/{id}/cancel
+- GET /v1/_stats (contabilidade do servidor), POST /v1/_stats/reset
+
+Respostas: a análise é fictícia mas segue o esquema de prompts.py (nota
+determinística pelo conteúdo), ou o formato compacto (compacto.py) quando as
+instruções da chamada ou do run pedem, também em chat/completions (backends
+chat e local de backends.py: o servidor faz o papel do modelo local); o
+resumo da matrícula e a triagem recebem JSONs no formato esperado.
+
+Perfil de latência (lognormal: mediana * exp(sigma * N(0,1))):
+- --latencia-api: endpoints leves (arquivos, threads, assistentes)
+- --ttft e --tokens-por-s: tempo até o primeiro token e velocidade de
+  geração nas chamadas ao modelo
+- --indexacao: atraso extra quando o edital vem anexado à mensagem (vector
+  store criado por thread)
+- --busca: atraso extra da ida e volta do file_search nos runs com vector
+  store (do assistente ou da thread) e a ferramenta habilitada
+- --taxa-lenta / --fator-lento: fração das chamadas ao modelo que demoram
+  `fator` vezes mais (cauda de latência, para testar o hedging de hedge.py)
+
+--taxa-json-invalido: fração das análises com JSON defeituoso (validacao.py):
+metade com o tipo errado logo na primeira chave, metade entre cercas de
+markdown, sem o "}" final e com vírgula sobrando (reparável). Contam em
+"json_invalido" na contabilidade.
+
+Streams abandonados pelo cliente (hedging, cancelamento) contam em
+"abandonados" na contabilidade.
+
+Tokens: entrada ~ caracteres/4 da requisição + --tokens-arquivo por arquivo
+referenciado (um quarto disso em buscas no vector store do assistente);
+saída ~ caracteres/4 do texto gerado.
+
+Cache de prompt (responses e chat/completions, como na API): o prefixo
+idêntico a uma requisição anterior, a partir de 1024 tokens e em blocos de
+128, volta em cached_tokens e reduz o tempo até o primeiro token.
+
+Erros: --taxa-429 / --taxa-500 nas chamadas ao modelo (429 com
+Retry-After), --rpm limita requisições por minuto ao modelo, --capacidade
+limita as gerações simultâneas de chat/completions e responses (429 acima
+dela, para testar a concorrência adaptativa de concorrencia.py) e
+--taxa-erro faz linhas do batch falharem.
+
+Uso:
+    python fake_openai.py --porta 8089 --ttft 0.8 --tokens-por-s 80 --taxa-429 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=sk-fake python query.py
+"""
+
+import argparse
+import collections
+import hashlib
+import json
+import math
+import random
+import re
+import signal
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import compacto
+from prompts import CRITERIOS, IMOVEL_CAMPOS, MODEL
+
+DEFAULT_PORTA = 8089
+
+# Cache de prompt: prefixos idênticos a partir de 1024 tokens, em blocos de 128
+CACHE_MIN_TOKENS = 1024
+CACHE_BLOCO_TOKENS = 128
+CACHE_MAX_PREFIXOS = 500000
+# Fração do TTFT economizada quando toda a entrada vem do cache
+CACHE_GANHO_TTFT = 0.5
+
+
+def _id(prefixo: str) -> str:
+    return f"{prefixo}_{uuid.uuid4().hex[:24]}"
+
+
+def _tokens(texto: str) -> int:
+    return max(1, len(texto) // 4)
+
+
+def analise_ficticia(seed: str, excluir: Optional[set] = None) -> Dict:
+    """Análise no formato do esquema, com notas pseudoaleatórias estáveis por `seed`"""
+    rng = random.Random(hashlib.sha256(seed.encode()).hexdigest())
+    criterios = [
+        {"nome": nome, "peso": peso, "nota": rng.randint(3, 10),
+         "justificativa": " ".join(["Análise fictícia do servidor local, com o tamanho de uma justificativa"
+                                    " de 2 a 4 linhas."] * 4),
+         "fontes": ["Anúncio/HTML", "Edital pág. 3"]}
+        for nome, peso in CRITERIOS
+        if nome not in (excluir or set())
+    ]
+    # Cerca de metade dos dados consta nos documentos
+    imovel = {campo: "Valor fictício (Fonte: Anúncio/HTML)" if rng.random() < 0.5 else "Não informado"
+              for campo in IMOVEL_CAMPOS}
+    return {
+        "imovel": imovel,
+        "criterios": criterios,
+        "nota_final": {
+            "metodo": "media_ponderada",
+            "valor": round(sum(c["nota"] * c["peso"] for c in criterios), 1),
+        },
+        "riscos": [{"descricao": "Risco fictício", "fonte": "Anúncio/HTML"}] * 2,
+        "proximos_passos": ["Solicitar certidões", "Confirmar quitação"],
+    }
+
+
+def texto_analise(entrada: str, instrucoes: str = "") -> str:
+    """JSON da análise para a mensagem do usuário (respeita critérios calculados localmente)
+
+    Com as instruções do formato compacto, responde no formato de compacto.py;
+    com as de pacote (pacote.py), uma análise por imóvel entre os marcadores;
+    com as de reanálise parcial (reanalise.py), só as chaves e critérios pedidos.
+    """
+    if "Reanálise parcial" in (instrucoes or ""):
+        base, parcial = instrucoes.split("Reanálise parcial", 1)
+        analise = json.loads(texto_analise(entrada, base))
+        chaves = re.findall(r'"(\w+)"', re.search(r"somente com as chaves: (.*)", parcial).group(1))
+        pedidos = re.search(r"Critérios a avaliar: (.*?)\. Não inclua", parcial).group(1).split("; ")
+        numeros = {n for n, (nome, _) in enumerate(CRITERIOS, 1) if nome in pedidos}
+        for chave in ("criterios", "c"):
+            if chave in analise:
+                analise[chave] = [c for c in analise[chave] if c.get("nome") in pedidos or c.get("n") in numeros]
+        return json.dumps({chave: analise[chave] for chave in chaves if chave in analise}, ensure_ascii=False)
+    if "Análise em pacote" in (instrucoes or ""):
+        blocos = re.split(r"^=== IMÓVEL (\S+) ===$", entrada, flags=re.MULTILINE)
+        analises = [{"id": imovel_id, **json.loads(texto_analise(bloco, instrucoes.split("Análise em pacote")[0]))}
+                    for imovel_id, bloco in zip(blocos[1::2], blocos[2::2])]
+        return json.dumps({"analises": analises}, ensure_ascii=False)
+    excluir = set()
+    if "Critérios já calculados localmente" in entrada:
+        excluir = set(re.findall(r"^- (.+?) \(peso", entrada, re.MULTILINE))
+    analise = analise_ficticia(entrada, excluir)
+    compacta = re.search(r"formato compacto.*?no máximo (\d+) caracteres", instrucoes or "", re.DOTALL)
+    if compacta:
+        return json.dumps(compacto.compactar(analise, int(compacta.group(1))), ensure_ascii=False,
+                          separators=(",", ":"))
+    return json.dumps(analise, ensure_ascii=False)
+
+
+def texto_chat(sistema: str, usuario: str) -> str:
+    """Resposta JSON dos prompts auxiliares (triagem e extração da matrícula)"""
+    rng = random.Random(hashlib.sha256(usuario.encode()).hexdigest())
+    if "triagem" in sistema.lower():
+        return json.dumps({"nota": round(rng.uniform(2, 10), 1), "motivo": "Triagem fictícia do servidor local."})
+    if "matrícula" in sistema.lower():
+        return json.dumps({
+            "registros": [{"ato": f"R-{rng.randint(1, 9)}", "data": "01/01/2020", "natureza": "Compra e venda",
+                           "descricao": "Registro fictício"}],
+            "onus": [], "cancelamentos": [], "datas": [],
+        }, ensure_ascii=False)
+    return "{}"
+
+
+def _prompt_responses(params: Dict, tokens_arquivo: int) -> str:
+    """Texto equivalente ao prompt da Responses API, na ordem em que o modelo o recebe
+
+    Arquivos entram como um marcador do tamanho dos seus tokens, então o
+    mesmo edital no mesmo lugar conta como prefixo repetido.
+    """
+    partes = [params.get("model") or "", params.get("instructions") or "",
+              json.dumps(params.get("text") or {}, sort_keys=True)]
+    entrada = params.get("input")
+    if isinstance(entrada, str):
+        partes.append(entrada)
+    for item in entrada if isinstance(entrada, list) else []:
+        conteudo = item.get("content") if isinstance(item, dict) else None
+        if isinstance(conteudo, str):
+            partes.append(conteudo)
+        for parte in conteudo if isinstance(conteudo, list) else []:
+            if parte.get("type") == "input_text":
+                partes.append(parte.get("text", ""))
+            elif parte.get("type") == "input_file":
+                marcador = f"<arquivo {parte.get('file_id')}>"
+                partes.append(marcador * (tokens_arquivo * 4 // len(marcador) + 1))
+    return "\n".join(partes)
+
+
+def resposta_ficticia(custom_id: str, body: Dict, tokens_arquivo: int = 0) -> Dict:
+    """Objeto de resposta da Responses API (linhas do batch)"""
+    texto = texto_analise(_texto_input(body.get("input")) or custom_id, body.get("instructions"))
+    arquivos = json.dumps(body.get("input")).count('"input_file"')
+    entrada = _tokens(json.dumps(body, ensure_ascii=False)) + arquivos * tokens_arquivo
+    return _objeto_response(body.get("model", MODEL), texto, entrada)
+
+
+def _texto_input(entrada) -> str:
+    """Texto das partes input_text (ou a string) do campo input da Responses API"""
+    if isinstance(entrada, str):
+        return entrada
+    partes = []
+    for item in entrada or []:
+        conteudo = item.get("content") if isinstance(item, dict) else None
+        if isinstance(conteudo, str):
+            partes.append(conteudo)
+        for parte in conteudo if isinstance(conteudo, list) else []:
+            if parte.get("type") == "input_text":
+                partes.append(parte.get("text", ""))
+    return "\n".join(partes)
+
+
+def _texto_mensagem(conteudo) -> str:
+    """Texto de uma mensagem da Chat Completions (string ou lista de partes "text")"""
+    if isinstance(conteudo, list):
+        return "\n".join(p.get("text", "") for p in conteudo if isinstance(p, dict) and p.get("type") == "text")
+    return str(conteudo or "")
+
+
+def _objeto_response(model: str, texto: str, entrada: int, cache: int = 0) -> Dict:
+    saida = _tokens(texto)
+    return {
+        "id": _id("resp"), "object": "response", "created_at": int(time.time()), "status": "completed",
+        "model": model, "error": None, "incomplete_details": None, "instructions": None, "metadata": {},
+        "parallel_tool_calls": True, "temperature": 1.0, "tool_choice": "auto", "tools": [], "top_p": 1.0,
+        "output": [{
+            "type": "message", "id": _id("msg"), "role": "assistant", "status": "completed",
+            "content": [{"type": "output_text", "text": texto, "annotations": []}],
+        }],
+        "usage": {"input_tokens": entrada, "output_tokens": saida, "total_tokens": entrada + saida,
+                  "input_tokens_details": {"cached_tokens": cache},
+                  "output_tokens_details": {"reasoning_tokens": 0}},
+    }
+
+
+class Perfil:
+    """Distribuições de latência, tokens e erros do servidor"""
+
+    def __init__(self, latencia_api: float = 0.02, ttft: float = 0.5, sigma: float = 0.3,
+                 tokens_por_s: float = 200.0, indexacao: float = 0.0, busca: float = 0.0,
+                 tokens_arquivo: int = 15000,
+                 taxa_429: float = 0.0, taxa_500: float = 0.0, retry_after: float = 1.0,
+                 rpm: Optional[int] = None, duracao: float = 5.0, taxa_erro: float = 0.0,
+                 taxa_lenta: float = 0.0, fator_lento: float = 5.0, capacidade: Optional[int] = None,
+                 taxa_json_invalido: float = 0.0):
+        self.latencia_api = latencia_api
+        self.ttft = ttft
+        self.sigma = sigma
+        self.tokens_por_s = tokens_por_s
+        self.indexacao = indexacao
+        self.busca = busca
+        self.tokens_arquivo = tokens_arquivo
+        self.taxa_429 = taxa_429
+        self.taxa_500 = taxa_500
+        self.retry_after = retry_after
+        self.rpm = rpm
+        self.duracao = duracao
+        self.taxa_erro = taxa_erro
+        self.taxa_lenta = taxa_lenta
+        self.fator_lento = fator_lento
+        self.capacidade = capacidade
+        self.taxa_json_invalido = taxa_json_invalido
+
+    def amostra(self, mediana: float) -> float:
+        if mediana <= 0:
+            return 0.0
+        return mediana * math.exp(self.sigma * random.gauss(0, 1))
+
+
+class ErroHTTP(Exception):
+    def __init__(self, status: int, mensagem: str, tipo: str = "invalid_request_error",
+                 headers: Optional[Dict[str, str]] = None):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+        self.tipo = tipo
+        self.headers = headers or {}
+
+
+class FakeOpenAI:
+    """Estado do servidor (em memória) e contabilidade por rota"""
+
+    def __init__(self, perfil: Optional[Perfil] = None):
+        self.perfil = perfil or Perfil()
+        self.arquivos: Dict[str, Dict] = {}
+        self.batches: Dict[str, Dict] = {}
+        self.assistants: Dict[str, Dict] = {}
+        self.vector_stores: Dict[str, Dict] = {}
+        self.threads: Dict[str, Dict] = {}
+        self.runs: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+        self._janela_rpm = collections.deque()
+        self.em_geracao = 0
+        self._prefixos = set()
+        self.reset_stats()
+
+    # Contabilidade ---------------------------------------------------------
+
+    def reset_stats(self):
+        with self.lock:
+            self.inicio = time.time()
+            self.por_rota = collections.defaultdict(lambda: {
+                "requisicoes": 0, "erros_429": 0, "erros_500": 0,
+                "tokens_entrada": 0, "tokens_cache": 0, "tokens_saida": 0, "latencia_total_s": 0.0,
+                "abandonados": 0, "json_invalido": 0,
+            })
+
+    def contabilizar(self, rota: str, latencia: float = 0.0, entrada: int = 0, saida: int = 0, erro: int = 0,
+                     cache: int = 0, abandonado: bool = False):
+        with self.lock:
+            r = self.por_rota[rota]
+            r["requisicoes"] += 1
+            r["abandonados"] += int(abandonado)
+            r["latencia_total_s"] += latencia
+            r["tokens_entrada"] += entrada
+            r["tokens_cache"] += cache
+            r["tokens_saida"] += saida
+            if erro in (429, 500):
+                r[f"erros_{erro}"] += 1
+
+    def stats(self) -> Dict:
+        with self.lock:
+            rotas = {}
+            for rota, r in self.por_rota.items():
+                rotas[rota] = dict(r, latencia_media_s=round(r["latencia_total_s"] / r["requisicoes"], 3)
+                                   if r["requisicoes"] else None)
+                rotas[rota]["latencia_total_s"] = round(r["latencia_total_s"], 3)
+            total = {k: sum(r[k] for r in self.por_rota.values())
+                     for k in ("requisicoes", "erros_429", "erros_500", "tokens_entrada", "tokens_cache",
+                               "tokens_saida", "abandonados", "json_invalido")}
+        total["duracao_s"] = round(time.time() - self.inicio, 1)
+        return {"total": total, "rotas": rotas}
+
+    # Modelo ----------------------------------------------------------------
+
+    def admitir_modelo(self, rota: str):
+        """Limite de rpm e de gerações simultâneas e erros injetados nas chamadas ao modelo"""
+        p = self.perfil
+        agora = time.time()
+        if p.capacidade and self.em_geracao > p.capacidade:
+            self._erro_429(rota, p.retry_after)
+        if p.rpm:
+            with self.lock:
+                while self._janela_rpm and agora - self._janela_rpm[0] > 60:
+                    self._janela_rpm.popleft()
+                excedeu = len(self._janela_rpm) >= p.rpm
+                if not excedeu:
+                    self._janela_rpm.append(agora)
+            if excedeu:
+                espera = 60 - (agora - self._janela_rpm[0])
+                self._erro_429(rota, espera)
+        if random.random() < p.taxa_429:
+            self._erro_429(rota, p.retry_after)
+        if random.random() < p.taxa_500:
+            self.contabilizar(rota, erro=500)
+            raise ErroHTTP(500, "Erro injetado pelo servidor local", "server_error")
+
+    def _erro_429(self, rota: str, espera: float):
+        self.contabilizar(rota, erro=429)
+        raise ErroHTTP(429, "Rate limit (servidor local)", "rate_limit_error", {
+            "retry-after": str(max(1, math.ceil(espera))),
+            "retry-after-ms": str(int(espera * 1000)),
+        })
+
+    def corromper(self, rota: str, texto: str) -> str:
+        """JSON da análise com defeito, na fração --taxa-json-invalido das respostas"""
+        if random.random() >= self.perfil.taxa_json_invalido:
+            return texto
+        with self.lock:
+            self.por_rota[rota]["json_invalido"] += 1
+        if random.random() < 0.5:
+            # Objeto da primeira chave vira string: erro de estrutura nos primeiros caracteres
+            posicao = texto.index(":") + 1
+            return texto[:posicao] + '"' + texto[posicao:]
+        return "```json\n" + texto.rstrip()[:-1] + ",\n```"
+
+    def tokens_em_cache(self, prompt: str, entrada: int) -> int:
+        """Tokens do maior prefixo já visto (blocos de 128, mínimo 1024); registra os prefixos do prompt"""
+        bloco = CACHE_BLOCO_TOKENS * 4
+        h = hashlib.sha256()
+        repetido = 0
+        with self.lock:
+            if len(self._prefixos) > CACHE_MAX_PREFIXOS:
+                self._prefixos.clear()
+            for n in range(len(prompt) // bloco):
+                h.update(prompt[n * bloco:(n + 1) * bloco].encode("utf-8"))
+                chave = h.digest()
+                if chave in self._prefixos:
+                    repetido = (n + 1) * bloco
+                else:
+                    self._prefixos.add(chave)
+        # Proporção do prompt repetida, aplicada aos tokens de entrada contados
+        cache = int(entrada * repetido / len(prompt)) // CACHE_BLOCO_TOKENS * CACHE_BLOCO_TOKENS if prompt else 0
+        return cache if cache >= CACHE_MIN_TOKENS else 0
+
+    def tempo_geracao(self, saida: int, anexos: int = 0, busca: bool = False,
+                      fracao_cache: float = 0.0) -> Tuple[float, float]:
+        """(atraso até o primeiro token, duração da geração)"""
+        p = self.perfil
+        ttft = p.amostra(p.ttft) * (1 - CACHE_GANHO_TTFT * fracao_cache)
+        ttft += (p.amostra(p.indexacao) if anexos else 0.0) + (p.amostra(p.busca) if busca else 0.0)
+        geracao = saida / p.tokens_por_s if p.tokens_por_s else 0.0
+        if p.taxa_lenta and random.random() < p.taxa_lenta:
+            # Cauda: servidor sobrecarregado, a chamada inteira fica mais lenta
+            return ttft * p.fator_lento, geracao * p.fator_lento
+        return ttft, geracao
+
+    # Arquivos e vector stores ---------------------------------------------------
+
+    def novo_arquivo(self, conteudo: bytes, filename: str, purpose: str) -> Dict:
+        meta = {
+            "id": f"file-{uuid.uuid4().hex[:24]}", "object": "file", "bytes": len(conteudo),
+            "created_at": int(time.time()), "filename": filename, "purpose": purpose, "status": "processed",
+        }
+        with self.lock:
+            self.arquivos[meta["id"]] = {"meta": meta, "conteudo": conteudo}
+        return meta
+
+    def novo_vector_store(self, params: Dict) -> Dict:
+        vs = {
+            "id": _id("vs"), "object": "vector_store", "created_at": int(time.time()),
+            "name": params.get("name", ""), "metadata": params.get("metadata") or {}, "status": "completed",
+            "usage_bytes": 0, "last_active_at": int(time.time()), "expires_after": None, "expires_at": None,
+            "file_counts": {"in_progress": 0, "completed": 0, "failed": 0, "cancelled": 0, "total": 0},
+            "_arquivos": {},
+        }
+        self.vector_stores[vs["id"]] = vs
+        for file_id in params.get("file_ids") or []:
+            self.indexar(vs["id"], file_id)
+        return vs
+
+    def indexar(self, vs_id: str, file_id: str) -> Dict:
+        vs = self.vector_stores[vs_id]
+        arquivo = self.arquivos[file_id]["meta"]
+        item = {
+            "id": file_id, "object": "vector_store.file", "created_at": int(time.time()),
+            "vector_store_id": vs_id, "status": "completed", "usage_bytes": arquivo["bytes"], "last_error": None,
+        }
+        vs["_arquivos"][file_id] = item
+        self._recontar(vs)
+        return item
+
+    def _recontar(self, vs: Dict):
+        n = len(vs["_arquivos"])
+        vs["file_counts"].update(completed=n, total=n)
+        vs["usage_bytes"] = sum(f["usage_bytes"] for f in vs["_arquivos"].values())
+
+    # Batches ---------------------------------------------------------------
+
+    def criar_batch(self, params: Dict) -> Dict:
+        if params.get("input_file_id") not in self.arquivos:
+            raise ErroHTTP(404, f"Arquivo não encontrado: {params.get('input_file_id')}")
+        linhas = self.arquivos[params["input_file_id"]]["conteudo"].decode("utf-8").splitlines()
+        batch = {
+            "id": _id("batch"), "object": "batch", "endpoint": params.get("endpoint"),
+            "input_file_id": params["input_file_id"], "completion_window": params.get("completion_window"),
+            "status": "validating", "created_at": int(time.time()), "metadata": params.get("metadata"),
+            "output_file_id": None, "error_file_id": None, "errors": None,
+            "request_counts": {"total": sum(1 for l in linhas if l.strip()), "completed": 0, "failed": 0},
+        }
+        with self.lock:
+            self.batches[batch["id"]] = batch
+        return batch
+
+    def consultar_batch(self, batch_id: str) -> Dict:
+        """Avança o batch conforme o tempo decorrido desde a criação"""
+        batch = self.batches[batch_id]
+        if batch["status"] in ("completed", "cancelled"):
+            return batch
+        decorrido = time.time() - batch["created_at"]
+        if decorrido < self.perfil.duracao:
+            batch["status"] = "validating" if decorrido < 1 else "in_progress"
+        else:
+            self._processar_batch(batch)
+        return batch
+
+    def _processar_batch(self, batch: Dict):
+        rng = random.Random(batch["id"])
+        saida, erros = [], []
+        for linha in self.arquivos[batch["input_file_id"]]["conteudo"].decode("utf-8").splitlines():
+            if not linha.strip():
+                continue
+            req = json.loads(linha)
+            item = {"id": _id("batch_req"), "custom_id": req["custom_id"], "response": None, "error": None}
+            if rng.random() < self.perfil.taxa_erro:
+                item["error"] = {"code": "server_error", "message": "Erro injetado pelo servidor local"}
+                erros.append(item)
+            else:
+                body = resposta_ficticia(req["custom_id"], req.get("body", {}), self.perfil.tokens_arquivo)
+                item["response"] = {"status_code": 200, "request_id": uuid.uuid4().hex, "body": body}
+                self.contabilizar("POST /v1/batches (linhas)", entrada=body["usage"]["input_tokens"],
+                                  saida=body["usage"]["output_tokens"])
+                saida.append(item)
+
+        def jsonl(itens):
+            return "".join(json.dumps(i, ensure_ascii=False) + "\n" for i in itens).encode("utf-8")
+
+        if saida:
+            batch["output_file_id"] = self.novo_arquivo(jsonl(saida), "batch_output.jsonl", "batch_output")["id"]
+        if erros:
+            batch["error_file_id"] = self.novo_arquivo(jsonl(erros), "batch_errors.jsonl", "batch_output")["id"]
+        batch["request_counts"].update(completed=len(saida), failed=len(erros))
+        batch["status"] = "completed"
+        batch["completed_at"] = int(time.time())
+
+    # Assistants ------------------------------------------------------------
+
+    def novo_assistant(self, params: Dict) -> Dict:
+        assistant = {
+            "id": _id("asst"), "object": "assistant", "created_at": int(time.time()),
+            "name": params.get("name"), "description": params.get("description"),
+            "model": params.get("model", MODEL), "instructions": params.get("instructions"),
+            "tools": params.get("tools") or [], "tool_resources": params.get("tool_resources") or {},
+            "metadata": params.get("metadata") or {}, "temperature": 1.0, "top_p": 1.0, "response_format": "auto",
+        }
+        self.assistants[assistant["id"]] = assistant
+        return assistant
+
+    def nova_mensagem(self, thread_id: str, role: str, texto: str, attachments=None,
+                      run_id: Optional[str] = None, assistant_id: Optional[str] = None) -> Dict:
+        mensagem = {
+            "id": _id("msg"), "object": "thread.message", "created_at": int(time.time()),
+            "thread_id": thread_id, "role": role, "status": "completed",
+            "content": [{"type": "text", "text": {"value": texto, "annotations": []}}],
+            "assistant_id": assistant_id, "run_id": run_id, "attachments": attachments or [],
+            "metadata": {}, "completed_at": int(time.time()), "incomplete_at": None, "incomplete_details": None,
+        }
+        self.threads[thread_id]["_mensagens"].append(mensagem)
+        return mensagem
+
+    def novo_run(self, thread_id: str, params: Dict, rota: str = "runs") -> Dict:
+        assistant = self.assistants.get(params.get("assistant_id")) or {}
+        run = {
+            "id": _id("run"), "object": "thread.run", "created_at": int(time.time()),
+            "thread_id": thread_id, "assistant_id": params.get("assistant_id"), "status": "queued",
+            "required_action": None, "last_error": None, "expires_at": None, "started_at": None,
+            "cancelled_at": None, "failed_at": None, "completed_at": None,
+            "model": params.get("model") or assistant.get("model", MODEL),
+            "instructions": params.get("instructions") or assistant.get("instructions") or "",
+            "tools": params["tools"] if params.get("tools") is not None else assistant.get("tools", []),
+            "metadata": {}, "incomplete_details": None, "usage": None, "temperature": 1.0, "top_p": 1.0,
+            "max_prompt_tokens": None, "max_completion_tokens": None,
+            "truncation_strategy": {"type": "auto", "last_messages": None}, "response_format": "auto",
+            "tool_choice": "auto", "parallel_tool_calls": True,
+        }
+        mensagens = self.threads[thread_id]["_mensagens"]
+        entrada_texto = "\n".join(m["content"][0]["text"]["value"] for m in mensagens if m["role"] == "user")
+        anexos = sum(len(m.get("attachments") or []) for m in mensagens)
+        recursos = [assistant.get("tool_resources") or {}, self.threads[thread_id].get("tool_resources") or {}]
+        busca = any(t.get("type") == "file_search" for t in run["tools"]) and any(
+            (r.get("file_search") or {}).get("vector_store_ids") for r in recursos)
+        texto = self.corromper(rota, texto_analise(entrada_texto, run["instructions"]))
+        entrada = (_tokens(run["instructions"] + entrada_texto) + anexos * self.perfil.tokens_arquivo
+                   + (self.perfil.tokens_arquivo // 4 if busca else 0))
+        saida = _tokens(texto)
+        ttft, geracao = self.tempo_geracao(saida, anexos, busca)
+        run["_fake"] = {"texto": texto, "entrada": entrada, "saida": saida, "ttft": ttft, "geracao": geracao,
+                        "inicio": time.time()}
+        run["usage"] = {"prompt_tokens": entrada, "completion_tokens": saida, "total_tokens": entrada + saida}
+        self.runs[run["id"]] = run
+        return run
+
+    def consultar_run(self, run_id: str) -> Dict:
+        """Run sem stream: conclui quando o tempo de geração passa"""
+        run = self.runs[run_id]
+        fake = run["_fake"]
+        if run["status"] not in ("completed", "failed", "cancelled"):
+            decorrido = time.time() - fake["inicio"]
+            if decorrido >= fake["ttft"] + fake["geracao"]:
+                self.nova_mensagem(run["thread_id"], "assistant", fake["texto"], run_id=run["id"],
+                                   assistant_id=run["assistant_id"])
+                run.update(status="completed", completed_at=int(time.time()))
+            else:
+                run.update(status="in_progress", started_at=run["started_at"] or int(fake["inicio"]))
+        return run
+
+
+def _publico(objeto: Dict) -> Dict:
+    """Remove os campos internos (prefixo _)"""
+    return {k: v for k, v in objeto.items() if not k.startswith("_")}
+
+
+def criar_handler(api: FakeOpenAI):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def handle(self):
+            # Clientes que abandonam a conexão (fim de stream, timeout) não são erro do servidor
+            try:
+                super().handle()
+            except (ConnectionResetError, BrokenPipeError):
+                pass
+
+        # Utilitários -------------------------------------------------------
+
+        def _responder(self, status: int, corpo, content_type: str = "application/json",
+                       headers: Optional[Dict[str, str]] = None):
+            dados = corpo if isinstance(corpo, bytes) else json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(dados)))
+            for nome, valor in (headers or {}).items():
+                self.send_header(nome, valor)
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def _corpo(self) -> bytes:
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        def _json(self) -> Dict:
+            corpo = self._corpo()
+            return json.loads(corpo) if corpo else {}
+
+        def _evento(self, nome: Optional[str], dados):
+            """Bloco SSE (chunked); sem nome, só a linha data (formato da Chat Completions)"""
+            texto = dados if isinstance(dados, str) else json.dumps(dados, ensure_ascii=False)
+            bloco = (f"event: {nome}\n" if nome else "") + f"data: {texto}\n\n"
+            bloco = bloco.encode("utf-8")
+            self.wfile.write(f"{len(bloco):x}\r\n".encode() + bloco + b"\r\n")
+            self.wfile.flush()
+
+        def _dormir(self, segundos: float):
+            if segundos > 0:
+                time.sleep(segundos)
+
+        def _rota(self, metodo: str) -> str:
+            """Rota sem ids (para a contabilidade)"""
+            caminho = self.path.split("?")[0]
+            caminho = re.sub(r"/(file|vs|asst|thread|msg|run|batch|resp)[-_][A-Za-z0-9]+", r"/{\1}", caminho)
+            return f"{metodo} {caminho}"
+
+        def _despachar(self, metodo: str):
+            rota = self._rota(metodo)
+            inicio = time.perf_counter()
+            try:
+                resultado = self._executar(metodo, self.path.split("?")[0].strip("/").split("/"), rota)
+                if resultado is not None:
+                    self._dormir(api.perfil.amostra(api.perfil.latencia_api))
+                    self._responder(200, resultado)
+                    if "_stats" not in rota:
+                        api.contabilizar(rota, time.perf_counter() - inicio)
+            except ErroHTTP as e:
+                self._responder(e.status, {"error": {"message": e.mensagem, "type": e.tipo, "code": None}},
+                                headers=e.headers)
+            except KeyError as e:
+                self._responder(404, {"error": {"message": f"Não encontrado: {e}", "type": "invalid_request_error"}})
+
+        def do_GET(self):
+            self._despachar("GET")
+
+        def do_POST(self):
+            self._despachar("POST")
+
+        def do_DELETE(self):
+            self._despachar("DELETE")
+
+        # Rotas -------------------------------------------------------------
+
+        def _executar(self, metodo: str, p: List[str], rota: str):
+            if p[0] != "v1":
+                raise ErroHTTP(404, f"Rota não suportada: {self.path}")
+            p = p[1:]
+            n = len(p)
+
+            if p == ["_stats"] and metodo == "GET":
+                return api.stats()
+            if p == ["_stats", "reset"] and metodo == "POST":
+                api.reset_stats()
+                return {"ok": True}
+            if p == ["models"]:
+                return {"object": "list", "data": [{"id": MODEL, "object": "model", "created": 0, "owned_by": "local"}]}
+
+            # Arquivos
+            if p[0] == "files":
+                if n == 1 and metodo == "POST":
+                    return self._upload()
+                if n == 2:
+                    return api.arquivos[p[1]]["meta"]
+                if n == 3 and p[2] == "content":
+                    self._responder(200, api.arquivos[p[1]]["conteudo"], "application/octet-stream")
+                    api.contabilizar(rota)
+                    return None
+
+            # Vector stores
+            if p[0] == "vector_stores":
+                if n == 1 and metodo == "POST":
+                    return _publico(api.novo_vector_store(self._json()))
+                vs = api.vector_stores[p[1]]
+                if n == 2:
+                    return _publico(vs)
+                if n == 3 and p[2] == "files":
+                    if metodo == "POST":
+                        return api.indexar(vs["id"], self._json()["file_id"])
+                    return {"object": "list", "data": list(vs["_arquivos"].values()), "has_more": False,
+                            "first_id": None, "last_id": None}
+                if n == 4 and p[2] == "files":
+                    if metodo == "DELETE":
+                        vs["_arquivos"].pop(p[3])
+                        api._recontar(vs)
+                        return {"id": p[3], "object": "vector_store.file.deleted", "deleted": True}
+                    return vs["_arquivos"][p[3]]
+
+            # Assistants
+            if p[0] == "assistants":
+                if n == 1 and metodo == "POST":
+                    return api.novo_assistant(self._json())
+                assistant = api.assistants[p[1]]
+                if metodo == "POST":
+                    assistant.update({k: v for k, v in self._json().items() if k in assistant})
+                return assistant
+
+            # Threads, mensagens e runs
+            if p[0] == "threads":
+                if n == 1 and metodo == "POST":
+                    params = self._json()
+                    thread = {"id": _id("thread"), "object": "thread", "created_at": int(time.time()),
+                              "metadata": params.get("metadata") or {},
+                              "tool_resources": params.get("tool_resources"), "_mensagens": []}
+                    api.threads[thread["id"]] = thread
+                    return _publico(thread)
+                thread = api.threads[p[1]]
+                if n == 3 and p[2] == "messages":
+                    if metodo == "POST":
+                        params = self._json()
+                        conteudo = params.get("content")
+                        texto = conteudo if isinstance(conteudo, str) else " ".join(
+                            c.get("text", "") for c in conteudo or [] if isinstance(c, dict))
+                        return api.nova_mensagem(thread["id"], params.get("role", "user"), texto,
+                                                 params.get("attachments"))
+                    mensagens = list(reversed(thread["_mensagens"]))
+                    return {"object": "list", "data": mensagens, "has_more": False,
+                            "first_id": mensagens[0]["id"] if mensagens else None,
+                            "last_id": mensagens[-1]["id"] if mensagens else None}
+                if n == 3 and p[2] == "runs" and metodo == "POST":
+                    params = self._json()
+                    api.admitir_modelo(rota)
+                    run = api.novo_run(thread["id"], params, rota)
+                    if params.get("stream"):
+                        self._stream_run(run, rota)
+                        return None
+                    return _publico(run)
+                if n == 4 and p[2] == "runs":
+                    return _publico(api.consultar_run(p[3]))
+                if n == 5 and p[2] == "runs" and p[4] == "cancel" and metodo == "POST":
+                    run = api.runs[p[3]]
+                    if run["status"] not in ("completed", "failed", "cancelled"):
+                        run.update(status="cancelled", cancelled_at=int(time.time()))
+                    return _publico(run)
+
+            # Modelo
+            if p == ["chat", "completions"] and metodo == "POST":
+                return self._gerar(self._chat, rota)
+            if p == ["responses"] and metodo == "POST":
+                return self._gerar(self._responses, rota)
+
+            # Batches
+            if p[0] == "batches":
+                if n == 1 and metodo == "POST":
+                    return api.criar_batch(self._json())
+                if n == 2:
+                    return api.consultar_batch(p[1])
+                if n == 3 and p[2] == "cancel":
+                    batch = api.consultar_batch(p[1])
+                    if batch["status"] != "completed":
+                        batch["status"] = "cancelled"
+                    return batch
+
+            raise ErroHTTP(404, f"Rota não suportada: {metodo} {self.path}")
+
+        def _upload(self) -> Dict:
+            """multipart/form-data: campos "purpose" e "file" """
+            mensagem = BytesParser(policy=HTTP).parsebytes(
+                b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + self._corpo()
+            )
+            campos = {p.get_param("name", header="content-disposition"): p for p in mensagem.iter_parts()}
+            arquivo = campos["file"]
+            return api.novo_arquivo(arquivo.get_payload(decode=True), arquivo.get_filename() or "upload",
+                                    campos["purpose"].get_content().strip())
+
+        def _gerar(self, chamada, rota: str) -> None:
+            """Chamada ao modelo contada entre as gerações simultâneas (--capacidade)"""
+            with api.lock:
+                api.em_geracao += 1
+            try:
+                return chamada(rota)
+            finally:
+                with api.lock:
+                    api.em_geracao -= 1
+
+        def _chat(self, rota: str) -> None:
+            inicio = time.perf_counter()
+            params = self._json()
+            api.admitir_modelo(rota)
+            mensagens = params.get("messages", [])
+            sistema = " ".join(_texto_mensagem(m.get("content")) for m in mensagens if m.get("role") == "system")
+            usuario = " ".join(_texto_mensagem(m.get("content")) for m in mensagens if m.get("role") == "user")
+            arquivos = json.dumps(mensagens).count('"type": "file"')
+            if "Analise um edital" in sistema:
+                # Análise pelos backends chat e local (backends.py)
+                texto = api.corromper(rota, texto_analise(usuario, sistema))
+            else:
+                texto = texto_chat(sistema, usuario)
+            entrada, saida = _tokens(sistema + usuario) + arquivos * api.perfil.tokens_arquivo, _tokens(texto)
+            marcadores = "<arquivo>" * (arquivos * api.perfil.tokens_arquivo * 4 // len("<arquivo>"))
+            cache = api.tokens_em_cache(f"{params.get('model')}\n{sistema}\n{marcadores}{usuario}", entrada)
+            ttft, geracao = api.tempo_geracao(saida, fracao_cache=cache / entrada)
+            uso = {"prompt_tokens": entrada, "completion_tokens": saida, "total_tokens": entrada + saida,
+                   "prompt_tokens_details": {"cached_tokens": cache}}
+            base = {"id": _id("chatcmpl"), "created": int(time.time()), "model": params.get("model", MODEL)}
+            if params.get("stream"):
+                def pedaco(delta, fim=None, usage=None):
+                    escolhas = [] if usage else [{"index": 0, "delta": delta, "finish_reason": fim, "logprobs": None}]
+                    return None, dict(base, object="chat.completion.chunk", choices=escolhas, usage=usage)
+                fim = [pedaco({}, "stop")]
+                if (params.get("stream_options") or {}).get("include_usage"):
+                    fim.append(pedaco({}, usage=uso))
+                eventos = {
+                    "inicio": [pedaco({"role": "assistant", "content": ""})],
+                    "delta": lambda parte: pedaco({"content": parte}),
+                    "fim": fim + [(None, "[DONE]")],
+                }
+                abandonado = self._stream_texto(texto, ttft, geracao, eventos)
+            else:
+                self._dormir(ttft + geracao)
+                self._responder(200, dict(base, object="chat.completion", usage=uso, choices=[
+                    {"index": 0, "message": {"role": "assistant", "content": texto, "refusal": None},
+                     "finish_reason": "stop", "logprobs": None}]))
+                abandonado = False
+            api.contabilizar(rota, time.perf_counter() - inicio, entrada, saida, cache=cache, abandonado=abandonado)
+
+        def _responses(self, rota: str) -> None:
+            inicio = time.perf_counter()
+            params = self._json()
+            api.admitir_modelo(rota)
+            entrada_texto = _texto_input(params.get("input"))
+            arquivos = json.dumps(params.get("input")).count('"input_file"')
+            texto = api.corromper(rota, texto_analise(entrada_texto, params.get("instructions")))
+            entrada = _tokens((params.get("instructions") or "") + entrada_texto) + arquivos * api.perfil.tokens_arquivo
+            cache = api.tokens_em_cache(_prompt_responses(params, api.perfil.tokens_arquivo), entrada)
+            resposta = _objeto_response(params.get("model", MODEL), texto, entrada, cache)
+            ttft, geracao = api.tempo_geracao(resposta["usage"]["output_tokens"], fracao_cache=cache / entrada)
+            if params.get("stream"):
+                inicial = dict(resposta, status="in_progress", output=[], usage=None)
+                eventos = {
+                    "inicio": [("response.created", {"type": "response.created", "response": inicial})],
+                    "delta": lambda pedaco: ("response.output_text.delta", {
+                        "type": "response.output_text.delta", "item_id": resposta["output"][0]["id"],
+                        "output_index": 0, "content_index": 0, "delta": pedaco}),
+                    "fim": [("response.completed", {"type": "response.completed", "response": resposta})],
+                }
+                abandonado = self._stream_texto(texto, ttft, geracao, eventos)
+            else:
+                self._dormir(ttft + geracao)
+                self._responder(200, resposta)
+                abandonado = False
+            api.contabilizar(rota, time.perf_counter() - inicio, entrada, resposta["usage"]["output_tokens"],
+                             cache=cache, abandonado=abandonado)
+
+        def _stream_texto(self, texto: str, ttft: float, geracao: float, eventos: Dict) -> bool:
+            """Resposta em SSE: eventos iniciais, deltas do texto na velocidade do perfil e eventos finais
+
+            Retorna True se o cliente abandonou o stream no meio (hedging, cancelamento).
+            """
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for nome, dados in eventos["inicio"]:
+                    self._evento(nome, dados)
+                self._dormir(ttft)
+                pedacos = max(1, min(50, len(texto) // 40))
+                tamanho = math.ceil(len(texto) / pedacos)
+                for i in range(0, len(texto), tamanho):
+                    self._dormir(geracao / pedacos)
+                    self._evento(*eventos["delta"](texto[i:i + tamanho]))
+                for nome, dados in eventos["fim"]:
+                    self._evento(nome, dados)
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+                return False
+            except (ConnectionResetError, BrokenPipeError):
+                return True
+
+        def _stream_run(self, run: Dict, rota: str):
+            """Run em streaming (SSE): deltas do texto na velocidade do perfil"""
+            inicio = time.perf_counter()
+            fake = run["_fake"]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            msg = {
+                "id": _id("msg"), "object": "thread.message", "created_at": int(time.time()),
+                "thread_id": run["thread_id"], "role": "assistant", "content": [],
+                "assistant_id": run["assistant_id"], "run_id": run["id"], "attachments": [], "metadata": {},
+                "status": "in_progress", "completed_at": None, "incomplete_at": None, "incomplete_details": None,
+            }
+            try:
+                self._evento("thread.run.created", _publico(run))
+                self._evento("thread.run.queued", _publico(run))
+                self._dormir(fake["ttft"])
+                run.update(status="in_progress", started_at=int(time.time()))
+                self._evento("thread.run.in_progress", _publico(run))
+                self._evento("thread.message.created", msg)
+
+                texto = fake["texto"]
+                pedacos = max(1, min(50, len(texto) // 40))
+                tamanho = math.ceil(len(texto) / pedacos)
+                for i in range(0, len(texto), tamanho):
+                    self._dormir(fake["geracao"] / pedacos)
+                    self._evento("thread.message.delta", {
+                        "id": msg["id"], "object": "thread.message.delta",
+                        "delta": {"content": [{"index": 0, "type": "text",
+                                               "text": {"value": texto[i:i + tamanho], "annotations": []}}]},
+                    })
+
+                final = api.nova_mensagem(run["thread_id"], "assistant", texto, run_id=run["id"],
+                                          assistant_id=run["assistant_id"])
+                self._evento("thread.message.completed", dict(final, id=msg["id"]))
+                run.update(status="completed", completed_at=int(time.time()))
+                self._evento("thread.run.completed", _publico(run))
+                self._evento("done", "[DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+            finally:
+                # Tokens cobrados mesmo se o cliente abandonar o stream
+                api.contabilizar(rota, time.perf_counter() - inicio, fake["entrada"], fake["saida"])
+
+    return Handler
+
+
+def iniciar(porta: int = DEFAULT_PORTA, **perfil) -> ThreadingHTTPServer:
+    """Sobe o servidor numa thread (porta 0 = livre); `.api` dá acesso ao estado e `.shutdown()` para"""
+    api = FakeOpenAI(Perfil(**perfil))
+    servidor = ThreadingHTTPServer(("127.0.0.1", porta), criar_handler(api))
+    servidor.daemon_threads = True
+    servidor.api = api
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def main():
+    """Função principal para linha de comando"""
+    parser = argparse.ArgumentParser(description="Servidor local compatível com a API da OpenAI (testes e benchmarks)")
+    parser.add_argument("--porta", type=int, default=DEFAULT_PORTA, help=f"Porta HTTP. Default: {DEFAULT_PORTA}")
+    parser.add_argument("--latencia-api", type=float, default=0.02, help="Mediana (s) dos endpoints leves")
+    parser.add_argument("--ttft", type=float, default=0.5, help="Mediana (s) até o primeiro token")
+    parser.add_argument("--sigma", type=float, default=0.3, help="Dispersão lognormal das latências")
+    parser.add_argument("--tokens-por-s", type=float, default=200.0, help="Velocidade de geração")
+    parser.add_argument("--indexacao", type=float, default=0.0, help="Mediana (s) extra com edital anexado à mensagem")
+    parser.add_argument("--busca", type=float, default=0.0, help="Mediana (s) extra do file_search nos runs")
+    parser.add_argument("--tokens-arquivo", type=int, default=15000, help="Tokens de entrada por arquivo referenciado")
+    parser.add_argument("--taxa-429", type=float, default=0.0, help="Fração de chamadas ao modelo com 429")
+    parser.add_argument("--taxa-500", type=float, default=0.0, help="Fração de chamadas ao modelo com 500")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After (s) dos 429 injetados")
+    parser.add_argument("--rpm", type=int, help="Limite de requisições por minuto ao modelo")
+    parser.add_argument("--duracao", type=float, default=5.0, help="Segundos até um batch concluir")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de linhas do batch com erro")
+    parser.add_argument("--taxa-lenta", type=float, default=0.0, help="Fração das chamadas ao modelo mais lentas")
+    parser.add_argument("--fator-lento", type=float, default=5.0, help="Quantas vezes mais lentas. Default: 5")
+    parser.add_argument("--capacidade", type=int, help="Gerações simultâneas (chat/responses) antes dos 429")
+    parser.add_argument("--taxa-json-invalido", type=float, default=0.0, help="Fração das análises com JSON defeituoso")
+    args = parser.parse_args()
+
+    perfil = {k: v for k, v in vars(args).items() if k != "porta"}
+    servidor = iniciar(args.porta, **perfil)
+    print(f"Servidor local em http://127.0.0.1:{servidor.server_port}/v1 (Ctrl+C para parar)", flush=True)
+
+    def parar(*_):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, parar)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(json.dumps(servidor.api.stats(), indent=2, ensure_ascii=False))
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
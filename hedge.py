@@ -0,0 +1,176 @@
+"""
+Hedging das Análises (cauda de latência)
+========================================
+
+A maioria das análises termina perto da mediana, mas algumas ficam presas
+em servidores sobrecarregados e levam várias vezes mais. Com hedging, se a
+chamada ao modelo não terminou até o percentil configurado das latências
+já observadas, uma cópia idêntica é enviada; vale a resposta que chegar
+primeiro e a outra é cancelada (stream fechado; no backend assistants o run
+também é cancelado na API).
+
+- "hedge_percentil": percentil das latências (total_s) a partir do qual a
+  cópia sai (ex.: 95). Sem a chave o hedging fica desligado
+- "hedge_minimo_s": limiar mínimo em segundos (default 10), para não
+  duplicar análises rápidas quando o histórico é curto ou muito homogêneo
+- "hedge_min_amostras": latências necessárias antes de começar (default 20);
+  o histórico sai de data/analysis/*_metrics.json do mesmo backend e cresce
+  com as análises da execução
+
+Cada cópia custa uma análise a mais (os tokens de entrada já processados e
+a saída gerada até o cancelamento são cobrados) e não passa pelos limites
+de rpm/tpm do agendador (scheduler.py): com percentil 95, cerca de 5% das
+análises são duplicadas. As métricas de cada análise trazem hedge_emitido,
+hedge_venceu (a cópia respondeu primeiro) e hedge_limiar_s; `relatorio()`
+e usage.agregar somam cópias emitidas e vencedoras.
+
+Uso:
+    python query.py --hedge-percentil 95
+    python automation.py --estado MG --cidade UBERLANDIA --hedge-percentil 95
+    python benchmark.py carga --taxa-lenta 0.1 --hedge-percentil 90
+"""
+
+import collections
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import usage
+
+DEFAULT_MINIMO_S = 10.0
+DEFAULT_MIN_AMOSTRAS = 20
+# Latências mais recentes consideradas no percentil
+JANELA = 200
+
+
+class Hedge:
+    """Cópia da chamada ao modelo quando ela passa do percentil das latências observadas"""
+
+    def __init__(self, percentil: Optional[float] = None, minimo_s: float = DEFAULT_MINIMO_S,
+                 min_amostras: int = DEFAULT_MIN_AMOSTRAS, historico: Iterable[float] = (),
+                 log: Callable[[str], None] = print):
+        self.percentil = percentil
+        self.minimo_s = minimo_s
+        self.min_amostras = min_amostras
+        self.log = log
+        self.latencias = collections.deque((float(s) for s in historico), maxlen=JANELA)
+        self.lock = threading.Lock()
+        self.stats = {"analises": 0, "emitidos": 0, "vencidos": 0}
+
+    @classmethod
+    def de_config(cls, config: Dict, backend: str, analysis_dir: str = "data/analysis",
+                  **kwargs) -> "Hedge":
+        """Hedge do config.json, com o histórico de latências do backend"""
+        percentil = config.get("hedge_percentil")
+        historico = []
+        if percentil:
+            historico = [r["total_s"] for r in usage.carregar(analysis_dir)
+                         if r.get("backend") == backend and r.get("total_s") is not None and not r.get("pacote")]
+        return cls(
+            percentil=percentil,
+            minimo_s=float(config.get("hedge_minimo_s", DEFAULT_MINIMO_S)),
+            min_amostras=int(config.get("hedge_min_amostras", DEFAULT_MIN_AMOSTRAS)),
+            historico=historico[-JANELA:],
+            **kwargs
+        )
+
+    @property
+    def ativo(self) -> bool:
+        return bool(self.percentil)
+
+    def limiar(self) -> Optional[float]:
+        """Segundos até a cópia (None: desligado ou histórico insuficiente)"""
+        with self.lock:
+            if not self.ativo or len(self.latencias) < self.min_amostras:
+                return None
+            ordenadas = sorted(self.latencias)
+        indice = min(len(ordenadas) - 1, int(self.percentil / 100 * len(ordenadas)))
+        return max(self.minimo_s, ordenadas[indice])
+
+    def observar(self, total_s: Optional[float]):
+        """Latência de uma chamada concluída (entra no percentil)"""
+        if total_s is not None:
+            with self.lock:
+                self.latencias.append(float(total_s))
+
+    def _contar(self, campo: str):
+        with self.lock:
+            self.stats[campo] += 1
+
+    def executar(self, funcao: Callable[[Dict, Optional[threading.Event], bool], List[str]],
+                 metricas: Optional[Dict] = None) -> List[str]:
+        """Executa `funcao(metricas, cancelado, copia)` com hedging
+
+        `cancelado` é sinalizado na tentativa que perdeu, que deve desistir
+        assim que puder (analysis.AnaliseCancelada). Se uma das tentativas
+        falhar, espera a outra; o erro só sobe se as duas falharem. As
+        métricas da tentativa vencedora vão para `metricas`.
+        """
+        self._contar("analises")
+        limiar = self.limiar()
+        if limiar is None:
+            parcial = {}
+            textos = funcao(parcial, None, False)
+            self.observar(parcial.get("total_s"))
+            if metricas is not None:
+                metricas.update(parcial, hedge_emitido=False)
+            return textos
+
+        resultados = queue.Queue()
+        tentativas = []
+
+        def disparar(copia: bool):
+            parcial, cancelado = {}, threading.Event()
+            tentativas.append((parcial, cancelado))
+            indice = len(tentativas) - 1
+
+            def alvo():
+                try:
+                    resultados.put((indice, funcao(parcial, cancelado, copia), None))
+                except Exception as exc:
+                    resultados.put((indice, None, exc))
+
+            threading.Thread(target=alvo, name=f"hedge-{indice}", daemon=True).start()
+
+        inicio = time.perf_counter()
+        disparar(False)
+        try:
+            vencedora, textos, erro = resultados.get(timeout=limiar)
+        except queue.Empty:
+            self._contar("emitidos")
+            self.log(f"Hedge: análise passou de {limiar:.1f}s (p{self.percentil:g}), enviando cópia")
+            disparar(True)
+            vencedora, textos, erro = resultados.get()
+            if erro is not None:
+                self.log(f"Hedge: tentativa {vencedora} falhou ({erro}), aguardando a outra")
+                vencedora, textos, erro = resultados.get()
+        if erro is not None:
+            raise erro
+
+        for indice, (_, cancelado) in enumerate(tentativas):
+            if indice != vencedora:
+                cancelado.set()
+        if vencedora > 0:
+            self._contar("vencidos")
+
+        parcial = tentativas[vencedora][0]
+        # Tempo percebido, desde o envio da primeira tentativa: com a cópia vencendo, a latência
+        # dela sozinha puxaria o percentil para baixo e o hedge dispararia cada vez mais cedo
+        percebido = time.perf_counter() - inicio
+        self.observar(percebido)
+        if metricas is not None:
+            metricas.update(parcial, hedge_emitido=len(tentativas) > 1, hedge_venceu=vencedora > 0,
+                            hedge_limiar_s=round(limiar, 3))
+            metricas["total_s"] = round(percebido, 3)
+        return textos
+
+    def relatorio(self) -> Dict:
+        with self.lock:
+            stats = dict(self.stats)
+        limiar = self.limiar()
+        return {
+            **stats,
+            "taxa_emitidos": round(stats["emitidos"] / stats["analises"], 3) if stats["analises"] else None,
+            "limiar_s": round(limiar, 3) if limiar is not None else None,
+        }
@@ -0,0 +1,92 @@
+"""
+Dados Estruturados do Anúncio
+=============================
+
+Extrai do HTML de detalhe (página da Caixa salva pelo scrape_detail.py) os
+campos quantitativos do anúncio, sem IA:
+
+- valor_avaliacao, valor_minimo (R$) e desconto_percent
+- tipo (Apartamento, Casa, Terreno...), quartos, vagas
+- area_privativa_m2, area_total_m2, area_terreno_m2
+- financiamento / fgts (formas de pagamento aceitas)
+- ocupado (True/False/None quando o anúncio não informa)
+- modalidade (Leilão SFI, Licitação Aberta, Venda Online...) e leilao
+  (número do edital), usados para escolher o edital (editais.py)
+
+Campos ausentes ficam None. Usado pela triagem (screening.py), pelas notas
+locais (scoring.py) e pelo registro de editais (editais.py).
+"""
+
+import re
+import unicodedata
+from typing import Dict, Optional
+
+from bs4 import BeautifulSoup
+
+# Modalidades de venda da Caixa, da mais específica para a mais genérica
+MODALIDADES = (
+    "Leilão SFI - Edital Único", "Leilão SFI", "Licitação Aberta", "Licitação Fechada",
+    "Venda Direta Online", "Venda Online", "Venda Direta",
+)
+
+
+def _numero(texto: str) -> Optional[float]:
+    """'1.234.567,89' -> 1234567.89"""
+    try:
+        return float(texto.replace(".", "").replace(",", "."))
+    except (AttributeError, ValueError):
+        return None
+
+
+def _buscar(padrao: str, texto: str) -> Optional[str]:
+    match = re.search(padrao, texto, re.IGNORECASE)
+    return match.group(1).strip() if match else None
+
+
+def _sem_acento(texto: str) -> str:
+    return unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+
+
+def texto_detalhe(html: str) -> str:
+    """Texto do HTML de detalhe com espaços normalizados"""
+    texto = BeautifulSoup(html, "html.parser").get_text(" ")
+    return re.sub(r"\s+", " ", texto).strip()
+
+
+def extrair_dados(html: str) -> Dict:
+    """Campos quantitativos do anúncio a partir do HTML de detalhe"""
+    texto = texto_detalhe(html)
+
+    dados = {
+        "valor_avaliacao": _numero(_buscar(r"valor de avalia[çc][ãa]o:?\s*R\$\s*([\d.,]+)", texto)),
+        "valor_minimo": _numero(_buscar(r"valor m[íi]nimo de venda[^:]*:?\s*R\$\s*([\d.,]+)", texto)),
+        "desconto_percent": _numero(_buscar(r"desconto de\s*([\d.,]+)\s*%", texto)),
+        "tipo": _buscar(r"tipo de im[óo]vel:?\s*([A-Za-zÀ-ú ]+?)(?=\s+(?:Quartos|Garagem|N[úu]mero|Matr[íi]cula|Comarca)\b|$)", texto),
+        "quartos": _numero(_buscar(r"quartos:?\s*(\d+)", texto)),
+        "vagas": _numero(_buscar(r"garage[mn]s?:?\s*(\d+)", texto)),
+        "area_privativa_m2": _numero(_buscar(r"[áa]rea privativa\s*[=:]?\s*([\d.,]+)", texto)),
+        "area_total_m2": _numero(_buscar(r"[áa]rea total\s*[=:]?\s*([\d.,]+)", texto)),
+        "area_terreno_m2": _numero(_buscar(r"[áa]rea do terreno\s*[=:]?\s*([\d.,]+)", texto)),
+        "financiamento": bool(re.search(r"permite financiamento|aceita financiamento|financiamento habitacional", texto, re.IGNORECASE)) or None,
+        "fgts": bool(re.search(r"permite utiliza[çc][ãa]o de FGTS|aceita FGTS", texto, re.IGNORECASE)) or None,
+        "ocupado": None,
+        "modalidade": None,
+        "leilao": _buscar(r"edital\s*(?:n[º°o.]*)?\s*:?\s*(\d+[\d./-]*\d)", texto),
+    }
+
+    sem_acento = _sem_acento(texto).upper()
+    for modalidade in MODALIDADES:
+        if _sem_acento(modalidade).upper() in sem_acento:
+            dados["modalidade"] = modalidade
+            break
+
+    if re.search(r"im[óo]vel (?:encontra-se )?desocupado", texto, re.IGNORECASE):
+        dados["ocupado"] = False
+    elif re.search(r"im[óo]vel (?:encontra-se )?ocupado", texto, re.IGNORECASE):
+        dados["ocupado"] = True
+
+    # Desconto não informado mas deduzível dos valores
+    if dados["desconto_percent"] is None and dados["valor_avaliacao"] and dados["valor_minimo"]:
+        dados["desconto_percent"] = round((1 - dados["valor_minimo"] / dados["valor_avaliacao"]) * 100, 2)
+
+    return dados
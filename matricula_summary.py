@@ -0,0 +1,164 @@
+"""
+Resumo Estruturado de Matrículas Longas (map-reduce)
+====================================================
+
+Em vez de truncar o texto do OCR, a matrícula é dividida em blocos que são
+analisados em paralelo por um prompt pequeno de extração (registros, ônus,
+cancelamentos e datas). Os resultados parciais são unidos num resumo
+compacto, que entra no prompt principal no lugar do texto integral.
+
+Matrículas curtas (até `limite_texto` caracteres) seguem como texto, sem
+chamadas extras à API.
+"""
+
+import json
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_BLOCO = 6000
+DEFAULT_SOBREPOSICAO = 300
+DEFAULT_WORKERS = 4
+DEFAULT_LIMITE_TEXTO = 1500
+
+EXTRACTION_PROMPT = """
+Você recebe um trecho do texto (OCR) de uma matrícula de imóvel.
+Extraia apenas o que constar no trecho, sem inferir, e responda SOMENTE com o JSON:
+
+{
+  "registros": [{"ato": "R-1", "data": "", "natureza": "", "descricao": ""}],
+  "onus": [{"ato": "", "tipo": "", "credor": "", "data": ""}],
+  "cancelamentos": [{"ato": "", "ato_cancelado": "", "data": ""}],
+  "datas": [{"data": "", "evento": "", "ato": ""}]
+}
+
+- registros: registros (R-n) e averbações (AV-n) com número do ato, data, natureza e descrição curta (até 20 palavras).
+- onus: alienação fiduciária, hipoteca, penhora, indisponibilidade, ações e demais ônus ou restrições.
+- cancelamentos: atos que cancelam ou quitam outro ato (informe qual ato foi cancelado).
+- datas: consolidação da propriedade, leilões, intimações, prazos e demais eventos datados.
+Use listas vazias quando não houver itens.
+"""
+
+LISTAS = ("registros", "onus", "cancelamentos", "datas")
+
+
+def dividir_em_blocos(texto: str, tamanho: int = DEFAULT_BLOCO,
+                      sobreposicao: int = DEFAULT_SOBREPOSICAO) -> List[str]:
+    """Divide o texto em blocos de até `tamanho` caracteres, quebrando em fim de linha
+
+    Os blocos se sobrepõem em `sobreposicao` caracteres para que um ato
+    cortado na fronteira apareça inteiro em pelo menos um deles. A
+    sobreposição fica limitada a metade do bloco, para que cada bloco avance.
+    """
+    tamanho = max(1, tamanho)
+    sobreposicao = max(0, min(sobreposicao, tamanho // 2))
+    blocos = []
+    inicio = 0
+    while inicio < len(texto):
+        fim = min(inicio + tamanho, len(texto))
+        if fim < len(texto):
+            quebra = texto.rfind("\n", inicio + tamanho // 2, fim)
+            if quebra != -1:
+                fim = quebra + 1
+        blocos.append(texto[inicio:fim])
+        if fim >= len(texto):
+            break
+        # Próximo bloco começa no início de uma linha dentro da sobreposição
+        quebra = texto.find("\n", fim - sobreposicao, fim)
+        proximo = quebra + 1 if quebra != -1 else fim - sobreposicao
+        inicio = max(proximo, inicio + 1)
+    return blocos
+
+
+def extrair_bloco(client, bloco: str, model: str = DEFAULT_MODEL) -> Dict:
+    """Etapa map: extrai os itens estruturados de um bloco"""
+    response = client.chat.completions.create(
+        model=model,
+        temperature=0,
+        response_format={"type": "json_object"},
+        messages=[
+            {"role": "system", "content": EXTRACTION_PROMPT},
+            {"role": "user", "content": bloco},
+        ],
+    )
+    parcial = json.loads(response.choices[0].message.content)
+    return {chave: parcial.get(chave) or [] for chave in LISTAS}
+
+
+def _chave(item: Dict) -> str:
+    """Chave de deduplicação: ato + conteúdo normalizado"""
+    return re.sub(r"\W+", " ", json.dumps(item, sort_keys=True, ensure_ascii=False).lower()).strip()
+
+
+def combinar(parciais: List[Dict]) -> Dict:
+    """Etapa reduce: une os blocos na ordem do documento, sem repetições
+
+    Ônus cujo ato aparece em algum cancelamento recebem "cancelado": true.
+    """
+    resumo = {chave: [] for chave in LISTAS}
+    vistos = {chave: set() for chave in LISTAS}
+
+    for parcial in parciais:
+        for chave in LISTAS:
+            for item in parcial.get(chave, []):
+                if not isinstance(item, dict):
+                    continue
+                k = _chave(item)
+                if k not in vistos[chave]:
+                    vistos[chave].add(k)
+                    resumo[chave].append(item)
+
+    cancelados = {_normaliza_ato(c.get("ato_cancelado", "")) for c in resumo["cancelamentos"]}
+    cancelados.discard("")
+    for onus in resumo["onus"]:
+        onus["cancelado"] = _normaliza_ato(onus.get("ato", "")) in cancelados
+    return resumo
+
+
+def _normaliza_ato(ato: str) -> str:
+    """'R.4/12.345' e 'R-4' -> 'R4'"""
+    match = re.match(r"\s*(AV|R)\W*(\d+)", str(ato), re.IGNORECASE)
+    return f"{match.group(1).upper()}{int(match.group(2))}" if match else ""
+
+
+def resumir_matricula(client, texto: str, model: str = DEFAULT_MODEL, workers: int = DEFAULT_WORKERS,
+                      tamanho_bloco: int = DEFAULT_BLOCO) -> Optional[Dict]:
+    """Map-reduce completo; retorna None se nenhum bloco pôde ser extraído"""
+    blocos = dividir_em_blocos(texto, tamanho_bloco)
+
+    def extrair(bloco):
+        try:
+            return extrair_bloco(client, bloco, model)
+        except Exception as e:
+            print(f"[AVISO] Falha ao extrair bloco da matrícula: {e}", file=sys.stderr)
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(blocos)))) as executor:
+        parciais = [p for p in executor.map(extrair, blocos) if p is not None]
+
+    if not parciais:
+        return None
+
+    resumo = combinar(parciais)
+    resumo["blocos"] = len(blocos)
+    resumo["blocos_com_falha"] = len(blocos) - len(parciais)
+    return resumo
+
+
+def preparar_matricula(client, texto: str, model: str = DEFAULT_MODEL, workers: int = DEFAULT_WORKERS,
+                       tamanho_bloco: int = DEFAULT_BLOCO, limite_texto: int = DEFAULT_LIMITE_TEXTO) -> str:
+    """Texto da matrícula para o prompt principal: integral se curto, resumo estruturado se longo"""
+    if len(texto) <= limite_texto:
+        return texto
+
+    resumo = resumir_matricula(client, texto, model, workers, tamanho_bloco)
+    if resumo is None:
+        print("[AVISO] Resumo da matrícula indisponível, usando texto truncado", file=sys.stderr)
+        return texto[:limite_texto]
+
+    print(f"Matricula resumida: {len(texto)} caracteres em {resumo['blocos']} blocos", file=sys.stderr)
+    return "Resumo estruturado extraído do texto integral da matrícula: " + json.dumps(
+        resumo, ensure_ascii=False, separators=(",", ":")
+    )
@@ -0,0 +1,564 @@
+"""
+Motores de OCR para Matrículas
+==============================
+
+Converte o PDF da matrícula em texto. Motores disponíveis:
+
+- pytesseract: chama o executável `tesseract` para cada página (um processo
+  novo e um arquivo temporário por página). Comportamento original.
+- tesserocr: mantém instâncias `PyTessBaseAPI` vivas, com os dados de idioma
+  carregados uma única vez, e entrega a imagem da página em memória.
+
+Pipelines de renderização:
+
+- batch: `convert_from_path` renderiza todas as páginas como imagens PIL e só
+  depois o OCR começa (memória cresce com o número de páginas).
+- stream: cada página é renderizada pelo `pdftoppm` direto para um buffer de
+  memória compartilhada e entregue a processos de OCR persistentes. O número
+  de buffers é fixo, então o pico de memória não depende do número de páginas.
+
+Releitura seletiva: a primeira passada usa uma resolução baixa (rápida) e
+lê a confiança por palavra do Tesseract; só as páginas com confiança média
+abaixo do limite são renderizadas de novo em alta resolução e relidas.
+
+O motor é escolhido pela chave "ocr_engine" do config.json (default: pytesseract)
+e o pipeline pela chave "ocr_pipeline" (default: stream).
+Para comparar use:
+    python benchmark.py ocr data/detail/<cidade>_<uf>/<imovel>.pdf
+    python benchmark.py ocr-memoria data/detail/<cidade>_<uf>/<imovel>.pdf --paginas 40
+"""
+
+import atexit
+import math
+import multiprocessing
+import os
+import queue
+import re
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+# Caminho do Poppler local
+POPPLER_PATH = os.path.join(os.path.dirname(__file__), "poppler", "poppler-24.08.0", "Library", "bin")
+
+DEFAULT_ENGINE = "pytesseract"
+DEFAULT_LANG = "eng"
+DEFAULT_DPI = 200
+DEFAULT_PIPELINE = "stream"
+DEFAULT_DPI_RAPIDO = 150
+DEFAULT_DPI_ALTO = 300
+# Confiança média (0-100) abaixo da qual a página é relida em alta resolução
+DEFAULT_CONF_MIN = 70.0
+
+# Maior página aceita sem reduzir a resolução (A3, em polegadas)
+MAX_PAGE_INCHES = (11.7, 16.5)
+
+
+class PytesseractEngine:
+    """OCR via executável tesseract (um subprocesso por página)"""
+
+    name = "pytesseract"
+
+    def __init__(self, lang: str = DEFAULT_LANG, workers: int = 1):
+        import pytesseract
+        self._pytesseract = pytesseract
+        self.lang = lang
+        self.workers = workers
+
+    def image_to_string(self, image) -> str:
+        return self._pytesseract.image_to_string(image, lang=self.lang)
+
+    def image_to_data(self, image) -> Tuple[str, Optional[float]]:
+        """Texto e confiança média das palavras (uma única chamada ao tesseract)"""
+        data = self._pytesseract.image_to_data(
+            image, lang=self.lang, output_type=self._pytesseract.Output.DICT
+        )
+        return _texto_de_dados(data)
+
+    def raw_to_data(self, buf, width: int, height: int) -> Tuple[str, Optional[float]]:
+        """OCR de pixels em escala de cinza (1 byte/pixel) já em memória"""
+        from PIL import Image
+
+        # frombuffer não copia os pixels; o pytesseract ainda grava um
+        # arquivo temporário para o executável
+        image = Image.frombuffer("L", (width, height), buf, "raw", "L", 0, 1)
+        try:
+            return self.image_to_data(image)
+        finally:
+            del image
+
+    def close(self):
+        pass
+
+
+class TesserocrEngine:
+    """OCR em processo com um pool de PyTessBaseAPI persistentes"""
+
+    name = "tesserocr"
+
+    def __init__(self, lang: str = DEFAULT_LANG, workers: int = 1):
+        try:
+            import tesserocr
+        except ImportError as e:
+            raise RuntimeError(
+                "Motor 'tesserocr' indisponível. Instale com: pip install tesserocr"
+            ) from e
+
+        self.lang = lang
+        self.workers = workers
+        # Uma instância por worker: a API do Tesseract não é thread-safe,
+        # mas libera o GIL durante o reconhecimento
+        self._apis = queue.Queue()
+        for _ in range(workers):
+            self._apis.put(tesserocr.PyTessBaseAPI(lang=lang))
+
+    def image_to_string(self, image) -> str:
+        api = self._apis.get()
+        try:
+            api.SetImage(image)
+            return api.GetUTF8Text()
+        finally:
+            self._apis.put(api)
+
+    def image_to_data(self, image) -> Tuple[str, Optional[float]]:
+        """Texto e confiança média das palavras"""
+        api = self._apis.get()
+        try:
+            api.SetImage(image)
+            return api.GetUTF8Text(), _media(api.AllWordConfidences())
+        finally:
+            self._apis.put(api)
+
+    def raw_to_data(self, buf, width: int, height: int) -> Tuple[str, Optional[float]]:
+        """OCR de pixels em escala de cinza (1 byte/pixel) já em memória"""
+        api = self._apis.get()
+        try:
+            # Pixels crus, sem codificar/decodificar imagem
+            api.SetImageBytes(bytes(buf), width, height, 1, width)
+            return api.GetUTF8Text(), _media(api.AllWordConfidences())
+        finally:
+            self._apis.put(api)
+
+    def close(self):
+        while not self._apis.empty():
+            self._apis.get_nowait().End()
+
+
+def _media(confs) -> Optional[float]:
+    confs = [float(c) for c in confs if float(c) >= 0]
+    return sum(confs) / len(confs) if confs else None
+
+
+def _texto_de_dados(data: Dict) -> Tuple[str, Optional[float]]:
+    """Remonta o texto (uma linha por linha do Tesseract) a partir do image_to_data"""
+    linhas = []
+    palavras = []
+    confs = []
+    linha_atual = None
+
+    for i, palavra in enumerate(data["text"]):
+        if float(data["conf"][i]) < 0:
+            continue
+        linha = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        if linha != linha_atual:
+            if palavras:
+                linhas.append(" ".join(palavras))
+            palavras = []
+            linha_atual = linha
+        if palavra.strip():
+            palavras.append(palavra)
+            confs.append(data["conf"][i])
+
+    if palavras:
+        linhas.append(" ".join(palavras))
+    return "\n".join(linhas), _media(confs)
+
+
+ENGINES = {
+    PytesseractEngine.name: PytesseractEngine,
+    TesserocrEngine.name: TesserocrEngine,
+}
+
+# Motores já inicializados neste processo, reutilizados entre matrículas
+_engines: Dict[Tuple[str, str, int], object] = {}
+
+
+def get_engine(name: Optional[str] = None, lang: str = DEFAULT_LANG, workers: int = 1):
+    """Retorna (criando se necessário) o motor de OCR persistente"""
+    name = name or DEFAULT_ENGINE
+    if name not in ENGINES:
+        raise ValueError(f"Motor de OCR desconhecido: {name} (opções: {', '.join(ENGINES)})")
+
+    key = (name, lang, workers)
+    if key not in _engines:
+        _engines[key] = ENGINES[name](lang=lang, workers=workers)
+    return _engines[key]
+
+
+def close_engines():
+    """Libera todos os motores e pools de OCR persistentes"""
+    while _engines:
+        _, engine = _engines.popitem()
+        engine.close()
+    while _pools:
+        _, pool = _pools.popitem()
+        pool.close()
+
+
+def _poppler_path() -> Optional[str]:
+    return POPPLER_PATH if os.path.isdir(POPPLER_PATH) else None
+
+
+def _poppler_bin(name: str) -> str:
+    poppler_path = _poppler_path()
+    if poppler_path:
+        exe = name + (".exe" if sys.platform == "win32" else "")
+        return os.path.join(poppler_path, exe)
+    return name
+
+
+def extrair_camada_texto(pdf_path: str) -> str:
+    """Texto embutido no PDF (pdftotext do Poppler), páginas separadas por \\f; "" se não houver"""
+    try:
+        saida = subprocess.run([_poppler_bin("pdftotext"), "-enc", "UTF-8", pdf_path, "-"],
+                               capture_output=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+    return saida.decode("utf-8", errors="replace")
+
+
+def render_pages(pdf_path: str, dpi: int = DEFAULT_DPI, first_page: Optional[int] = None,
+                 last_page: Optional[int] = None) -> List:
+    """Renderiza as páginas do PDF como imagens PIL"""
+    from pdf2image import convert_from_path
+
+    return convert_from_path(pdf_path, dpi=dpi, poppler_path=_poppler_path(),
+                             first_page=first_page, last_page=last_page)
+
+
+def page_sizes(pdf_path: str) -> List[Tuple[float, float]]:
+    """Tamanho (largura, altura) em pontos de cada página do PDF"""
+    from pdf2image import pdfinfo_from_path
+
+    pages = pdfinfo_from_path(pdf_path, poppler_path=_poppler_path())["Pages"]
+    info = pdfinfo_from_path(pdf_path, poppler_path=_poppler_path(), first_page=1, last_page=pages)
+
+    sizes = []
+    for page in range(1, pages + 1):
+        value = info.get(f"Page {page:4d} size", info.get("Page size", "612 x 792 pts"))
+        match = re.match(r"\s*([\d.]+)\s*x\s*([\d.]+)", str(value))
+        sizes.append((float(match.group(1)), float(match.group(2))) if match else (612.0, 792.0))
+    return sizes
+
+
+def _read_pnm_header(stream) -> Tuple[int, int, int]:
+    """Lê o cabeçalho PGM/PPM binário e retorna (largura, altura, canais)"""
+    tokens = []
+    token = b""
+    while len(tokens) < 4:
+        byte = stream.read(1)
+        if not byte:
+            raise RuntimeError("Saída do pdftoppm truncada")
+        if byte == b"#" and not token:
+            stream.readline()
+        elif byte.isspace():
+            if token:
+                tokens.append(token)
+                token = b""
+        else:
+            token += byte
+
+    magic, width, height, _maxval = tokens
+    channels = {b"P5": 1, b"P6": 3}.get(magic)
+    if channels is None:
+        raise RuntimeError(f"Formato PNM inesperado: {magic!r}")
+    return int(width), int(height), channels
+
+
+def render_page_into(pdf_path: str, page: int, dpi: int, buf) -> Tuple[int, int]:
+    """Renderiza uma página em escala de cinza direto no buffer informado
+
+    Os pixels são lidos do stdout do pdftoppm para o buffer, sem arquivo
+    temporário e sem decodificação por PIL. Retorna (largura, altura).
+    """
+    cmd = [_poppler_bin("pdftoppm"), "-gray", "-r", str(dpi),
+           "-f", str(page), "-l", str(page), pdf_path]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        width, height, channels = _read_pnm_header(proc.stdout)
+        size = width * height * channels
+        if channels != 1 or size > len(buf):
+            raise RuntimeError(f"Página {page} não cabe no buffer ({width}x{height}x{channels})")
+
+        view = memoryview(buf)[:size]
+        try:
+            read = 0
+            while read < size:
+                n = proc.stdout.readinto(view[read:])
+                if not n:
+                    raise RuntimeError(f"Saída do pdftoppm truncada na página {page}")
+                read += n
+        finally:
+            view.release()
+    finally:
+        proc.stdout.close()
+        err = proc.stderr.read()
+        proc.stderr.close()
+        if proc.wait() != 0:
+            raise RuntimeError(f"pdftoppm falhou na página {page}: {err.decode(errors='replace')}")
+    return width, height
+
+
+def _fit_dpi(size_pts: Tuple[float, float], dpi: int, capacity: int) -> int:
+    """Reduz a resolução de páginas maiores que o buffer"""
+    pixels = math.ceil(size_pts[0] / 72 * dpi + 1) * math.ceil(size_pts[1] / 72 * dpi + 1)
+    if pixels <= capacity:
+        return dpi
+    return max(int(dpi * math.sqrt(capacity / pixels)) - 1, 1)
+
+
+def _ocr_worker(engine_name: str, lang: str, slot_names: List[str], tasks, results):
+    """Processo de OCR persistente: carrega o motor uma vez e lê páginas da memória compartilhada"""
+    engine = ENGINES[engine_name](lang=lang, workers=1)
+    slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            page, slot, width, height = task
+            view = slots[slot].buf[:width * height]
+            try:
+                text, conf = engine.raw_to_data(view, width, height)
+                results.put((page, slot, text, conf, None))
+            except Exception as e:
+                results.put((page, slot, "", None, str(e)))
+            finally:
+                try:
+                    view.release()
+                except BufferError:
+                    pass
+    finally:
+        engine.close()
+        for shm in slots:
+            try:
+                shm.close()
+            except BufferError:
+                pass
+
+
+class OCRWorkerPool:
+    """Processos de OCR persistentes alimentados por buffers de memória compartilhada
+
+    Há `2 * workers` buffers: enquanto um worker reconhece uma página, a
+    próxima já está sendo renderizada. O pico de memória é limitado pelo
+    número de buffers, não pelo número de páginas do PDF.
+    """
+
+    def __init__(self, engine: Optional[str] = None, lang: str = DEFAULT_LANG,
+                 workers: int = 1, max_dpi: int = DEFAULT_DPI):
+        self.engine = engine or DEFAULT_ENGINE
+        if self.engine not in ENGINES:
+            raise ValueError(f"Motor de OCR desconhecido: {self.engine} (opções: {', '.join(ENGINES)})")
+        self.workers = max(workers, 1)
+        self.capacity = math.ceil(MAX_PAGE_INCHES[0] * max_dpi) * math.ceil(MAX_PAGE_INCHES[1] * max_dpi)
+
+        ctx = multiprocessing.get_context()
+        self._slots = [shared_memory.SharedMemory(create=True, size=self.capacity)
+                       for _ in range(2 * self.workers)]
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        self._procs = [
+            ctx.Process(
+                target=_ocr_worker,
+                args=(self.engine, lang, [s.name for s in self._slots], self._tasks, self._results),
+                daemon=True,
+            )
+            for _ in range(self.workers)
+        ]
+        for proc in self._procs:
+            proc.start()
+
+    def _next_result(self):
+        while True:
+            try:
+                return self._results.get(timeout=1)
+            except queue.Empty:
+                if not all(p.is_alive() for p in self._procs):
+                    raise RuntimeError("Processo de OCR encerrado inesperadamente")
+
+    def ocr_pdf(self, pdf_path: str, dpi: int = DEFAULT_DPI,
+                pages: Optional[List[int]] = None) -> Dict[int, Tuple[str, Optional[float]]]:
+        """Renderiza e reconhece as páginas (1-based) em streaming
+
+        Retorna {página: (texto, confiança média)}.
+        """
+        sizes = page_sizes(pdf_path)
+        pages = pages or list(range(1, len(sizes) + 1))
+
+        texts = {}
+        errors = []
+        free = list(range(len(self._slots)))
+        pending = 0
+        todo = list(reversed(pages))
+
+        try:
+            while todo or pending:
+                if todo and free:
+                    page = todo.pop()
+                    slot = free.pop()
+                    page_dpi = _fit_dpi(sizes[page - 1], dpi, self.capacity)
+                    try:
+                        width, height = render_page_into(pdf_path, page, page_dpi, self._slots[slot].buf)
+                    except Exception:
+                        free.append(slot)
+                        raise
+                    self._tasks.put((page, slot, width, height))
+                    pending += 1
+                    continue
+
+                page, slot, text, conf, error = self._next_result()
+                pending -= 1
+                free.append(slot)
+                texts[page] = (text, conf)
+                if error:
+                    errors.append(f"página {page}: {error}")
+        finally:
+            # Falha no meio do PDF: descarta os resultados ainda na fila para
+            # que não cheguem ao próximo documento com os números de página deste
+            while pending:
+                try:
+                    self._next_result()
+                except RuntimeError:
+                    break
+                pending -= 1
+
+        if errors:
+            print(f"[AVISO] Erros de OCR: {'; '.join(errors)}", file=sys.stderr)
+        return texts
+
+    @property
+    def ativo(self) -> bool:
+        """Todos os processos de OCR ainda estão de pé"""
+        return bool(self._slots) and all(p.is_alive() for p in self._procs)
+
+    def close(self):
+        for _ in self._procs:
+            self._tasks.put(None)
+        for proc in self._procs:
+            proc.join(timeout=10)
+            if proc.is_alive():
+                proc.terminate()
+        for shm in self._slots:
+            shm.close()
+            shm.unlink()
+        self._slots = []
+
+
+# Pools já inicializados neste processo, reutilizados entre matrículas
+_pools: Dict[Tuple[str, str, int, int], OCRWorkerPool] = {}
+
+
+def get_pool(engine: Optional[str] = None, lang: str = DEFAULT_LANG,
+             workers: int = 1, max_dpi: int = DEFAULT_DPI) -> OCRWorkerPool:
+    """Retorna (criando se necessário) o pool de OCR persistente"""
+    key = (engine or DEFAULT_ENGINE, lang, workers, max_dpi)
+    if key in _pools and not _pools[key].ativo:
+        # Pool com processo encerrado (falha anterior): recria
+        _pools.pop(key).close()
+    if key not in _pools:
+        _pools[key] = OCRWorkerPool(engine, lang=lang, workers=workers, max_dpi=max_dpi)
+    return _pools[key]
+
+
+atexit.register(close_engines)
+
+
+def peak_rss_mb() -> Dict[str, Optional[float]]:
+    """Pico de memória residente do processo atual e dos filhos já encerrados"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            return {"processo": psutil.Process().memory_info().peak_wset / 2**20, "filhos": None}
+        except (ImportError, AttributeError):
+            return {"processo": None, "filhos": None}
+
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "processo": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 2**20,
+        "filhos": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / 2**20,
+    }
+
+
+def ocr_pages(pages: List, engine) -> List[str]:
+    """Executa OCR nas páginas mantendo a ordem original"""
+    if engine.workers <= 1 or len(pages) <= 1:
+        return [engine.image_to_string(page) for page in pages]
+
+    with ThreadPoolExecutor(max_workers=engine.workers) as executor:
+        return list(executor.map(engine.image_to_string, pages))
+
+
+def ocr_pages_data(pages: List, engine) -> List[Tuple[str, Optional[float]]]:
+    """Como ocr_pages, mas retorna (texto, confiança média) por página"""
+    if engine.workers <= 1 or len(pages) <= 1:
+        return [engine.image_to_data(page) for page in pages]
+
+    with ThreadPoolExecutor(max_workers=engine.workers) as executor:
+        return list(executor.map(engine.image_to_data, pages))
+
+
+def _ocr_passada(pdf_path: str, pipeline: str, engine: Optional[str], lang: str, workers: int,
+                 dpi: int, max_dpi: int, pages: Optional[List[int]] = None) -> Dict[int, Tuple[str, Optional[float]]]:
+    """Uma passada de OCR nas páginas indicadas (todas se None)"""
+    if pipeline == "stream":
+        return get_pool(engine, lang=lang, workers=workers, max_dpi=max_dpi).ocr_pdf(pdf_path, dpi=dpi, pages=pages)
+
+    if pipeline != "batch":
+        raise ValueError(f"Pipeline de OCR desconhecido: {pipeline} (opções: batch, stream)")
+
+    ocr_engine = get_engine(engine, lang=lang, workers=workers)
+    if pages is None:
+        images = render_pages(pdf_path, dpi=dpi)
+        pages = list(range(1, len(images) + 1))
+    else:
+        images = [render_pages(pdf_path, dpi=dpi, first_page=p, last_page=p)[0] for p in pages]
+    return dict(zip(pages, ocr_pages_data(images, ocr_engine)))
+
+
+def extrair_texto_pdf(pdf_path: str, engine: Optional[str] = None, lang: str = DEFAULT_LANG,
+                      workers: int = 1, dpi: int = DEFAULT_DPI, pipeline: Optional[str] = None,
+                      dpi_alto: Optional[int] = None, conf_min: float = DEFAULT_CONF_MIN,
+                      stats: Optional[Dict] = None) -> str:
+    """Extrai o texto de todas as páginas do PDF
+
+    Com `dpi_alto`, a primeira passada usa `dpi` e só as páginas com confiança
+    média abaixo de `conf_min` (ou sem nenhuma palavra reconhecida) são
+    renderizadas e relidas em `dpi_alto`. Se `stats` for informado, recebe o
+    número de páginas e quantas precisaram do caminho lento.
+    """
+    pipeline = pipeline or DEFAULT_PIPELINE
+    max_dpi = max(dpi, dpi_alto or 0)
+
+    results = _ocr_passada(pdf_path, pipeline, engine, lang, workers, dpi, max_dpi)
+
+    lentas = []
+    if dpi_alto and dpi_alto > dpi:
+        lentas = [page for page, (_, conf) in sorted(results.items()) if conf is None or conf < conf_min]
+        if lentas:
+            results.update(_ocr_passada(pdf_path, pipeline, engine, lang, workers, dpi_alto, max_dpi, lentas))
+
+    if stats is not None:
+        confs = [conf for _, conf in results.values() if conf is not None]
+        stats.update({
+            "paginas": len(results),
+            "paginas_alta_resolucao": len(lentas),
+            "confianca_media": round(sum(confs) / len(confs), 1) if confs else None,
+        })
+
+    return "".join(results[page][0] + "\n" for page in sorted(results))
@@ -0,0 +1,194 @@
+"""
+Empacotamento de Imóveis (várias análises por requisição)
+=========================================================
+
+Em cidades com muitos anúncios pequenos e parecidos, o que cada requisição
+carrega de fixo (instruções, esquema, edital, ida e volta) pesa mais que o
+próprio imóvel. Com "pacote_tamanho" > 1 (ou `--pacote N` no automation.py)
+imóveis do mesmo edital vão juntos numa única chamada:
+
+- a mensagem traz o contexto comum uma vez só (edital em arquivo ou os
+  trechos do modo clausulas) e depois cada imóvel entre marcadores
+  "=== IMÓVEL <id> ==="
+- a resposta é {"analises": [{"id": "<id>", ...análise...}]}, no formato
+  configurado (completo ou compacto, compacto.py) e com saída estruturada
+- `separar` valida cada item (id do pacote, estrutura completa) e devolve a
+  análise de cada imóvel, gravada em data/analysis/ como as demais; quem
+  faltar ou vier inválido é analisado sozinho; numa resposta truncada ou
+  com defeitos triviais (validacao.reparar) os itens completos são
+  aproveitados
+
+Só entram em pacotes imóveis com mensagem até "pacote_max_tokens_imovel"
+tokens e, com "pacote_valor_max", valor mínimo de venda até esse valor (R$);
+os demais seguem uma análise por requisição. Tokens e custo do pacote são
+rateados pelo tamanho de cada imóvel na entrada e na saída; as métricas
+trazem "pacote" (id, tamanho) e usage.agregar compara custo e latência por
+imóvel entre pacotes e análises individuais ("por_pacote").
+
+Backends: responses, chat e local (saída estruturada). No assistants e no
+modo batch as análises continuam individuais.
+"""
+
+import json
+import re
+from typing import Callable, Dict, Iterable, List, Optional
+
+import analysis
+import clausulas
+import compacto
+import usage
+import validacao
+from backends import criar
+from prompts import _objeto
+
+DEFAULT_TAMANHO = 1
+DEFAULT_MAX_TOKENS_IMOVEL = 4000
+
+# Início dos dados do imóvel na mensagem (analysis.montar_conteudo): o que vem antes é comum ao edital
+INICIO_IMOVEL = "Esta é a descrição resumida do imóvel:"
+MARCADOR = "=== IMÓVEL {id} ==="
+CAMPOS_ANALISE = ("imovel", "criterios", "nota_final", "riscos", "proximos_passos")
+
+
+def tamanho(config: Dict) -> int:
+    return max(1, int(config.get("pacote_tamanho", DEFAULT_TAMANHO)))
+
+
+def elegivel(conteudo: str, config: Dict, valor_minimo: Optional[float] = None) -> bool:
+    """Imóvel pequeno o bastante para ir num pacote"""
+    _, proprio = dividir(conteudo)
+    if len(proprio) // 4 > int(config.get("pacote_max_tokens_imovel", DEFAULT_MAX_TOKENS_IMOVEL)):
+        return False
+    valor_max = config.get("pacote_valor_max")
+    return valor_max is None or (valor_minimo is not None and valor_minimo <= float(valor_max))
+
+
+def edital(config: Dict) -> str:
+    """Edital do imóvel (config resolvido por editais.py): só imóveis do mesmo edital vão juntos"""
+    return config.get("edital_file_id") or config.get("edital_pdf", clausulas.DEFAULT_EDITAL_PDF)
+
+
+def agrupar(ids: Iterable[str], chave: Callable[[str], str], n: int) -> List[List[str]]:
+    """Grupos de até `n` imóveis com a mesma chave (edital), na ordem de chegada"""
+    por_chave: Dict[str, List[str]] = {}
+    for imovel_id in ids:
+        por_chave.setdefault(chave(imovel_id), []).append(imovel_id)
+    return [grupo[i:i + n] for grupo in por_chave.values() for i in range(0, len(grupo), n)]
+
+
+def dividir(conteudo: str):
+    """(contexto comum do edital, dados do imóvel) de uma mensagem de análise"""
+    posicao = conteudo.find(INICIO_IMOVEL)
+    if posicao <= 0:
+        return "", conteudo
+    return conteudo[:posicao], conteudo[posicao:]
+
+
+def montar(conteudos: Dict[str, str]) -> str:
+    """Mensagem do pacote: contexto comum uma vez e cada imóvel entre marcadores"""
+    partes = {imovel_id: dividir(conteudo) for imovel_id, conteudo in conteudos.items()}
+    comuns = {comum for comum, _ in partes.values()}
+    # Contextos diferentes (não deveria acontecer no mesmo edital) ficam junto de cada imóvel
+    prefixo = comuns.pop() if len(comuns) == 1 else ""
+    blocos = [MARCADOR.format(id=imovel_id) + "\n" + (proprio if prefixo else comum + proprio)
+              for imovel_id, (comum, proprio) in partes.items()]
+    return prefixo + "\n\n".join(blocos)
+
+
+def estimar_tokens(conteudos: Dict[str, str], config: Dict) -> int:
+    """Tokens previstos do pacote (entrada única, uma resposta por imóvel), para os limites do agendador"""
+    return analysis.estimar_tokens(montar(conteudos), config) + analysis.tokens_saida(config) * (len(conteudos) - 1)
+
+
+def formato(saida: Dict) -> Dict:
+    """Instruções e esquema da resposta em pacote a partir do formato individual (analysis.formato_saida)"""
+    item = _objeto({"id": {"type": "string"}, **saida["schema"]["properties"]})
+    instrucoes = saida["instructions"] + f"""
+Análise em pacote:
+- A mensagem traz vários imóveis, cada um começando por "{MARCADOR.format(id='<id>')}". O contexto antes do
+  primeiro marcador (edital) vale para todos.
+- Analise cada imóvel de forma independente: não misture dados, fontes ou notas entre imóveis.
+- Responda {{"analises": [...]}} com um item por imóvel, na ordem da mensagem: "id" (o do marcador) e
+  a análise do imóvel na estrutura acima.
+"""
+    return {"instructions": instrucoes, "nome": saida["nome"] + "_pacote",
+            "schema": _objeto({"analises": {"type": "array", "items": item}})}
+
+
+def analisar(client, backend: str, conteudos: Dict[str, str], config: Dict,
+             metricas: Optional[Dict] = None) -> Dict[str, Dict]:
+    """Uma chamada ao modelo para o pacote; retorna a análise de cada imóvel que voltou válida"""
+    instancia = criar(backend, client, config, saida=formato(analysis.formato_saida(config)))
+    return separar("\n".join(instancia.analisar(montar(conteudos), metricas)), conteudos)
+
+
+def _valida(analise: Dict) -> bool:
+    return (all(campo in analise for campo in CAMPOS_ANALISE) and isinstance(analise["criterios"], list)
+            and isinstance(analise["nota_final"], dict) and "valor" in analise["nota_final"])
+
+
+def separar(texto: str, ids: Iterable[str]) -> Dict[str, Dict]:
+    """Análise (estrutura completa) de cada imóvel do pacote; ids ausentes ou inválidos ficam de fora"""
+    esperados = set(ids)
+    inicio = re.search(r'\{\s*"analises"\s*:', texto)
+    if not inicio:
+        return {}
+    try:
+        resposta = json.JSONDecoder(strict=False).raw_decode(texto, inicio.start())[0]
+    except ValueError:
+        # Defeitos triviais ou resposta truncada: aproveita os itens completos (validacao.py)
+        resposta = validacao.reparar(texto[inicio.start():])
+    try:
+        itens = resposta["analises"]
+    except (KeyError, TypeError):
+        return {}
+    analises = {}
+    for item in itens if isinstance(itens, list) else []:
+        if not isinstance(item, dict):
+            continue
+        imovel_id = str(item.get("id", "")).strip()
+        analise = compacto.expandir({k: v for k, v in item.items() if k != "id"})
+        if imovel_id in esperados and imovel_id not in analises and _valida(analise):
+            analises[imovel_id] = analise
+    return analises
+
+
+def ratear(metricas: Dict, conteudos: Dict[str, str], analises: Dict[str, Dict], id_pacote: str,
+           config: Dict) -> Dict[str, Dict]:
+    """Métricas de cada imóvel: tokens e custo do pacote pela participação na entrada e na saída
+
+    O contexto comum conta igualmente para todos; a latência é a do pacote
+    (o quanto cada imóvel esperou), com o tempo por imóvel ao lado.
+    """
+    n = len(conteudos)
+    partes = {imovel_id: dividir(conteudo) for imovel_id, conteudo in conteudos.items()}
+    comum = max((len(c) for c, _ in partes.values()), default=0)
+    peso_entrada = {i: comum / n + len(p) for i, (_, p) in partes.items()}
+    peso_saida = {i: len(json.dumps(analises.get(i) or {}, ensure_ascii=False)) for i in conteudos}
+    soma_entrada = sum(peso_entrada.values()) or 1
+    soma_saida = sum(peso_saida.values()) or 1
+
+    base = {k: v for k, v in metricas.items()
+            if k not in ("tokens_entrada", "tokens_cache", "tokens_saida", "custo_usd", "economia_cache_usd")}
+    base["pacote"] = {"id": id_pacote, "tamanho": n}
+    if metricas.get("total_s") is not None:
+        base["pacote"]["total_s_por_imovel"] = round(metricas["total_s"] / n, 3)
+
+    por_imovel = {}
+    for imovel_id in conteudos:
+        fracao_entrada = peso_entrada[imovel_id] / soma_entrada
+        por_imovel[imovel_id] = {
+            **base,
+            "tokens_entrada": round((metricas.get("tokens_entrada") or 0) * fracao_entrada),
+            "tokens_cache": round((metricas.get("tokens_cache") or 0) * fracao_entrada),
+            "tokens_saida": round((metricas.get("tokens_saida") or 0) * peso_saida[imovel_id] / soma_saida),
+        }
+
+    # Custo recalculado por imóvel e ajustado ao total do pacote (zero no backend local)
+    for campo, funcao in (("custo_usd", usage.custo_usd), ("economia_cache_usd", usage.economia_cache_usd)):
+        total = metricas.get(campo) or 0.0
+        brutos = {i: funcao(m, m.get("modelo"), config) for i, m in por_imovel.items()}
+        soma = sum(brutos.values())
+        for imovel_id, m in por_imovel.items():
+            m[campo] = round(total * brutos[imovel_id] / soma, 6) if soma else 0.0
+    return por_imovel
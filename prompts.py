@@ -0,0 +1,240 @@
+"""
+Prompts e Esquema da Análise
+============================
+
+Fonte única das instruções do assistente e da estrutura do JSON de saída,
+usadas por create_assistent.py, setup_openai.py e pelos backends de análise.
+"""
+
+import hashlib
+import json
+
+MODEL = "gpt-4o"
+
+INSTRUCTIONS = """
+Tarefa:
+Analise um edital em PDF, o texto da matrícula do imóvel (em PDF convertido) e um HTML com a descrição do imóvel para classificar a atratividade do imóvel para revenda em até 6 meses (flip).
+Você deve extrair todos os dados relevantes, citar a fonte de cada informação e atribuir notas (0–10) a cinco critérios principais, calculando a nota final ponderada.
+
+ Entradas fornecidas
+
+Edital (PDF): <anexe o arquivo ou indique o caminho>
+
+Matrícula: <texto integral ou PDF convertido>
+
+Descrição (HTML): <HTML extraído do site do leilão>
+
+ Instruções de análise
+
+Extraia e liste todas as informações abaixo, sempre com “Fonte: …”
+Use “Edital pág. X”, “Matrícula AV-nº/Registro/Descrição”, ou “Anúncio/HTML”.
+Se a informação não constar, marque “Não informado” (sem inferir).
+
+Deve incluir, se existir no material:
+
+ Nome do condomínio
+ Habite-se (ou averbação equivalente)
+ Apartamento e bloco
+ Área privativa e total
+ Quartos
+ Matrícula e escritura registrada
+ Pendências judiciais ou averbações de ações
+ Processo judicial (número, vara ou tipo, se constar)
+ Vaga(s) de garagem (nº ou fração ideal)
+ Itens de lazer do condomínio (se descritos)
+ Dados e endereço dos adquirentes anteriores
+ Forma de título (compra e venda, alienação fiduciária, adjudicação etc.)
+ Laudêmio (existência e tipo, se aplicável)
+ Notícia de abertura de execução extrajudicial
+ Decurso de prazo com purga de mora
+ Documentos que instruíram o registro da execução
+ Resultado / Código hash do CNIB
+ DOI (Declaração sobre Operações Imobiliárias)
+ Registro na matrícula (número, data, ato e natureza)
+ Sequencial de registros e averbações
+ Inscrição imobiliária
+ Quitação da dívida / cancelamento da cédula
+ Averbação de leilão negativo
+ Outras observações de ônus ou restrições de disponibilidade
+
+Critérios e notas (0–10)
+Avalie exatamente 5 critérios com base nas informações coletadas.
+Para cada um, dê nota (0–10), justifique em 2–4 linhas, e cite as fontes.
+
+Critério	Peso	Descrição
+Liquidez & Preço de Entrada	0.30	Considere deságio vs. avaliação, tipologia (quartos, área, vaga) e bairro.
+Situação Registral & Risco Jurídico	0.25	Analise cadeia dominial, consolidação, cancelamento de ônus, pendências judiciais e regularidade registral.
+Despesas Propter Rem	0.20	Regras de IPTU e condomínio (limites, repasses e riscos de passivo).
+Prazos de Contratação & Registro	0.15	Compatibilidade entre prazos de pagamento, contratação e registro com o horizonte de 6 meses.
+Velocidade de Liquidez	0.10	Potencial de revenda rápida em 6 meses considerando localização e perfil do imóvel.
+
+Cálculo da nota final
+
+Use média ponderada:
+
+Apresente a fórmula e o resultado final com 1 casa decimal.
+
+Sinalizadores de risco
+Liste 2 riscos práticos baseados nos documentos (ex.: passivo condominial acima do limite, atraso cartorial, pendência judicial, ausência de quitação).
+
+Próximos passos objetivos
+Liste 2 ações diretas para mitigar riscos e acelerar a revenda (ex.: solicitar certidões, confirmar quitação, contato com síndico, preparar orçamento de reforma rápida).
+
+ Saída obrigatória
+
+A resposta final deve ser apenas o JSON abaixo (sem texto explicativo), seguindo exatamente esta estrutura:
+
+{
+  "imovel": {
+    "empreendimento": "",
+    "condominio": "",
+    "habite_se": "",
+    "apartamento": "",
+    "bloco": "",
+    "area_privativa_m2": "",
+    "area_total_m2": "",
+    "quartos": "",
+    "vaga_garagem": "",
+    "itens_lazer": "",
+    "matricula": "",
+    "oficio": "",
+    "comarca": "",
+    "inscricao_imobiliaria": "",
+    "forma_titulo": "",
+    "laudemio": "",
+    "noticia_execucao_extrajudicial": "",
+    "decurso_prazo_purga_mora": "",
+    "documentos_instrucao": "",
+    "codigo_cnib": "",
+    "doi": "",
+    "registro": "",
+    "sequencial": "",
+    "pendencias_judiciais": "",
+    "processo_judicial": "",
+    "restricoes_disponibilidade": "",
+    "quitacao_divida": "",
+    "averbacao_leilao_negativo": "",
+    "avaliacao": "",
+    "valor_minimo": "",
+    "desconto_percent": "",
+    "fonte_principal": ""
+  },
+  "criterios": [
+    {"nome": "Liquidez & Preço de Entrada", "peso": 0.30, "nota": 0, "justificativa": "", "fontes": []},
+    {"nome": "Situação Registral & Risco Jurídico", "peso": 0.25, "nota": 0, "justificativa": "", "fontes": []},
+    {"nome": "Despesas Propter Rem", "peso": 0.20, "nota": 0, "justificativa": "", "fontes": []},
+    {"nome": "Prazos de Contratação & Registro", "peso": 0.15, "nota": 0, "justificativa": "", "fontes": []},
+    {"nome": "Velocidade de Liquidez", "peso": 0.10, "nota": 0, "justificativa": "", "fontes": []}
+  ],
+  "nota_final": {"metodo": "media_ponderada", "valor": 0.0},
+  "riscos": [
+    {"descricao": "", "fonte": ""},
+    {"descricao": "", "fonte": ""}
+  ],
+  "proximos_passos": [
+    "",
+    ""
+  ]
+}
+
+ Regras finais
+
+Português claro e técnico.
+
+Sem inferências: se não constar nos documentos, use “Não informado”.
+
+Sem links externos.
+
+Cite “Fonte: …” em cada dado extraído.
+
+Resposta final deve ser SOMENTE o JSON.
+"""
+
+# Campos do objeto "imovel" na ordem da saída obrigatória
+IMOVEL_CAMPOS = [
+    "empreendimento",
+    "condominio",
+    "habite_se",
+    "apartamento",
+    "bloco",
+    "area_privativa_m2",
+    "area_total_m2",
+    "quartos",
+    "vaga_garagem",
+    "itens_lazer",
+    "matricula",
+    "oficio",
+    "comarca",
+    "inscricao_imobiliaria",
+    "forma_titulo",
+    "laudemio",
+    "noticia_execucao_extrajudicial",
+    "decurso_prazo_purga_mora",
+    "documentos_instrucao",
+    "codigo_cnib",
+    "doi",
+    "registro",
+    "sequencial",
+    "pendencias_judiciais",
+    "processo_judicial",
+    "restricoes_disponibilidade",
+    "quitacao_divida",
+    "averbacao_leilao_negativo",
+    "avaliacao",
+    "valor_minimo",
+    "desconto_percent",
+    "fonte_principal",
+]
+
+# Critérios (nome, peso) na ordem da saída obrigatória
+CRITERIOS = [
+    ("Liquidez & Preço de Entrada", 0.30),
+    ("Situação Registral & Risco Jurídico", 0.25),
+    ("Despesas Propter Rem", 0.20),
+    ("Prazos de Contratação & Registro", 0.15),
+    ("Velocidade de Liquidez", 0.10),
+]
+
+
+def _objeto(propriedades: dict) -> dict:
+    """Objeto no formato exigido pelo modo strict (todos os campos obrigatórios)"""
+    return {
+        "type": "object",
+        "properties": propriedades,
+        "required": list(propriedades),
+        "additionalProperties": False,
+    }
+
+
+# JSON Schema (modo strict) equivalente à saída obrigatória das instruções
+ANALYSIS_SCHEMA = _objeto({
+    "imovel": _objeto({campo: {"type": "string"} for campo in IMOVEL_CAMPOS}),
+    "criterios": {
+        "type": "array",
+        "items": _objeto({
+            "nome": {"type": "string", "enum": [nome for nome, _ in CRITERIOS]},
+            "peso": {"type": "number"},
+            "nota": {"type": "number"},
+            "justificativa": {"type": "string"},
+            "fontes": {"type": "array", "items": {"type": "string"}},
+        }),
+    },
+    "nota_final": _objeto({
+        "metodo": {"type": "string", "enum": ["media_ponderada"]},
+        "valor": {"type": "number"},
+    }),
+    "riscos": {
+        "type": "array",
+        "items": _objeto({
+            "descricao": {"type": "string"},
+            "fonte": {"type": "string"},
+        }),
+    },
+    "proximos_passos": {"type": "array", "items": {"type": "string"}},
+})
+
+# Versão das instruções + esquema: entra na chave do cache de análises e na
+# chave do cache de prompt (prompt_cache_key)
+VERSAO_PROMPT = hashlib.sha256(
+    (INSTRUCTIONS + json.dumps(ANALYSIS_SCHEMA, sort_keys=True)).encode("utf-8")
+).hexdigest()[:16]
@@ -2,89 +2,138 @@ from openai import OpenAI
 from dotenv import load_dotenv
 import os
 from var import vars
-import time
-import pytesseract
-from pdf2image import convert_from_path
 import warnings
 import sys
+import argparse
+import json
+from analysis import preparar_conteudo, finalizar_analise, salvar_metricas, extrair_json
+from backends import analisar, preparar_config, BACKENDS, DEFAULT_BACKEND
+from cache import AnalysisCache, chave_analise, entradas_analise
+from editais import config_imovel
+from hedge import Hedge
+import reanalise
+from resilience import Resiliencia, cliente_resiliente
+from usage import linha_cache
 
 # Suprime warnings de depreciação da API
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
-# Caminho do Poppler local
-POPPLER_PATH = os.path.join(os.path.dirname(__file__), "poppler", "poppler-24.08.0", "Library", "bin")
-
-# lendo matricula (se existir o PDF)
-pdf_path = f"data/detail/{vars['cidade'].lower()}_{vars['estado'].lower()}/{vars['imovel']}.pdf"
-matricula_imovel = ""
-
-if os.path.exists(pdf_path):
-    print(f"[OK] PDF encontrado: {pdf_path}")
-    try:
-        paginas = convert_from_path(pdf_path, poppler_path=POPPLER_PATH)
-        for pagina in paginas:
-            matricula_imovel += pytesseract.image_to_string(pagina) + "\n"
-        
-        print(f"Matricula extraida: {len(matricula_imovel)} caracteres")
-        matricula_imovel = matricula_imovel[:1500]
-    except Exception as e:
-        print(f"[AVISO] Erro ao processar PDF: {e}")
-        matricula_imovel = "PDF nao pode ser processado."
-else:
-    print(f"[AVISO] PDF nao encontrado: {pdf_path}")
-    print("Continuando analise apenas com informacoes do HTML...")
-    matricula_imovel = "Matricula nao disponivel (PDF nao encontrado)."
-#lendo detalhe
-with open(f"data/detail/{vars['cidade'].lower()}_{vars['estado'].lower()}/{vars['imovel']}.html", "r", encoding="utf-8") as f:
-    detail = f.read()
-
-load_dotenv()
-
-open_ai_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=open_ai_key)
-
-file_id = vars["edital_file_id"]
-state = vars["estado"]
-city = vars["cidade"]
-assistant_id = vars["assistant_id"]
-
-
-thread = client.beta.threads.create()
-thread_id = thread.id
-print("thread", thread_id, file=sys.stderr)  # Log para stderr para não poluir stdout
-
-message = client.beta.threads.messages.create(
-    thread_id=thread_id,
-    role="user",
-    content=f"Esta é a descrição resumida do imóvel: {detail}\n\nMatrícula do imóvel: {matricula_imovel}",
-    attachments=[
-        {
-            "file_id": file_id,
-            "tools": [{"type": "file_search"}]
-        }
-    ]
-)
-
-
-run = client.beta.threads.runs.create_and_poll(
-    thread_id=thread_id,
-    assistant_id=assistant_id
-)
-
-time.sleep(10)
-
-# Recupera mensagens
-messages = client.beta.threads.messages.list(thread_id=thread_id)
-
-print("\n--- Resposta do Assistant ---\n", file=sys.stderr)
-for msg in messages.data:
-    if msg.role == "assistant":
-        for content in msg.content:
-            if content.type == "text":
-                # Imprime na saída padrão apenas o JSON
-                print(content.text.value)
-            elif content.type == "output_text":
-                print(content.output_text.value)
-            else:
-                print("Outro tipo de conteúdo:", content, file=sys.stderr)
 
+def main():
+    parser = argparse.ArgumentParser(description="Análise de um imóvel com IA")
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=vars.get("analysis_backend", DEFAULT_BACKEND),
+        help=f"Backend de análise. Default: {DEFAULT_BACKEND} (ou 'analysis_backend' do config.json)"
+    )
+    parser.add_argument(
+        "--parcial",
+        action="store_true",
+        help="Mostra no stderr o progresso do texto gerado (backend assistants)"
+    )
+    parser.add_argument(
+        "--hedge-percentil",
+        type=float,
+        default=vars.get("hedge_percentil"),
+        help="Envia uma cópia se a análise passar deste percentil das latências já medidas (hedge.py)"
+    )
+    parser.add_argument(
+        "--sem-cache",
+        action="store_true",
+        help="Refaz a análise completa mesmo que as entradas não tenham mudado (sem reanálise parcial)"
+    )
+    args = parser.parse_args()
+
+    # Edital do imóvel: regra do registro (editais.py) para a UF/modalidade, ou o global
+    config = config_imovel(vars, vars["estado"], vars["cidade"], vars["imovel"])
+    # Backend local: edital só como cláusulas no texto (backends.py)
+    config = preparar_config(args.backend, config)
+    if config.get("edital_nome"):
+        print(f"[EDITAL] {config['edital_nome']} ({config['edital_file_id']})", file=sys.stderr)
+
+    # Cache por conteúdo: mesmo HTML, matrícula, edital, prompt e modelo
+    cache = AnalysisCache()
+    chave = chave_analise(config, vars["estado"], vars["cidade"], vars["imovel"], args.backend)
+    entradas = entradas_analise(config, vars["estado"], vars["cidade"], vars["imovel"], args.backend)
+    plano = None
+    if not args.sem_cache:
+        analise = cache.obter(chave)
+        if analise is not None:
+            print(f"[CACHE] Analise reutilizada (chave {chave[:12]}): {cache.estatisticas()}", file=sys.stderr)
+            print(json.dumps(analise, ensure_ascii=False, indent=2))
+            return
+        # Só matrícula e/ou edital mudaram: o modelo refaz apenas os critérios afetados
+        plano = reanalise.planejar(cache.anterior(vars["imovel"]), entradas, config, args.backend)
+        if plano:
+            print(f"[REANALISE] {', '.join(plano['mudancas'])} mudou: reavaliando {plano['reavaliados']}, "
+                  f"reaproveitando {plano['reaproveitados']}", file=sys.stderr)
+
+    load_dotenv()
+
+    open_ai_key = os.getenv("OPENAI_API_KEY")
+    client = OpenAI(api_key=open_ai_key, max_retries=0)
+    # 429/5xx repetidos com backoff e jitter; circuito pausa se a API estiver instável
+    resiliencia = Resiliencia.de_config(vars)
+
+    # lendo matricula e detalhe
+    conteudo = preparar_conteudo(cliente_resiliente(client, resiliencia), config,
+                                 vars["estado"], vars["cidade"], vars["imovel"])
+
+    def mostrar_parcial(texto):
+        print(f"\r  gerando... {len(texto)} caracteres", end="", file=sys.stderr, flush=True)
+
+    hedge = Hedge.de_config({**vars, "hedge_percentil": args.hedge_percentil}, args.backend,
+                            log=lambda msg: print(f"\n[HEDGE] {msg}", file=sys.stderr))
+
+    metricas = {}
+    repeticoes = resiliencia.relatorio()["repeticoes"]
+    if plano:
+        analise = resiliencia.executar(
+            reanalise.analisar, client, args.backend, conteudo, config, plano, metricas=metricas,
+            on_partial=mostrar_parcial if args.parcial else None, hedge=hedge if hedge.ativo else None
+        )
+        if analise is not None:
+            metricas["tentativas"] = 1 + resiliencia.relatorio()["repeticoes"] - repeticoes
+            salvar_metricas(vars["imovel"], args.backend, metricas)
+            print(f"\nAnalise parcial ({args.backend}): {metricas}", file=sys.stderr)
+            analise = finalizar_analise(analise, vars, vars["estado"], vars["cidade"], vars["imovel"])
+            cache.gravar(chave, vars["imovel"], analise, entradas)
+            print(json.dumps(analise, ensure_ascii=False, indent=2))
+            return
+        print("\n[REANALISE] Resposta sem as partes pedidas, refazendo a análise completa", file=sys.stderr)
+        metricas = {}
+        repeticoes = resiliencia.relatorio()["repeticoes"]
+    textos = resiliencia.executar(
+        analisar,
+        client,
+        args.backend,
+        conteudo,
+        config,
+        metricas=metricas,
+        on_partial=mostrar_parcial if args.parcial else None,
+        hedge=hedge if hedge.ativo else None
+    )
+    metricas["tentativas"] = 1 + resiliencia.relatorio()["repeticoes"] - repeticoes
+    salvar_metricas(vars["imovel"], args.backend, metricas)
+
+    print(f"\nAnalise ({args.backend}): {metricas}", file=sys.stderr)
+    print(f"[CACHE DE PROMPT] {linha_cache(metricas)}", file=sys.stderr)
+
+    print("\n--- Resposta do Assistant ---\n", file=sys.stderr)
+    analise = extrair_json("\n".join(textos))
+    if analise is None:
+        for texto in textos:
+            # Imprime na saída padrão apenas o JSON
+            print(texto)
+        return
+
+    # Notas locais dos critérios quantitativos (scoring.py) e nota final recalculada
+    analise = finalizar_analise(analise, vars, vars["estado"], vars["cidade"], vars["imovel"])
+    cache.gravar(chave, vars["imovel"], analise, entradas)
+    print(json.dumps(analise, ensure_ascii=False, indent=2))
+
+
+# Guarda necessária: os processos de OCR (ocr.py) reimportam este módulo no Windows
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Reanálise Parcial por Critério
+==============================
+
+Nem toda mudança de entrada invalida a análise inteira. Um edital novo só
+mexe nos critérios que dependem dele (Despesas Propter Rem e Prazos de
+Contratação & Registro); uma matrícula atualizada muda os dados do imóvel
+e a Situação Registral. Quando o cache (cache.py) não tem a análise para as
+entradas atuais mas tem a anterior do mesmo imóvel, as entradas que mudaram
+são comparadas com DEPENDENCIAS:
+
+- só matrícula e/ou edital mudaram (arquivos ou opções de OCR, resumo da
+  matrícula e trechos do edital): o modelo recebe a mensagem completa, mas
+  responde só as partes afetadas (dados do imóvel, critérios afetados,
+  riscos e próximos passos); os demais critérios vêm da análise anterior e
+  a nota_final é recalculada localmente com os pesos de prompts.CRITERIOS
+  (os mesmos do create_assistent.py). Se a análise anterior não tiver a
+  nota de algum critério não afetado, a análise é completa
+- qualquer outra mudança (anúncio, prompt, modelo, notas locais, formato):
+  análise completa
+
+"reanalise_modo": "parcial" (padrão) ou "completa" no config.json; o
+`--sem-cache` do query.py também força a análise completa. Funciona nos
+backends responses, chat e local (o assistants tem as instruções fixas no
+assistente); no modo batch e nos pacotes (pacote.py) as reanálises são
+completas. As métricas trazem "reanalise" (mudanças, critérios reavaliados
+e reaproveitados) e usage.agregar compara custo e tokens de saída das
+análises completas e parciais ("por_reanalise").
+"""
+
+import copy
+import json
+import re
+from typing import Dict, List, Optional
+
+import compacto
+import scoring
+import validacao
+from analysis import formato_saida
+from backends import BACKENDS_SAIDA, analisar as analisar_backend
+from prompts import CRITERIOS, _objeto
+
+MODOS = ("parcial", "completa")
+DEFAULT_MODO = "parcial"
+
+# Partes da análise -> entradas (cache.entradas_analise) das quais dependem
+DEPENDENCIAS = {
+    "imovel": {"detalhe", "matricula"},
+    "Liquidez & Preço de Entrada": {"detalhe"},
+    "Situação Registral & Risco Jurídico": {"detalhe", "matricula"},
+    "Despesas Propter Rem": {"detalhe", "edital"},
+    "Prazos de Contratação & Registro": {"detalhe", "edital"},
+    "Velocidade de Liquidez": {"detalhe"},
+    # Riscos e próximos passos resumem tudo: sempre refeitos
+    "riscos": {"detalhe", "matricula", "edital"},
+    "proximos_passos": {"detalhe", "matricula", "edital"},
+}
+
+# Opções da chave do cache que só mudam o texto de uma entrada
+PREFIXOS_OPCOES = {"ocr_": "matricula", "matricula_": "matricula", "edital_trechos": "edital",
+                   "edital_max_caracteres": "edital"}
+
+# Seção da análise -> chave na saída compacta (compacto.py)
+CHAVES_COMPACTAS = {"imovel": "i", "criterios": "c", "riscos": "r", "proximos_passos": "p"}
+
+
+def modo(config: Dict) -> str:
+    return config.get("reanalise_modo", DEFAULT_MODO)
+
+
+def mudancas(anteriores: Dict, atuais: Dict) -> Optional[List[str]]:
+    """Entradas que mudaram ("matricula", "edital"); None se mudou algo que exige análise completa"""
+    mudou = set()
+    for chave in set(anteriores) | set(atuais):
+        if anteriores.get(chave) == atuais.get(chave):
+            continue
+        if chave in ("matricula", "edital"):
+            mudou.add(chave)
+        elif chave == "opcoes":
+            antes, agora = anteriores.get(chave) or {}, atuais.get(chave) or {}
+            for opcao in set(antes) | set(agora):
+                if antes.get(opcao) == agora.get(opcao):
+                    continue
+                entrada = next((e for p, e in PREFIXOS_OPCOES.items() if opcao.startswith(p)), None)
+                if entrada is None:
+                    return None
+                mudou.add(entrada)
+        else:
+            return None
+    return sorted(mudou)
+
+
+def planejar(anterior: Optional[Dict], entradas: Dict, config: Dict, backend: str) -> Optional[Dict]:
+    """Plano da reanálise parcial a partir da entrada anterior do cache, ou None (análise completa)
+
+    O plano traz as entradas que mudaram, as seções a pedir ao modelo, os
+    critérios reavaliados e reaproveitados e a análise anterior.
+    """
+    if modo(config) != "parcial" or backend not in BACKENDS_SAIDA:
+        return None
+    if not anterior or not anterior.get("entradas") or not anterior.get("analise"):
+        return None
+    mudou = mudancas(anterior["entradas"], entradas)
+    if not mudou:
+        return None
+
+    afetados = {parte for parte, deps in DEPENDENCIAS.items() if deps & set(mudou)}
+    criterios = [nome for nome, _ in CRITERIOS if nome in afetados]
+    nomes_anteriores = {c.get("nome") for c in anterior["analise"].get("criterios") or []
+                        if isinstance(c, dict) and scoring.nota_valida(c)}
+    reaproveitados = [nome for nome, _ in CRITERIOS if nome not in afetados]
+    # Critério não afetado que falta na análise anterior: só a análise completa o recupera
+    if not reaproveitados or any(nome not in nomes_anteriores for nome in reaproveitados):
+        return None
+    return {
+        "mudancas": mudou,
+        "secoes": [s for s in ("imovel", "criterios", "riscos", "proximos_passos")
+                   if s in afetados or (s == "criterios" and criterios)],
+        "reavaliados": criterios,
+        "reaproveitados": reaproveitados,
+        "anterior": anterior["analise"],
+    }
+
+
+def formato(saida: Dict, plano: Dict) -> Dict:
+    """Instruções e esquema da reanálise a partir do formato individual (analysis.formato_saida)"""
+    compacta = "c" in saida["schema"]["properties"]
+    chaves = [CHAVES_COMPACTAS[s] if compacta else s for s in plano["secoes"]]
+    propriedades = {chave: copy.deepcopy(saida["schema"]["properties"][chave]) for chave in chaves}
+
+    criterios = propriedades.get("c" if compacta else "criterios")
+    if criterios:
+        # Só os critérios reavaliados (números na saída compacta, nomes na completa)
+        if compacta:
+            numeros = [n for n, (nome, _) in enumerate(CRITERIOS, 1) if nome in plano["reavaliados"]]
+            criterios["items"]["properties"]["n"]["enum"] = numeros
+        else:
+            criterios["items"]["properties"]["nome"]["enum"] = list(plano["reavaliados"])
+
+    instrucoes = saida["instructions"] + f"""
+Reanálise parcial:
+- Os documentos mudaram ({", ".join(plano["mudancas"])}); os demais critérios já estão avaliados.
+- Responda somente com as chaves: {", ".join(f'"{c}"' for c in chaves)}.
+- Critérios a avaliar: {"; ".join(plano["reavaliados"]) or "nenhum"}. Não inclua outros critérios.
+"""
+    return {"instructions": instrucoes, "nome": saida["nome"] + "_parcial", "schema": _objeto(propriedades)}
+
+
+def extrair(texto: str, plano: Dict) -> Optional[Dict]:
+    """Partes da análise na resposta (estrutura completa), ou None se faltar alguma pedida"""
+    inicio = re.search(r'\{\s*"(?:%s)"\s*:' % "|".join([*CHAVES_COMPACTAS, *CHAVES_COMPACTAS.values()]), texto)
+    if not inicio:
+        return None
+    try:
+        resposta = json.JSONDecoder(strict=False).raw_decode(texto, inicio.start())[0]
+    except ValueError:
+        resposta = validacao.reparar(texto[inicio.start():])
+    if not isinstance(resposta, dict):
+        return None
+
+    compacta = not any(secao in resposta for secao in CHAVES_COMPACTAS)
+    if any((CHAVES_COMPACTAS[s] if compacta else s) not in resposta for s in plano["secoes"]):
+        return None
+    if compacta:
+        resposta = compacto.expandir({"c": [], **resposta})
+    partes = {s: resposta[s] for s in plano["secoes"]}
+    if "criterios" in partes:
+        validos = [c for c in partes["criterios"] if isinstance(c, dict) and isinstance(c.get("nota"), (int, float))]
+        if sorted(c.get("nome") for c in validos) != sorted(plano["reavaliados"]):
+            return None
+    return partes
+
+
+def mesclar(partes: Dict, plano: Dict) -> Dict:
+    """Análise anterior com as partes reavaliadas e a nota final recalculada localmente"""
+    analise = copy.deepcopy(plano["anterior"])
+    # Critérios locais voltam a ser aplicados (analysis.finalizar_analise)
+    analise.pop("criterios_locais", None)
+    for secao, valor in partes.items():
+        if secao != "criterios":
+            analise[secao] = valor
+    por_nome = {c["nome"]: c for c in analise.get("criterios") or []
+                if isinstance(c, dict) and c.get("nome") in plano["reaproveitados"]}
+    por_nome.update({c["nome"]: {**c, "peso": scoring.PESOS[c["nome"]]} for c in partes.get("criterios") or []})
+    analise["criterios"] = [por_nome[nome] for nome, _ in CRITERIOS if nome in por_nome]
+    analise["nota_final"] = scoring.nota_final(analise["criterios"])
+    return analise
+
+
+def analisar(client, backend: str, conteudo: str, config: Dict, plano: Dict,
+             metricas: Optional[Dict] = None, on_partial=None, hedge=None) -> Optional[Dict]:
+    """Pede ao modelo só as partes afetadas e devolve a análise mesclada (None se a resposta não servir)"""
+    textos = analisar_backend(client, backend, conteudo, config, metricas=metricas, on_partial=on_partial,
+                              hedge=hedge, saida=formato(formato_saida(config), plano))
+    partes = extrair("\n".join(textos), plano)
+    if partes is None:
+        return None
+    if metricas is not None:
+        metricas["reanalise"] = {k: plano[k] for k in ("mudancas", "reavaliados", "reaproveitados")}
+    return mesclar(partes, plano)
@@ -0,0 +1,271 @@
+"""
+Resiliência das Chamadas à OpenAI
+=================================
+
+Camada comum para todas as chamadas à API (análise, resumo da matrícula,
+triagem, batch, setup):
+
+- erros transitórios (429, 5xx, falha de conexão e timeout) são repetidos
+  com backoff exponencial limitado e jitter completo: espera sorteada entre
+  0 e min(teto, base * 2^(tentativa-1)); o Retry-After do servidor, quando
+  presente, é respeitado
+- circuit breaker compartilhado: se a fração de erros transitórios nas
+  últimas chamadas passar do limiar, todas as chamadas do processo param
+  pela pausa configurada (dobrando a cada reabertura seguida, até o teto);
+  depois uma única chamada de teste decide se o circuito fecha
+- contadores de chamadas, repetições, erros por status, aberturas do
+  circuito e tempo pausado (`relatorio()`)
+
+Erros não transitórios (400, 401, 404...) sobem na hora e não contam como
+falha no circuito. No automation.py as análises são repetidas pelo
+agendador (scheduler.py), que usa a mesma política e o mesmo circuito; as
+demais chamadas passam por `cliente_resiliente()`.
+
+Opções no config.json: retry_max_tentativas, retry_base_s, retry_teto_s,
+breaker_janela, breaker_limiar, breaker_pausa_s.
+"""
+
+import collections
+import functools
+import random
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+DEFAULT_MAX_TENTATIVAS = 5
+DEFAULT_BASE_S = 2.0
+DEFAULT_TETO_S = 60.0
+DEFAULT_JANELA = 20
+DEFAULT_LIMIAR = 0.5
+DEFAULT_MINIMO = 6
+DEFAULT_PAUSA_S = 30.0
+DEFAULT_PAUSA_MAX_S = 300.0
+
+# Intervalo com que quem espera o fim da chamada de teste volta a consultar o circuito
+INTERVALO_TESTE_S = 1.0
+
+STATUS_TRANSITORIOS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def status_code(exc: Exception) -> Optional[int]:
+    """Status HTTP de um erro do cliente OpenAI (ou None)"""
+    return getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+
+
+def retry_after(exc: Exception) -> Optional[float]:
+    """Segundos pedidos pelo servidor nos cabeçalhos retry-after-ms / retry-after"""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def transitorio(exc: Exception) -> bool:
+    """429, 5xx, conexão ou timeout: vale repetir"""
+    status = status_code(exc)
+    if status is not None:
+        return status in STATUS_TRANSITORIOS or status >= 500
+    import openai
+    return isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError))
+
+
+class CircuitBreaker:
+    """Circuito aberto quando a taxa de erros transitórios passa do limiar"""
+
+    def __init__(self, janela: int = DEFAULT_JANELA, limiar: float = DEFAULT_LIMIAR,
+                 minimo: int = DEFAULT_MINIMO, pausa: float = DEFAULT_PAUSA_S,
+                 pausa_max: float = DEFAULT_PAUSA_MAX_S):
+        self.resultados = collections.deque(maxlen=janela)
+        self.limiar = limiar
+        self.minimo = min(minimo, janela)
+        self.pausa = pausa
+        self.pausa_max = pausa_max
+        self.pausa_atual = pausa
+        self.aberto_ate = 0.0
+        self.meio_aberto = False
+        self.teste_em_andamento = False
+        self.aberturas = 0
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self) -> str:
+        if time.monotonic() < self.aberto_ate:
+            return "aberto"
+        return "meio_aberto" if self.meio_aberto else "fechado"
+
+    def espera(self) -> float:
+        """Segundos até a próxima chamada poder sair (0 = pode agora)"""
+        with self._lock:
+            restante = self.aberto_ate - time.monotonic()
+            if restante > 0:
+                return restante
+            if self.meio_aberto:
+                if self.teste_em_andamento:
+                    return INTERVALO_TESTE_S
+                self.teste_em_andamento = True
+            return 0.0
+
+    def registrar(self, ok: bool) -> bool:
+        """Registra o resultado de uma chamada; retorna True se o circuito abriu agora"""
+        with self._lock:
+            if self.meio_aberto and self.teste_em_andamento:
+                self.meio_aberto = self.teste_em_andamento = False
+                if ok:
+                    self.pausa_atual = self.pausa
+                    return False
+                return self._abrir()
+
+            self.resultados.append(ok)
+            falhas = self.resultados.count(False)
+            if len(self.resultados) >= self.minimo and falhas / len(self.resultados) >= self.limiar:
+                return self._abrir()
+            return False
+
+    def _abrir(self) -> bool:
+        self.aberturas += 1
+        self.aberto_ate = time.monotonic() + self.pausa_atual
+        self.pausa_atual = min(self.pausa_atual * 2, self.pausa_max)
+        self.resultados.clear()
+        self.meio_aberto = True
+        return True
+
+
+class Resiliencia:
+    """Política de repetição + circuit breaker + contadores, compartilhados entre threads"""
+
+    def __init__(self, max_tentativas: int = DEFAULT_MAX_TENTATIVAS, base: float = DEFAULT_BASE_S,
+                 teto: float = DEFAULT_TETO_S, breaker: Optional[CircuitBreaker] = None,
+                 log: Callable[[str], None] = lambda msg: print(msg, file=sys.stderr)):
+        self.max_tentativas = max(1, max_tentativas)
+        self.base = base
+        self.teto = teto
+        self.breaker = breaker or CircuitBreaker()
+        self.log = log
+        self._lock = threading.Lock()
+        self.contadores = {"chamadas": 0, "repeticoes": 0, "falhas_definitivas": 0, "pausado_s": 0.0}
+        self.erros = collections.Counter()
+
+    @classmethod
+    def de_config(cls, config: Dict, **kwargs) -> "Resiliencia":
+        """Política a partir das chaves retry_* / breaker_* do config.json"""
+        breaker = CircuitBreaker(
+            janela=config.get("breaker_janela", DEFAULT_JANELA),
+            limiar=config.get("breaker_limiar", DEFAULT_LIMIAR),
+            pausa=config.get("breaker_pausa_s", DEFAULT_PAUSA_S),
+        )
+        return cls(
+            max_tentativas=config.get("retry_max_tentativas", DEFAULT_MAX_TENTATIVAS),
+            base=config.get("retry_base_s", DEFAULT_BASE_S),
+            teto=config.get("retry_teto_s", DEFAULT_TETO_S),
+            breaker=breaker,
+            **kwargs
+        )
+
+    def _contar(self, campo: str, valor: float = 1):
+        with self._lock:
+            self.contadores[campo] += valor
+
+    def espera(self, tentativa: int, exc: Optional[Exception] = None) -> float:
+        """Backoff exponencial com jitter completo; nunca menos que o Retry-After"""
+        backoff = random.uniform(0, min(self.teto, self.base * 2 ** (tentativa - 1)))
+        pedido = retry_after(exc) if exc is not None else None
+        return max(backoff, pedido) if pedido else backoff
+
+    def antes_da_chamada(self) -> float:
+        """Espera exigida pelo circuito (0 = pode chamar); conta a chamada quando liberada"""
+        espera = self.breaker.espera()
+        if espera > 0:
+            self._contar("pausado_s", espera)
+        else:
+            self._contar("chamadas")
+        return espera
+
+    def sucesso(self):
+        self.breaker.registrar(True)
+
+    def falha(self, exc: Exception) -> bool:
+        """Registra um erro; retorna True se for transitório (vale repetir)"""
+        if not transitorio(exc):
+            # O servidor respondeu: não é sinal de indisponibilidade
+            self.breaker.registrar(True)
+            return False
+        with self._lock:
+            self.erros[str(status_code(exc) or type(exc).__name__)] += 1
+        if self.breaker.registrar(False):
+            self.log(f"[CIRCUITO] Muitos erros transitórios: chamadas pausadas por "
+                     f"{self.breaker.aberto_ate - time.monotonic():.0f}s")
+        return True
+
+    def repetir(self, tentativa: int, exc: Exception, rotulo: str = "OpenAI") -> Optional[float]:
+        """Espera antes da próxima tentativa, ou None se não vale/não dá para repetir"""
+        if not self.falha(exc) or tentativa >= self.max_tentativas:
+            self._contar("falhas_definitivas")
+            return None
+        self._contar("repeticoes")
+        espera = self.espera(tentativa, exc)
+        self.log(f"[RETRY] {rotulo}: {status_code(exc) or type(exc).__name__}, "
+                 f"nova tentativa em {espera:.1f}s ({tentativa}/{self.max_tentativas})")
+        return espera
+
+    def executar(self, fn: Callable, *args, **kwargs):
+        """Chama fn(*args, **kwargs) com repetições e circuito (uso síncrono)"""
+        rotulo = getattr(fn, "__qualname__", "OpenAI")
+        for tentativa in range(1, self.max_tentativas + 1):
+            while (pausa := self.antes_da_chamada()) > 0:
+                time.sleep(pausa)
+            try:
+                resultado = fn(*args, **kwargs)
+            except Exception as e:
+                espera = self.repetir(tentativa, e, rotulo)
+                if espera is None:
+                    raise
+                time.sleep(espera)
+                continue
+            self.sucesso()
+            return resultado
+
+    def relatorio(self) -> Dict:
+        """Contadores desde a criação"""
+        with self._lock:
+            return {
+                **{k: round(v, 1) if isinstance(v, float) else v for k, v in self.contadores.items()},
+                "erros_por_status": dict(self.erros),
+                "aberturas_circuito": self.breaker.aberturas,
+                "estado_circuito": self.breaker.estado,
+            }
+
+
+class ClienteResiliente:
+    """Cliente OpenAI cujas chamadas passam por `Resiliencia.executar`
+
+    Recursos (client.files, client.beta.threads...) são embrulhados
+    recursivamente; `stream()` é repassado sem repetição, já que os erros
+    acontecem durante a iteração (quem consome o stream repete a operação).
+    """
+
+    def __init__(self, alvo, resiliencia: Resiliencia):
+        self._alvo = alvo
+        self._resiliencia = resiliencia
+
+    def __getattr__(self, nome: str):
+        valor = getattr(self._alvo, nome)
+        if nome.startswith("_") or nome == "stream" or isinstance(valor, (str, int, float, bool, type(None))):
+            return valor
+        if nome in ("with_options", "copy"):
+            return lambda *a, **k: ClienteResiliente(valor(*a, **k), self._resiliencia)
+        if callable(valor) and not isinstance(valor, type):
+            return functools.partial(self._resiliencia.executar, valor)
+        return ClienteResiliente(valor, self._resiliencia)
+
+
+def cliente_resiliente(client, resiliencia: Resiliencia) -> ClienteResiliente:
+    """Embrulha o cliente (sem os retries do SDK, para não repetir em dobro)"""
+    return ClienteResiliente(client.with_options(max_retries=0), resiliencia)
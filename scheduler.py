@@ -0,0 +1,253 @@
+"""
+Agendador Concorrente de Análises
+=================================
+
+Executa várias análises de imóveis ao mesmo tempo respeitando os limites da
+conta na API:
+
+- rpm: requisições por minuto
+- tpm: tokens por minuto (estimados pelo tamanho do prompt, ver
+  analysis.estimar_tokens)
+
+Cada análise só é admitida quando os dois baldes têm saldo; a admissão é
+feita em ordem de chegada (FIFO). Erros transitórios (429, 5xx, conexão)
+são repetidos com a política de resilience.py (backoff exponencial com
+jitter, respeitando o Retry-After); um 429 pausa também todas as admissões
+e o circuit breaker compartilhado suspende as análises quando a taxa de
+erros dispara.
+Cada resultado traz a espera na fila (vaga + limites, fila_s), o tempo de
+preparo e o número de tentativas. Ao final, `relatorio()` informa a vazão
+obtida.
+
+O número de análises em paralelo é adaptativo (concorrencia.py): começa em
+`concorrencia`, sobe até `concorrencia_max` enquanto as chamadas respondem
+sem erro e sem aumento de latência, e cai pela metade a cada 429, timeout
+ou 5xx. Sem `concorrencia_max` o valor inicial é também o teto.
+
+Uso:
+    scheduler = AnalysisScheduler(rpm=500, tpm=200000, concorrencia=8, concorrencia_max=16)
+    resultados = scheduler.executar_todos([(imovel_id, preparar, executar), ...])
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from concorrencia import ControleAIMD
+from resilience import Resiliencia, status_code, transitorio
+
+DEFAULT_CONCORRENCIA = 4
+DEFAULT_RPM = 500
+DEFAULT_TPM = 30000
+
+
+class TokenBucket:
+    """Balde que recarrega `capacidade` unidades por minuto, de forma contínua"""
+
+    def __init__(self, capacidade: float):
+        self.capacidade = float(capacidade)
+        self.saldo = float(capacidade)
+        self.atualizado = time.monotonic()
+
+    def _recarregar(self):
+        agora = time.monotonic()
+        self.saldo = min(self.capacidade, self.saldo + (agora - self.atualizado) * self.capacidade / 60.0)
+        self.atualizado = agora
+
+    def espera(self, quantidade: float) -> float:
+        """Segundos até haver `quantidade` disponível (0 se já houver)"""
+        self._recarregar()
+        # Pedido maior que a capacidade só precisa do balde cheio
+        quantidade = min(quantidade, self.capacidade)
+        if self.saldo >= quantidade:
+            return 0.0
+        return (quantidade - self.saldo) * 60.0 / self.capacidade
+
+    def consumir(self, quantidade: float):
+        self._recarregar()
+        self.saldo -= min(quantidade, self.capacidade)
+
+
+class RateLimiter:
+    """Admissão por requisições e tokens por minuto, em ordem de chegada"""
+
+    def __init__(self, rpm: int = DEFAULT_RPM, tpm: int = DEFAULT_TPM):
+        self.requisicoes = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.pausado_ate = 0.0
+        self._lock = asyncio.Lock()
+
+    async def admitir(self, tokens: int):
+        """Aguarda saldo nos dois baldes e consome uma requisição e `tokens`"""
+        # O lock garante FIFO: ninguém passa na frente de quem está esperando
+        async with self._lock:
+            while True:
+                espera = max(
+                    self.pausado_ate - time.monotonic(),
+                    self.requisicoes.espera(1),
+                    self.tokens.espera(tokens),
+                )
+                if espera <= 0:
+                    break
+                await asyncio.sleep(espera)
+            self.requisicoes.consumir(1)
+            self.tokens.consumir(tokens)
+
+    def pausar(self, segundos: float):
+        """Suspende novas admissões (ex.: após um 429)"""
+        self.pausado_ate = max(self.pausado_ate, time.monotonic() + segundos)
+
+
+class VagasAdaptativas:
+    """Semáforo (asyncio) cujo tamanho acompanha o limite do ControleAIMD"""
+
+    def __init__(self, controle: ControleAIMD):
+        self.controle = controle
+        self.em_uso = 0
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.em_uso < self.controle.limite)
+            self.em_uso += 1
+
+    async def __aexit__(self, *exc):
+        async with self._cond:
+            self.em_uso -= 1
+            self._cond.notify_all()
+
+    async def atualizar(self):
+        """Acorda quem espera por vaga (o limite pode ter subido)"""
+        async with self._cond:
+            self._cond.notify_all()
+
+
+class AnalysisScheduler:
+    """Executa análises concorrentes com admissão por rpm/tpm"""
+
+    def __init__(self, rpm: int = DEFAULT_RPM, tpm: int = DEFAULT_TPM,
+                 concorrencia: int = DEFAULT_CONCORRENCIA, max_tentativas: Optional[int] = None,
+                 log: Callable[[str], None] = print, resiliencia: Optional[Resiliencia] = None,
+                 concorrencia_max: Optional[int] = None, controle: Optional[ControleAIMD] = None,
+                 config: Optional[Dict] = None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.concorrencia = max(1, concorrencia)
+        self.log = log
+        # Limite adaptativo de análises em andamento (mantido entre execuções); parâmetros
+        # "analysis_concorrencia_min/_max" e "aimd_*" do config.json
+        self.controle = controle or ControleAIMD.de_config(config or {}, "analysis", self.concorrencia,
+                                                           concorrencia_max, log=log)
+        if resiliencia is None:
+            resiliencia = Resiliencia(log=log) if max_tentativas is None else Resiliencia(max_tentativas, log=log)
+        self.resiliencia = resiliencia
+        self.max_tentativas = resiliencia.max_tentativas
+        self._reset()
+
+    def _reset(self):
+        self.stats = {
+            "analises": 0,
+            "falhas": 0,
+            "erros_429": 0,
+            "repeticoes": 0,
+            "tokens_estimados": 0,
+            "latencias": [],
+            "inicio": None,
+            "fim": None,
+        }
+
+    async def _executar_job(self, limiter: RateLimiter, semaforo: VagasAdaptativas,
+                            job_id: str, preparar: Callable[[], Tuple[Any, int]],
+                            executar: Callable[[Any], Any]) -> Dict:
+        """preparar() -> (payload, tokens estimados); executar(payload) -> resultado"""
+        chegada = time.perf_counter()
+        async with semaforo:
+            fila = time.perf_counter() - chegada
+            inicio = time.perf_counter()
+            try:
+                payload, tokens = await asyncio.to_thread(preparar)
+            except Exception as e:
+                self.stats["falhas"] += 1
+                self.log(f"[ERRO] {job_id}: falha ao preparar análise: {e}")
+                return {"id": job_id, "ok": False, "erro": str(e)}
+            preparo = time.perf_counter() - inicio
+
+            for tentativa in range(1, self.max_tentativas + 1):
+                espera = time.perf_counter()
+                # Circuito aberto suspende todas as análises
+                while (pausa := self.resiliencia.antes_da_chamada()) > 0:
+                    await asyncio.sleep(pausa)
+                await limiter.admitir(tokens)
+                fila += time.perf_counter() - espera
+                inicio = time.perf_counter()
+                inicio_controle = time.monotonic()
+                try:
+                    resultado = await asyncio.to_thread(executar, payload)
+                except Exception as e:
+                    if status_code(e) == 429:
+                        self.stats["erros_429"] += 1
+                    if transitorio(e):
+                        self.controle.registrar(inicio_controle, congestionado=True)
+                    espera = self.resiliencia.repetir(tentativa, e, job_id)
+                    if espera is None:
+                        self.stats["falhas"] += 1
+                        self.log(f"[ERRO] {job_id}: {e}")
+                        return {"id": job_id, "ok": False, "erro": str(e), "tentativas": tentativa}
+                    self.stats["repeticoes"] += 1
+                    if status_code(e) == 429:
+                        # Limite da conta: ninguém mais é admitido durante a espera
+                        limiter.pausar(espera)
+                    else:
+                        await asyncio.sleep(espera)
+                    continue
+
+                self.resiliencia.sucesso()
+                latencia = time.perf_counter() - inicio
+                self.controle.registrar(inicio_controle, latencia)
+                await semaforo.atualizar()
+                self.stats["analises"] += 1
+                self.stats["tokens_estimados"] += tokens
+                self.stats["latencias"].append(latencia)
+                return {"id": job_id, "ok": True, "resultado": resultado, "latencia_s": round(latencia, 3),
+                        "fila_s": round(fila, 3), "preparo_s": round(preparo, 3), "tentativas": tentativa}
+
+    async def _executar_todos(self, jobs) -> List[Dict]:
+        limiter = RateLimiter(self.rpm, self.tpm)
+        semaforo = VagasAdaptativas(self.controle)
+        # O executor padrão do asyncio.to_thread tem cpu+4 threads: limitaria a concorrência
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=self.controle.maximo))
+        return await asyncio.gather(*(
+            self._executar_job(limiter, semaforo, job_id, preparar, executar)
+            for job_id, preparar, executar in jobs
+        ))
+
+    def executar_todos(self, jobs: List[Tuple[str, Callable, Callable]]) -> List[Dict]:
+        """Executa os jobs (id, preparar, executar) e retorna os resultados na mesma ordem"""
+        self._reset()
+        self.stats["inicio"] = time.perf_counter()
+        try:
+            return asyncio.run(self._executar_todos(jobs))
+        finally:
+            self.stats["fim"] = time.perf_counter()
+
+    def relatorio(self) -> Dict:
+        """Vazão obtida na última execução"""
+        s = self.stats
+        duracao = (s["fim"] or time.perf_counter()) - s["inicio"] if s["inicio"] else 0.0
+        minutos = duracao / 60.0
+        return {
+            "analises": s["analises"],
+            "falhas": s["falhas"],
+            "erros_429": s["erros_429"],
+            "repeticoes": s["repeticoes"],
+            "concorrencia": self.concorrencia,
+            "concorrencia_atual": self.controle.limite,
+            "aimd": self.controle.relatorio(),
+            "limite_rpm": self.rpm,
+            "limite_tpm": self.tpm,
+            "duracao_s": round(duracao, 1),
+            "analises_por_min": round(s["analises"] / minutos, 2) if minutos else None,
+            "tokens_por_min": round(s["tokens_estimados"] / minutos) if minutos else None,
+            "latencia_media_s": round(sum(s["latencias"]) / len(s["latencias"]), 2) if s["latencias"] else None,
+        }
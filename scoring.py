@@ -0,0 +1,190 @@
+"""
+Notas Locais dos Critérios Quantitativos
+========================================
+
+"Liquidez & Preço de Entrada" é basicamente aritmética sobre avaliação,
+valor mínimo, desconto e tipologia; não precisa do modelo. Este módulo
+calcula as notas desses critérios a partir dos dados do anúncio
+(listing.py), de forma determinística e reproduzível.
+
+Modos ("scoring_modo" no config.json):
+- prompt (padrão): as notas locais vão na mensagem, o modelo avalia só os
+  critérios restantes (prompt e resposta menores) e a nota final é
+  recalculada localmente
+- sobrescrever: o modelo avalia os cinco critérios como antes e as notas
+  locais substituem as dele
+- desligado: comportamento original
+
+Critérios locais em "criterios_locais" (padrão: só Liquidez & Preço de
+Entrada; "Velocidade de Liquidez" também pode ser calculado, mas sem
+considerar a localização). Sem dados suficientes no anúncio (valor mínimo
+e desconto/avaliação), o critério volta para o modelo.
+
+A nota final (`nota_final`) é a média ponderada das notas presentes,
+normalizada pela soma dos pesos presentes; com critério ausente ou sem nota
+numérica ela sai marcada "incompleta", com os critérios faltando.
+"""
+
+from typing import Callable, Dict, List, Optional
+
+from listing import extrair_dados
+from prompts import CRITERIOS
+from screening import DEFAULT_PRECO_IDEAL, TIPOS
+
+# Muda sempre que as fórmulas mudarem (faz parte da chave do cache)
+VERSAO = 1
+
+MODOS = ("prompt", "sobrescrever", "desligado")
+DEFAULT_MODO = "prompt"
+DEFAULT_CRITERIOS_LOCAIS = ["Liquidez & Preço de Entrada"]
+
+PESOS = dict(CRITERIOS)
+
+
+def _brl(valor: float) -> str:
+    return f"R$ {valor:,.0f}".replace(",", ".")
+
+
+def _dec(valor: float) -> str:
+    return f"{valor:.1f}".replace(".", ",")
+
+
+def _faixa(valor: Optional[float], ideal_min: float, ideal_max: float, fora: float) -> float:
+    """10 dentro da faixa ideal, `fora` fora dela, 5 sem informação"""
+    if valor is None:
+        return 5.0
+    return 10.0 if ideal_min <= valor <= ideal_max else fora
+
+
+def nota_liquidez_preco(dados: Dict, preco_ideal: float = DEFAULT_PRECO_IDEAL) -> Optional[Dict]:
+    """Liquidez & Preço de Entrada: deságio (60%), tipologia (25%) e preço de entrada (15%)"""
+    valor = dados.get("valor_minimo")
+    desconto = dados.get("desconto_percent")
+    if not valor or desconto is None:
+        return None
+
+    n_desconto = min(max(desconto, 0.0) / 50.0, 1.0) * 10
+    n_tipologia = (
+        _faixa(dados.get("quartos"), 2, 3, 7.0)
+        + _faixa(dados.get("vagas"), 1, 10, 5.0)
+        + _faixa(dados.get("area_privativa_m2"), 40, 90, 6.0)
+    ) / 3
+    n_preco = min(10.0, 10.0 * preco_ideal / valor)
+    nota = 0.60 * n_desconto + 0.25 * n_tipologia + 0.15 * n_preco
+
+    tipologia = ", ".join(
+        texto for texto in (
+            dados.get("tipo"),
+            f"{dados['quartos']:.0f} quartos" if dados.get("quartos") is not None else None,
+            f"{dados['vagas']:.0f} vaga(s)" if dados.get("vagas") is not None else None,
+            f"{_dec(dados['area_privativa_m2'])} m² privativos" if dados.get("area_privativa_m2") else None,
+        ) if texto
+    ) or "tipologia não informada"
+    avaliacao = f" sobre avaliação de {_brl(dados['valor_avaliacao'])}" if dados.get("valor_avaliacao") else ""
+    justificativa = (
+        f"Deságio de {_dec(desconto)}%{avaliacao}, entrada de {_brl(valor)}; {tipologia}. "
+        f"Componentes: deságio {n_desconto:.1f}, tipologia {n_tipologia:.1f}, preço {n_preco:.1f}. "
+        "Bairro não considerado. Nota calculada localmente."
+    )
+    return {"nota": round(nota, 1), "justificativa": justificativa}
+
+
+def nota_velocidade_liquidez(dados: Dict, preco_ideal: float = DEFAULT_PRECO_IDEAL) -> Optional[Dict]:
+    """Velocidade de Liquidez pelo perfil: tipo (40%), pagamento (30%) e ocupação (30%)"""
+    if not dados.get("valor_minimo") or not dados.get("tipo"):
+        return None
+
+    tipo = dados["tipo"].lower()
+    n_tipo = next((nota for nome, nota in TIPOS.items() if nome in tipo), 5.0)
+    if dados.get("financiamento"):
+        n_pagamento = 10.0
+    elif dados.get("fgts"):
+        n_pagamento = 7.0
+    else:
+        n_pagamento = 5.0 if dados.get("financiamento") is None else 3.0
+    ocupado = dados.get("ocupado")
+    n_ocupacao = 6.0 if ocupado is None else (3.0 if ocupado else 10.0)
+    nota = 0.40 * n_tipo + 0.30 * n_pagamento + 0.30 * n_ocupacao
+
+    justificativa = (
+        f"{dados['tipo']}, entrada de {_brl(dados['valor_minimo'])}, "
+        f"{'aceita financiamento' if dados.get('financiamento') else 'sem financiamento informado'}, "
+        f"{'ocupado' if ocupado else 'desocupado' if ocupado is False else 'ocupação não informada'}. "
+        "Localização não considerada. Nota calculada localmente."
+    )
+    return {"nota": round(nota, 1), "justificativa": justificativa}
+
+
+CALCULOS: Dict[str, Callable[[Dict, float], Optional[Dict]]] = {
+    "Liquidez & Preço de Entrada": nota_liquidez_preco,
+    "Velocidade de Liquidez": nota_velocidade_liquidez,
+}
+
+
+def modo(config: Dict) -> str:
+    return config.get("scoring_modo", DEFAULT_MODO)
+
+
+def criterios_locais(html: str, config: Dict) -> List[Dict]:
+    """Critérios calculados localmente para o anúncio, no formato da saída"""
+    if modo(config) == "desligado":
+        return []
+
+    dados = extrair_dados(html)
+    preco_ideal = config.get("triagem_preco_ideal", DEFAULT_PRECO_IDEAL)
+    locais = []
+    for nome in config.get("criterios_locais", DEFAULT_CRITERIOS_LOCAIS):
+        calculo = CALCULOS.get(nome)
+        resultado = calculo(dados, preco_ideal) if calculo else None
+        if resultado:
+            locais.append({"nome": nome, "peso": PESOS[nome], "nota": resultado["nota"],
+                           "justificativa": resultado["justificativa"], "fontes": ["Anúncio/HTML"]})
+    return locais
+
+
+def instrucao_prompt(locais: List[Dict]) -> str:
+    """Complemento da mensagem no modo prompt: notas prontas e critérios a avaliar"""
+    nomes = {c["nome"] for c in locais}
+    prontos = "\n".join(f"- {c['nome']} (peso {c['peso']:.2f}): nota {c['nota']}" for c in locais)
+    restantes = ", ".join(nome for nome, _ in CRITERIOS if nome not in nomes)
+    return (
+        "\n\nCritérios já calculados localmente a partir do anúncio (não os avalie nem os inclua em \"criterios\"):\n"
+        f"{prontos}\n"
+        f"Avalie apenas: {restantes}. A nota_final será recalculada localmente com todos os critérios."
+    )
+
+
+def nota_valida(criterio: Dict) -> bool:
+    nota = criterio.get("nota")
+    return isinstance(nota, (int, float)) and not isinstance(nota, bool)
+
+
+def nota_final(criterios: List[Dict]) -> Dict:
+    """Média ponderada das notas presentes, normalizada pela soma dos pesos presentes
+
+    Critério ausente ou sem nota numérica não entra na média (em vez de
+    puxá-la para baixo); a nota sai marcada "incompleta", com os faltantes.
+    """
+    validos = {c["nome"]: c["nota"] for c in criterios
+               if isinstance(c, dict) and c.get("nome") in PESOS and nota_valida(c)}
+    soma_pesos = sum(PESOS[nome] for nome in validos)
+    valor = sum(nota * PESOS[nome] for nome, nota in validos.items()) / soma_pesos if soma_pesos else 0.0
+    resultado = {"metodo": "media_ponderada", "valor": round(valor, 1)}
+    faltando = [nome for nome, _ in CRITERIOS if nome not in validos]
+    if faltando:
+        resultado.update(incompleta=True, criterios_faltando=faltando)
+    return resultado
+
+
+def aplicar(analise: Dict, locais: List[Dict]) -> Dict:
+    """Insere/substitui os critérios locais e recalcula a nota final ponderada"""
+    if not locais:
+        return analise
+
+    por_nome = {c.get("nome"): c for c in analise.get("criterios") or [] if isinstance(c, dict)}
+    por_nome.update({c["nome"]: c for c in locais})
+    analise["criterios"] = [por_nome[nome] for nome, _ in CRITERIOS if nome in por_nome]
+
+    analise["nota_final"] = nota_final(analise["criterios"])
+    analise["criterios_locais"] = [c["nome"] for c in locais]
+    return analise
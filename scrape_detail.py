@@ -1,6 +1,10 @@
 from bs4 import BeautifulSoup
+import json
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select, WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -8,6 +12,17 @@ from var import vars
 import os
 from selenium.webdriver.chrome.options import Options
 
+from concorrencia import ControleAIMD, Vagas
+
+# Navegadores em paralelo: começa em scraping_concorrencia e se ajusta (AIMD, concorrencia.py)
+# até scraping_concorrencia_max conforme o site responde
+CONCORRENCIA = int(vars.get("scraping_concorrencia", 1))
+CONCORRENCIA_MAX = int(vars.get("scraping_concorrencia_max", 3))
+# Espera máxima por cada elemento da página; estourar conta como site sobrecarregado
+TIMEOUT = float(vars.get("scraping_timeout_s", 30))
+TIMEOUT_PDF = float(vars.get("scraping_timeout_pdf_s", 15))
+TENTATIVAS = 3
+
 # Caminho onde quer salvar os PDFs
 download_dir = f"{os.getcwd()}/data/detail/{vars['cidade'].lower()}_{vars['estado'].lower()}"
 
@@ -34,48 +49,106 @@ for tag in soup.find_all(text=lambda t: "Número do imóvel" in t):
         numero = partes[1].strip().split("<")[0].split()[0].replace("-", "")  # extrai o número e remove o hífen
         imoveis.append(numero)
 
-for imovel in imoveis:
-    print(imovel)
-
-    driver = webdriver.Chrome(options=options)
-    driver.get("https://venda-imoveis.caixa.gov.br/sistema/busca-imovel.asp")
-
-    wait = WebDriverWait(driver, 10)
-
-    # Espera até o select de estado estar presente no DOM
-    estado_select = wait.until(EC.presence_of_element_located((By.ID, "cmb_estado")))
-
-    time.sleep(5)
-
-    # Seleciona o estado (ex:x Pernambuco)
-    Select(estado_select).select_by_visible_text(vars["estado"])
 
-    time.sleep(5)
+def opcao_disponivel(elemento_id, texto):
+    """Condição de espera: o select já tem a opção (carregada pelo JavaScript do site)"""
+    def condicao(driver):
+        try:
+            select = Select(driver.find_element(By.ID, elemento_id))
+            return select if any(o.text.strip() == texto for o in select.options) else False
+        except WebDriverException:
+            return False
+    return condicao
 
-    # Espera o campo de cidade ser atualizado
-    cidade_select = wait.until(EC.presence_of_element_located((By.ID, "cmb_cidade")))
 
-    # Seleciona a cidade (ex: RECIFE)
-    Select(cidade_select).select_by_visible_text(vars["cidade"])
+def esperar_pdf(imovel):
+    """Aguarda o download da matrícula terminar (sem o .crdownload do Chrome)"""
+    pdf = f"{download_dir}/{imovel}.pdf"
+    limite = time.monotonic() + TIMEOUT_PDF
+    while time.monotonic() < limite:
+        if os.path.exists(pdf) and not os.path.exists(f"{pdf}.crdownload"):
+            return True
+        time.sleep(0.2)
+    return False
 
-    # Extrai todas as opções de cidade
-    time.sleep(2)
-    driver.find_element(By.ID, "btn_next0").click()
-    time.sleep(2)
-    driver.find_element(By.ID, "btn_next1").click()
-
-    time.sleep(2)
-
-    # salvar detalhe:
-    driver.execute_script(f"detalhe_imovel({imovel})")
-    detalhe = wait.until(EC.presence_of_element_located((By.ID, "dadosImovel")))
-
-    with open(f"{path}/{imovel}.html", "w", encoding="utf-8") as f:
-        f.write(detalhe.get_attribute("outerHTML"))
-
-    driver.execute_script(f"ExibeDoc('/editais/matricula/{vars['estado']}/{imovel}.pdf')")
-
-    time.sleep(2)  # espera o PDF carregar
-
-    driver.quit()
 
+def baixar_imovel(imovel):
+    """HTML de detalhe e PDF da matrícula de um imóvel (um navegador por imóvel)"""
+    driver = webdriver.Chrome(options=options)
+    try:
+        driver.get("https://venda-imoveis.caixa.gov.br/sistema/busca-imovel.asp")
+
+        wait = WebDriverWait(driver, TIMEOUT)
+
+        # Espera o select de estado ter as opções e seleciona o estado (ex:x Pernambuco)
+        wait.until(opcao_disponivel("cmb_estado", vars["estado"])).select_by_visible_text(vars["estado"])
+
+        # Espera o campo de cidade ser atualizado e seleciona a cidade (ex: RECIFE)
+        wait.until(opcao_disponivel("cmb_cidade", vars["cidade"])).select_by_visible_text(vars["cidade"])
+
+        wait.until(EC.element_to_be_clickable((By.ID, "btn_next0"))).click()
+        wait.until(EC.element_to_be_clickable((By.ID, "btn_next1"))).click()
+        wait.until(EC.presence_of_element_located((By.ID, "listaimoveispaginacao")))
+
+        # salvar detalhe:
+        driver.execute_script(f"detalhe_imovel({imovel})")
+        detalhe = wait.until(EC.presence_of_element_located((By.ID, "dadosImovel")))
+
+        with open(f"{path}/{imovel}.html", "w", encoding="utf-8") as f:
+            f.write(detalhe.get_attribute("outerHTML"))
+
+        driver.execute_script(f"ExibeDoc('/editais/matricula/{vars['estado']}/{imovel}.pdf')")
+
+        if not esperar_pdf(imovel):
+            print(f"{imovel}: matrícula não baixada em {TIMEOUT_PDF:.0f}s", file=sys.stderr)
+    finally:
+        driver.quit()
+
+
+controle = ControleAIMD.de_config(vars, "scraping", CONCORRENCIA, CONCORRENCIA_MAX,
+                                  log=lambda msg: print(msg, file=sys.stderr))
+vagas = Vagas(controle)
+tempos = []
+falhas = {}
+
+
+def processar(imovel):
+    for tentativa in range(1, TENTATIVAS + 1):
+        with vagas:
+            inicio = time.monotonic()
+            try:
+                baixar_imovel(imovel)
+            except (TimeoutException, WebDriverException) as e:
+                # Timeout ou página quebrada: site lento, menos navegadores em paralelo
+                controle.registrar(inicio, congestionado=True)
+                falhas[imovel] = f"{type(e).__name__}: {str(e).strip()[:200]}"
+                print(f"{imovel}: tentativa {tentativa} falhou ({type(e).__name__})", file=sys.stderr)
+                continue
+            latencia = time.monotonic() - inicio
+            controle.registrar(inicio, latencia)
+            tempos.append(latencia)
+            falhas.pop(imovel, None)
+            print(imovel, flush=True)
+            return
+
+
+inicio_scraping = time.monotonic()
+try:
+    with ThreadPoolExecutor(max_workers=controle.maximo) as executor:
+        list(executor.map(processar, imoveis))
+finally:
+    # Métricas para o relatório do automation.py
+    with open(f"data/detail/scraping_{vars['cidade'].lower()}_{vars['estado'].lower()}.json", "w",
+              encoding="utf-8") as f:
+        json.dump({
+            "imoveis": len(imoveis),
+            "baixados": len(tempos),
+            "falhas": falhas,
+            "duracao_s": round(time.monotonic() - inicio_scraping, 1),
+            "tempo_medio_s": round(sum(tempos) / len(tempos), 1) if tempos else None,
+            "concorrencia": controle.relatorio(),
+        }, f, indent=2, ensure_ascii=False)
+
+# Falha só se nenhum imóvel foi baixado; os demais seguem para a análise
+if imoveis and not tempos:
+    sys.exit(1)
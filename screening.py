@@ -0,0 +1,171 @@
+"""
+Triagem Antes da Análise Completa (cascata de dois níveis)
+==========================================================
+
+Nível 1 (barato): toda a lista recebe uma nota provisória (0-10)
+- regras: determinísticas sobre os dados do anúncio (listing.py): desconto,
+  tipo do imóvel, preço de entrada, formas de pagamento e ocupação
+- modelo: um modelo barato (gpt-4o-mini) lê os mesmos dados e um trecho
+  do anúncio; se a chamada falhar, vale a nota das regras
+
+Nível 2 (caro): só os imóveis promovidos seguem para a análise completa.
+Política de promoção (configurável, união dos critérios):
+- top: fração dos melhores da triagem (ex.: 0.3 = 30% melhores)
+- nota_min: nota provisória mínima
+
+Sem nenhum dos dois critérios, todos são promovidos (triagem desligada).
+`economia()` estima tokens, custo e tempo que os descartados deixaram de
+consumir na análise completa.
+"""
+
+import json
+import math
+import sys
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from listing import extrair_dados, texto_detalhe
+from usage import PRECOS_1M, custo_usd, uso_tokens
+
+MODOS = ("regras", "modelo")
+DEFAULT_MODO = "regras"
+DEFAULT_MODELO = "gpt-4o-mini"
+
+# Preço de entrada considerado de liquidez ideal; acima dele a nota cai
+DEFAULT_PRECO_IDEAL = 300000.0
+
+# Preços por 1M de tokens (USD) da análise completa (gpt-4o)
+DEFAULT_PRECO_ENTRADA_1M = PRECOS_1M["gpt-4o"][0]
+DEFAULT_PRECO_SAIDA_1M = PRECOS_1M["gpt-4o"][2]
+
+# Latência típica de uma análise completa quando não há medição na execução
+DEFAULT_LATENCIA_ANALISE = 90.0
+
+TIPOS = {
+    "apartamento": 10, "casa": 9, "sobrado": 9, "kitnet": 8, "flat": 8,
+    "sala": 5, "loja": 5, "comercial": 5, "terreno": 4, "lote": 4, "galpão": 3, "prédio": 3,
+}
+
+PESOS = {"desconto": 0.45, "tipo": 0.20, "preco": 0.20, "pagamento": 0.15}
+
+SCREENING_PROMPT = """
+Você faz a triagem de imóveis de leilão da Caixa para revenda rápida (flip em até 6 meses).
+Com base apenas nos dados do anúncio, dê uma nota provisória de 0 a 10 considerando
+desconto sobre a avaliação, tipo e tamanho do imóvel, preço de entrada, formas de
+pagamento aceitas e ocupação. Responda SOMENTE com o JSON:
+{"nota": 0.0, "motivo": "até 20 palavras"}
+"""
+
+
+def nota_regras(dados: Dict, preco_ideal: float = DEFAULT_PRECO_IDEAL) -> Tuple[float, str]:
+    """Nota provisória determinística; dado ausente conta como neutro (5)"""
+    componentes = {}
+
+    desconto = dados.get("desconto_percent")
+    componentes["desconto"] = min(max(desconto, 0) / 50.0, 1.0) * 10 if desconto is not None else 5.0
+
+    tipo = (dados.get("tipo") or "").lower()
+    componentes["tipo"] = next((nota for nome, nota in TIPOS.items() if nome in tipo), 5.0) if tipo else 5.0
+
+    valor = dados.get("valor_minimo")
+    componentes["preco"] = min(10.0, 10.0 * preco_ideal / valor) if valor else 5.0
+
+    if dados.get("financiamento") is None and dados.get("fgts") is None:
+        componentes["pagamento"] = 5.0
+    else:
+        componentes["pagamento"] = 6.0 * bool(dados.get("financiamento")) + 4.0 * bool(dados.get("fgts"))
+
+    nota = sum(componentes[k] * peso for k, peso in PESOS.items())
+    if dados.get("ocupado"):
+        nota -= 1.5
+
+    motivo = ", ".join(f"{k} {v:.1f}" for k, v in componentes.items())
+    if dados.get("ocupado"):
+        motivo += ", ocupado -1.5"
+    return round(min(max(nota, 0.0), 10.0), 2), motivo
+
+
+def nota_modelo(client, dados: Dict, texto: str, model: str = DEFAULT_MODELO) -> Tuple[float, str, Dict]:
+    """Nota provisória de um modelo barato; retorna (nota, motivo, usage)"""
+    response = client.chat.completions.create(
+        model=model,
+        temperature=0,
+        response_format={"type": "json_object"},
+        messages=[
+            {"role": "system", "content": SCREENING_PROMPT},
+            {"role": "user", "content": f"Dados: {json.dumps(dados, ensure_ascii=False)}\n\nAnúncio: {texto[:3000]}"},
+        ],
+    )
+    resposta = json.loads(response.choices[0].message.content)
+    nota = min(max(float(resposta["nota"]), 0.0), 10.0)
+    usage = response.usage
+    return round(nota, 2), str(resposta.get("motivo", "")), {
+        "input_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "output_tokens": getattr(usage, "completion_tokens", 0) or 0,
+    }
+
+
+def triar(htmls: Dict[str, str], modo: str = DEFAULT_MODO, client=None, model: str = DEFAULT_MODELO,
+          preco_ideal: float = DEFAULT_PRECO_IDEAL) -> List[Dict]:
+    """Nota provisória de cada imóvel ({id: html de detalhe}), da maior para a menor"""
+    triagem = []
+    for imovel_id, html in htmls.items():
+        dados = extrair_dados(html)
+        nota, motivo = nota_regras(dados, preco_ideal)
+        item = {"id": imovel_id, "nota_triagem": nota, "motivo": motivo, "modo": "regras", "dados": dados}
+
+        if modo == "modelo" and client is not None:
+            try:
+                nota, motivo, usage = nota_modelo(client, dados, texto_detalhe(html), model)
+                item.update(nota_triagem=nota, motivo=motivo, modo="modelo", usage=usage)
+            except Exception as e:
+                print(f"[AVISO] Triagem por modelo falhou para {imovel_id}, usando regras: {e}", file=sys.stderr)
+
+        triagem.append(item)
+
+    triagem.sort(key=lambda i: i["nota_triagem"], reverse=True)
+    return triagem
+
+
+def promover(triagem: List[Dict], top: Optional[float] = None, nota_min: Optional[float] = None) -> Set[str]:
+    """Ids promovidos à análise completa (triagem ordenada pela nota)"""
+    if top is None and nota_min is None:
+        return {i["id"] for i in triagem}
+
+    promovidos = set()
+    if top is not None:
+        promovidos.update(i["id"] for i in triagem[:math.ceil(len(triagem) * top)])
+    if nota_min is not None:
+        promovidos.update(i["id"] for i in triagem if i["nota_triagem"] >= nota_min)
+    return promovidos
+
+
+def economia(tokens_descartados: Iterable[int], output_tokens: int, latencia_analise: Optional[float],
+             concorrencia: int = 1, triagem: Iterable[Dict] = (),
+             preco_entrada_1m: float = DEFAULT_PRECO_ENTRADA_1M,
+             preco_saida_1m: float = DEFAULT_PRECO_SAIDA_1M) -> Dict:
+    """Estimativa do que os descartados deixaram de consumir, descontado o custo da triagem
+
+    `tokens_descartados`: tokens estimados (entrada + saída) de cada análise
+    completa evitada; `output_tokens`: parte de saída de cada uma.
+    """
+    tokens = list(tokens_descartados)
+    evitadas = len(tokens)
+    entrada = sum(tokens) - evitadas * output_tokens
+    saida = evitadas * output_tokens
+    custo_evitado = (entrada * preco_entrada_1m + saida * preco_saida_1m) / 1e6
+
+    # Triagem por modelo tem custo próprio (gpt-4o-mini: ~1/16 do gpt-4o)
+    custo_triagem = sum(custo_usd(uso_tokens(i["usage"]), DEFAULT_MODELO) for i in triagem if i.get("usage"))
+
+    latencia = latencia_analise or DEFAULT_LATENCIA_ANALISE
+    return {
+        "analises_evitadas": evitadas,
+        "tokens_evitados_estimados": sum(tokens),
+        "custo_evitado_usd_estimado": round(custo_evitado, 4),
+        "custo_triagem_usd": round(custo_triagem, 4),
+        "economia_liquida_usd_estimada": round(custo_evitado - custo_triagem, 4),
+        "tempo_api_evitado_s_estimado": round(evitadas * latencia, 1),
+        "tempo_execucao_evitado_s_estimado": round(evitadas * latencia / max(1, concorrencia), 1),
+        "latencia_analise_s": round(latencia, 1),
+        "latencia_medida": latencia_analise is not None,
+    }
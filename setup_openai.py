@@ -6,15 +6,24 @@ Este script configura automaticamente todo o ambiente necessário
 para executar as análises de imóveis com IA:
 
 1. Verifica chave da API OpenAI
-2. Faz upload do edital.pdf
-3. Cria novo assistente
-4. Testa a configuração
-5. Valida todo o pipeline
+2. Faz upload do edital.pdf (só se o conteúdo ainda não foi enviado)
+3. Indexa o edital num vector store persistente
+4. Cria novo assistente (com o vector store do edital)
+5. Testa a configuração
+
+O edital é indexado uma única vez: as análises reutilizam o vector store do
+assistente em vez de anexar o arquivo a cada mensagem (o que faz a
+plataforma criar e indexar um vector store novo por thread).
 
 Uso:
     python setup_openai.py
+
+    # Troca só o edital: reenvia o PDF, atualiza o vector store e o assistente atual
+    python setup_openai.py --apenas-edital
 """
 
+import argparse
+
 import os
 import sys
 import io
@@ -22,6 +31,9 @@ import json
 from pathlib import Path
 from dotenv import load_dotenv
 from openai import OpenAI
+from editais import RegistroEditais
+from prompts import INSTRUCTIONS, MODEL
+from resilience import Resiliencia, cliente_resiliente
 
 # Configurar encoding UTF-8 para Windows
 if sys.platform == 'win32':
@@ -97,7 +109,7 @@ class SetupOpenAI:
         
         # Testa a chave
         try:
-            self.client = OpenAI(api_key=api_key)
+            self.client = cliente_resiliente(OpenAI(api_key=api_key), Resiliencia.de_config(self.config))
             # Tenta listar modelos para validar a chave
             models = self.client.models.list()
             self.log(f"Chave da API válida! ({api_key[:15]}...)", "SUCCESS")
@@ -116,158 +128,86 @@ class SetupOpenAI:
             return False
         
         try:
-            self.log("Fazendo upload do edital.pdf...", "STEP")
-            file = self.client.files.create(
-                file=open(self.edital_path, "rb"),
-                purpose="assistants"
-            )
+            # Mesmo conteúdo já enviado (registro de editais): reaproveita o file_id
+            self.log("Fazendo upload do edital.pdf (se ainda não enviado)...", "STEP")
+            registro = RegistroEditais.de_config(self.config, log=lambda msg: self.log(msg, "STEP"))
+            file_id = registro.arquivos[registro.enviar(self.client, str(self.edital_path))]["file_id"]
             
-            self.config["edital_file_id"] = file.id
+            self.config["edital_file_id"] = file_id
             self.save_config()
             
-            self.log(f"Upload concluído! File ID: {file.id}", "SUCCESS")
+            self.log(f"Edital pronto! File ID: {file_id}", "SUCCESS")
             return True
             
         except Exception as e:
             self.log(f"Erro no upload: {e}", "ERROR")
             return False
     
+    def index_edital(self) -> bool:
+        """Indexa o edital no vector store persistente (cria ou atualiza)"""
+        self.step_header(3, "Indexar Edital (Vector Store)")
+        
+        file_id = self.config["edital_file_id"]
+        vector_store_id = self.config.get("edital_vector_store_id")
+        
+        try:
+            if vector_store_id:
+                try:
+                    self.client.vector_stores.retrieve(vector_store_id)
+                except Exception:
+                    self.log(f"Vector store {vector_store_id} não encontrado, criando outro", "WARNING")
+                    vector_store_id = None
+            
+            if not vector_store_id:
+                self.log("Criando vector store do edital...", "STEP")
+                vector_store = self.client.vector_stores.create(name="Leilão Bot - Editais")
+                vector_store_id = vector_store.id
+            
+            # Mantém no vector store apenas o edital atual
+            indexados = [f.id for f in self.client.vector_stores.files.list(vector_store_id=vector_store_id)]
+            if file_id in indexados:
+                self.log("Edital já indexado", "SUCCESS")
+            else:
+                self.log("Indexando edital (uma única vez)...", "STEP")
+                arquivo = self.client.vector_stores.files.create_and_poll(
+                    vector_store_id=vector_store_id,
+                    file_id=file_id
+                )
+                if arquivo.status != "completed":
+                    self.log(f"Falha ao indexar o edital: {arquivo.status} {arquivo.last_error}", "ERROR")
+                    return False
+            for antigo in indexados:
+                if antigo != file_id:
+                    self.client.vector_stores.files.delete(file_id=antigo, vector_store_id=vector_store_id)
+                    self.log(f"  Edital anterior removido do índice: {antigo}")
+            
+            self.config["edital_vector_store_id"] = vector_store_id
+            self.save_config()
+            
+            self.log(f"Vector store pronto! ID: {vector_store_id}", "SUCCESS")
+            return True
+            
+        except Exception as e:
+            self.log(f"Erro ao indexar edital: {e}", "ERROR")
+            return False
+    
+    def tool_resources(self) -> dict:
+        """Vector store do edital para a ferramenta file_search do assistente"""
+        return {"file_search": {"vector_store_ids": [self.config["edital_vector_store_id"]]}}
+    
     def create_assistant(self) -> bool:
         """Cria novo assistente"""
-        self.step_header(3, "Criar Assistente de Análise")
+        self.step_header(4, "Criar Assistente de Análise")
         
         try:
             self.log("Criando assistente com GPT-4o...", "STEP")
             
             assistant = self.client.beta.assistants.create(
                 name="Leilão Bot",
-                instructions="""
-Tarefa:
-Analise um edital em PDF, o texto da matrícula do imóvel (em PDF convertido) e um HTML com a descrição do imóvel para classificar a atratividade do imóvel para revenda em até 6 meses (flip).
-Você deve extrair todos os dados relevantes, citar a fonte de cada informação e atribuir notas (0–10) a cinco critérios principais, calculando a nota final ponderada.
-
-Entradas fornecidas:
-- Edital (PDF): anexado
-- Matrícula: texto integral ou PDF convertido
-- Descrição (HTML): HTML extraído do site do leilão
-
-Instruções de análise:
-Extraia e liste todas as informações abaixo, sempre com "Fonte: …"
-Use "Edital pág. X", "Matrícula AV-nº/Registro/Descrição", ou "Anúncio/HTML".
-Se a informação não constar, marque "Não informado" (sem inferir).
-
-Deve incluir, se existir no material:
-- Nome do condomínio
-- Habite-se (ou averbação equivalente)
-- Apartamento e bloco
-- Área privativa e total
-- Quartos
-- Matrícula e escritura registrada
-- Pendências judiciais ou averbações de ações
-- Processo judicial (número, vara ou tipo, se constar)
-- Vaga(s) de garagem (nº ou fração ideal)
-- Itens de lazer do condomínio (se descritos)
-- Dados e endereço dos adquirentes anteriores
-- Forma de título (compra e venda, alienação fiduciária, adjudicação etc.)
-- Laudêmio (existência e tipo, se aplicável)
-- Notícia de abertura de execução extrajudicial
-- Decurso de prazo com purga de mora
-- Documentos que instruíram o registro da execução
-- Resultado / Código hash do CNIB
-- DOI (Declaração sobre Operações Imobiliárias)
-- Registro na matrícula (número, data, ato e natureza)
-- Sequencial de registros e averbações
-- Inscrição imobiliária
-- Quitação da dívida / cancelamento da cédula
-- Averbação de leilão negativo
-- Outras observações de ônus ou restrições de disponibilidade
-
-Critérios e notas (0–10):
-Avalie exatamente 5 critérios com base nas informações coletadas.
-Para cada um, dê nota (0–10), justifique em 2–4 linhas, e cite as fontes.
-
-Critério | Peso | Descrição
-1. Liquidez & Preço de Entrada | 0.30 | Considere deságio vs. avaliação, tipologia (quartos, área, vaga) e bairro.
-2. Situação Registral & Risco Jurídico | 0.25 | Analise cadeia dominial, consolidação, cancelamento de ônus, pendências judiciais e regularidade registral.
-3. Despesas Propter Rem | 0.20 | Regras de IPTU e condomínio (limites, repasses e riscos de passivo).
-4. Prazos de Contratação & Registro | 0.15 | Compatibilidade entre prazos de pagamento, contratação e registro com o horizonte de 6 meses.
-5. Velocidade de Liquidez | 0.10 | Potencial de revenda rápida em 6 meses considerando localização e perfil do imóvel.
-
-Cálculo da nota final:
-Use média ponderada: Nota_Final = (C1×0.30) + (C2×0.25) + (C3×0.20) + (C4×0.15) + (C5×0.10)
-Apresente a fórmula e o resultado final com 1 casa decimal.
-
-Sinalizadores de risco:
-Liste 2 riscos práticos baseados nos documentos (ex.: passivo condominial acima do limite, atraso cartorial, pendência judicial, ausência de quitação).
-
-Próximos passos objetivos:
-Liste 2 ações diretas para mitigar riscos e acelerar a revenda (ex.: solicitar certidões, confirmar quitação, contato com síndico, preparar orçamento de reforma rápida).
-
-Saída obrigatória:
-A resposta final deve ser apenas o JSON abaixo (sem texto explicativo), seguindo exatamente esta estrutura:
-
-{
-  "imovel": {
-    "empreendimento": "",
-    "condominio": "",
-    "habite_se": "",
-    "apartamento": "",
-    "bloco": "",
-    "area_privativa_m2": "",
-    "area_total_m2": "",
-    "quartos": "",
-    "vaga_garagem": "",
-    "itens_lazer": "",
-    "matricula": "",
-    "oficio": "",
-    "comarca": "",
-    "inscricao_imobiliaria": "",
-    "forma_titulo": "",
-    "laudemio": "",
-    "noticia_execucao_extrajudicial": "",
-    "decurso_prazo_purga_mora": "",
-    "documentos_instrucao": "",
-    "codigo_cnib": "",
-    "doi": "",
-    "registro": "",
-    "sequencial": "",
-    "pendencias_judiciais": "",
-    "processo_judicial": "",
-    "restricoes_disponibilidade": "",
-    "quitacao_divida": "",
-    "averbacao_leilao_negativo": "",
-    "avaliacao": "",
-    "valor_minimo": "",
-    "desconto_percent": "",
-    "fonte_principal": ""
-  },
-  "criterios": [
-    {"nome": "Liquidez & Preço de Entrada", "peso": 0.30, "nota": 0, "justificativa": "", "fontes": []},
-    {"nome": "Situação Registral & Risco Jurídico", "peso": 0.25, "nota": 0, "justificativa": "", "fontes": []},
-    {"nome": "Despesas Propter Rem", "peso": 0.20, "nota": 0, "justificativa": "", "fontes": []},
-    {"nome": "Prazos de Contratação & Registro", "peso": 0.15, "nota": 0, "justificativa": "", "fontes": []},
-    {"nome": "Velocidade de Liquidez", "peso": 0.10, "nota": 0, "justificativa": "", "fontes": []}
-  ],
-  "nota_final": {"metodo": "media_ponderada", "valor": 0.0},
-  "riscos": [
-    {"descricao": "", "fonte": ""},
-    {"descricao": "", "fonte": ""}
-  ],
-  "proximos_passos": [
-    "",
-    ""
-  ]
-}
-
-Regras finais:
-- Português claro e técnico.
-- Sem inferências: se não constar nos documentos, use "Não informado".
-- Sem links externos.
-- Cite "Fonte: …" em cada dado extraído.
-- Resposta final deve ser SOMENTE o JSON.
-""",
-                model="gpt-4o",
-                tools=[{"type": "file_search"}]
+                instructions=INSTRUCTIONS,
+                model=MODEL,
+                tools=[{"type": "file_search"}],
+                tool_resources=self.tool_resources()
             )
             
             self.config["assistant_id"] = assistant.id
@@ -280,12 +220,27 @@ Regras finais:
             self.log(f"Erro ao criar assistente: {e}", "ERROR")
             return False
     
+    def attach_vector_store(self) -> bool:
+        """Aponta o assistente existente para o vector store do edital"""
+        self.step_header(4, "Atualizar Assistente")
+        
+        try:
+            self.client.beta.assistants.update(
+                self.config["assistant_id"],
+                tool_resources=self.tool_resources()
+            )
+            self.log(f"Assistente {self.config['assistant_id']} usando o vector store do edital", "SUCCESS")
+            return True
+        except Exception as e:
+            self.log(f"Erro ao atualizar assistente: {e}", "ERROR")
+            return False
+    
     def test_configuration(self) -> bool:
         """Testa a configuração completa"""
-        self.step_header(4, "Testar Configuração")
+        self.step_header(5, "Testar Configuração")
         
         # Verifica se todos os IDs estão presentes
-        required_keys = ["edital_file_id", "assistant_id"]
+        required_keys = ["edital_file_id", "edital_vector_store_id", "assistant_id"]
         missing = [k for k in required_keys if k not in self.config]
         
         if missing:
@@ -308,6 +263,14 @@ Regras finais:
             self.log(f"  ✗ Assistant ID inválido: {e}", "ERROR")
             return False
         
+        self.log("Verificando vector store do edital...", "STEP")
+        file_search = getattr(assistant_info.tool_resources, "file_search", None)
+        if not file_search or self.config["edital_vector_store_id"] not in (file_search.vector_store_ids or []):
+            self.log("  ✗ Assistente não está usando o vector store do edital", "ERROR")
+            return False
+        vector_store = self.client.vector_stores.retrieve(self.config["edital_vector_store_id"])
+        self.log(f"  ✓ Vector store válido: {vector_store.file_counts.completed} arquivo(s) indexado(s)", "SUCCESS")
+        
         return True
     
     def show_summary(self):
@@ -318,6 +281,7 @@ Regras finais:
         print(f"\n📋 Resumo da Configuração:")
         print(f"  • API Key: {os.getenv('OPENAI_API_KEY', '')[:15]}...")
         print(f"  • File ID: {self.config.get('edital_file_id', 'N/A')}")
+        print(f"  • Vector Store ID: {self.config.get('edital_vector_store_id', 'N/A')}")
         print(f"  • Assistant ID: {self.config.get('assistant_id', 'N/A')}")
         print(f"\n🚀 Próximos Passos:")
         print(f"  1. Testar análise individual:")
@@ -328,7 +292,7 @@ Regras finais:
         print(f"     python automation.py --estado GO --cidade GOIANIA --min-nota 7")
         print(f"\n{'='*60}\n")
     
-    def run(self):
+    def run(self, apenas_edital: bool = False):
         """Executa todo o processo de configuração"""
         print("\n" + "="*60)
         print("🤖 CONFIGURAÇÃO AUTOMÁTICA - OpenAI Assistant")
@@ -347,12 +311,21 @@ Regras finais:
             self.log("Configuração abortada: falha no upload", "ERROR")
             return False
         
-        # Passo 3: Cria assistente
-        if not self.create_assistant():
+        # Passo 3: Indexa o edital
+        if not self.index_edital():
+            self.log("Configuração abortada: falha ao indexar edital", "ERROR")
+            return False
+        
+        # Passo 4: Cria assistente (ou atualiza o atual com --apenas-edital)
+        if apenas_edital and self.config.get("assistant_id"):
+            if not self.attach_vector_store():
+                self.log("Configuração abortada: falha ao atualizar assistente", "ERROR")
+                return False
+        elif not self.create_assistant():
             self.log("Configuração abortada: falha ao criar assistente", "ERROR")
             return False
         
-        # Passo 4: Testa configuração
+        # Passo 5: Testa configuração
         if not self.test_configuration():
             self.log("Configuração abortada: teste falhou", "ERROR")
             return False
@@ -364,10 +337,18 @@ Regras finais:
 
 def main():
     """Função principal"""
+    parser = argparse.ArgumentParser(description="Configuração automática da OpenAI")
+    parser.add_argument(
+        "--apenas-edital",
+        action="store_true",
+        help="Reenvia o edital, atualiza o vector store e o assistente atual (sem criar outro)"
+    )
+    args = parser.parse_args()
+    
     setup = SetupOpenAI()
     
     try:
-        success = setup.run()
+        success = setup.run(apenas_edital=args.apenas_edital)
         sys.exit(0 if success else 1)
     except KeyboardInterrupt:
         print("\n\n⚠️ Configuração interrompida pelo usuário")
@@ -0,0 +1,37 @@
+"""
+Testes do Backend Assistants
+============================
+
+Run em streaming contra o servidor local (fake_openai.py): o stream é
+consumido até o fim do run, de onde vem o uso de tokens.
+"""
+
+import json
+
+import pytest
+from openai import OpenAI
+
+import analysis
+import fake_openai
+
+
+@pytest.fixture
+def servidor():
+    servidor = fake_openai.iniciar(0, latencia_api=0.0, ttft=0.01, sigma=0.0, tokens_por_s=100000.0)
+    yield servidor
+    servidor.shutdown()
+
+
+def test_assistants_espera_o_fim_do_run(servidor):
+    """Uso real de tokens nas métricas e nenhum run deixado em andamento"""
+    client = OpenAI(api_key="teste", base_url=f"http://127.0.0.1:{servidor.server_address[1]}/v1")
+    assistente = client.beta.assistants.create(model="gpt-4o", name="Leilão Bot", instructions="Analise.")
+    metricas = {}
+
+    textos = analysis.analisar_assistants(client, assistente.id, None, "Imóvel 1", metricas)
+
+    assert json.loads(textos[-1])["criterios"]
+    assert metricas["tokens_entrada"] > 0 and metricas["tokens_saida"] > 0
+    assert metricas["modelo"] == "gpt-4o"
+    assert [run["status"] for run in servidor.api.runs.values()] == ["completed"]
+    assert servidor.api.stats()["total"]["abandonados"] == 0
@@ -0,0 +1,94 @@
+"""
+Testes do Cache de Análises
+===========================
+
+A chave muda com cada entrada que determina a análise e só com elas;
+acertos e faltas são contados em stats.json.
+"""
+
+import pytest
+
+import cache
+
+ESTADO, CIDADE, IMOVEL = "MG", "UBERLANDIA", "8444400000001"
+CONFIG = {"edital_file_id": "file-edital", "assistant_id": "asst-1", "ocr_dpi": 200, "ocr_workers": 2}
+
+
+@pytest.fixture
+def imovel(tmp_path, monkeypatch):
+    """HTML de detalhe e PDF da matrícula nos caminhos do scraping"""
+    monkeypatch.chdir(tmp_path)
+    caminhos = cache.caminhos_imovel(ESTADO, CIDADE, IMOVEL)
+    (tmp_path / caminhos["html"]).parent.mkdir(parents=True)
+    (tmp_path / caminhos["html"]).write_text("<html>Apartamento 2 quartos</html>", encoding="utf-8")
+    (tmp_path / caminhos["pdf"]).write_bytes(b"%PDF-1.4 matricula")
+    return {k: tmp_path / v for k, v in caminhos.items()}
+
+
+def _chave(config=CONFIG, backend="responses") -> str:
+    return cache.chave_analise(config, ESTADO, CIDADE, IMOVEL, backend)
+
+
+def test_mesmas_entradas_mesma_chave(imovel):
+    """Nada mudou: a análise não é paga de novo"""
+    assert _chave() == _chave(dict(CONFIG))
+    assert len(_chave()) == 64
+
+
+@pytest.mark.parametrize("arquivo", ["html", "pdf"])
+def test_chave_muda_com_os_documentos(imovel, arquivo):
+    """Um byte a mais no anúncio ou na matrícula muda a chave"""
+    antes = _chave()
+    with open(imovel[arquivo], "ab") as f:
+        f.write(b" ")
+    assert _chave() != antes
+
+
+def test_documento_ausente_entra_na_chave(imovel):
+    """Matrícula ainda não baixada não se confunde com a baixada"""
+    antes = _chave()
+    imovel["pdf"].unlink()
+    assert _chave() != antes
+
+
+@pytest.mark.parametrize("opcao", cache.CONFIG_CHAVE)
+def test_chave_muda_com_as_opcoes_do_texto(imovel, opcao):
+    """Opções que mudam o texto enviado ao modelo entram na chave"""
+    assert _chave({**CONFIG, opcao: "outro valor"}) != _chave()
+
+
+def test_chave_muda_com_edital_modelo_e_prompt(imovel, monkeypatch):
+    """Edital, modelo e versão das instruções"""
+    antes = _chave()
+    assert _chave({**CONFIG, "edital_file_id": "file-outro"}) != antes
+    assert _chave({**CONFIG, "analysis_model": "gpt-4o-mini"}) != antes
+
+    monkeypatch.setattr(cache, "VERSAO_PROMPT", "outra-versao")
+    assert _chave() != antes
+
+
+def test_assistant_so_conta_no_backend_assistants(imovel):
+    """O assistant_id só determina a análise quando é ele que responde"""
+    outro = {**CONFIG, "assistant_id": "asst-2"}
+    assert _chave(outro) == _chave()
+    assert _chave(outro, "assistants") != _chave(backend="assistants")
+    assert _chave(backend="assistants") != _chave()
+
+
+def test_opcoes_de_desempenho_nao_mudam_a_chave(imovel):
+    """Workers do OCR não mudam o texto: a análise anterior continua valendo"""
+    assert _chave({**CONFIG, "ocr_workers": 8}) == _chave()
+
+
+def test_acertos_e_faltas(tmp_path):
+    """Falta na primeira consulta, acerto depois de gravar"""
+    analises = cache.AnalysisCache(str(tmp_path / "cache"))
+
+    assert analises.obter("abc") is None
+    analises.gravar("abc", IMOVEL, {"nota_final": {"valor": 7.5}})
+    assert analises.obter("abc") == {"nota_final": {"valor": 7.5}}
+    assert analises.obter("abc") == {"nota_final": {"valor": 7.5}}
+
+    stats = analises.estatisticas()
+    assert (stats["acertos"], stats["faltas"], stats["entradas"]) == (2, 1, 1)
+    assert stats["taxa_acerto"] == 0.667
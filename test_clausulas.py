@@ -0,0 +1,119 @@
+"""
+Testes do Índice de Cláusulas do Edital
+=======================================
+
+Segmentação do texto em cláusulas numeradas e ranking BM25 das consultas
+dos critérios, num edital pequeno montado aqui.
+"""
+
+import clausulas
+from clausulas import IndiceBM25
+
+CABECALHO = "CAIXA ECONÔMICA FEDERAL - Edital de Licitação Aberta nº 0001/2025"
+
+PAGINAS = [
+    [
+        CABECALHO,
+        "Data do leilão: 10/03/2025. Pagamento à vista ou com financiamento.",
+        "1. DO OBJETO",
+        "1.1. Venda de imóveis residenciais no estado em que se encontram.",
+        "1",
+    ],
+    [
+        CABECALHO,
+        "6. DAS DESPESAS",
+        "6.1. Débitos de IPTU e condomínio até a data da venda são de responsabilidade da CAIXA,",
+        "limitados a 10% do valor de avaliação do imóvel.",
+        "6.2. Taxas de condomínio vencidas após a venda ficam a cargo do arrematante.",
+        "2",
+    ],
+    [
+        CABECALHO,
+        "13. DO REGISTRO",
+        "13.1. O arrematante deve registrar a escritura no cartório de registro de imóveis",
+        "no prazo de 30 dias contados da assinatura do contrato.",
+        "13.2. A desocupação do imóvel ocupado é de responsabilidade do arrematante.",
+        "3",
+    ],
+]
+TEXTO = "\f".join("\n".join(linhas) for linhas in PAGINAS)
+
+
+def _indice() -> IndiceBM25:
+    return IndiceBM25(clausulas.segmentar(TEXTO))
+
+
+def test_tokens_sem_acento_stopwords_e_com_radical():
+    """'Condomínio' e 'condominiais' caem no mesmo termo; stopwords ficam de fora"""
+    assert clausulas.tokens("Débitos de Condomínio e condominiais") == ["debito", "condom", "condom"]
+
+
+def test_segmentar_clausulas_numeradas():
+    """Itens com seção e página; cabeçalhos repetidos, números de página e títulos sem corpo saem"""
+    segmentadas = clausulas.segmentar(TEXTO)
+    por_id = {c["id"]: c for c in segmentadas}
+
+    assert list(por_id) == ["resumo-1", "1.1", "6.1", "6.2", "13.1", "13.2"]
+    assert por_id["resumo-1"]["texto"].startswith("Data do leilão")
+    assert por_id["6.1"]["secao"] == "6. DAS DESPESAS"
+    assert por_id["6.1"]["pagina"] == 2
+    assert por_id["6.1"]["texto"].endswith("limitados a 10% do valor de avaliação do imóvel.")
+    assert not any(CABECALHO in c["texto"] for c in segmentadas)
+
+
+def test_clausula_longa_vira_partes():
+    """Cláusulas acima de MAX_CLAUSULA são divididas entre palavras"""
+    texto = "1. DO OBJETO\n1.1. " + "imóvel residencial " * 200
+    partes = [c for c in clausulas.segmentar(texto) if c["id"].startswith("1.1")]
+
+    assert len(partes) > 1
+    assert partes[0]["id"] == "1.1 (parte 1)"
+    assert all(len(p["texto"]) <= clausulas.MAX_CLAUSULA for p in partes)
+
+
+def test_bm25_ordena_pela_relevancia():
+    """A cláusula que cobre mais termos da consulta vem primeiro"""
+    resultados = _indice().buscar("prazo para registro da escritura no cartório", k=3)
+
+    assert resultados[0][1]["id"] == "13.1"
+    pontos = [score for score, _ in resultados]
+    assert pontos == sorted(pontos, reverse=True)
+
+
+def test_bm25_termo_raro_pesa_mais():
+    """'IPTU' só aparece em uma cláusula; 'condomínio' em duas"""
+    indice = _indice()
+    assert indice.idf("iptu") > indice.idf("condom")
+
+    ids = [c["id"] for _, c in indice.buscar("IPTU condomínio", k=5)]
+    assert ids[:2] == ["6.1", "6.2"]
+    assert "13.1" not in ids
+
+
+def test_bm25_sem_termos_em_comum():
+    """Só voltam cláusulas com pontuação positiva"""
+    assert _indice().buscar("piscina churrasqueira", k=3) == []
+
+
+def test_trechos_relevantes_na_ordem_do_edital():
+    """União das melhores de cada critério, sem repetir, na ordem em que aparecem no edital"""
+    indice = _indice()
+    trechos = clausulas.trechos_relevantes(indice, ["Despesas Propter Rem", "Prazos de Contratação & Registro"], k=2)
+    ids = [c["id"] for c in trechos]
+
+    assert "6.1" in ids and "13.1" in ids
+    assert len(ids) == len(set(ids))
+    ordem = [c["id"] for c in indice.clausulas]
+    assert ids == sorted(ids, key=ordem.index)
+
+
+def test_trechos_relevantes_respeita_o_limite():
+    """O limite de caracteres corta as últimas rodadas, não a melhor de cada critério"""
+    indice = _indice()
+    criterios = ["Despesas Propter Rem", "Prazos de Contratação & Registro"]
+    melhores = {indice.buscar(clausulas.CONSULTAS[c], 1)[0][1]["id"] for c in criterios}
+    limite = sum(len(c["texto"]) for c in indice.clausulas if c["id"] in melhores)
+
+    trechos = clausulas.trechos_relevantes(indice, criterios, k=3, max_caracteres=limite)
+
+    assert {c["id"] for c in trechos} == melhores
@@ -0,0 +1,57 @@
+"""
+Testes da Saída Compacta
+========================
+
+Expansão da resposta compacta para a estrutura completa, nota final
+calculada localmente e validação da resposta compacta em extrair_json.
+"""
+
+import json
+
+import analysis
+import compacto
+import scoring
+from fake_openai import analise_ficticia
+from prompts import CRITERIOS
+
+
+def _criterio(n: int, nota) -> dict:
+    return {"n": n, "s": nota, "j": "Justificativa.", "f": ["Edital pág. 2"]}
+
+
+def test_expandir_ida_e_volta():
+    """compactar seguido de expandir preserva critérios, riscos e a nota final"""
+    analise = analise_ficticia("compacto")
+
+    expandida = compacto.expandir(compacto.compactar(analise))
+
+    assert [c["nome"] for c in expandida["criterios"]] == [nome for nome, _ in CRITERIOS]
+    assert [c["nota"] for c in expandida["criterios"]] == [c["nota"] for c in analise["criterios"]]
+    assert expandida["nota_final"] == scoring.nota_final(analise["criterios"])
+    assert expandida["riscos"] == [{"descricao": r["descricao"], "fonte": r["fonte"]} for r in analise["riscos"]]
+
+
+def test_expandir_criterio_faltando_nao_derruba_a_nota():
+    """Média só dos critérios presentes, com a nota marcada incompleta"""
+    expandida = compacto.expandir({"i": [], "c": [_criterio(1, 8), _criterio(2, 6)], "r": [], "p": []})
+
+    assert expandida["nota_final"]["valor"] == round((8 * 0.30 + 6 * 0.25) / 0.55, 1)
+    assert expandida["nota_final"]["incompleta"] is True
+    assert expandida["nota_final"]["criterios_faltando"] == [nome for nome, _ in CRITERIOS[2:]]
+
+
+def test_expandir_nota_nao_numerica_fica_fora_da_media():
+    """Nota em texto não quebra a expansão nem entra na média"""
+    expandida = compacto.expandir({"i": [], "c": [_criterio(1, "8"), _criterio(2, 6)], "r": [], "p": []})
+
+    assert expandida["nota_final"]["valor"] == 6.0
+    assert CRITERIOS[0][0] in expandida["nota_final"]["criterios_faltando"]
+
+
+def test_extrair_json_valida_a_compacta_antes_de_expandir():
+    """Resposta compacta fora do esquema é descartada, mesmo com JSON íntegro"""
+    valida = {"i": ["cond=Residencial Ipê (Fonte: Matrícula R-1)"], "c": [_criterio(1, 8)], "r": [], "p": []}
+    assert analysis.extrair_json(json.dumps(valida))["imovel"]["condominio"] == "Residencial Ipê (Fonte: Matrícula R-1)"
+
+    assert analysis.extrair_json(json.dumps({**valida, "c": [_criterio(1, "8")]})) is None
+    assert analysis.extrair_json(json.dumps({**valida, "c": [_criterio(9, 8)]})) is None
@@ -0,0 +1,104 @@
+"""
+Testes da Concorrência Adaptativa (AIMD)
+========================================
+
+Aumento aditivo a cada rodada saudável, corte multiplicativo no
+congestionamento (uma vez por rodada) e limite segurado quando a latência
+sobe.
+"""
+
+import time
+
+import concorrencia
+from concorrencia import ControleAIMD
+
+
+def _controle(**kwargs) -> ControleAIMD:
+    return ControleAIMD(log=lambda msg: None, **kwargs)
+
+
+def test_aumento_de_um_por_rodada():
+    """Cada conclusão soma 1/limite: uma rodada completa de tarefas sobe o limite em 1"""
+    controle = _controle(inicial=2, maximo=10)
+
+    for _ in range(2):
+        controle.registrar(time.monotonic(), 1.0)
+    assert controle.limite == 2
+    controle.registrar(time.monotonic(), 1.0)
+    assert controle.limite == 3
+
+    for _ in range(100):
+        controle.registrar(time.monotonic(), 1.0)
+    assert controle.limite == 10
+    assert controle.stats["aumentos"] == 8 and controle.stats["pico"] == 10
+
+
+def test_corte_multiplicativo_ate_o_minimo():
+    """Congestionamento multiplica o limite pelo fator de corte, sem passar do mínimo"""
+    controle = _controle(inicial=8, minimo=3, maximo=8, fator_corte=0.5)
+
+    controle.registrar(time.monotonic(), congestionado=True)
+    assert controle.limite == 4
+    controle.registrar(time.monotonic(), congestionado=True)
+    assert controle.limite == 3
+    assert controle.stats["cortes"] == 2
+
+
+def test_rajada_do_mesmo_lote_corta_uma_vez():
+    """Só corta de novo quem começou uma latência de base depois do último corte"""
+    controle = _controle(inicial=16, maximo=16)
+    for _ in range(concorrencia.MIN_AMOSTRAS_LATENCIA):
+        controle.registrar(time.monotonic(), 0.2)
+    antes_do_corte = time.monotonic()
+
+    controle.registrar(antes_do_corte, congestionado=True)
+    controle.registrar(antes_do_corte, congestionado=True)
+    controle.registrar(time.monotonic(), congestionado=True)
+    assert controle.limite == 8
+    assert controle.stats["congestionamentos"] == 3 and controle.stats["cortes"] == 1
+
+    time.sleep(0.25)
+    controle.registrar(time.monotonic(), congestionado=True)
+    assert controle.limite == 4
+
+
+def test_latencia_alta_segura_o_limite():
+    """Acima da tolerância sobre a base o limite nem sobe nem cai"""
+    controle = _controle(inicial=2, maximo=10, tolerancia_latencia=2.0)
+    for _ in range(concorrencia.MIN_AMOSTRAS_LATENCIA):
+        controle.registrar(time.monotonic(), 1.0)
+    limite = controle.limite
+
+    for _ in range(10):
+        controle.registrar(time.monotonic(), 3.0)
+
+    assert controle.limite == limite
+    assert controle.stats["lentas"] == 10
+    assert controle.latencia_base() == 1.0
+
+
+def test_de_config():
+    """Parâmetros da etapa e os aimd_* do config.json"""
+    config = {"scraping_concorrencia_min": 2, "scraping_concorrencia_max": 12, "aimd_fator_corte": 0.7,
+              "aimd_tolerancia_latencia": 3.0}
+
+    controle = ControleAIMD.de_config(config, "scraping", 4, log=lambda msg: None)
+
+    assert (controle.limite, controle.minimo, controle.maximo) == (4, 2, 12)
+    assert controle.fator_corte == 0.7 and controle.tolerancia_latencia == 3.0
+    # Sem máximo no config nem no argumento, o valor inicial é o teto
+    assert ControleAIMD.de_config({}, "analysis", 4, log=lambda msg: None).maximo == 4
+    assert ControleAIMD.de_config({}, "analysis", 4, 9, log=lambda msg: None).maximo == 9
+
+
+def test_vagas_acompanham_o_limite():
+    """Semáforo de threads: não passa do limite atual do controle"""
+    controle = _controle(inicial=1, maximo=2)
+    vagas = concorrencia.Vagas(controle)
+
+    with vagas:
+        assert vagas.em_uso == 1
+        controle.registrar(time.monotonic(), 1.0)
+        with vagas:
+            assert vagas.em_uso == 2
+    assert vagas.em_uso == 0
@@ -0,0 +1,143 @@
+"""
+Testes do Hedging das Análises
+==============================
+
+Limiar pelo percentil das latências, cópia da chamada lenta, cancelamento
+da tentativa que perdeu e erros de uma das tentativas. As "análises" são
+funções que dormem o tempo pedido ou até serem canceladas.
+"""
+
+import time
+
+import pytest
+
+from hedge import Hedge
+
+LIMIAR_S = 0.1
+
+
+def _hedge(**kwargs) -> Hedge:
+    """Histórico homogêneo: a cópia sai em LIMIAR_S"""
+    return Hedge(percentil=95, minimo_s=LIMIAR_S, min_amostras=5, historico=[0.01] * 5,
+                 log=lambda msg: None, **kwargs)
+
+
+def _tentativas(original: float, copia: float, falha=None):
+    """Função de análise: cada tentativa dura o tempo dado ou desiste ao ser cancelada"""
+    canceladas = []
+
+    def funcao(metricas, cancelado, e_copia):
+        duracao = copia if e_copia else original
+        inicio = time.perf_counter()
+        if falha is not None and falha == e_copia:
+            time.sleep(duracao)
+            raise RuntimeError("falha da tentativa")
+        if cancelado is not None and cancelado.wait(duracao):
+            canceladas.append(e_copia)
+            raise RuntimeError("cancelada")
+        metricas["total_s"] = round(time.perf_counter() - inicio, 3)
+        return ["copia" if e_copia else "original"]
+
+    return funcao, canceladas
+
+
+def test_limiar_pelo_percentil():
+    """Percentil das latências observadas, nunca abaixo do mínimo; sem histórico, desligado"""
+    hedge = Hedge(percentil=90, minimo_s=1.0, min_amostras=10, historico=range(1, 11), log=lambda msg: None)
+    assert hedge.limiar() == 10.0
+    hedge.observar(100.0)
+    assert hedge.limiar() == 10.0
+
+    assert Hedge(percentil=90, minimo_s=5.0, min_amostras=3, historico=[1, 1, 1]).limiar() == 5.0
+    assert Hedge(percentil=90, min_amostras=3, historico=[1, 1]).limiar() is None
+    assert Hedge(historico=[1] * 50).limiar() is None
+
+
+def test_rapida_nao_emite_copia():
+    """Chamada que termina antes do limiar não é duplicada"""
+    hedge = _hedge()
+    funcao, canceladas = _tentativas(original=0.01, copia=0.01)
+    metricas = {}
+
+    assert hedge.executar(funcao, metricas) == ["original"]
+    assert metricas["hedge_emitido"] is False and metricas["hedge_venceu"] is False
+    assert hedge.stats == {"analises": 1, "emitidos": 0, "vencidos": 0}
+    assert canceladas == []
+
+
+def test_copia_vence_e_cancela_a_original():
+    """A original passa do limiar e fica presa: a cópia responde e a original é cancelada"""
+    hedge = _hedge()
+    funcao, canceladas = _tentativas(original=5.0, copia=0.01)
+    metricas = {}
+
+    inicio = time.perf_counter()
+    assert hedge.executar(funcao, metricas) == ["copia"]
+    assert time.perf_counter() - inicio < 1.0
+
+    assert metricas["hedge_emitido"] is True and metricas["hedge_venceu"] is True
+    assert metricas["hedge_limiar_s"] == LIMIAR_S
+    assert hedge.stats == {"analises": 1, "emitidos": 1, "vencidos": 1}
+    time.sleep(0.05)
+    assert canceladas == [False]
+
+
+def test_latencia_observada_e_a_percebida():
+    """Com a cópia vencendo, o histórico recebe o tempo desde a original, não o da cópia"""
+    hedge = _hedge()
+    funcao, _ = _tentativas(original=5.0, copia=0.01)
+    metricas = {}
+
+    hedge.executar(funcao, metricas)
+
+    assert hedge.latencias[-1] >= LIMIAR_S
+    assert metricas["total_s"] == pytest.approx(hedge.latencias[-1], abs=0.001)
+
+
+def test_original_vence_e_cancela_a_copia():
+    """A cópia sai, mas a original termina antes dela"""
+    hedge = _hedge()
+    funcao, canceladas = _tentativas(original=0.15, copia=5.0)
+    metricas = {}
+
+    assert hedge.executar(funcao, metricas) == ["original"]
+    assert metricas["hedge_emitido"] is True and metricas["hedge_venceu"] is False
+    assert hedge.stats["vencidos"] == 0
+    time.sleep(0.05)
+    assert canceladas == [True]
+
+
+def test_falha_de_uma_tentativa_espera_a_outra():
+    """A cópia falha: vale a original, que terminou depois"""
+    hedge = _hedge()
+    funcao, _ = _tentativas(original=0.3, copia=0.01, falha=True)
+
+    assert hedge.executar(funcao, {}) == ["original"]
+
+
+def test_as_duas_falham():
+    """O erro só sobe quando nenhuma tentativa responde"""
+    hedge = _hedge()
+
+    def funcao(metricas, cancelado, e_copia):
+        time.sleep(0.15 if not e_copia else 0.01)
+        raise ValueError("copia" if e_copia else "original")
+
+    with pytest.raises(ValueError):
+        hedge.executar(funcao, {})
+
+
+def test_sem_hedge_passa_o_cancelamento_vazio():
+    """Desligado: uma chamada só, sem Event de cancelamento"""
+    hedge = Hedge(log=lambda msg: None)
+    recebido = []
+
+    def funcao(metricas, cancelado, e_copia):
+        recebido.append((cancelado, e_copia))
+        metricas["total_s"] = 0.5
+        return ["ok"]
+
+    metricas = {}
+    assert hedge.executar(funcao, metricas) == ["ok"]
+    assert recebido == [(None, False)]
+    assert metricas == {"total_s": 0.5, "hedge_emitido": False}
@@ -0,0 +1,110 @@
+"""
+Testes do Pacote de Imóveis por Requisição
+==========================================
+
+Mensagem com o edital uma vez só, separação da resposta por imóvel (ids
+ausentes, repetidos, estranhos ou truncados) e rateio de tokens e custo.
+"""
+
+import json
+
+import compacto
+import pacote
+from fake_openai import analise_ficticia
+from prompts import MODEL
+
+EDITAL = "Trechos do edital que valem para todos os imóveis.\n" * 20
+
+
+def _conteudo(imovel_id: str, tamanho: int = 200) -> str:
+    return EDITAL + pacote.INICIO_IMOVEL + f" imóvel {imovel_id} " + "x" * tamanho
+
+
+def _resposta(*itens) -> str:
+    return json.dumps({"analises": list(itens)}, ensure_ascii=False)
+
+
+def test_montar_envia_contexto_comum_uma_vez():
+    """O contexto comum (edital) vai uma vez, seguido do marcador de cada imóvel"""
+    conteudos = {"1": _conteudo("1"), "2": _conteudo("2")}
+    mensagem = pacote.montar(conteudos)
+    assert mensagem.count(EDITAL) == 1
+    assert pacote.MARCADOR.format(id="1") in mensagem and pacote.MARCADOR.format(id="2") in mensagem
+
+
+def test_separar_ignora_ids_ausentes_repetidos_e_estranhos():
+    """Só o primeiro item de cada id do pacote, com a estrutura completa"""
+    primeira, repetida = analise_ficticia("a"), analise_ficticia("b")
+    sem_nota = {k: v for k, v in analise_ficticia("c").items() if k != "nota_final"}
+    texto = _resposta(
+        {"id": "1", **primeira},
+        {"id": "1", **repetida},
+        {"id": "9", **analise_ficticia("d")},
+        {"id": "2", **sem_nota},
+        "não é um objeto",
+    )
+
+    analises = pacote.separar(texto, ["1", "2", "3"])
+
+    assert list(analises) == ["1"]
+    assert analises["1"] == primeira
+
+
+def test_separar_item_compacto_volta_expandido():
+    """Itens no formato compacto voltam na estrutura completa"""
+    analise = analise_ficticia("compacta")
+    texto = "Segue o pacote:\n" + _resposta({"id": "7", **compacto.compactar(analise)})
+
+    analises = pacote.separar(texto, ["7"])
+
+    assert set(analises["7"]) >= set(pacote.CAMPOS_ANALISE)
+    assert [c["nome"] for c in analises["7"]["criterios"]] == [c["nome"] for c in analise["criterios"]]
+
+
+def test_separar_resposta_truncada_aproveita_itens_completos():
+    """Resposta cortada no meio: os itens que fecharam antes do corte valem"""
+    texto = _resposta({"id": "1", **analise_ficticia("a")}, {"id": "2", **analise_ficticia("b")})
+    truncado = "```json\n" + texto[:texto.index('"id": "2"') + 60]
+
+    assert list(pacote.separar(truncado, ["1", "2"])) == ["1"]
+
+
+def test_separar_sem_json():
+    """Recusa ou estrutura inesperada: nenhum imóvel"""
+    assert pacote.separar("O modelo recusou a tarefa.", ["1"]) == {}
+    assert pacote.separar('{"analises": "nada"}', ["1"]) == {}
+
+
+def test_ratear_soma_os_totais_do_pacote():
+    """Tokens e custo repartidos pelo tamanho de cada imóvel somam os do pacote"""
+    conteudos = {"1": _conteudo("1", 100), "2": _conteudo("2", 800), "3": _conteudo("3", 3000)}
+    analises = {i: analise_ficticia(i) for i in conteudos}
+    metricas = {"modelo": MODEL, "total_s": 12.0, "tokens_entrada": 10001, "tokens_cache": 4003,
+                "tokens_saida": 2999, "custo_usd": 0.05, "economia_cache_usd": 0.0075}
+
+    por_imovel = pacote.ratear(metricas, conteudos, analises, "1+2+3", {})
+
+    assert set(por_imovel) == set(conteudos)
+    for campo in ("tokens_entrada", "tokens_cache", "tokens_saida"):
+        # Arredondamento por imóvel: no máximo meio token de diferença em cada um
+        assert abs(sum(m[campo] for m in por_imovel.values()) - metricas[campo]) <= len(conteudos) / 2
+    for campo in ("custo_usd", "economia_cache_usd"):
+        assert abs(sum(m[campo] for m in por_imovel.values()) - metricas[campo]) < 1e-5
+
+    # Imóvel maior paga mais entrada; latência e pacote iguais para todos
+    assert por_imovel["1"]["tokens_entrada"] < por_imovel["2"]["tokens_entrada"] < por_imovel["3"]["tokens_entrada"]
+    for m in por_imovel.values():
+        assert m["total_s"] == 12.0
+        assert m["pacote"] == {"id": "1+2+3", "tamanho": 3, "total_s_por_imovel": 4.0}
+
+
+def test_ratear_sem_custo_no_backend_local():
+    """Modelo local: tokens repartidos, custo zero"""
+    conteudos = {"1": _conteudo("1"), "2": _conteudo("2")}
+    metricas = {"modelo": "qwen2.5-7b-instruct", "tokens_entrada": 5000, "tokens_saida": 1000,
+                "custo_usd": 0.0, "economia_cache_usd": 0.0}
+
+    por_imovel = pacote.ratear(metricas, conteudos, {}, "1+2", {})
+
+    assert all(m["custo_usd"] == 0.0 and m["economia_cache_usd"] == 0.0 for m in por_imovel.values())
+    assert sum(m["tokens_saida"] for m in por_imovel.values()) == 1000
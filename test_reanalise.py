@@ -0,0 +1,142 @@
+"""
+Testes da Reanálise Parcial
+===========================
+
+Quais entradas mudaram desde a análise guardada no cache, que critérios
+isso obriga a reavaliar e como a resposta parcial se junta à anterior.
+"""
+
+import json
+
+import compacto
+import reanalise
+import scoring
+from analysis import formato_saida
+from fake_openai import analise_ficticia
+from prompts import CRITERIOS
+
+NOMES = [nome for nome, _ in CRITERIOS]
+EDITAL_AFETADOS = ["Despesas Propter Rem", "Prazos de Contratação & Registro"]
+
+
+def _entradas(**mudancas) -> dict:
+    entradas = {
+        "detalhe": "h-detalhe", "matricula": "h-matricula", "edital": "file-1", "prompt": "v3", "scoring": 1,
+        "opcoes": {"ocr_dpi": 200, "matricula_modo": "resumo", "edital_trechos": 3, "saida_modo": "completa"},
+        "modelo": {"model": "gpt-4o"},
+    }
+    opcoes = mudancas.pop("opcoes", {})
+    entradas.update(mudancas)
+    entradas["opcoes"] = {**entradas["opcoes"], **opcoes}
+    return entradas
+
+
+def _anterior(**mudancas_analise) -> dict:
+    analise = analise_ficticia("anterior")
+    analise.update(mudancas_analise)
+    return {"entradas": _entradas(), "analise": analise}
+
+
+def test_mudancas_por_entrada():
+    """Entradas que mudaram, com as opções de cada documento junto dele"""
+    assert reanalise.mudancas(_entradas(), _entradas()) == []
+    assert reanalise.mudancas(_entradas(), _entradas(edital="file-2")) == ["edital"]
+    assert reanalise.mudancas(_entradas(), _entradas(matricula="h-2", opcoes={"ocr_dpi": 300})) == ["matricula"]
+    assert reanalise.mudancas(_entradas(), _entradas(opcoes={"edital_trechos": 5})) == ["edital"]
+
+
+def test_mudancas_que_exigem_analise_completa():
+    """Anúncio, instruções ou formato da saída novos invalidam tudo"""
+    assert reanalise.mudancas(_entradas(), _entradas(detalhe="h-2")) is None
+    assert reanalise.mudancas(_entradas(), _entradas(prompt="v4", edital="file-2")) is None
+    assert reanalise.mudancas(_entradas(), _entradas(opcoes={"saida_modo": "compacta"})) is None
+
+
+def test_planejar_edital_novo():
+    """Edital novo: só os critérios que dependem dele, com riscos e próximos passos"""
+    plano = reanalise.planejar(_anterior(), _entradas(edital="file-2"), {}, "responses")
+
+    assert plano["mudancas"] == ["edital"]
+    assert plano["reavaliados"] == EDITAL_AFETADOS
+    assert plano["reaproveitados"] == [n for n in NOMES if n not in EDITAL_AFETADOS]
+    assert plano["secoes"] == ["criterios", "riscos", "proximos_passos"]
+
+
+def test_planejar_matricula_refaz_dados_do_imovel():
+    """Matrícula nova também refaz os dados do imóvel"""
+    plano = reanalise.planejar(_anterior(), _entradas(matricula="h-2"), {}, "chat")
+
+    assert plano["secoes"][0] == "imovel"
+    assert plano["reavaliados"] == ["Situação Registral & Risco Jurídico"]
+
+
+def test_planejar_cai_para_analise_completa():
+    """Sem plano quando a reanálise parcial não cabe"""
+    novas = _entradas(edital="file-2")
+    assert reanalise.planejar(_anterior(), novas, {"reanalise_modo": "completa"}, "responses") is None
+    assert reanalise.planejar(_anterior(), novas, {}, "assistants") is None
+    assert reanalise.planejar(None, novas, {}, "responses") is None
+    assert reanalise.planejar(_anterior(), _entradas(), {}, "responses") is None
+    assert reanalise.planejar(_anterior(), _entradas(detalhe="h-2"), {}, "responses") is None
+
+    # Critério não afetado ausente (ou sem nota) na análise anterior: não há de onde reaproveitar
+    criterios = analise_ficticia("anterior")["criterios"]
+    sem_velocidade = [c for c in criterios if c["nome"] != "Velocidade de Liquidez"]
+    assert reanalise.planejar(_anterior(criterios=sem_velocidade), novas, {}, "responses") is None
+    sem_nota = [{k: v for k, v in c.items() if k != "nota"} if c["nome"] == NOMES[0] else c for c in criterios]
+    assert reanalise.planejar(_anterior(criterios=sem_nota), novas, {}, "responses") is None
+
+
+def test_formato_pede_so_os_criterios_reavaliados():
+    """Esquema só com as seções do plano e o enum dos critérios reavaliados"""
+    plano = reanalise.planejar(_anterior(), _entradas(edital="file-2"), {}, "responses")
+
+    saida = reanalise.formato(formato_saida({}), plano)
+
+    assert list(saida["schema"]["properties"]) == plano["secoes"]
+    nomes = saida["schema"]["properties"]["criterios"]["items"]["properties"]["nome"]["enum"]
+    assert nomes == EDITAL_AFETADOS
+
+
+def test_extrair_completa_e_compacta():
+    """Partes pedidas nos dois formatos; critério a mais, a menos ou sem nota descarta a resposta"""
+    plano = reanalise.planejar(_anterior(), _entradas(edital="file-2"), {}, "responses")
+    nova = analise_ficticia("nova")
+    partes = {"criterios": [c for c in nova["criterios"] if c["nome"] in EDITAL_AFETADOS],
+              "riscos": nova["riscos"], "proximos_passos": nova["proximos_passos"]}
+
+    assert reanalise.extrair("Resposta:\n" + json.dumps(partes, ensure_ascii=False), plano) == partes
+
+    compacta = compacto.compactar({**nova, "criterios": partes["criterios"]})
+    extraidas = reanalise.extrair(json.dumps({k: compacta[k] for k in ("c", "r", "p")}), plano)
+    assert [c["nome"] for c in extraidas["criterios"]] == EDITAL_AFETADOS
+
+    assert reanalise.extrair(json.dumps({**partes, "criterios": nova["criterios"]}), plano) is None
+    assert reanalise.extrair(json.dumps({**partes, "criterios": partes["criterios"][:1]}), plano) is None
+    sem_nota = [{**c, "nota": None} for c in partes["criterios"]]
+    assert reanalise.extrair(json.dumps({**partes, "criterios": sem_nota}), plano) is None
+
+
+def test_mesclar_reaproveita_e_recalcula_nota_final():
+    """Critérios reaproveitados intactos, reavaliados com o peso local e nota final refeita"""
+    anterior = _anterior(criterios_locais=["Liquidez & Preço de Entrada"])
+    plano = reanalise.planejar(anterior, _entradas(edital="file-2"), {}, "responses")
+    novos = [{"nome": nome, "nota": 2.0, "justificativa": "Edital novo.", "fontes": ["Edital"]}
+             for nome in reversed(EDITAL_AFETADOS)]
+
+    analise = reanalise.mesclar({"criterios": novos, "riscos": [], "proximos_passos": ["Ler o edital"]}, plano)
+
+    assert [c["nome"] for c in analise["criterios"]] == NOMES
+    por_nome = {c["nome"]: c for c in analise["criterios"]}
+    anteriores = {c["nome"]: c for c in anterior["analise"]["criterios"]}
+    for nome in NOMES:
+        if nome in EDITAL_AFETADOS:
+            assert por_nome[nome]["nota"] == 2.0 and por_nome[nome]["peso"] == scoring.PESOS[nome]
+        else:
+            assert por_nome[nome] == anteriores[nome]
+    esperado = sum(por_nome[nome]["nota"] * scoring.PESOS[nome] for nome in NOMES)
+    assert analise["nota_final"] == {"metodo": "media_ponderada", "valor": round(esperado, 1)}
+    assert analise["proximos_passos"] == ["Ler o edital"] and analise["imovel"] == anterior["analise"]["imovel"]
+    # Notas locais voltam a ser aplicadas depois da mescla; a análise anterior fica intacta
+    assert "criterios_locais" not in analise
+    assert anterior["analise"]["criterios_locais"] == ["Liquidez & Preço de Entrada"]
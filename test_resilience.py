@@ -0,0 +1,156 @@
+"""
+Testes da Resiliência das Chamadas à OpenAI
+===========================================
+
+Backoff com jitter, estados do circuit breaker (fechado, aberto,
+meio-aberto) e repetição dos erros transitórios. O relógio do circuito é
+simulado e as esperas não dormem.
+"""
+
+import types
+
+import pytest
+
+import resilience
+
+
+class ErroAPI(Exception):
+    """Erro do cliente com status HTTP e cabeçalhos, como os do SDK"""
+
+    def __init__(self, status: int, headers: dict = None):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+        self.response = types.SimpleNamespace(status_code=status, headers=headers or {})
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = types.SimpleNamespace(agora=1000.0, dormido=[])
+    relogio.monotonic = lambda: relogio.agora
+    relogio.sleep = relogio.dormido.append
+    monkeypatch.setattr(resilience, "time", relogio)
+    return relogio
+
+
+def test_erros_transitorios():
+    """429, 5xx e 408 se repetem; erros do pedido não"""
+    assert all(resilience.transitorio(ErroAPI(s)) for s in (408, 429, 500, 503, 529))
+    assert not any(resilience.transitorio(ErroAPI(s)) for s in (400, 401, 404, 422))
+
+
+def test_backoff_exponencial_limitado(monkeypatch):
+    """Teto do sorteio dobra a cada tentativa até retry_teto_s"""
+    monkeypatch.setattr(resilience.random, "uniform", lambda a, b: b)
+    politica = resilience.Resiliencia(base=2.0, teto=20.0, log=lambda msg: None)
+
+    assert [politica.espera(t) for t in range(1, 6)] == [2.0, 4.0, 8.0, 16.0, 20.0]
+
+    monkeypatch.setattr(resilience.random, "uniform", lambda a, b: a)
+    assert politica.espera(4) == 0.0
+
+
+def test_backoff_respeita_retry_after(monkeypatch):
+    """O servidor pede mais que o sorteio: vale o Retry-After"""
+    monkeypatch.setattr(resilience.random, "uniform", lambda a, b: b)
+    politica = resilience.Resiliencia(base=1.0, teto=60.0, log=lambda msg: None)
+
+    assert politica.espera(1, ErroAPI(429, {"retry-after": "12"})) == 12.0
+    assert politica.espera(1, ErroAPI(429, {"retry-after-ms": "2500"})) == 2.5
+    assert politica.espera(5, ErroAPI(429, {"retry-after": "1"})) == 16.0
+
+
+def test_circuito_abre_com_a_taxa_de_erros(relogio):
+    """Fechado até o mínimo de chamadas; abre quando as falhas chegam ao limiar"""
+    breaker = resilience.CircuitBreaker(janela=4, limiar=0.5, minimo=4, pausa=10.0)
+
+    assert not breaker.registrar(False)
+    assert not breaker.registrar(False)
+    assert not breaker.registrar(True)
+    assert breaker.estado == "fechado" and breaker.espera() == 0.0
+
+    assert breaker.registrar(True) is True
+    assert breaker.estado == "aberto"
+    assert breaker.espera() == pytest.approx(10.0)
+
+
+def test_meio_aberto_libera_uma_chamada_de_teste(relogio):
+    """Depois da pausa só uma chamada sai; o sucesso dela fecha o circuito"""
+    breaker = resilience.CircuitBreaker(janela=2, limiar=0.5, minimo=2, pausa=10.0)
+    breaker.registrar(False)
+    breaker.registrar(False)
+
+    relogio.agora += 10.0
+    assert breaker.estado == "meio_aberto"
+    assert breaker.espera() == 0.0
+    assert breaker.espera() == resilience.INTERVALO_TESTE_S
+
+    assert not breaker.registrar(True)
+    assert breaker.estado == "fechado"
+    assert breaker.espera() == 0.0
+
+
+def test_teste_falho_reabre_com_pausa_dobrada(relogio):
+    """Cada reabertura seguida dobra a pausa, até pausa_max; um sucesso volta à pausa inicial"""
+    breaker = resilience.CircuitBreaker(janela=2, limiar=0.5, minimo=2, pausa=10.0, pausa_max=30.0)
+    breaker.registrar(False)
+    breaker.registrar(False)
+
+    for pausa in (20.0, 30.0, 30.0):
+        relogio.agora += 60.0
+        assert breaker.espera() == 0.0
+        assert breaker.registrar(False) is True
+        assert breaker.espera() == pytest.approx(pausa)
+    assert breaker.aberturas == 4
+
+    relogio.agora += 60.0
+    breaker.espera()
+    breaker.registrar(True)
+    assert breaker.pausa_atual == 10.0
+
+
+def test_executar_repete_transitorios(relogio):
+    """Dois 503 seguidos de sucesso: três chamadas, duas repetições"""
+    respostas = [ErroAPI(503), ErroAPI(503), "ok"]
+
+    def chamada():
+        resposta = respostas.pop(0)
+        if isinstance(resposta, Exception):
+            raise resposta
+        return resposta
+
+    politica = resilience.Resiliencia(max_tentativas=5, base=1.0, log=lambda msg: None)
+
+    assert politica.executar(chamada) == "ok"
+    relatorio = politica.relatorio()
+    assert relatorio["chamadas"] == 3 and relatorio["repeticoes"] == 2
+    assert relatorio["erros_por_status"] == {"503": 2}
+    assert len(relogio.dormido) == 2
+
+
+def test_executar_nao_repete_erro_do_pedido(relogio):
+    """Um 400 sobe na hora e não conta como falha no circuito"""
+    def chamada():
+        raise ErroAPI(400)
+
+    politica = resilience.Resiliencia(max_tentativas=5, log=lambda msg: None)
+
+    with pytest.raises(ErroAPI):
+        politica.executar(chamada)
+    assert politica.relatorio()["falhas_definitivas"] == 1
+    assert list(politica.breaker.resultados) == [True]
+    assert relogio.dormido == []
+
+
+def test_executar_desiste_depois_do_maximo(relogio):
+    """Transitório em todas as tentativas: o último erro sobe"""
+    def chamada():
+        raise ErroAPI(429)
+
+    politica = resilience.Resiliencia(max_tentativas=3, breaker=resilience.CircuitBreaker(minimo=10),
+                                      log=lambda msg: None)
+
+    with pytest.raises(ErroAPI):
+        politica.executar(chamada)
+    relatorio = politica.relatorio()
+    assert relatorio["chamadas"] == 3 and relatorio["repeticoes"] == 2
+    assert relatorio["falhas_definitivas"] == 1
@@ -0,0 +1,136 @@
+"""
+Testes da Admissão por rpm/tpm
+==============================
+
+Baldes de requisições e tokens do agendador de análises e execução dos
+jobs em paralelo. O relógio dos baldes é simulado: as esperas são
+conferidas sem dormir de verdade.
+"""
+
+import asyncio
+import threading
+import time
+import types
+
+import pytest
+
+import scheduler
+
+
+class Relogio:
+    """time.monotonic e asyncio.sleep falsos: dormir só avança o relógio"""
+
+    def __init__(self):
+        self.agora = 1000.0
+        self.dormido = 0.0
+
+    def monotonic(self) -> float:
+        return self.agora
+
+    async def sleep(self, segundos: float):
+        self.agora += segundos
+        self.dormido += segundos
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(scheduler, "time", types.SimpleNamespace(monotonic=relogio.monotonic,
+                                                                 perf_counter=time.perf_counter))
+    monkeypatch.setattr(scheduler, "asyncio", types.SimpleNamespace(Lock=asyncio.Lock, sleep=relogio.sleep))
+    return relogio
+
+
+def test_balde_recarrega_continuamente(relogio):
+    """O saldo volta na proporção do tempo, até a capacidade"""
+    balde = scheduler.TokenBucket(600)
+    balde.consumir(600)
+    assert balde.espera(100) == pytest.approx(10.0)
+
+    relogio.agora += 5
+    assert balde.espera(100) == pytest.approx(5.0)
+    relogio.agora += 3600
+    assert balde.espera(600) == 0.0 and balde.saldo == 600
+
+
+def test_pedido_maior_que_o_balde_espera_so_o_balde_cheio(relogio):
+    """Um prompt acima do tpm não trava a fila para sempre"""
+    balde = scheduler.TokenBucket(1000)
+    assert balde.espera(5000) == 0.0
+    balde.consumir(5000)
+    assert balde.saldo == 0.0
+    assert balde.espera(5000) == pytest.approx(60.0)
+
+
+def test_admissao_por_requisicoes(relogio):
+    """Com rpm=60 as primeiras 60 passam na hora; a seguinte espera 1s"""
+    async def admitir():
+        limiter = scheduler.RateLimiter(rpm=60, tpm=10 ** 6)
+        for _ in range(60):
+            await limiter.admitir(10)
+        assert relogio.dormido == 0.0
+        await limiter.admitir(10)
+
+    asyncio.run(admitir())
+    assert relogio.dormido == pytest.approx(1.0)
+
+
+def test_admissao_por_tokens(relogio):
+    """O balde de tokens segura a análise até haver saldo para o prompt inteiro"""
+    async def admitir():
+        limiter = scheduler.RateLimiter(rpm=600, tpm=1000)
+        await limiter.admitir(800)
+        await limiter.admitir(500)
+
+    asyncio.run(admitir())
+    # Saldo de 200: faltam 300 tokens a 1000 por minuto
+    assert relogio.dormido == pytest.approx(18.0)
+
+
+def test_pausa_suspende_admissoes(relogio):
+    """Depois de um 429 ninguém é admitido até o fim da pausa"""
+    async def admitir():
+        limiter = scheduler.RateLimiter(rpm=600, tpm=10 ** 6)
+        await limiter.admitir(10)
+        limiter.pausar(7)
+        await limiter.admitir(10)
+
+    asyncio.run(admitir())
+    assert relogio.dormido == pytest.approx(7.0)
+
+
+def test_jobs_em_paralelo_ate_a_concorrencia():
+    """Resultados na ordem dos jobs, sem passar de `concorrencia` em andamento"""
+    lock = threading.Lock()
+    em_andamento = {"atual": 0, "pico": 0}
+
+    def executar(payload):
+        with lock:
+            em_andamento["atual"] += 1
+            em_andamento["pico"] = max(em_andamento["pico"], em_andamento["atual"])
+        time.sleep(0.05)
+        with lock:
+            em_andamento["atual"] -= 1
+        return payload * 2
+
+    agendador = scheduler.AnalysisScheduler(rpm=6000, tpm=10 ** 6, concorrencia=3, log=lambda msg: None)
+    jobs = [(str(n), lambda n=n: (n, 100), executar) for n in range(8)]
+
+    resultados = agendador.executar_todos(jobs)
+
+    assert [r["id"] for r in resultados] == [str(n) for n in range(8)]
+    assert [r["resultado"] for r in resultados] == [n * 2 for n in range(8)]
+    assert em_andamento["pico"] == 3
+    assert agendador.relatorio()["analises"] == 8
+
+
+def test_controle_aimd_do_config():
+    """Parâmetros analysis_concorrencia_* e aimd_* do config.json chegam ao controle das análises"""
+    config = {"analysis_concorrencia_min": 2, "analysis_concorrencia_max": 6, "aimd_fator_corte": 0.25}
+
+    agendador = scheduler.AnalysisScheduler(concorrencia=3, config=config, log=lambda msg: None)
+
+    controle = agendador.controle
+    assert (controle.limite, controle.minimo, controle.maximo) == (3, 2, 6)
+    assert controle.fator_corte == 0.25
@@ -0,0 +1,151 @@
+"""
+Testes da Validação da Saída Durante o Stream
+=============================================
+
+O validador recebe o texto acumulado em pedaços, como no on_partial dos
+backends, e tem de apontar o primeiro erro de sintaxe ou de esquema sem
+esperar o fim; o reparo conserta cercas, vírgulas sobrando e respostas
+truncadas.
+"""
+
+import json
+
+import pytest
+
+import compacto
+import validacao
+from analysis import extrair_json
+from fake_openai import analise_ficticia
+from prompts import ANALYSIS_SCHEMA
+
+ANALISE = analise_ficticia("validacao")
+TEXTO = json.dumps(ANALISE, ensure_ascii=False, indent=2)
+
+
+def _alimentar(texto: str, schema=ANALYSIS_SCHEMA, pedaco: int = 7, extras: bool = False):
+    """Texto acumulado em pedaços, como o on_partial dos backends"""
+    validador = validacao.ValidadorJSON(schema, extras=extras)
+    for fim in range(pedaco, len(texto) + pedaco, pedaco):
+        validador.acompanhar(texto[:fim])
+    return validador
+
+
+@pytest.mark.parametrize("pedaco", [1, 7, 500])
+def test_stream_valido_em_pedacos(pedaco):
+    """Análise completa, um caractere por vez ou em pedaços maiores"""
+    validador = _alimentar(TEXTO, pedaco=pedaco)
+    assert validador.concluido and validador.erro is None
+
+
+@pytest.mark.parametrize("pedaco", [1, 7])
+def test_stream_valido_com_escapes_unicode(pedaco):
+    """Saída com ensure_ascii: chaves e enums são comparados já decodificados"""
+    texto = json.dumps(ANALISE, ensure_ascii=True, indent=2)
+    assert "\\u00e7" in texto
+    validador = _alimentar(texto, pedaco=pedaco)
+    assert validador.concluido and validador.erro is None
+
+
+def test_stream_valido_compacto_com_texto_antes():
+    """Saída compacta depois de uma cerca de markdown"""
+    texto = "```json\n" + json.dumps(compacto.compactar(ANALISE), ensure_ascii=False)
+    assert _alimentar(texto, compacto.SCHEMA).concluido
+
+
+def test_tipo_errado_detectado_no_inicio():
+    """O tipo errado do primeiro campo aparece logo, não no fim da resposta"""
+    texto = '{"imovel": "' + TEXTO[TEXTO.index("{", 1):]
+    with pytest.raises(validacao.SaidaInvalida) as erro:
+        _alimentar(texto)
+    assert erro.value.posicao < 20
+    assert "imovel" in str(erro.value)
+
+
+@pytest.mark.parametrize("texto, trecho", [
+    ('{"riscos": [], "extra": 1', "chave fora do esquema 'extra'"),
+    ('{"riscos": [], "riscos": [', "chave repetida"),
+    ('{"nota_final": {"metodo": "soma"', "valor fora do enum"),
+    ('{"criterios": [{"nome": "Liquidez & Preço de Entrada", "peso": "alto"', "esperado number"),
+    ('{"criterios": [{"nota": 7.5.1}', "valor inválido"),
+    ('{"riscos": []}', "faltam as chaves"),
+    ('{"imovel" {', "caractere inesperado"),
+])
+def test_erros_de_estrutura(texto, trecho):
+    """Cada erro de sintaxe ou esquema, com a mensagem que o identifica"""
+    with pytest.raises(validacao.SaidaInvalida, match=trecho):
+        _alimentar(texto + " ")
+
+
+def test_extras_aceita_chaves_fora_do_esquema():
+    """Sem saída estruturada (assistants) chaves a mais são toleradas"""
+    texto = TEXTO[:-1].rstrip() + ', "observacao": "sem saída estruturada"}'
+    assert _alimentar(texto, extras=True).concluido
+    with pytest.raises(validacao.SaidaInvalida):
+        _alimentar(texto)
+
+
+def test_depois_do_erro_nao_valida_mais():
+    """O primeiro erro fica guardado; o resto do stream é ignorado"""
+    validador = validacao.ValidadorJSON(ANALYSIS_SCHEMA)
+    with pytest.raises(validacao.SaidaInvalida):
+        validador.acompanhar('{"imovel": 1')
+    validador.acompanhar('{"imovel": 1, "outra": 2}')
+    assert not validador.concluido and validador.erro is not None
+
+
+def test_nova_mensagem_reinicia_a_validacao():
+    """Texto acumulado menor que o já visto é uma nova mensagem (assistants)"""
+    validador = validacao.ValidadorJSON(ANALYSIS_SCHEMA)
+    validador.acompanhar('Rascunho: {"proximos_passos": ["Ler o edital", ')
+    validador.acompanhar(TEXTO[:10])
+    validador.acompanhar(TEXTO)
+    assert validador.concluido and validador.erro is None
+
+
+def test_prefixo_longo_demais():
+    """Texto demais antes do primeiro '{': desiste"""
+    with pytest.raises(validacao.SaidaInvalida, match="JSON não começou"):
+        _alimentar("x" * (validacao.MAX_PREFIXO + 10))
+
+
+def test_reparar_cerca_e_virgula_sobrando():
+    """Cercas de markdown, texto em volta e vírgulas antes de } e ]"""
+    texto = "```json\n" + TEXTO[:-1].rstrip() + ",\n```"
+    with pytest.raises(ValueError):
+        json.loads(texto)
+    assert validacao.reparar(texto) == ANALISE
+    assert validacao.reparar('Resultado: {"a": [1, 2,], "b": {"c": 3,},} fim') == {"a": [1, 2], "b": {"c": 3}}
+
+
+def test_reparar_resposta_truncada():
+    """Resposta cortada: fecha strings e colchetes no último valor completo"""
+    # Truncada dentro de uma string: a string é fechada
+    assert validacao.reparar('{"a": 1, "b": "meio do te') == {"a": 1, "b": "meio do te"}
+    # Truncada depois da chave ou no meio de um literal: volta ao último valor completo
+    assert validacao.reparar('{"a": 1, "b": [1, 2], "c"') == {"a": 1, "b": [1, 2]}
+    assert validacao.reparar('{"a": {"b": [1, tr') == {"a": {"b": [1]}}
+
+    truncado = validacao.reparar(TEXTO[:len(TEXTO) // 2])
+    assert isinstance(truncado, dict) and truncado["imovel"] == ANALISE["imovel"]
+
+
+def test_reparar_sem_conserto():
+    """Sem objeto, ou só sobra um objeto vazio"""
+    assert validacao.reparar("sem json nenhum") is None
+    # Colchete sem par: sobra só o objeto vazio, que não passa pelo esquema
+    assert validacao.reparar('{"a": ]') == {}
+    assert not validacao.reparavel('{"a": ]', ANALYSIS_SCHEMA)
+
+
+def test_reparavel_exige_o_esquema():
+    """Reparável só se o reparo também passar pelo esquema"""
+    completo = TEXTO[:-1] + ",\n```"
+    assert validacao.reparavel(completo, ANALYSIS_SCHEMA)
+    assert not validacao.reparavel(TEXTO[:len(TEXTO) // 2], ANALYSIS_SCHEMA)
+
+
+def test_extrair_json_repara_e_valida():
+    """extrair_json usa o reparo, mas descarta o que sai do esquema"""
+    assert extrair_json("```json\n" + TEXTO[:-1] + ",\n```") == ANALISE
+    # Reparada mas fora do esquema (faltam seções): descartada
+    assert extrair_json(TEXTO[:len(TEXTO) // 2]) is None
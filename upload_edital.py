@@ -3,22 +3,20 @@ from dotenv import load_dotenv
 from openai import OpenAI
 import json
 
+from editais import RegistroEditais
+
 load_dotenv()
 
 api_key = os.getenv("OPENAI_API_KEY")
 
 client = OpenAI(api_key=api_key)
 
-file = client.files.create(
-    file=open("edital.pdf", "rb"),
-    purpose="assistants" 
-)
-
 with open("config.json", "r") as f:
     config = json.load(f)
-    config["edital_file_id"] = file.id
+
+# Só envia se este conteúdo ainda não estiver na conta (registro de editais)
+registro = RegistroEditais.de_config(config)
+config["edital_file_id"] = registro.arquivos[registro.enviar(client, "edital.pdf")]["file_id"]
 
 with open("config.json", "w") as f:
     json.dump(config, f, indent=4)
-    
-
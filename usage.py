@@ -0,0 +1,240 @@
+"""
+Uso de Tokens, Custo e Latência das Análises
+============================================
+
+Cada análise grava em data/analysis/<imovel>_metrics.json (ao lado do
+<imovel>_analysis.json) o que consumiu:
+
+- modelo, tokens_entrada, tokens_cache (parte da entrada servida do cache
+  de prompt), tokens_saida, custo_usd e economia_cache_usd (quanto o cache
+  de prompt poupou em relação ao preço cheio da entrada)
+- saida: formato da resposta, "completa" ou "compacta" (compacto.py)
+- total_s (chamada ao modelo), ttft_s/geracao_s (assistants), fila_s
+  (espera por vaga e pelos limites de rpm/tpm), preparo_s (OCR e resumo da
+  matrícula), tentativas (429 repetidos) e, no modo batch, batch_s (tempo
+  do job na plataforma, com 50% de desconto no custo)
+- hedge_emitido / hedge_venceu / hedge_limiar_s: cópia da chamada enviada
+  por passar do percentil de latência e se foi ela que respondeu (hedge.py)
+
+No backend assistants o stream é encerrado assim que o JSON chega, antes do
+evento com o uso do run; nesse caso os tokens são estimados (~4 caracteres
+por token) e o registro traz "tokens_estimados": true.
+
+`agregar()` consolida os registros no relatório do automation.py e no
+endpoint GET /uso da API.
+"""
+
+import json
+import statistics
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+# USD por 1M de tokens: entrada, entrada em cache, saída
+PRECOS_1M = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+DEFAULT_MODELO_PRECO = "gpt-4o"
+
+# A Batch API cobra metade do preço
+DESCONTO_BATCH = 0.5
+
+
+def _campo(obj, nome: str):
+    if obj is None:
+        return None
+    return obj.get(nome) if isinstance(obj, dict) else getattr(obj, nome, None)
+
+
+def uso_tokens(usage) -> Dict:
+    """Tokens de um `usage` da Responses API (input/output) ou de chat/runs (prompt/completion)"""
+    entrada = _campo(usage, "input_tokens")
+    detalhes = _campo(usage, "input_tokens_details")
+    if entrada is None:
+        entrada = _campo(usage, "prompt_tokens")
+        detalhes = _campo(usage, "prompt_tokens_details")
+    saida = _campo(usage, "output_tokens")
+    if saida is None:
+        saida = _campo(usage, "completion_tokens")
+    return {
+        "tokens_entrada": entrada or 0,
+        "tokens_cache": _campo(detalhes, "cached_tokens") or 0,
+        "tokens_saida": saida or 0,
+    }
+
+
+def precos(modelo: Optional[str], config: Optional[Dict] = None) -> tuple:
+    """(entrada, cache, saída) em USD/1M; preco_*_1m do config.json valem para a análise"""
+    config = config or {}
+    base = next((p for nome, p in sorted(PRECOS_1M.items(), key=lambda i: -len(i[0]))
+                 if modelo and modelo.startswith(nome)), PRECOS_1M[DEFAULT_MODELO_PRECO])
+    entrada = config.get("preco_entrada_1m", base[0])
+    return (
+        entrada,
+        config.get("preco_cache_1m", base[1] * entrada / base[0]),
+        config.get("preco_saida_1m", base[2]),
+    )
+
+
+def custo_usd(uso: Dict, modelo: Optional[str] = None, config: Optional[Dict] = None,
+              batch: bool = False) -> float:
+    """Custo de um registro com tokens_entrada/tokens_cache/tokens_saida"""
+    entrada, cache, saida = precos(modelo, config)
+    em_cache = uso.get("tokens_cache") or 0
+    custo = (
+        ((uso.get("tokens_entrada") or 0) - em_cache) * entrada
+        + em_cache * cache
+        + (uso.get("tokens_saida") or 0) * saida
+    ) / 1e6
+    return round(custo * (DESCONTO_BATCH if batch else 1.0), 6)
+
+
+def economia_cache_usd(uso: Dict, modelo: Optional[str] = None, config: Optional[Dict] = None,
+                       batch: bool = False) -> float:
+    """Quanto o cache de prompt poupou: tokens em cache pelo preço cheio menos o preço de cache"""
+    entrada, cache, _ = precos(modelo, config)
+    economia = (uso.get("tokens_cache") or 0) * (entrada - cache) / 1e6
+    return round(economia * (DESCONTO_BATCH if batch else 1.0), 6)
+
+
+def linha_cache(uso: Dict) -> str:
+    """'cache de prompt: 12800/14210 tokens de entrada (90%)' para os logs de cada análise"""
+    entrada = uso.get("tokens_entrada") or 0
+    em_cache = uso.get("tokens_cache") or 0
+    if uso.get("tokens_estimados"):
+        return "cache de prompt: uso não informado (tokens estimados)"
+    percentual = f" ({em_cache / entrada:.0%})" if entrada else ""
+    return f"cache de prompt: {em_cache}/{entrada} tokens de entrada{percentual}, {entrada - em_cache} sem cache"
+
+
+def _resumo(valores: List[float]) -> Optional[Dict]:
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return {
+        "media": round(statistics.fmean(ordenados), 2),
+        "p50": round(statistics.median(ordenados), 2),
+        "p95": round(ordenados[min(len(ordenados) - 1, int(0.95 * len(ordenados)))], 2),
+        "max": round(ordenados[-1], 2),
+    }
+
+
+def agregar(registros: Iterable[Dict]) -> Dict:
+    """Totais de tokens e custo, tempos (média/p50/p95) e repetições por backend"""
+    registros = list(registros)
+    totais = {k: sum(r.get(k) or 0 for r in registros) for k in ("tokens_entrada", "tokens_cache", "tokens_saida")}
+    custo = sum(r.get("custo_usd") or 0 for r in registros)
+
+    por_backend = {}
+    for r in registros:
+        b = por_backend.setdefault(r.get("backend", "?"), {"analises": 0, "custo_usd": 0.0, "tokens": 0,
+                                                           "tokens_entrada": 0, "tokens_cache": 0})
+        b["analises"] += 1
+        b["custo_usd"] = round(b["custo_usd"] + (r.get("custo_usd") or 0), 4)
+        b["tokens"] += (r.get("tokens_entrada") or 0) + (r.get("tokens_saida") or 0)
+        b["tokens_entrada"] += r.get("tokens_entrada") or 0
+        b["tokens_cache"] += r.get("tokens_cache") or 0
+    for b in por_backend.values():
+        b["taxa_cache"] = round(b["tokens_cache"] / b["tokens_entrada"], 3) if b["tokens_entrada"] else None
+
+    # Tempo da chamada com e sem acerto no cache de prompt
+    com_cache = [r["total_s"] for r in registros if r.get("total_s") is not None and r.get("tokens_cache")]
+    sem_cache = [r["total_s"] for r in registros if r.get("total_s") is not None and not r.get("tokens_cache")]
+
+    # Formato da resposta (compacto.py): tokens de saída e tempo da chamada
+    por_saida = {}
+    for r in registros:
+        por_saida.setdefault(r.get("saida", "completa"), []).append(r)
+    por_saida = {
+        saida: {
+            "analises": len(grupo),
+            "tokens_saida_medio": round(sum(r.get("tokens_saida") or 0 for r in grupo) / len(grupo)),
+            "geracao_s": _resumo([r["geracao_s"] for r in grupo if r.get("geracao_s") is not None]),
+            "total_s": _resumo([r["total_s"] for r in grupo if r.get("total_s") is not None]),
+        }
+        for saida, grupo in por_saida.items()
+    }
+
+    # Imóveis por requisição (pacote.py): custo e latência por imóvel, individuais no tamanho 1
+    por_pacote = {}
+    for r in registros:
+        por_pacote.setdefault((r.get("pacote") or {}).get("tamanho", 1), []).append(r)
+    por_pacote = {
+        tamanho: {
+            "analises": len(grupo),
+            "custo_medio_usd": round(sum(r.get("custo_usd") or 0 for r in grupo) / len(grupo), 4),
+            "tokens_entrada_medio": round(sum(r.get("tokens_entrada") or 0 for r in grupo) / len(grupo)),
+            "tokens_saida_medio": round(sum(r.get("tokens_saida") or 0 for r in grupo) / len(grupo)),
+            "total_s": _resumo([r["total_s"] for r in grupo if r.get("total_s") is not None]),
+            "total_s_por_imovel": _resumo([(r.get("pacote") or {}).get("total_s_por_imovel", r["total_s"])
+                                           for r in grupo if r.get("total_s") is not None]),
+        }
+        for tamanho, grupo in sorted(por_pacote.items())
+    }
+
+    # Reanálise parcial (reanalise.py): só os critérios afetados pela mudança de entrada
+    por_reanalise = {}
+    for r in registros:
+        por_reanalise.setdefault("parcial" if r.get("reanalise") else "completa", []).append(r)
+    por_reanalise = {
+        tipo: {
+            "analises": len(grupo),
+            "custo_medio_usd": round(sum(r.get("custo_usd") or 0 for r in grupo) / len(grupo), 4),
+            "tokens_saida_medio": round(sum(r.get("tokens_saida") or 0 for r in grupo) / len(grupo)),
+            "total_s": _resumo([r["total_s"] for r in grupo if r.get("total_s") is not None]),
+            "criterios_reaproveitados": sum(len((r.get("reanalise") or {}).get("reaproveitados") or [])
+                                            for r in grupo),
+        }
+        for tipo, grupo in por_reanalise.items()
+    }
+
+    emitidos = sum(1 for r in registros if r.get("hedge_emitido"))
+    hedges = {
+        "emitidos": emitidos,
+        "vencidos": sum(1 for r in registros if r.get("hedge_venceu")),
+        "taxa_emitidos": round(emitidos / len(registros), 3) if registros else None,
+    }
+
+    # Validação da saída durante o stream (validacao.py); inválidas: a última tentativa foi ao reparo
+    validacao = {
+        "abortadas": sum(r.get("saida_abortadas") or 0 for r in registros),
+        "tempo_abortado_s": round(sum(r.get("saida_abortadas_s") or 0 for r in registros), 3),
+        "invalidas": sum(1 for r in registros if r.get("saida_valida") is False),
+    }
+
+    return {
+        "analises": len(registros),
+        **totais,
+        "tokens_sem_cache": totais["tokens_entrada"] - totais["tokens_cache"],
+        "taxa_cache": round(totais["tokens_cache"] / totais["tokens_entrada"], 3) if totais["tokens_entrada"] else None,
+        "analises_com_cache": sum(1 for r in registros if r.get("tokens_cache")),
+        "economia_cache_usd": round(sum(r.get("economia_cache_usd") or 0 for r in registros), 4),
+        "tokens_estimados": sum(1 for r in registros if r.get("tokens_estimados")),
+        "custo_usd": round(custo, 4),
+        "custo_medio_usd": round(custo / len(registros), 4) if registros else None,
+        "tentativas_extras": sum(max(0, (r.get("tentativas") or 1) - 1) for r in registros),
+        "tempos_s": {
+            k: _resumo([r[k] for r in registros if r.get(k) is not None])
+            for k in ("fila_s", "preparo_s", "ttft_s", "total_s", "batch_s")
+        },
+        "total_s_por_cache": {"com_cache": _resumo(com_cache), "sem_cache": _resumo(sem_cache)},
+        "modelos": sorted({r["modelo"] for r in registros if r.get("modelo")}),
+        "por_backend": por_backend,
+        "por_saida": por_saida,
+        "por_pacote": por_pacote,
+        "por_reanalise": por_reanalise,
+        "hedges": hedges,
+        "validacao_saida": validacao,
+    }
+
+
+def carregar(analysis_dir: str = "data/analysis") -> List[Dict]:
+    """Registros de uso gravados (data/analysis/*_metrics.json)"""
+    registros = []
+    for path in sorted(Path(analysis_dir).glob("*_metrics.json")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                registros.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return registros
@@ -0,0 +1,337 @@
+"""
+Validação Incremental da Saída do Modelo
+========================================
+
+O JSON da análise só era conferido no fim: uma resposta com a estrutura
+errada logo no começo custava a geração inteira e o imóvel ficava sem
+análise. Aqui a resposta é validada enquanto chega (on_partial dos
+backends, backends.py):
+
+- `ValidadorJSON` lê o texto em pedaços e confere, contra o esquema da
+  saída (prompts.ANALYSIS_SCHEMA, compacto.SCHEMA, pacotes e reanálises),
+  a sintaxe, o tipo de cada valor, chaves fora do esquema, valores fora do
+  enum e chaves obrigatórias ao fechar cada objeto. No primeiro erro
+  levanta `SaidaInvalida`; se o texto até ali não tiver conserto
+  (`reparavel`), o backend cancela a chamada (stream fechado, run
+  cancelado no assistants) e tenta de novo, até "saida_tentativas" vezes
+  (default 2). A última tentativa vai até o fim e passa pelo reparo
+- `reparar` conserta o que é trivial: texto ou cercas de markdown em volta,
+  vírgulas sobrando antes de } e ], quebras de linha cruas em strings e
+  resposta truncada (fecha strings e colchetes, descartando o último valor
+  incompleto). analysis.extrair_json, pacote.separar e reanalise.extrair
+  usam o reparo quando o JSON não abre direto; a análise reparada ainda
+  precisa passar pelo esquema
+
+"saida_validacao": false no config.json desliga a validação durante o
+stream. As métricas trazem saida_valida (a resposta passou sem reparo),
+saida_abortadas e saida_erros; usage.agregar soma abortadas e reparadas.
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+DEFAULT_TENTATIVAS = 2
+# Caracteres tolerados antes do "{" (texto ou cerca de markdown) até desistir
+MAX_PREFIXO = 2000
+
+# Primeiro caractere de um valor -> tipo JSON
+INICIO_TIPO = {"{": "object", "[": "array", '"': "string", "t": "boolean", "f": "boolean", "n": "null"}
+CARACTERES_ESCALAR = set("+-0123456789.eEtrufalsn")
+
+
+class SaidaInvalida(ValueError):
+    """Resposta do modelo fora da sintaxe JSON ou do esquema esperado"""
+
+    def __init__(self, mensagem: str, posicao: Optional[int] = None):
+        super().__init__(mensagem if posicao is None else f"{mensagem} (caractere {posicao})")
+        self.posicao = posicao
+
+
+def ativa(config: Dict) -> bool:
+    return bool(config.get("saida_validacao", True))
+
+
+def tentativas(config: Dict) -> int:
+    return max(1, int(config.get("saida_tentativas", DEFAULT_TENTATIVAS)))
+
+
+def _tipos(schema: Optional[Dict]) -> Optional[set]:
+    if not schema or "type" not in schema:
+        return None
+    return {schema["type"]} if isinstance(schema["type"], str) else set(schema["type"])
+
+
+class ValidadorJSON:
+    """Validação de um objeto JSON contra o esquema, caractere a caractere"""
+
+    def __init__(self, schema: Optional[Dict] = None, extras: bool = False, max_prefixo: int = MAX_PREFIXO):
+        """`extras`: aceita chaves fora do esquema (respostas sem saída estruturada, backend assistants)"""
+        self.schema = schema
+        self.extras = extras
+        self.max_prefixo = max_prefixo
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.pilha: List[Dict] = []
+        self.posicao = 0
+        self.iniciado = False
+        self.concluido = False
+        self.erro: Optional[SaidaInvalida] = None
+        self.visto = 0
+        # String em andamento: conteúdo (ainda com os escapes) guardado só para chaves e enums
+        self.em_string = False
+        self.escape = False
+        self.string: Optional[List[str]] = None
+        self.string_chave = False
+        self.string_schema = None
+        # Número ou literal (true, false, null) em andamento
+        self.escalar: Optional[List[str]] = None
+        self.escalar_schema = None
+
+    def acompanhar(self, texto: str):
+        """Texto acumulado da resposta (on_partial): processa só o que chegou desde a última chamada
+
+        Texto mais curto que o já visto é uma nova mensagem (assistants):
+        a validação recomeça. Depois do primeiro erro não faz nada.
+        """
+        if self.erro is not None:
+            return
+        if len(texto) < self.visto:
+            self.reiniciar()
+        novo, self.visto = texto[self.visto:], len(texto)
+        self.alimentar(novo)
+
+    def alimentar(self, pedaco: str):
+        try:
+            for c in pedaco:
+                if self.concluido:
+                    return
+                self._caractere(c)
+                self.posicao += 1
+        except SaidaInvalida as e:
+            self.erro = e
+            raise
+
+    def _falha(self, mensagem: str):
+        caminho = self._caminho()
+        raise SaidaInvalida(f"{mensagem}{f' em {caminho}' if caminho else ''}", self.posicao)
+
+    def _caminho(self) -> str:
+        partes = []
+        for frame in self.pilha:
+            if frame["tipo"] == "objeto" and frame["chave"] is not None:
+                partes.append(f".{frame['chave']}")
+            elif frame["tipo"] == "lista" and frame["n"]:
+                partes.append(f"[{frame['n'] - 1}]")
+        return "".join(partes).lstrip(".")
+
+    def _caractere(self, c: str):
+        if self.em_string:
+            self._caractere_string(c)
+            return
+        if self.escalar is not None:
+            if c in CARACTERES_ESCALAR:
+                self.escalar.append(c)
+                return
+            self._fim_escalar()
+        if not self.iniciado:
+            if c == "{":
+                self.iniciado = True
+                self._abrir_valor(c, self.schema)
+            elif self.posicao >= self.max_prefixo:
+                self._falha(f"JSON não começou nos primeiros {self.max_prefixo} caracteres")
+            return
+        if c.isspace():
+            return
+
+        frame = self.pilha[-1]
+        estado = frame["estado"]
+        if frame["tipo"] == "objeto":
+            if estado in ("chave_ou_fim", "virgula_ou_fim") and c == "}":
+                self._fechar()
+            elif estado in ("chave_ou_fim", "chave") and c == '"':
+                self._abrir_string(chave=True)
+            elif estado == "dois_pontos" and c == ":":
+                frame["estado"] = "valor"
+            elif estado == "valor":
+                frame["estado"] = "virgula_ou_fim"
+                props = (frame["schema"] or {}).get("properties") or {}
+                self._abrir_valor(c, props.get(frame["chave"]))
+            elif estado == "virgula_ou_fim" and c == ",":
+                frame["estado"] = "chave"
+            else:
+                self._falha(f"caractere inesperado {c!r}")
+        else:
+            if estado in ("valor_ou_fim", "virgula_ou_fim") and c == "]":
+                self._fechar()
+            elif estado in ("valor_ou_fim", "valor"):
+                frame["estado"] = "virgula_ou_fim"
+                frame["n"] += 1
+                self._abrir_valor(c, (frame["schema"] or {}).get("items"))
+            elif estado == "virgula_ou_fim" and c == ",":
+                frame["estado"] = "valor"
+            else:
+                self._falha(f"caractere inesperado {c!r}")
+
+    def _abrir_valor(self, c: str, schema: Optional[Dict]):
+        tipo = INICIO_TIPO.get(c) or ("number" if c == "-" or c.isdigit() else None)
+        if tipo is None:
+            self._falha(f"caractere inesperado {c!r}")
+        permitidos = _tipos(schema)
+        if permitidos and tipo not in permitidos and not (tipo == "number" and "integer" in permitidos):
+            self._falha(f"esperado {'/'.join(sorted(permitidos))}, veio {tipo}")
+        if c == "{":
+            self.pilha.append({"tipo": "objeto", "schema": schema, "estado": "chave_ou_fim",
+                               "chave": None, "chaves": set()})
+        elif c == "[":
+            self.pilha.append({"tipo": "lista", "schema": schema, "estado": "valor_ou_fim", "n": 0})
+        elif c == '"':
+            self._abrir_string(chave=False, schema=schema)
+        else:
+            self.escalar, self.escalar_schema = [c], schema
+
+    def _abrir_string(self, chave: bool, schema: Optional[Dict] = None):
+        self.em_string, self.escape = True, False
+        self.string_chave, self.string_schema = chave, schema
+        self.string = [] if chave or (schema or {}).get("enum") else None
+
+    def _caractere_string(self, c: str):
+        if self.escape:
+            self.escape = False
+        elif c == "\\":
+            self.escape = True
+        elif c == '"':
+            self.em_string = False
+            self._fim_string(self._decodificar("".join(self.string)) if self.string is not None else None)
+            return
+        if self.string is not None:
+            self.string.append(c)
+
+    def _decodificar(self, bruta: str) -> str:
+        """Conteúdo da string com os escapes JSON resolvidos, para comparar com chaves e enums"""
+        try:
+            return json.loads(f'"{bruta}"', strict=False)
+        except ValueError:
+            self._falha(f"string inválida {bruta[:20]!r}")
+
+    def _fim_string(self, valor: Optional[str]):
+        if self.string_chave:
+            frame = self.pilha[-1]
+            schema = frame["schema"] or {}
+            if valor in frame["chaves"]:
+                self._falha(f"chave repetida {valor!r}")
+            props = schema.get("properties")
+            if props is not None and valor not in props and not self.extras \
+                    and schema.get("additionalProperties") is False:
+                self._falha(f"chave fora do esquema {valor!r}")
+            frame["chave"] = valor
+            frame["chaves"].add(valor)
+            frame["estado"] = "dois_pontos"
+        elif valor is not None and valor not in self.string_schema["enum"]:
+            self._falha(f"valor fora do enum {valor[:40]!r}")
+
+    def _fim_escalar(self):
+        texto, schema = "".join(self.escalar), self.escalar_schema or {}
+        self.escalar = None
+        try:
+            valor = json.loads(texto)
+        except ValueError:
+            self._falha(f"valor inválido {texto[:20]!r}")
+        if _tipos(schema) == {"integer"} and not isinstance(valor, int):
+            self._falha(f"esperado integer, veio {texto[:20]!r}")
+        if schema.get("enum") and valor not in schema["enum"]:
+            self._falha(f"valor fora do enum {texto[:20]!r}")
+
+    def _fechar(self):
+        frame = self.pilha[-1]
+        if frame["tipo"] == "objeto":
+            faltando = [k for k in (frame["schema"] or {}).get("required") or [] if k not in frame["chaves"]]
+            if faltando:
+                self._falha(f"faltam as chaves {', '.join(faltando)}")
+        self.pilha.pop()
+        if not self.pilha:
+            self.concluido = True
+
+
+def validar(dados: Any, schema: Dict, extras: bool = False):
+    """Levanta SaidaInvalida se o objeto já decodificado não segue o esquema"""
+    validador = ValidadorJSON(schema, extras)
+    validador.alimentar(json.dumps(dados, ensure_ascii=False))
+    if not validador.concluido:
+        raise SaidaInvalida("JSON incompleto")
+
+
+def reparar(texto: str) -> Optional[Any]:
+    """Objeto JSON de uma resposta com defeitos triviais, ou None se não houver conserto
+
+    Ignora o que vem antes do primeiro "{" e depois do objeto, tira vírgulas
+    sobrando e fecha uma resposta truncada no último valor completo.
+    """
+    inicio = texto.find("{")
+    if inicio < 0:
+        return None
+    saida: List[str] = []
+    pilha: List[str] = []
+    # Pontos em que o texto acumulado fecha sem o valor em andamento: (tamanho, fechamentos)
+    cortes = []
+    em_string = escape = False
+    for c in texto[inicio:]:
+        if em_string:
+            saida.append(c)
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                em_string = False
+            continue
+        if c == '"':
+            em_string = True
+        elif c in "{[":
+            pilha.append("}" if c == "{" else "]")
+            saida.append(c)
+            cortes.append((len(saida), list(pilha)))
+            continue
+        elif c in "}]":
+            while saida and saida[-1].isspace():
+                saida.pop()
+            if saida and saida[-1] == ",":
+                saida.pop()
+            if not pilha or pilha[-1] != c:
+                break
+            pilha.pop()
+            saida.append(c)
+            if not pilha:
+                break
+            continue
+        elif c == ",":
+            cortes.append((len(saida), list(pilha)))
+        saida.append(c)
+
+    candidatos = []
+    if not pilha:
+        candidatos.append("".join(saida))
+    else:
+        # Truncada: fecha como está e, se não abrir, volta aos últimos valores completos
+        final = "".join(saida) + ('"' if em_string else "")
+        candidatos.append(final.rstrip().rstrip(",") + "".join(reversed(pilha)))
+        candidatos += ["".join(saida[:n]).rstrip().rstrip(",") + "".join(reversed(p))
+                       for n, p in reversed(cortes[-5:])]
+    for candidato in candidatos:
+        try:
+            return json.loads(candidato, strict=False)
+        except ValueError:
+            continue
+    return None
+
+
+def reparavel(texto: str, schema: Dict, extras: bool = False) -> bool:
+    """O texto recebido até agora já dá uma resposta válida depois do reparo (não vale abortar)"""
+    dados = reparar(texto)
+    if dados is None:
+        return False
+    try:
+        validar(dados, schema, extras)
+    except SaidaInvalida:
+        return False
+    return True